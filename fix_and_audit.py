@@ -1,25 +1,24 @@
-
 import os
 
+from site_tools import document, writer
+from site_tools.checks import ORBITRON_CLASS_SPAN, OrbitronWordmark
+
 def fix_index_font():
     path = "public/index.html"
     try:
-        with open(path, 'r') as f:
-            content = f.read()
+        doc = document.load(path)
         
-        # Target the specific span in the navbar
-        target = 'FUTURE<span class="text-cyan-400">ATOMS</span>'
-        replacement = 'FUTURE<span class="font-[\'Orbitron\'] text-cyan-400">ATOMS</span>'
+        # Target the FUTURE<span class="text-cyan-400">ATOMS</span> wordmark in the navbar
+        results, edits = document.walk(doc, [OrbitronWordmark(ORBITRON_CLASS_SPAN)])
         
-        if target in content:
-            new_content = content.replace(target, replacement)
-            with open(path, 'w') as f:
-                f.write(new_content)
+        if edits:
+            new_content = document.apply_edits(doc.text, edits)
+            writer.write_text(path, new_content)
             print(f"Fixed {path}")
         else:
             print(f"Target string not found in {path}. searching for partial matches...")
             # Debugging partials
-            if 'FUTURE<span' in content:
+            if 'FUTURE<span' in doc.text:
                 print("Found 'FUTURE<span' start")
     except Exception as e:
         print(f"Error processing {path}: {e}")
@@ -31,8 +30,7 @@ def audit_docs():
             print(f"File not found: {path}")
             continue
             
-        with open(path, 'r') as f:
-            content = f.read()
+        content = document.load(path).text
             
         if "FUTUREATOMS" in content or "FutureAtoms" in content:
             print(f"Found 'FutureAtoms' text in {path}")
@@ -1,22 +1,20 @@
-
 import os
 import sys
 
-def update_css_link(filepath):
-    try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            content = f.read()
+from site_tools import document, writer
+from site_tools.checks import MainCssVersion
+from site_tools.manifest import Manifest, cached_walk
 
-        # Target string
-        target = 'href="css/main.css"'
-        replacement = 'href="css/main.css?v=9999"'
+def update_css_link(filepath, manifest=None):
+    try:
+        results, edits, doc = cached_walk(filepath, [MainCssVersion()], manifest, fix=True)
+        status = results['main_css']
 
-        if target in content:
-            new_content = content.replace(target, replacement)
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(new_content)
+        if status['updated']:
+            new_content = document.apply_edits(doc.text, edits)
+            writer.write_text(filepath, new_content)
             print(f"Updated: {filepath}")
-        elif 'href="css/main.css?v=9999"' in content:
+        elif status['current']:
             print(f"Already updated: {filepath}")
         else:
             print(f"Skipped (target not found): {filepath}")
@@ -32,9 +30,11 @@ def main():
 
     files = [f for f in os.listdir(public_dir) if f.endswith('.html')]
     files.sort()
+    manifest = Manifest()
     
     for f in files:
-        update_css_link(os.path.join(public_dir, f))
+        update_css_link(os.path.join(public_dir, f), manifest)
+    manifest.save()
 
 if __name__ == "__main__":
     main()
@@ -1,51 +1,34 @@
-
 import os
-import re
-
-def update_file(filepath):
-    try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            content = f.read()
 
-        # Regex for href="css/main.css" allowing quotes
-        # We also want to avoid double replacement if ?v=9999 is already there
-        pattern = r'href=["\']css/main\.css(?![\?&]v=9999)["\']'
-        
-        # We want to replace it with href="css/main.css?v=9999" preserving the quote used?
-        # Let's simplify: replace the whole match.
-        # But we need to know which quote was used.
-        
-        def replacer(match):
-            full_match = match.group(0)
-            quote = full_match[-1] # the closing quote
-            return f'href={quote}css/main.css?v=9999{quote}'
+from site_tools import engine
+from site_tools.checks import MainCssVersion
+from site_tools.manifest import Manifest
 
-        new_content, count = re.subn(pattern, replacer, content)
-
-        if count > 0:
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(new_content)
-            print(f"Updated {filepath} ({count} matches)")
-        else:
-            if 'css/main.css?v=9999' in content:
-                print(f"Skipped {filepath} (Already updated)")
-            else:
-                print(f"Skipped {filepath} (No match found)")
-                # Debug logging for chipos.html
-                if 'chipos.html' in filepath:
-                     print(f"DEBUG {filepath} content snippet:")
-                     idx = content.find('main.css')
-                     print(content[idx-20:idx+20])
-    
-    except Exception as e:
-        print(f"Error {filepath}: {e}")
+def css_visitors(path):
+    # Matches href="css/main.css" with either quote style; links that
+    # already carry ?v=9999 are reported as current and left alone.
+    return [MainCssVersion()]
 
 def main():
     public_dir = 'public'
     files = [f for f in os.listdir(public_dir) if f.endswith('.html')]
     files.sort()
-    for f in files:
-        update_file(os.path.join(public_dir, f))
+    paths = [os.path.join(public_dir, f) for f in files]
+
+    manifest = Manifest()
+    report = engine.run(css_visitors, paths, manifest=manifest)
+    manifest.save()
+
+    for result in report.results:
+        if result.status == engine.FAILED:
+            print(f"Error {result.path}: {result.error}")
+        elif result.status == engine.UPDATED:
+            print(f"Updated {result.path} ({result.results['main_css']['updated']} matches)")
+        elif result.results['main_css']['current']:
+            print(f"Skipped {result.path} (Already updated)")
+        else:
+            print(f"Skipped {result.path} (No match found)")
+    print(report.summary())
 
 if __name__ == "__main__":
     main()
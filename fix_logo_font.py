@@ -1,58 +1,47 @@
-
 import glob
 import os
-import re
+
+from site_tools import document, engine
+from site_tools.checks import WORDMARK_SKIP, OrbitronWordmark
+from site_tools.manifest import Manifest
+
+def wordmark_visitors(path):
+    # OrbitronWordmark handles whitespace variations between FUTURE, the
+    # text-cyan-400 span and ATOMS, and leaves already-styled spans alone.
+    return [OrbitronWordmark()]
 
 def fix_all_logos():
     print("Starting logo fix...")
-    files = glob.glob("public/*.html")
+    files = sorted(glob.glob("public/*.html"))
     print(f"Found {len(files)} files in public/")
     
-    # Regex to handle whitespace variations
-    # We want to find: FUTURE<span class="text-cyan-400">ATOMS</span>
-    # and replace with: FUTURE<span class="text-cyan-400" style="font-family: 'Orbitron', sans-serif;">ATOMS</span>
-    
-    pattern = re.compile(r'(FUTURE\s*<span\s+class=["\']text-cyan-400["\']\s*>\s*ATOMS\s*</span>)', re.IGNORECASE)
-    replacement = r'FUTURE<span class="text-cyan-400" style="font-family: \'Orbitron\', sans-serif;">ATOMS</span>'
-    
-    count = 0
+    targets = []
     for path in files:
-        if "chipos-docs.html" in path or "chipos-settings.html" in path:
+        if os.path.basename(path) in WORDMARK_SKIP:
             print(f"Skipping docs: {path}")
             continue 
+        targets.append(path)
 
-        try:
-            with open(path, 'r', encoding='utf-8') as f:
-                content = f.read()
-        except Exception as e:
-            print(f"Error reading {path}: {e}")
-            continue
-            
-        new_content = content
-        
-        # Check if already fixed
-        if 'style="font-family: \'Orbitron\', sans-serif;"' in content and 'ATOMS</span>' in content:
-            # Simple check if it might be already done
-             if 'FUTURE<span class="text-cyan-400" style="font-family: \'Orbitron\', sans-serif;">ATOMS</span>' in content:
-                 print(f"Skipping {path} (already fixed)")
-                 continue
+    manifest = Manifest()
+    report = engine.run(wordmark_visitors, targets, manifest=manifest)
+    manifest.save()
 
-        if pattern.search(content):
-            new_content = pattern.sub(replacement, content)
-            
-            with open(path, 'w', encoding='utf-8') as f:
-                f.write(new_content)
-            print(f"Updated {path}")
-            count += 1
-        else:
-             # Debug: Check if "FUTURE" exists but didn't match
-             if "FUTURE" in content and "ATOMS" in content:
-                 print(f"No match in {path} but found keywords. Checking snippet...")
-                 # Print a snippet to see what it looks like
-                 idx = content.find("FUTURE")
-                 print(f"Snippet: {content[idx:idx+60]!r}")
+    for result in report.results:
+        if result.status == engine.UPDATED:
+            print(f"Updated {result.path}")
+        elif result.status == engine.FAILED:
+            print(f"Error processing {result.path}: {result.error}")
+        elif result.results['orbitron']['fixed']:
+            print(f"Skipping {result.path} (already fixed)")
+        elif not result.cached:
+            # Debug: "FUTURE" exists but didn't match
+            content = document.load(result.path).text
+            if "FUTURE" in content and "ATOMS" in content:
+                print(f"No match in {result.path} but found keywords. Checking snippet...")
+                idx = content.find("FUTURE")
+                print(f"Snippet: {content[idx:idx+60]!r}")
 
-    print(f"Total files updated: {count}")
+    print(f"Total files updated: {report.counts[engine.UPDATED]} ({report.summary()})")
 
 if __name__ == "__main__":
     fix_all_logos()
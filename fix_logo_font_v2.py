@@ -1,7 +1,9 @@
-
 import glob
 import os
-import re
+
+from site_tools import document, writer
+from site_tools.checks import WORDMARK_SKIP, OrbitronWordmark
+from site_tools.manifest import Manifest, cached_walk
 
 def fix_all_logos():
     log_file = "fix_log.txt"
@@ -10,43 +12,34 @@ def fix_all_logos():
         files = glob.glob("public/*.html")
         log.write(f"Found {len(files)} files in public/\n")
         
-        # Regex to handle whitespace variations
-        pattern = re.compile(r'(FUTURE\s*<span\s+class=["\']text-cyan-400["\']\s*>\s*ATOMS\s*</span>)', re.IGNORECASE)
-        replacement = r'FUTURE<span class="text-cyan-400" style="font-family: \'Orbitron\', sans-serif;">ATOMS</span>'
-        
+        manifest = Manifest()
         count = 0
         for path in files:
-            if "chipos-docs.html" in path or "chipos-settings.html" in path:
+            if os.path.basename(path) in WORDMARK_SKIP:
                 log.write(f"Skipping docs: {path}\n")
                 continue 
 
             try:
-                with open(path, 'r', encoding='utf-8') as f:
-                    content = f.read()
+                results, edits, doc = cached_walk(path, [OrbitronWordmark()], manifest, fix=True)
             except Exception as e:
                 log.write(f"Error reading {path}: {e}\n")
                 continue
-                
-            new_content = content
-            
-            # Check if already fixed
-            if 'FUTURE<span class="text-cyan-400" style="font-family: \'Orbitron\', sans-serif;">ATOMS</span>' in content:
-                log.write(f"Skipping {path} (already fixed)\n")
-                continue
 
-            if pattern.search(content):
-                new_content = pattern.sub(replacement, content)
-                
-                with open(path, 'w', encoding='utf-8') as f:
-                    f.write(new_content)
+            if edits:
+                new_content = document.apply_edits(doc.text, edits)
+                writer.write_text(path, new_content)
                 log.write(f"Updated {path}\n")
                 count += 1
-            else:
-                 if "FUTURE" in content and "ATOMS" in content:
-                     log.write(f"No match in {path} but found keywords.\n")
-                     idx = content.find("FUTURE")
-                     log.write(f"Snippet: {content[idx:idx+60]!r}\n")
+            elif results['orbitron']['fixed']:
+                log.write(f"Skipping {path} (already fixed)\n")
+            elif doc is None:
+                log.write(f"Skipping {path} (unchanged since last run)\n")
+            elif "FUTURE" in doc.text and "ATOMS" in doc.text:
+                log.write(f"No match in {path} but found keywords.\n")
+                idx = doc.text.find("FUTURE")
+                log.write(f"Snippet: {doc.text[idx:idx+60]!r}\n")
 
+        manifest.save()
         log.write(f"Total files updated: {count}\n")
 
 if __name__ == "__main__":
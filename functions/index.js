@@ -2,6 +2,7 @@ const { onRequest } = require("firebase-functions/v2/https");
 const { defineSecret } = require("firebase-functions/params");
 const { GoogleGenAI } = require("@google/genai");
 const { Octokit } = require("@octokit/rest");
+const { retrieve, formatPassages } = require("./site-retrieval");
 
 // Import Summit Pipeline functions
 const { summitPipeline, summitArticles, summitSocial, summitGenerate } = require("./summit-pipeline");
@@ -98,9 +99,27 @@ exports.chat = onRequest({ secrets: [GEMINI_API_KEY, GEMINI_STORE_NAME] }, async
 
         const client = new GoogleGenAI({ apiKey });
 
-        // Construct tools configuration (RAG)
+        // Ground the answer in the site passages relevant to this question
+        // (site-index.json, built by `python3 -m site_tools.retrieval`). The
+        // previous user turn is included so follow-ups still match.
+        let passages = [];
+        let siteIndexLoaded = true;
+        try {
+            const lastUserTurn = Array.isArray(history)
+                ? [...history].reverse().find((turn) => turn && turn.role === 'user')
+                : null;
+            const followUp = lastUserTurn && Array.isArray(lastUserTurn.parts)
+                ? lastUserTurn.parts.map((part) => part.text || '').join(' ')
+                : '';
+            passages = retrieve(`${followUp} ${message || ''}`);
+        } catch (error) {
+            siteIndexLoaded = false;
+            console.error("Site index unavailable:", error.message);
+        }
+
+        // Construct tools configuration (RAG); only needed without the site index
         let tools = [];
-        if (storeName) {
+        if (storeName && !siteIndexLoaded) {
             tools = [{
                 fileSearch: {
                     fileSearchStoreNames: [storeName]
@@ -132,6 +151,13 @@ exports.chat = onRequest({ secrets: [GEMINI_API_KEY, GEMINI_STORE_NAME] }, async
 - Contact: https://futureatoms.com/contact.html
 `;
 
+        const SITE_CONTENT = passages.length ? `
+**Relevant Site Content:**
+Passages from the website that match the question. Prefer them over general knowledge and link the passage URL when you use one.
+
+${formatPassages(passages)}
+` : '';
+
         // System Instruction
         const systemInstruction = `You are Atomos, the advanced AI operating system and assistant for FutureAtoms.
 Your goal is to help users navigate the FutureAtoms ecosystem, understand our quantum-inspired products, and find the right tools for their needs.
@@ -144,7 +170,7 @@ Your goal is to help users navigate the FutureAtoms ecosystem, understand our qu
 **Your Knowledge Base (SITEMAP):**
 Use these links EXACTLY when recommending products or pages. Do not make up URLs.
 ${SITEMAP}
-
+${SITE_CONTENT}
 **Guidelines:**
 1. **Always provide direct links** when discussing a specific product.
 2. **ChipOS** is our flagship product. It is an AI Operating System for Hardware Design. If asked about downloading or installing, direct them to the ChipOS page.
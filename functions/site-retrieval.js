@@ -0,0 +1,93 @@
+/**
+ * Site knowledge retrieval for the chat function
+ *
+ * Loads site-index.json (built by `python3 -m site_tools.retrieval`) once per
+ * instance and ranks its passages with the BM25 weights precomputed there,
+ * so each chat request only carries the few passages relevant to it.
+ *
+ * Local check, no Gemini call:
+ *   node functions/site-retrieval.js "how much does chipos cost"
+ */
+
+const fs = require("fs");
+const path = require("path");
+
+const INDEX_PATH = path.join(__dirname, "site-index.json");
+const FORMAT_VERSION = 1;
+const TOP_K = 5;
+const MAX_PER_PAGE = 2;
+
+let index = null;
+
+// Must match site_tools.search.tokenize and site_tools.retrieval.stem
+function tokenize(text, maxTermLength = 32) {
+    const folded = text.normalize("NFKD").replace(/\p{M}/gu, "").toLowerCase();
+    return (folded.match(/[a-z0-9]+/g) || []).filter((t) => t.length <= maxTermLength);
+}
+
+function stem(term) {
+    if (term.length > 5 && term.endsWith("ies")) return term.slice(0, -3) + "y";
+    if (term.length > 4 && term.endsWith("s") && !/(ss|us|is)$/.test(term)) return term.slice(0, -1);
+    return term;
+}
+
+function loadIndex() {
+    if (!index) {
+        const data = JSON.parse(fs.readFileSync(INDEX_PATH, "utf8"));
+        if (data.version !== FORMAT_VERSION) {
+            throw new Error(`site-index.json: unsupported version ${data.version}`);
+        }
+        data.stopWords = new Set(data.stopWords);
+        index = data;
+    }
+    return index;
+}
+
+function queryTerms(data, text) {
+    return [...new Set(tokenize(text, data.maxTermLength).filter((t) => !data.stopWords.has(t)).map(stem))];
+}
+
+/**
+ * Best passages for `query` as { url, title, section, text, score }, at most
+ * `maxPerPage` from any one page.
+ */
+function retrieve(query, { k = TOP_K, maxPerPage = MAX_PER_PAGE } = {}) {
+    const data = loadIndex();
+    const scores = new Map();
+    for (const term of queryTerms(data, query)) {
+        const postings = data.terms[term] || [];
+        for (let i = 0; i < postings.length; i += 2) {
+            scores.set(postings[i], (scores.get(postings[i]) || 0) + postings[i + 1]);
+        }
+    }
+    const ranked = [...scores.keys()].sort((a, b) => scores.get(b) - scores.get(a) || a - b);
+    const perPage = new Map();
+    const results = [];
+    for (const id of ranked) {
+        const [url, title, section, text] = data.passages[id];
+        const page = url.split("#")[0];
+        if ((perPage.get(page) || 0) >= maxPerPage) continue;
+        perPage.set(page, (perPage.get(page) || 0) + 1);
+        results.push({ url, title, section, text, score: scores.get(id) });
+        if (results.length >= k) break;
+    }
+    return results;
+}
+
+/** Passages as a numbered Markdown block for the system instruction. */
+function formatPassages(passages) {
+    return passages.map((p, i) => `[${i + 1}] ${p.title} - ${p.section} (${p.url})\n${p.text}`).join("\n\n");
+}
+
+module.exports = { loadIndex, retrieve, formatPassages, tokenize, stem };
+
+if (require.main === module) {
+    const query = process.argv.slice(2).join(" ");
+    if (!query) {
+        console.error('Usage: node functions/site-retrieval.js "question"');
+        process.exit(1);
+    }
+    for (const p of retrieve(query)) {
+        console.log(`${p.score.toFixed(3).padStart(7)}  ${p.title} / ${p.section}\n         ${p.url}\n         ${p.text.slice(0, 200)}...`);
+    }
+}
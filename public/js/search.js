@@ -0,0 +1,151 @@
+/**
+ * Site search client for the prebuilt index in /search/ (built by site_tools/search.py)
+ * Loads index.json once, then fetches only the term shards a query needs
+ *
+ * Usage:
+ *   import { search } from './js/search.js';
+ *   const results = await search('chipos mcp');
+ */
+
+const INDEX_URL = '/search/index.json';
+// Shard file names in index.json are relative to it.
+const SHARD_BASE = INDEX_URL.slice(0, INDEX_URL.lastIndexOf('/') + 1);
+const TITLE_BOOST = 3;
+const PHRASE_BOOST = 2;
+const MIN_PREFIX_LENGTH = 2;
+
+let indexPromise = null;
+const shardCache = new Map();
+
+// Must match site_tools.search.tokenize
+export function tokenize(text) {
+    const folded = text.normalize('NFKD').replace(/\p{M}/gu, '').toLowerCase();
+    return folded.match(/[a-z0-9]+/g) || [];
+}
+
+function loadIndex() {
+    if (!indexPromise) {
+        indexPromise = fetch(INDEX_URL).then((response) => {
+            if (!response.ok) throw new Error(`search index: HTTP ${response.status}`);
+            return response.json();
+        }).then((index) => {
+            index.stopWords = new Set(index.stopWords);
+            index.prefixes = Object.keys(index.shards).sort((a, b) => b.length - a.length);
+            index.docs.forEach((doc) => {
+                if (doc) doc.titleLength = tokenize(doc[1]).length;
+            });
+            return index;
+        });
+        indexPromise.catch(() => { indexPromise = null; });
+    }
+    return indexPromise;
+}
+
+function loadShard(index, term) {
+    const prefix = index.prefixes.find((p) => term.startsWith(p));
+    if (prefix === undefined) return Promise.resolve({});
+    const file = index.shards[prefix];
+    if (!shardCache.has(file)) {
+        const promise = fetch(SHARD_BASE + file).then((response) => {
+            if (!response.ok) throw new Error(`search shard ${file}: HTTP ${response.status}`);
+            return response.json();
+        });
+        promise.catch(() => shardCache.delete(file));
+        shardCache.set(file, promise);
+    }
+    return shardCache.get(file);
+}
+
+// [[doc, pos, +delta, ...], ...] -> Map(doc -> [positions])
+function decode(rows) {
+    const docs = new Map();
+    for (const row of rows) {
+        const positions = [];
+        let pos = 0;
+        for (let i = 1; i < row.length; i++) {
+            pos += row[i];
+            positions.push(pos);
+        }
+        docs.set(row[0], positions);
+    }
+    return docs;
+}
+
+function merge(target, docs) {
+    for (const [doc, positions] of docs) {
+        target.set(doc, (target.get(doc) || []).concat(positions).sort((a, b) => a - b));
+    }
+    return target;
+}
+
+/**
+ * Ranked results for a free-text query: every term must match (the last one
+ * as a prefix, for search-as-you-type); falls back to any term matching.
+ */
+export async function search(query, { limit = 10 } = {}) {
+    const index = await loadIndex();
+    const terms = [...new Set(tokenize(query))]
+        .filter((t) => !index.stopWords.has(t) && t.length <= index.maxTermLength);
+    if (!terms.length) return [];
+
+    const shards = await Promise.all(terms.map((term) => loadShard(index, term)));
+    const matches = terms.map((term, i) => {
+        const shard = shards[i];
+        const docs = decode(shard[term] || []);
+        if (i === terms.length - 1 && term.length >= MIN_PREFIX_LENGTH) {
+            for (const other of Object.keys(shard)) {
+                if (other !== term && other.startsWith(term)) merge(docs, decode(shard[other]));
+            }
+        }
+        return docs;
+    });
+
+    const total = index.docs.filter(Boolean).length;
+    const scores = new Map();
+    const hits = new Map();
+    const firstHit = new Map();
+    matches.forEach((docs) => {
+        const idf = Math.log(1 + total / Math.max(1, docs.size));
+        for (const [doc, positions] of docs) {
+            const title = index.docs[doc].titleLength;
+            const inTitle = positions.filter((p) => p < title).length;
+            const tf = positions.length + TITLE_BOOST * inTitle;
+            scores.set(doc, (scores.get(doc) || 0) + idf * (1 + Math.log(tf)));
+            hits.set(doc, (hits.get(doc) || 0) + 1);
+            const first = positions.find((p) => p >= title);
+            if (first !== undefined && !(first >= firstHit.get(doc))) firstHit.set(doc, first);
+        }
+    });
+
+    // Bonus when the terms appear next to each other in query order.
+    if (matches.length > 1) {
+        for (const doc of scores.keys()) {
+            const lists = matches.map((docs) => new Set(docs.get(doc) || []));
+            const phrase = [...lists[0]].some((p) => lists.every((set, i) => set.has(p + i)));
+            if (phrase) scores.set(doc, scores.get(doc) * PHRASE_BOOST);
+        }
+    }
+
+    let docs = [...scores.keys()].filter((doc) => hits.get(doc) === terms.length);
+    if (!docs.length) docs = [...scores.keys()];
+    docs.sort((a, b) => scores.get(b) - scores.get(a));
+
+    return docs.slice(0, limit).map((doc) => {
+        const [url, title, description, sections] = index.docs[doc];
+        const position = firstHit.get(doc);
+        let section = null;
+        if (position !== undefined) {
+            for (const entry of sections) {
+                if (entry[0] > position) break;
+                section = entry;
+            }
+        }
+        return {
+            url: section && section[1] ? `${url}#${section[1]}` : url,
+            title,
+            description,
+            section: section ? section[2] : null,
+            score: scores.get(doc),
+        };
+    });
+}
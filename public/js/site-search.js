@@ -0,0 +1,117 @@
+/**
+ * Search box for the prebuilt site index (see js/search.js)
+ * Enhances every <form data-site-search> holding an <input type="search">
+ * and a results <ul>; results update as you type
+ *
+ * Usage:
+ *   <script type="module" src="js/site-search.js"></script>
+ */
+
+import { search } from './search.js';
+
+const DEBOUNCE_MS = 120;
+const LIMIT = 8;
+
+function renderResult(result) {
+    const item = document.createElement('li');
+    const link = document.createElement('a');
+    link.href = result.url;
+    link.className = 'block px-4 py-3 hover:bg-cyan-500/10 focus:bg-cyan-500/10 focus:outline-none';
+
+    const title = document.createElement('span');
+    title.className = 'block text-white font-bold';
+    title.textContent = result.section ? `${result.title} — ${result.section}` : result.title;
+    link.appendChild(title);
+
+    if (result.description) {
+        const description = document.createElement('span');
+        description.className = 'block text-sm text-gray-400 truncate';
+        description.textContent = result.description;
+        link.appendChild(description);
+    }
+    item.appendChild(link);
+    return item;
+}
+
+function setupSearch(form) {
+    const input = form.querySelector('input[type="search"]');
+    const list = form.querySelector('ul');
+    if (!input || !list) return;
+
+    let timer = null;
+    let latest = 0;
+
+    function show(items) {
+        list.replaceChildren(...items);
+        list.hidden = items.length === 0;
+    }
+
+    function message(text) {
+        const item = document.createElement('li');
+        item.className = 'px-4 py-3 text-sm text-gray-400';
+        item.textContent = text;
+        return item;
+    }
+
+    async function run() {
+        const query = input.value.trim();
+        const request = ++latest;
+        if (!query) {
+            show([]);
+            return;
+        }
+        try {
+            const results = await search(query, { limit: LIMIT });
+            if (request !== latest) return;
+            show(results.length ? results.map(renderResult) : [message('No results')]);
+        } catch (error) {
+            if (request !== latest) return;
+            console.error('Site search failed:', error);
+            show([message('Search is unavailable right now')]);
+        }
+    }
+
+    input.addEventListener('input', () => {
+        clearTimeout(timer);
+        timer = setTimeout(run, DEBOUNCE_MS);
+    });
+    form.addEventListener('submit', (event) => {
+        event.preventDefault();
+        const first = list.querySelector('a');
+        if (first) window.location.href = first.href;
+    });
+    input.addEventListener('keydown', (event) => {
+        if (event.key === 'Escape') {
+            input.value = '';
+            show([]);
+        } else if (event.key === 'ArrowDown') {
+            const first = list.querySelector('a');
+            if (first) {
+                event.preventDefault();
+                first.focus();
+            }
+        }
+    });
+    list.addEventListener('keydown', (event) => {
+        const links = [...list.querySelectorAll('a')];
+        const index = links.indexOf(document.activeElement);
+        if (index === -1) return;
+        if (event.key === 'ArrowDown' && index < links.length - 1) {
+            event.preventDefault();
+            links[index + 1].focus();
+        } else if (event.key === 'ArrowUp') {
+            event.preventDefault();
+            (index > 0 ? links[index - 1] : input).focus();
+        } else if (event.key === 'Escape') {
+            input.focus();
+        }
+    });
+    document.addEventListener('click', (event) => {
+        if (!form.contains(event.target)) list.hidden = true;
+    });
+    input.addEventListener('focus', () => {
+        if (list.children.length) list.hidden = false;
+    });
+}
+
+document.querySelectorAll('form[data-site-search]').forEach(setupSearch);
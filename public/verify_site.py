@@ -1,97 +1,70 @@
 import os
-import re
-from html.parser import HTMLParser
+import sys
 
-class LinkParser(HTMLParser):
-    def __init__(self):
-        super().__init__()
-        self.links = []
-        self.title = None
-        self.description = None
-        self._in_title = False
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-    def handle_starttag(self, tag, attrs):
-        if tag == 'a':
-            for name, value in attrs:
-                if name == 'href':
-                    self.links.append(value)
-        elif tag == 'title':
-            self._in_title = True
-        elif tag == 'meta':
-            attr_dict = dict(attrs)
-            if attr_dict.get('name') == 'description':
-                self.description = attr_dict.get('content')
+from site_tools.checks import PageMeta
+from site_tools.hosting import Hosting
+from site_tools.links import LinkTargets, SiteTree, check_local
+from site_tools.manifest import Manifest, cached_walk
 
-    def handle_endtag(self, tag):
-        if tag == 'title':
-            self._in_title = False
+# Always check the deployable tree next to this script, never the cwd
+# (running from the repo root used to descend into node_modules).
+PUBLIC_ROOT = os.path.dirname(os.path.abspath(__file__))
 
-    def handle_data(self, data):
-        if self._in_title:
-            self.title = data
+def get_html_files(tree):
+    return [os.path.join(tree.public_dir, rel) for rel in sorted(tree.files) if rel.endswith('.html')]
 
-def get_html_files(root_dir):
-    html_files = []
-    for dirpath, _, filenames in os.walk(root_dir):
-        for filename in filenames:
-            if filename.endswith('.html'):
-                html_files.append(os.path.join(dirpath, filename))
-    return html_files
-
-def verify_links_and_extract_meta(root_dir):
-    html_files = get_html_files(root_dir)
+def verify_links_and_extract_meta(root_dir, manifest=None):
+    # One listing of the tree; every link below is a set lookup resolved
+    # with firebase.json's cleanUrls/redirects/rewrites.
+    tree = SiteTree(root_dir, Hosting.load())
+    html_files = get_html_files(tree)
     broken_links = []
     page_metadata = []
 
     print(f"Found {len(html_files)} HTML files.")
 
+    pages = {}
     for file_path in html_files:
-        rel_path = os.path.relpath(file_path, root_dir)
+        rel_path = os.path.relpath(file_path, root_dir).replace(os.sep, '/')
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-                parser = LinkParser()
-                parser.feed(content)
-                
-                title = parser.title.strip() if parser.title else "No Title"
-                description = parser.description.strip() if parser.description else "No Description"
-                
-                page_metadata.append({
-                    'path': rel_path,
-                    'title': title,
-                    'description': description
-                })
+            results, _, _ = cached_walk(file_path, [PageMeta(), LinkTargets()], manifest)
+            pages[rel_path] = results
+        except Exception as e:
+            print(f"Error processing {rel_path}: {e}")
 
-                # Verify Links
-                for href in parser.links:
-                    href = href.strip()
-                    if not href or href.startswith(('http', 'https', 'mailto:', 'tel:', '#', 'javascript:')):
-                        continue
-                    
-                    # Handle anchors in local links
-                    href_clean = href.split('#')[0]
-                    if not href_clean:
-                        continue
+    ids = {rel: set(results['link_targets']['ids']) for rel, results in pages.items()}
+    for rel_path, results in pages.items():
+        meta = results['meta']
+        title = meta['title'].strip() if meta['title'] else "No Title"
+        description = meta['description'].strip() if meta['description'] else "No Description"
 
-                    # Resolve path
-                    target_path = os.path.join(os.path.dirname(file_path), href_clean)
-                    target_path = os.path.normpath(target_path)
-                    
-                    if not os.path.exists(target_path):
-                        broken_links.append({
-                            'source': rel_path,
-                            'link': href,
-                            'target_abs': target_path
-                        })
+        page_metadata.append({
+            'path': rel_path,
+            'title': title,
+            'description': description
+        })
 
-        except Exception as e:
-            print(f"Error processing {rel_path}: {e}")
+        # Verify Links (external URLs are checked by python3 -m site_tools.links --external)
+        for href in meta['links']:
+            href = href.strip()
+            if not href:
+                continue
+            reason = check_local(tree, ids, rel_path, href)
+            if reason:
+                broken_links.append({
+                    'source': rel_path,
+                    'link': href,
+                    'reason': reason
+                })
 
     return broken_links, page_metadata
 
 if __name__ == "__main__":
-    root_directory = "."
-    broken, metadata = verify_links_and_extract_meta(root_directory)
+    manifest = Manifest()
+    broken, metadata = verify_links_and_extract_meta(PUBLIC_ROOT, manifest)
+    manifest.save()
 
     print("\n--- Page Metadata ---")
     for page in metadata:
@@ -104,7 +77,7 @@ if __name__ == "__main__":
     if broken:
         for link in broken:
             print(f"Source: {link['source']}")
-            print(f"Broken Link: {link['link']}")
+            print(f"Broken Link: {link['link']} ({link['reason']})")
             print("-" * 20)
     else:
         print("No broken links found!")
@@ -29,6 +29,13 @@ echo ""
 echo "📦 Installing project dependencies..."
 npm install
 
+# Optional Python packages for the site_tools build stages (fonts, images, minify)
+if command -v python3 &> /dev/null; then
+    echo ""
+    echo "📦 Installing site_tools Python packages..."
+    python3 -m pip install -r site_tools/requirements.txt || echo "⚠️  Could not install site_tools/requirements.txt; font and image builds will be skipped"
+fi
+
 # Firebase login
 echo ""
 echo "🔐 Logging into Firebase..."
@@ -0,0 +1 @@
+"""Shared helpers for the Python site maintenance scripts."""
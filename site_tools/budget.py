@@ -0,0 +1,478 @@
+"""Offline page-weight benchmark with per-page budgets and a history file.
+
+Usage: python3 -m site_tools.budget [--dist | --dir DIR] [--record] [--tolerance PCT]
+                                    [--json PATH] [--seed-budgets] [files ...]
+
+For every page, the resources a browser would fetch are collected with the
+shared document model: stylesheets, scripts, images (the largest ``srcset``
+candidate, and the first ``<source>`` of a ``<picture>``), preloads, icons,
+the manifest, iframes, and ``@import``/``url()`` in ``<style>``. Hints (preconnect/dns-prefetch) and anything
+inside ``<noscript>`` are skipped. Local references are resolved like
+Firebase serves them (``links.SiteTree``). Their transfer size is the
+precompressed sibling in dist/ when there is one, otherwise gzip -9 for text
+and the raw size for everything else. Third-party requests are counted by
+origin but cannot be weighed offline.
+
+Budgets use Lighthouse's budget.json format (``resourceSizes`` in KB of
+transfer, ``resourceCounts``; the last entry whose ``path`` matches wins), so
+the same file can be given to Lighthouse. ``--record`` appends the run to
+perf-history.jsonl. Every run is compared with the last record, and any of
+these fails it (exit 1):
+- more transfer bytes or requests than the tolerance allows
+- an extra render-blocking resource
+- a new third-party origin
+- a budget overrun
+"""
+import argparse
+import gzip
+import json
+import os
+import re
+import subprocess
+import time
+from urllib.parse import urlsplit
+
+from site_tools import css, document, engine, writer
+from site_tools.document import Visitor
+from site_tools.hosting import Hosting
+from site_tools.links import SiteTree, classify
+from site_tools.manifest import CACHE_DIR, ROOT, Manifest
+from site_tools.minify import COMPRESS_EXTENSIONS, DIST_DIR
+
+BUDGET_PATH = os.path.join(ROOT, 'budget.json')
+HISTORY_PATH = os.path.join(ROOT, 'perf-history.jsonl')
+SIZE_CACHE_PATH = os.path.join(CACHE_DIR, 'budget-sizes.json')
+FORMAT_VERSION = 1
+
+# Lighthouse resource types.
+RESOURCE_TYPES = ('document', 'stylesheet', 'script', 'image', 'font', 'media', 'other')
+PRELOAD_TYPES = {'style': 'stylesheet', 'script': 'script', 'image': 'image', 'font': 'font',
+                 'video': 'media', 'audio': 'media', 'document': 'document'}
+FETCHED_RELS = ('icon', 'apple-touch-icon', 'manifest', 'mask-icon')
+NON_BLOCKING_MEDIA = ('print',)
+URL_TYPES = {'.css': 'stylesheet', '.woff2': 'font', '.woff': 'font', '.ttf': 'font', '.otf': 'font',
+             '.eot': 'font', '.png': 'image', '.jpg': 'image', '.jpeg': 'image', '.gif': 'image',
+             '.webp': 'image', '.avif': 'image', '.svg': 'image', '.ico': 'image'}
+
+_CSS_IMPORT_RE = re.compile(r'''@import\s+(?:url\(\s*)?(?:"([^"]*)"|'([^']*)'|([^)'"\s;]+))\s*\)?([^;]*);?''', re.I)
+_CSS_URL_RE = re.compile(r'''url\(\s*(?:"([^"]*)"|'([^']*)'|([^)'"\s]+))\s*\)''', re.I)
+
+DEFAULT_TOLERANCE = 5.0
+# Byte growth below this never counts as a regression, whatever the percentage.
+MIN_REGRESSION_BYTES = 1024
+SEED_HEADROOM = 1.1
+
+
+def _largest_candidate(srcset):
+    best, best_width = None, -1
+    for candidate in srcset.split(','):
+        parts = candidate.split()
+        if not parts:
+            continue
+        width = 0
+        if len(parts) > 1:
+            m = re.match(r'(\d+(?:\.\d+)?)[wx]$', parts[1])
+            width = float(m.group(1)) if m else 0
+        if width > best_width:
+            best, best_width = parts[0], width
+    return best
+
+
+class PageResources(Visitor):
+    """Collects what the page makes the browser fetch, and what blocks first render."""
+
+    name = 'resources'
+    version = 2
+
+    def begin(self, doc):
+        self.resources = []
+        self.in_head = False
+        self.in_style = False
+        self.noscript = 0
+        self.picture_source = None
+        self.in_picture = False
+        self.media_depth = 0
+
+    def add(self, kind, url, blocking=False):
+        url = url.strip()
+        if url and not url.startswith(('data:', 'blob:', '#')):
+            self.resources.append({'type': kind, 'url': url, 'blocking': blocking})
+
+    def start_tag(self, doc, node):
+        name = node.name
+        if name == 'head':
+            self.in_head = True
+        elif name == 'body':
+            self.in_head = False
+        elif name == 'noscript':
+            self.noscript += 1
+        if self.noscript:
+            return
+        if name == 'style':
+            self.in_style = True
+        elif name == 'link':
+            href = node.get('href')
+            rels = node.get('rel', '').lower().split()
+            if not href:
+                return
+            if 'stylesheet' in rels:
+                media = (node.get('media') or 'all').strip().lower()
+                self.add('stylesheet', href, self.in_head and media not in NON_BLOCKING_MEDIA
+                         and node.attr('disabled') is None)
+            elif 'preload' in rels:
+                self.add(PRELOAD_TYPES.get(node.get('as', '').lower(), 'other'), href)
+            elif 'modulepreload' in rels:
+                self.add('script', href)
+            elif any(r in FETCHED_RELS for r in rels):
+                self.add('other', href)
+        elif name == 'script':
+            src = node.get('src')
+            if src:
+                deferred = (node.attr('async') is not None or node.attr('defer') is not None
+                            or node.get('type', '').lower() == 'module')
+                self.add('script', src, self.in_head and not deferred)
+        elif name == 'picture':
+            self.in_picture = True
+            self.picture_source = None
+        elif name in ('video', 'audio'):
+            self.media_depth += 1
+            if node.get('poster'):
+                self.add('image', node.get('poster'))
+        elif name == 'source':
+            if self.in_picture and not self.media_depth and self.picture_source is None:
+                self.picture_source = _largest_candidate(node.get('srcset', '')) or node.get('src')
+        elif name == 'img':
+            src = None
+            if self.in_picture and self.picture_source:
+                src = self.picture_source
+            if src is None and node.get('srcset'):
+                src = _largest_candidate(node.get('srcset'))
+            src = src or node.get('src')
+            if src:
+                self.add('image', src)
+        elif name == 'iframe' and node.get('src'):
+            self.add('document', node.get('src'))
+
+    def text(self, doc, node):
+        if self.in_style and not self.noscript:
+            self.add_css(css.strip_comments(doc.text[node.start:node.end]))
+
+    def add_css(self, text):
+        """``@import`` (render-blocking in <head>) and ``url()`` references in a <style> block."""
+        for m in _CSS_IMPORT_RE.finditer(text):
+            url = next(g for g in m.groups()[:3] if g is not None)
+            media = m.group(4).strip().lower() or 'all'
+            self.add('stylesheet', url, self.in_head and media not in NON_BLOCKING_MEDIA)
+        for m in _CSS_URL_RE.finditer(_CSS_IMPORT_RE.sub('', text)):
+            url = next(g for g in m.groups() if g is not None)
+            ext = os.path.splitext(urlsplit(url).path)[1].lower()
+            self.add(URL_TYPES.get(ext, 'other'), url)
+
+    def end_tag(self, doc, node):
+        if node.name == 'head':
+            self.in_head = False
+        elif node.name == 'style':
+            self.in_style = False
+        elif node.name == 'noscript':
+            self.noscript = max(0, self.noscript - 1)
+        elif node.name == 'picture':
+            self.in_picture = False
+        elif node.name in ('video', 'audio'):
+            self.media_depth = max(0, self.media_depth - 1)
+
+    def finish(self, doc):
+        return self.resources
+
+
+def resource_visitors(path):
+    return [PageResources()]
+
+
+class SizeCache:
+    """``(raw, transfer)`` per file, kept across runs by stat."""
+
+    def __init__(self, path=SIZE_CACHE_PATH):
+        self.path = path
+        self.entries = {}
+        self.dirty = False
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == FORMAT_VERSION:
+                self.entries = data.get('files', {})
+        except (OSError, ValueError):
+            pass
+
+    def sizes(self, path):
+        st = os.stat(path)
+        key = os.path.abspath(path)
+        entry = self.entries.get(key)
+        if entry is not None and entry[:2] == [st.st_mtime_ns, st.st_size]:
+            return entry[2], entry[3]
+        transfer = st.st_size
+        for suffix in ('.br', '.gz'):
+            if os.path.isfile(path + suffix):
+                transfer = min(transfer, os.path.getsize(path + suffix))
+                break
+        else:
+            if os.path.splitext(path)[1].lower() in COMPRESS_EXTENSIONS:
+                with open(path, 'rb') as f:
+                    transfer = min(transfer, len(gzip.compress(f.read(), 9, mtime=0)))
+        self.entries[key] = [st.st_mtime_ns, st.st_size, st.st_size, transfer]
+        self.dirty = True
+        return st.st_size, transfer
+
+    def save(self):
+        if self.dirty:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            writer.write_text(self.path, json.dumps({'version': FORMAT_VERSION, 'files': self.entries},
+                                                    separators=(',', ':')))
+
+
+def page_url(rel, hosting):
+    """The URL path a page is served at (clean URL when ``cleanUrls`` is on)."""
+    path = '/' + rel
+    if path.endswith('/index.html'):
+        return path[:-len('index.html')]
+    if hosting.clean_urls and path.endswith('.html'):
+        return path[:-len('.html')]
+    return path
+
+
+def measure(rel, resources, tree, sizes):
+    """Weight metrics for one page from its collected resources."""
+    by_type = {t: {'count': 0, 'raw': 0, 'transfer': 0} for t in RESOURCE_TYPES}
+    raw, transfer = sizes.sizes(os.path.join(tree.public_dir, rel))
+    by_type['document'] = {'count': 1, 'raw': raw, 'transfer': transfer}
+    seen = set()
+    blocking = []
+    origins = set()
+    third_party = 0
+    missing = []
+    for res in resources:
+        kind, url, _ = classify(rel, res['url'])
+        if kind == 'skip' or url is None:
+            continue
+        if kind == 'external':
+            if url in seen:
+                continue
+            seen.add(url)
+            parts = urlsplit(url)
+            origins.add(f'{parts.scheme}://{parts.netloc}')
+            third_party += 1
+            by_type[res['type']]['count'] += 1
+        else:
+            status, target = tree.resolve(url)
+            key = target if status == 'file' else url
+            if key in seen:
+                continue
+            seen.add(key)
+            if status != 'file':
+                missing.append(res['url'])
+                continue
+            file_raw, file_transfer = sizes.sizes(os.path.join(tree.public_dir, target))
+            entry = by_type[res['type']]
+            entry['count'] += 1
+            entry['raw'] += file_raw
+            entry['transfer'] += file_transfer
+        if res['blocking']:
+            blocking.append(res['url'])
+    return {
+        'requests': sum(e['count'] for e in by_type.values()),
+        'raw': sum(e['raw'] for e in by_type.values()),
+        'transfer': sum(e['transfer'] for e in by_type.values()),
+        'by_type': by_type,
+        'render_blocking': blocking,
+        'third_party': {'requests': third_party, 'origins': sorted(origins)},
+        'missing': missing,
+    }
+
+
+def load_budgets(path=BUDGET_PATH):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return []
+
+
+def _path_pattern(pattern):
+    regex = re.escape(pattern.rstrip('$')).replace(r'\*', '.*')
+    return re.compile(regex + ('$' if pattern.endswith('$') else ''))
+
+
+def budget_for(url, budgets):
+    """The last budget whose ``path`` matches, as Lighthouse picks it."""
+    chosen = None
+    for budget in budgets:
+        if _path_pattern(budget.get('path', '/*')).match(url):
+            chosen = budget
+    return chosen
+
+
+def check_budget(metrics, budget):
+    """Messages for every size/count budget the page exceeds."""
+    if budget is None:
+        return []
+    problems = []
+    for item in budget.get('resourceSizes', []):
+        kind = item['resourceType']
+        if kind == 'total':
+            actual = metrics['transfer']
+        elif kind == 'third-party':
+            continue
+        else:
+            actual = metrics['by_type'].get(kind, {}).get('transfer', 0)
+        if actual > item['budget'] * 1024:
+            problems.append(f"{kind} {actual / 1024:.1f}KB over budget {item['budget']}KB")
+    for item in budget.get('resourceCounts', []):
+        kind = item['resourceType']
+        if kind == 'total':
+            actual = metrics['requests']
+        elif kind == 'third-party':
+            actual = metrics['third_party']['requests']
+        else:
+            actual = metrics['by_type'].get(kind, {}).get('count', 0)
+        if actual > item['budget']:
+            problems.append(f"{actual} {kind} request(s) over budget {item['budget']}")
+    return problems
+
+
+def summary(metrics):
+    """The per-page numbers kept in the history file."""
+    return {'transfer': metrics['transfer'], 'raw': metrics['raw'], 'requests': metrics['requests'],
+            'render_blocking': len(metrics['render_blocking']),
+            'third_party_origins': metrics['third_party']['origins']}
+
+
+def load_history(path=HISTORY_PATH):
+    records = []
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    records.append(json.loads(line))
+    except FileNotFoundError:
+        pass
+    return records
+
+
+def regressions(current, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Messages for a page that got heavier than ``baseline`` allows."""
+    problems = []
+    grew = current['transfer'] - baseline['transfer']
+    if grew > MIN_REGRESSION_BYTES and grew > baseline['transfer'] * tolerance / 100:
+        problems.append(f"transfer +{grew / 1024:.1f}KB ({baseline['transfer'] / 1024:.1f}KB -> "
+                        f"{current['transfer'] / 1024:.1f}KB)")
+    if current['requests'] > baseline['requests'] * (1 + tolerance / 100):
+        problems.append(f"requests {baseline['requests']} -> {current['requests']}")
+    if current['render_blocking'] > baseline['render_blocking']:
+        problems.append(f"render-blocking {baseline['render_blocking']} -> {current['render_blocking']}")
+    new_origins = sorted(set(current['third_party_origins']) - set(baseline['third_party_origins']))
+    if new_origins:
+        problems.append(f"new third-party origin(s): {', '.join(new_origins)}")
+    return problems
+
+
+def seed_budgets(results, hosting, headroom=SEED_HEADROOM):
+    """One budget per page from the current numbers plus headroom, in Lighthouse format."""
+    budgets = []
+    for rel, metrics in sorted(results.items()):
+        sizes = [{'resourceType': 'total', 'budget': int(metrics['transfer'] * headroom / 1024) + 1}]
+        for kind in ('document', 'stylesheet', 'script', 'image'):
+            transfer = metrics['by_type'][kind]['transfer']
+            if transfer:
+                sizes.append({'resourceType': kind, 'budget': int(transfer * headroom / 1024) + 1})
+        counts = [{'resourceType': 'total', 'budget': metrics['requests']},
+                  {'resourceType': 'third-party', 'budget': metrics['third_party']['requests']}]
+        url = page_url(rel, hosting)
+        budgets.append({'path': url + '$', 'resourceSizes': sizes, 'resourceCounts': counts})
+    return budgets
+
+
+def git_commit():
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                             text=True, timeout=10)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('files', nargs='*', help='pages to measure (default: every page)')
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument('--dist', action='store_true', help='measure the minified dist/ build')
+    source.add_argument('--dir', help='measure this directory instead of public/')
+    parser.add_argument('--budgets', default=BUDGET_PATH, help='Lighthouse-format budget file')
+    parser.add_argument('--history', default=HISTORY_PATH, help='JSON-lines history file')
+    parser.add_argument('--record', action='store_true', help='append this run to the history')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help=f'allowed growth in percent before a regression (default: {DEFAULT_TOLERANCE})')
+    parser.add_argument('--json', metavar='PATH', help='write the full per-page metrics as JSON')
+    parser.add_argument('--seed-budgets', action='store_true',
+                        help='write per-page budgets from the current numbers (plus 10%%) and exit')
+    parser.add_argument('--jobs', type=int, default=None, help='worker processes (default: CPU count)')
+    args = parser.parse_args()
+
+    hosting = Hosting.load()
+    public_dir = DIST_DIR if args.dist else (args.dir or document.PUBLIC_DIR)
+    tree = SiteTree(public_dir, hosting)
+    paths = args.files or document.page_paths(public_dir)
+
+    manifest = Manifest()
+    run = engine.run(resource_visitors, paths, workers=args.jobs, manifest=manifest, write=False)
+    manifest.save()
+    sizes = SizeCache()
+    results = {}
+    for result in run.results:
+        if result.status == engine.FAILED:
+            print(f"Error {result.path}: {result.error}")
+            continue
+        rel = os.path.relpath(result.path, public_dir).replace(os.sep, '/')
+        results[rel] = measure(rel, result.results['resources'], tree, sizes)
+    sizes.save()
+
+    if args.seed_budgets:
+        writer.write_text(args.budgets, json.dumps(seed_budgets(results, hosting), indent=2) + '\n')
+        print(f"Wrote {len(results)} page budget(s) to {args.budgets}")
+        return
+
+    budgets = load_budgets(args.budgets)
+    history = load_history(args.history)
+    source_rel = os.path.relpath(public_dir, ROOT)
+    # Only compare like with like: public/ and dist/ runs are separate series.
+    previous = [r for r in history if r.get('source') == source_rel]
+    baseline = previous[-1]['pages'] if previous else {}
+    failures = 0
+    print(f"{'page':<36} {'reqs':>5} {'transfer':>9} {'raw':>9} {'block':>5} {'3p':>3}")
+    for rel, metrics in sorted(results.items()):
+        problems = check_budget(metrics, budget_for(page_url(rel, hosting), budgets))
+        current = summary(metrics)
+        if rel in baseline:
+            problems += regressions(current, baseline[rel], args.tolerance)
+        print(f"{rel:<36} {metrics['requests']:>5} {metrics['transfer'] / 1024:>8.1f}K {metrics['raw'] / 1024:>8.1f}K "
+              f"{len(metrics['render_blocking']):>5} {len(metrics['third_party']['origins']):>3}")
+        for problem in problems:
+            print(f"  FAIL {problem}")
+        for url in metrics['missing']:
+            print(f"  missing: {url}")
+        failures += bool(problems)
+
+    total = sum(m['transfer'] for m in results.values())
+    print(f"{len(results)} pages, {total / 1024:.1f}KB total transfer, {failures} failing")
+    if args.json:
+        writer.write_text(args.json, json.dumps(results, indent=2) + '\n')
+    if args.record:
+        record = {'time': int(time.time()), 'commit': git_commit(), 'source': source_rel,
+                  'pages': {rel: summary(m) for rel, m in sorted(results.items())}}
+        with open(args.history, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, separators=(',', ':')) + '\n')
+        print(f"Recorded run in {args.history}")
+    if failures:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+"""Per-page bundles of the classic scripts under public/js.
+
+Usage: python3 -m site_tools.bundle [--dry-run] [--jobs N] [--report PATH] [files ...]
+
+Each page's local ``<script src="js/...">`` tags are grouped into runs that
+can be merged without changing when any of them executes:
+
+- blocking scripts only merge with the next one if nothing but whitespace
+  or comments sits between them, since anything in between would be parsed
+  before the second script runs;
+- ``defer`` scripts merge across markup and inline scripts (deferred
+  scripts all run after parsing, in order), but not across another deferred
+  or module script.
+
+``async`` scripts, SRI-pinned tags, ES modules, and files that use
+``document.currentScript`` or a file-level ``"use strict"`` are left alone.
+Each run becomes one minified, content-hashed file,
+``js/bundles/<stems>.<hash>.js``. Pages with the same run share it: the
+first tag's ``src`` is pointed at the bundle and the other tags are
+removed. The manifest at ``js/bundles/manifest.json`` maps each bundle to
+its sources and each page to its bundles. Later runs use it to expand
+bundle tags back into their sources, so the step can be rerun after any
+script changes. Bundles no page uses any more are deleted.
+"""
+import argparse
+import functools
+import json
+import os
+import posixpath
+import re
+import zlib
+
+from site_tools import document, engine, writer
+from site_tools.document import Visitor
+from site_tools.fingerprint import fingerprinted_name, logical_name, resolve_reference, short_hash
+from site_tools.hints import JS_TYPES, SCRIPTS_DIR, script_info, scripts_stamp
+from site_tools.manifest import Manifest
+from site_tools.minify import minify_js
+
+BUNDLE_DIR = posixpath.join(SCRIPTS_DIR, 'bundles')
+BUNDLE_MANIFEST_PATH = os.path.join(document.PUBLIC_DIR, BUNDLE_DIR, 'manifest.json')
+FORMAT_VERSION = 1
+# Joins two scripts without ASI surprises (``a()`` followed by ``(b)()``).
+SEPARATOR = '\n;\n'
+
+_SEPARATOR_RE = re.compile(r'(?:\s|<!--(?:.*?)-->)*', re.S)
+_STRICT_RE = re.compile(r'''^\s*(['"])use strict\1''')
+
+
+@functools.lru_cache(maxsize=None)
+def _minified(path, mtime_ns, size):
+    with open(path, 'r', encoding='utf-8') as f:
+        return minify_js(f.read())
+
+
+def minified_source(rel, public_dir=document.PUBLIC_DIR):
+    path = os.path.join(public_dir, rel)
+    st = os.stat(path)
+    return _minified(os.path.abspath(path), st.st_mtime_ns, st.st_size)
+
+
+def bundleable(rel, public_dir=document.PUBLIC_DIR):
+    """Whether ``rel`` is a classic js/ script that can be concatenated with others."""
+    path = os.path.join(public_dir, rel)
+    if not rel.startswith(SCRIPTS_DIR + '/') or rel.startswith(BUNDLE_DIR + '/') or not os.path.isfile(path):
+        return False
+    is_module, _, _ = script_info(path)
+    if is_module:
+        return False
+    text = minified_source(rel, public_dir)
+    return 'document.currentScript' not in text and not _STRICT_RE.match(text)
+
+
+def bundle_text(sources, public_dir=document.PUBLIC_DIR):
+    return SEPARATOR.join(minified_source(rel, public_dir).strip().rstrip(';') for rel in sources) + ';\n'
+
+
+def bundle_name(sources, public_dir=document.PUBLIC_DIR):
+    stems = '+'.join(posixpath.splitext(posixpath.basename(rel))[0] for rel in sources)
+    digest = short_hash(bundle_text(sources, public_dir).encode('utf-8'))
+    return fingerprinted_name(posixpath.join(BUNDLE_DIR, stems + '.js'), digest)
+
+
+def load_bundle_manifest(path=BUNDLE_MANIFEST_PATH):
+    """``({bundle: sources}, {page: bundles})`` from the previous build (empty if there is none)."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}, {}
+    if data.get('version') != FORMAT_VERSION:
+        return {}, {}
+    bundles = {rel: list(info['sources']) for rel, info in data.get('bundles', {}).items()}
+    return bundles, data.get('pages', {})
+
+
+class ScriptBundles(Visitor):
+    """Groups mergeable script tags into runs and points each run at its bundle."""
+
+    name = 'bundles'
+
+    def __init__(self, previous, stamp=''):
+        self.previous = previous
+        self.stamp = stamp
+
+    def cache_key(self):
+        digest = zlib.crc32(json.dumps(self.previous, sort_keys=True).encode('utf-8'))
+        return f'{super().cache_key()}:{self.stamp}:{digest:08x}'
+
+    def begin(self, doc):
+        rel = os.path.relpath(doc.path, document.PUBLIC_DIR).replace(os.sep, '/')
+        self.page_dir = posixpath.dirname(rel)
+        self.runs = []
+        self.current = None
+
+    def sources(self, node):
+        """Source list of a mergeable ``<script>`` tag, or None."""
+        if node.get('type', '').strip().lower() not in JS_TYPES or node.attr('async') is not None:
+            return None
+        if node.attr('integrity') is not None:
+            return None
+        ref = resolve_reference(node.get('src'), self.page_dir)
+        if ref is None:
+            return None
+        rel = logical_name(ref[1])
+        if ref[1] in self.previous:
+            return self.previous[ref[1]]
+        return [rel] if bundleable(rel) else None
+
+    def start_tag(self, doc, node):
+        if node.name != 'script':
+            return
+        span = doc.element_range(node)
+        sources = self.sources(node) if node.get('src') and span else None
+        if sources is None:
+            deferred = (node.attr('defer') is not None and node.get('src')) or \
+                node.get('type', '').strip().lower() == 'module'
+            if self.current is not None and (self.current['mode'] == 'sync' or deferred):
+                self.current = None
+            return
+        mode = 'defer' if node.attr('defer') is not None else 'sync'
+        run = self.current
+        if run is not None and run['mode'] == mode and (
+                mode == 'defer' or _SEPARATOR_RE.fullmatch(doc.text, run['tags'][-1][1][1], span[0])):
+            run['tags'].append((node, span))
+            run['sources'].extend(sources)
+        else:
+            self.current = {'mode': mode, 'tags': [(node, span)], 'sources': list(sources)}
+            self.runs.append(self.current)
+
+    def finish(self, doc):
+        runs = []
+        for run in self.runs:
+            sources = list(dict.fromkeys(run['sources']))
+            bundle = bundle_name(sources)
+            first, _ = run['tags'][0]
+            src = first.attr('src')
+            prefix, _, suffix = resolve_reference(src.value, self.page_dir)
+            path = '/' + bundle if prefix else posixpath.relpath(bundle, self.page_dir or '.')
+            if src.raw is not None and src.value != path + suffix:
+                self.replace(src.value_start, src.value_end, path + suffix)
+            for node, (start, end) in run['tags'][1:]:
+                line_start = doc.text.rfind('\n', 0, start)
+                if not doc.text[line_start + 1:start].strip():
+                    start = line_start
+                self.replace(start, end, '')
+            runs.append({'mode': run['mode'], 'sources': sources, 'bundle': bundle})
+        return {'runs': runs}
+
+
+class BundleVisitors:
+    """Picklable visitor factory for ``engine.run``."""
+
+    def __init__(self, previous, stamp=''):
+        self.previous = previous
+        self.stamp = stamp
+
+    def __call__(self, path):
+        return [ScriptBundles(self.previous, self.stamp)]
+
+
+def emit_bundles(bundles, keep=(), public_dir=document.PUBLIC_DIR):
+    """Write every bundle and delete unused ones; returns ``(written, removed)``."""
+    written = removed = 0
+    os.makedirs(os.path.join(public_dir, BUNDLE_DIR), exist_ok=True)
+    for rel, sources in sorted(bundles.items()):
+        if writer.write_text(os.path.join(public_dir, rel), bundle_text(sources, public_dir)):
+            written += 1
+    directory = os.path.join(public_dir, BUNDLE_DIR)
+    for filename in sorted(os.listdir(directory)) if os.path.isdir(directory) else ():
+        rel = posixpath.join(BUNDLE_DIR, filename)
+        if filename.endswith('.js') and rel not in bundles and rel not in keep:
+            os.unlink(os.path.join(directory, filename))
+            removed += 1
+    return written, removed
+
+
+def manifest_data(bundles, pages, public_dir=document.PUBLIC_DIR):
+    data = {'version': FORMAT_VERSION, 'bundles': {}, 'pages': pages}
+    for rel, sources in sorted(bundles.items()):
+        source_bytes = sum(os.path.getsize(os.path.join(public_dir, s)) for s in sources)
+        data['bundles'][rel] = {
+            'sources': sources,
+            'bytes': len(bundle_text(sources, public_dir).encode('utf-8')),
+            'source_bytes': source_bytes,
+            'pages': sorted(page for page, used in pages.items() if rel in used),
+        }
+    return data
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('files', nargs='*', help='pages to process (default: public/*.html)')
+    parser.add_argument('--dry-run', action='store_true', help='report without writing anything')
+    parser.add_argument('--jobs', type=int, default=None, help='worker processes (default: CPU count)')
+    parser.add_argument('--report', metavar='PATH', help='also write the bundle manifest to PATH')
+    args = parser.parse_args()
+
+    previous, previous_pages = load_bundle_manifest()
+    manifest = Manifest()
+    paths = args.files or document.page_paths()
+    report = engine.run(BundleVisitors(previous, scripts_stamp()), paths, workers=args.jobs,
+                        manifest=manifest, write=not args.dry_run)
+    manifest.save()
+
+    bundles = {}
+    pages = {}
+    failed = False
+    for result in report.results:
+        if result.status == engine.FAILED:
+            print(f"Error {result.path}: {result.error}")
+            failed = True
+            continue
+        page = os.path.relpath(result.path, document.PUBLIC_DIR).replace(os.sep, '/')
+        runs = result.results['bundles']['runs']
+        for run in runs:
+            bundles[run['bundle']] = run['sources']
+        if runs:
+            pages[page] = [run['bundle'] for run in runs]
+        if result.status == engine.UPDATED:
+            verb = 'Would bundle' if args.dry_run else 'Bundled'
+            print(f"{verb} {result.path}: " + '; '.join(
+                f"{' + '.join(run['sources'])} -> {run['bundle']}" for run in runs))
+    if args.files:
+        # Pages not processed this time keep their bundles.
+        for page, used in previous_pages.items():
+            if page in pages or any(r.path == os.path.join(document.PUBLIC_DIR, page) for r in report.results):
+                continue
+            for rel in used:
+                if rel in previous:
+                    bundles[rel] = previous[rel]
+                    pages.setdefault(page, []).append(rel)
+
+    data = manifest_data(bundles, pages)
+    total = sum(b['bytes'] for b in data['bundles'].values())
+    source_total = sum(b['source_bytes'] for b in data['bundles'].values())
+    print(f"{len(bundles)} bundle(s) for {len(pages)} page(s): {source_total} -> {total} bytes")
+    if not args.dry_run:
+        try:
+            written, removed = emit_bundles(bundles, keep=previous if failed else ())
+            writer.write_text(BUNDLE_MANIFEST_PATH, json.dumps(data, indent=2, sort_keys=True) + '\n')
+        except OSError as e:
+            print(f"Error writing bundles: {e}")
+            if report.transaction is not None:
+                report.transaction.rollback()
+                print("Rolled back page rewrites")
+            raise SystemExit(1)
+        print(f"Bundles: {written} written, {removed} unused removed")
+    if args.report:
+        os.makedirs(os.path.dirname(os.path.abspath(args.report)), exist_ok=True)
+        writer.write_text(args.report, json.dumps(data, indent=2, sort_keys=True) + '\n')
+    print(report.summary())
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
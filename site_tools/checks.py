@@ -0,0 +1,201 @@
+"""Audits and rewrites shared by the maintenance scripts, as document visitors."""
+import re
+import zlib
+
+from site_tools.document import END, TEXT, Visitor, compile_selector
+
+LOGO_ONCLICK = "window.location.href='index.html'"
+LOGO_CLASS = 'flex items-center gap-3 cursor-pointer'
+
+HEADER_LOGO_HTML = """        <div class="flex items-center gap-3 cursor-pointer" onclick="window.location.href='index.html'">
+            <div class="w-10 h-10 flex items-center justify-center">
+                <img src="images/futureatoms-icon.png" alt="FutureAtoms Icon"
+                    class="w-full h-full object-contain drop-shadow-[0_0_8px_rgba(0,255,255,0.5)]">
+            </div>
+            <div>
+                <h1 class="font-['Orbitron'] text-2xl md:text-3xl font-bold tracking-wider text-white">
+                    FUTURE<span class="text-cyan-400">ATOMS</span>
+                </h1>
+                <p class="text-[10px] md:text-xs tracking-[0.3em] text-cyan-200 opacity-70 uppercase">Evolving
+                    Intelligence</p>
+            </div>
+        </div>"""
+
+MAIN_CSS = 'css/main.css'
+MAIN_CSS_VERSION = '9999'
+
+ORBITRON_STYLE_SPAN = 'FUTURE<span class="text-cyan-400" style="font-family: \'Orbitron\', sans-serif;">ATOMS</span>'
+ORBITRON_CLASS_SPAN = 'FUTURE<span class="font-[\'Orbitron\'] text-cyan-400">ATOMS</span>'
+
+# Pages whose wordmark is intentionally left alone by the font fixers.
+WORDMARK_SKIP = ('chipos-docs.html', 'chipos-settings.html')
+
+LOGO_SELECTOR = f'div[class="{LOGO_CLASS}"][onclick="{LOGO_ONCLICK}"]'
+
+_LOGO_MATCH = compile_selector(LOGO_SELECTOR)
+_TRAILING_FUTURE_RE = re.compile(r'FUTURE\s*$', re.I)
+
+
+def normalize_whitespace(s):
+    return ' '.join(s.split())
+
+
+def _param_key(*params):
+    return format(zlib.crc32(repr(params).encode('utf-8')), '08x')
+
+
+class LogoAudit(Visitor):
+    """Checks the header logo size and tagline after the index.html onclick."""
+
+    name = 'logo'
+    window = 800
+
+    def begin(self, doc):
+        self.offset = None
+
+    def start_tag(self, doc, node):
+        if self.offset is None:
+            attr = node.attr('onclick')
+            if attr is not None and attr.value == LOGO_ONCLICK:
+                self.offset = attr.start
+
+    def finish(self, doc):
+        if self.offset is None:
+            return {'found': False}
+        chunk = doc.text[self.offset:self.offset + self.window]
+        if 'w-12 h-12' in chunk:
+            size = 'BAD (w-12)'
+        elif 'w-10 h-10' in chunk:
+            size = 'OK (w-10)'
+        else:
+            size = 'UNKNOWN size'
+        if 'Evolving Intelligence' in normalize_whitespace(chunk):
+            text = 'OK (Has Text)'
+        else:
+            text = 'MISSING TEXT'
+        return {'found': True, 'size': size, 'text': text}
+
+
+def format_logo_audit(path, result):
+    if not result['found']:
+        return f"{path}: [SKIP] No logo header found"
+    return f"{path}: {result['size']}, {result['text']}"
+
+
+class MainCssVersion(Visitor):
+    """Pins the css/main.css link to a cache-busting version."""
+
+    name = 'main_css'
+
+    def __init__(self, version=MAIN_CSS_VERSION, replace_query=False):
+        self.target = f'{MAIN_CSS}?v={version}'
+        self.replace_query = replace_query
+
+    def cache_key(self):
+        return f'{super().cache_key()}:{_param_key(self.target, self.replace_query)}'
+
+    def begin(self, doc):
+        self.updated = 0
+        self.current = 0
+
+    def start_tag(self, doc, node):
+        attr = node.attr('href')
+        if attr is None or attr.raw is None:
+            return
+        href = attr.raw
+        if href == self.target:
+            self.current += 1
+        elif href == MAIN_CSS or (self.replace_query and href.startswith(MAIN_CSS + '?')):
+            self.replace(attr.value_start, attr.value_end, self.target)
+            self.updated += 1
+
+    def finish(self, doc):
+        return {'updated': self.updated, 'current': self.current}
+
+
+class OrbitronWordmark(Visitor):
+    """Rewrites ``FUTURE<span class="text-cyan-400">ATOMS</span>`` to a fixed font."""
+
+    name = 'orbitron'
+
+    def __init__(self, replacement=ORBITRON_STYLE_SPAN):
+        self.replacement = replacement
+
+    def cache_key(self):
+        return f'{super().cache_key()}:{_param_key(self.replacement)}'
+
+    def begin(self, doc):
+        self.updated = 0
+
+    def start_tag(self, doc, node):
+        if node.name != 'span' or len(node.attrs) != 1 or node.get('class') != 'text-cyan-400':
+            return
+        nodes = doc.nodes
+        i = node.index
+        if i == 0 or i + 2 >= len(nodes):
+            return
+        before, inner, close = nodes[i - 1], nodes[i + 1], nodes[i + 2]
+        if before.kind != TEXT or inner.kind != TEXT or close.kind != END or close.name != 'span':
+            return
+        if doc.text[inner.start:inner.end].strip().upper() != 'ATOMS':
+            return
+        m = _TRAILING_FUTURE_RE.search(doc.text, before.start, before.end)
+        if m is None:
+            return
+        self.replace(m.start(), close.end, self.replacement)
+        self.updated += 1
+
+    def finish(self, doc):
+        return {'updated': self.updated, 'fixed': self.replacement in doc.text}
+
+
+class LogoHeader(Visitor):
+    """Replaces the whole clickable logo block with ``HEADER_LOGO_HTML``."""
+
+    name = 'logo_header'
+    version = 2
+
+    def __init__(self, html=HEADER_LOGO_HTML):
+        self.html = html
+
+    def cache_key(self):
+        return f'{super().cache_key()}:{_param_key(self.html)}'
+
+    def begin(self, doc):
+        self.node = None
+
+    def start_tag(self, doc, node):
+        if self.node is None and node.name == 'div' and _LOGO_MATCH(node):
+            self.node = node
+
+    def finish(self, doc):
+        if self.node is None:
+            return {'found': False, 'closed': False, 'start': None}
+        span = doc.element_range(self.node)
+        if span is not None:
+            self.replace(span[0], span[1], self.html)
+        return {'found': True, 'closed': span is not None, 'start': self.node.start}
+
+
+class PageMeta(Visitor):
+    """Collects ``<a href>`` targets, the title and the meta description."""
+
+    name = 'meta'
+
+    def begin(self, doc):
+        self.links = []
+        self.title = None
+        self.description = None
+
+    def start_tag(self, doc, node):
+        if node.name == 'a':
+            href = node.get('href')
+            if href is not None:
+                self.links.append(href)
+        elif node.name == 'title':
+            self.title = doc.inner_text(node)
+        elif node.name == 'meta' and node.get('name') == 'description':
+            self.description = node.get('content')
+
+    def finish(self, doc):
+        return {'links': self.links, 'title': self.title, 'description': self.description}
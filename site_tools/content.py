@@ -0,0 +1,293 @@
+"""Generate sitemap.xml, llm.txt, llms-full.txt and functions/website_content.txt.
+
+Usage: python3 -m site_tools.content [--check] [--jobs N]
+
+All four artifacts come from the same per-page extraction the search index
+uses (site_tools.search.VisibleText: title, description, canonical URL,
+robots meta and visible text). It is cached in
+.cache/search-manifest.json, so only pages whose content changed are parsed
+again, which keeps the pre-commit hook fast.
+
+- sitemap.xml lists every indexable page (no ``noindex``, not disallowed
+  by robots.txt) at its canonical URL. ``lastmod`` is the date the page's
+  extracted content last changed. That date is tracked by content hash in
+  lastmod.json, which is committed, so markup-only edits and fresh
+  checkouts do not bump it.
+- llm.txt and llms-full.txt are written by hand; only the regions between
+  ``<!-- generated:NAME -->`` and ``<!-- /generated:NAME -->`` markers are
+  replaced (a page index, and the full text of every page), plus the
+  "Last Updated" line. Missing markers are inserted before ``## Contact &
+  Resources`` / ``## Document Metadata``.
+- functions/website_content.txt is the chatbot's document dump, one block
+  per page.
+
+Files are only rewritten when their content changes. ``--check`` writes
+nothing and exits 1 if any artifact is out of date.
+"""
+import argparse
+import datetime
+import json
+import os
+import re
+import textwrap
+from urllib.parse import urlsplit
+from xml.sax.saxutils import escape
+
+from site_tools import document, engine, writer
+from site_tools.links import LOCAL_HOSTS
+from site_tools.manifest import ROOT, Manifest, content_hash
+from site_tools.search import SEARCH_MANIFEST_PATH, page_url, robots_disallowed, text_visitors
+
+SITE_URL = 'https://' + LOCAL_HOSTS[0]
+SITEMAP_PATH = os.path.join(document.PUBLIC_DIR, 'sitemap.xml')
+LLMS_PATH = os.path.join(document.PUBLIC_DIR, 'llm.txt')
+LLMS_FULL_PATH = os.path.join(document.PUBLIC_DIR, 'llms-full.txt')
+WEBSITE_CONTENT_PATH = os.path.join(ROOT, 'functions', 'website_content.txt')
+LASTMOD_PATH = os.path.join(ROOT, 'lastmod.json')
+
+SITEMAP_EXCLUDE = ('404.html', 'hub-coming-soon.html')
+CONTENT_EXCLUDE = ('404.html', 'go.html')
+PRODUCT_PAGES = ('chipos.html', 'bevybeats.html', 'savitri.html', 'zaphy.html', 'agentic.html', 'yuj.html',
+                 'adaptivision.html', 'systemverilog.html', 'swaastik.html')
+PAGE_PRIORITY = {
+    'index.html': ('1.0', 'weekly'),
+    'news.html': ('0.7', 'weekly'),
+    'blog.html': ('0.7', 'weekly'),
+    'chipos-pricing.html': ('0.7', 'monthly'),
+    'chipos-docs.html': ('0.7', 'weekly'),
+    'chipos-changelog.html': ('0.6', 'weekly'),
+    'chipos-pitch.html': ('0.6', 'monthly'),
+    'about.html': ('0.6', 'monthly'),
+    'contact.html': ('0.6', 'monthly'),
+    'careers.html': ('0.6', 'monthly'),
+    'feedback.html': ('0.4', 'monthly'),
+}
+WRAP_WIDTH = 100
+
+_SITEMAP_ENTRY_RE = re.compile(r'<loc>\s*([^<\s]+)\s*</loc>\s*<lastmod>\s*([^<\s]+)\s*</lastmod>')
+_LAST_UPDATED_RE = re.compile(r'^(- Last Updated: ).*$', re.M)
+
+
+def priority(rel):
+    if rel in PAGE_PRIORITY:
+        return PAGE_PRIORITY[rel]
+    if rel in PRODUCT_PAGES:
+        return '0.8', 'weekly'
+    if rel.startswith('blog-'):
+        return '0.7', 'monthly'
+    return '0.5', 'monthly'
+
+
+def canonical_url(rel, info):
+    canonical = info.get('canonical')
+    if canonical and (urlsplit(canonical).hostname or '') in LOCAL_HOSTS:
+        return canonical
+    return SITE_URL + page_url(rel)
+
+
+class LastModified:
+    """Content hash and last-changed date per page, kept in lastmod.json."""
+
+    def __init__(self, path=LASTMOD_PATH):
+        self.path = path
+        self.entries = {}
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+    def update(self, rel, digest, today, seed=None):
+        entry = self.entries.get(rel)
+        if entry is None:
+            entry = self.entries[rel] = {'hash': digest, 'lastmod': seed or today}
+        elif entry['hash'] != digest:
+            entry.update(hash=digest, lastmod=today)
+        return entry['lastmod']
+
+    def render(self, keep):
+        entries = {rel: self.entries[rel] for rel in sorted(self.entries) if rel in keep}
+        return json.dumps(entries, indent=2, sort_keys=True) + '\n'
+
+
+def previous_lastmods(path=SITEMAP_PATH):
+    """``{url path: lastmod}`` from the current sitemap, to seed pages seen for the first time."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            text = f.read()
+    except OSError:
+        return {}
+    seeds = {}
+    for loc, lastmod in _SITEMAP_ENTRY_RE.findall(text):
+        path = urlsplit(loc).path or '/'
+        seeds[path] = lastmod
+        if path.endswith('.html'):
+            seeds[path[:-len('.html')]] = lastmod
+    return seeds
+
+
+def render_sitemap(pages):
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>',
+             '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">']
+    for page in sorted(pages, key=lambda p: (-float(p['priority']), p['url'])):
+        lines += ['  <url>',
+                  f"    <loc>{escape(page['url'])}</loc>",
+                  f"    <lastmod>{page['lastmod']}</lastmod>",
+                  f"    <changefreq>{page['changefreq']}</changefreq>",
+                  f"    <priority>{page['priority']}</priority>",
+                  '  </url>']
+    lines.append('</urlset>')
+    return '\n'.join(lines) + '\n'
+
+
+def page_group(rel):
+    if rel in PRODUCT_PAGES:
+        return 'Products'
+    if rel.startswith('blog'):
+        return 'Blog'
+    if rel.startswith('chipos-'):
+        return 'ChipOS'
+    return 'Company'
+
+
+def render_page_index(pages):
+    groups = {}
+    for page in sorted(pages, key=lambda p: (-float(p['priority']), p['url'])):
+        groups.setdefault(page_group(page['rel']), []).append(page)
+    lines = ['## Pages']
+    for group in ('Products', 'ChipOS', 'Blog', 'Company'):
+        if group not in groups:
+            continue
+        lines += ['', f'### {group}', '']
+        for page in groups[group]:
+            line = f"- [{page['title'] or page['url']}]({page['url']})"
+            if page['description']:
+                line += f": {page['description']}"
+            lines.append(line)
+    return '\n'.join(lines)
+
+
+def render_page_text(pages):
+    lines = ['## Page Content', '',
+             'The visible text of every page on the site, extracted from the published HTML.']
+    for page in sorted(pages, key=lambda p: (-float(p['priority']), p['url'])):
+        lines += ['', f"### {page['title'] or page['url']}", '',
+                  f"- URL: {page['url']}", f"- Last Modified: {page['lastmod']}"]
+        if page['description']:
+            lines += ['', '> ' + page['description']]
+        if page['text']:
+            lines += [''] + textwrap.wrap(page['text'], WRAP_WIDTH, break_long_words=False,
+                                          break_on_hyphens=False)
+    lines += ['', '---']
+    return '\n'.join(lines)
+
+
+def replace_region(text, name, body, before):
+    """Swap the ``name`` region of ``text`` for ``body``, inserting it before ``before`` if absent."""
+    start = f'<!-- generated:{name} (python3 -m site_tools.content) -->'
+    end = f'<!-- /generated:{name} -->'
+    block = f'{start}\n{body}\n{end}'
+    pattern = re.compile(r'<!-- generated:%s\b[^>]*-->.*?<!-- /generated:%s -->' % (name, name), re.S)
+    if pattern.search(text):
+        return pattern.sub(lambda _: block, text, count=1)
+    index = text.find('\n' + before + '\n')
+    if index < 0:
+        return text.rstrip('\n') + '\n\n' + block + '\n'
+    return text[:index + 1] + block + '\n\n' + text[index + 1:]
+
+
+def render_website_content(pages):
+    blocks = []
+    for page in sorted(pages, key=lambda p: p['rel']):
+        blocks.append('\n'.join([
+            f"--- START DOCUMENT: {page['rel']} ---",
+            f"Title: {page['title']}",
+            f"URL: {page['url']}",
+            f"Description: {page['description']}",
+            'Content:',
+            page['text'],
+            '--- END DOCUMENT ---',
+        ]))
+    return '\n\n'.join(blocks) + '\n'
+
+
+def read(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return f.read()
+    except OSError:
+        return ''
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--check', action='store_true', help='write nothing; exit 1 if any artifact is stale')
+    parser.add_argument('--jobs', type=int, default=None, help='worker processes (default: CPU count)')
+    args = parser.parse_args()
+
+    manifest = Manifest(SEARCH_MANIFEST_PATH)
+    paths = document.page_paths()
+    report = engine.run(text_visitors, paths, workers=args.jobs, manifest=manifest, write=False)
+    manifest.prune(paths)
+    manifest.save()
+    fresh = sum(1 for r in report.results if r.status != engine.FAILED and not r.cached)
+    print(f"Extracted {fresh} changed page(s), {len(report.results) - fresh} from cache")
+
+    today = datetime.datetime.now(datetime.timezone.utc).date().isoformat()
+    lastmods = LastModified()
+    seeds = previous_lastmods()
+    disallowed = robots_disallowed()
+    failed = False
+    indexed = []
+    content = []
+    for result in report.results:
+        if result.status == engine.FAILED:
+            print(f"Error {result.path}: {result.error}")
+            failed = True
+            continue
+        rel = os.path.relpath(result.path, document.PUBLIC_DIR).replace(os.sep, '/')
+        info = result.results['search_text']
+        url = canonical_url(rel, info)
+        digest = content_hash(json.dumps([info['title'], info['description'], info['text']]))
+        page = {
+            'rel': rel,
+            'url': url,
+            'title': info['title'],
+            'description': info['description'],
+            'text': info['text'],
+            'lastmod': lastmods.update(rel, digest, today, seeds.get(urlsplit(url).path or '/')),
+        }
+        page['priority'], page['changefreq'] = priority(rel)
+        if rel not in CONTENT_EXCLUDE and not any(page_url(rel).startswith(p) for p in disallowed):
+            content.append(page)
+            if not info['noindex'] and rel not in SITEMAP_EXCLUDE:
+                indexed.append(page)
+
+    llms = read(LLMS_PATH)
+    llms_full = read(LLMS_FULL_PATH)
+    latest = max((page['lastmod'] for page in indexed), default=today)
+    outputs = [
+        (SITEMAP_PATH, render_sitemap(indexed)),
+        (LLMS_PATH, replace_region(llms, 'pages', render_page_index(indexed), '## Contact & Resources')),
+        (LLMS_FULL_PATH, _LAST_UPDATED_RE.sub(lambda m: m.group(1) + latest, replace_region(
+            llms_full, 'page-text', render_page_text(indexed), '## Document Metadata'))),
+        (WEBSITE_CONTENT_PATH, render_website_content(content)),
+        (LASTMOD_PATH, lastmods.render({page['rel'] for page in content})),
+    ]
+    print(f"{len(indexed)} page(s) in sitemap.xml and llm.txt, {len(content)} in website_content.txt")
+    stale = [(path, text) for path, text in outputs if read(path) != text]
+    for path, text in stale:
+        rel = os.path.relpath(path, ROOT)
+        if args.check:
+            print(f"Out of date: {rel}")
+        else:
+            writer.write_text(path, text)
+            print(f"Updated {rel}")
+    if not stale:
+        print("All generated files are up to date")
+    if failed or (args.check and stale):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+"""Inline above-the-fold CSS and load the full stylesheets asynchronously.
+
+Usage: python3 -m site_tools.critical [--fold N] [--all] [--dry-run] [files ...]
+
+For each page, the first ``--fold`` elements of ``<body>`` (by document
+order) are taken as the above-the-fold content. Every rule in the page's
+local stylesheets whose selector can match one of those elements is copied
+into a ``<style data-critical>`` block in ``<head>``. The keyframes and
+@font-face rules it uses come along too. The ``<link>`` tags are then switched
+to the non-blocking ``media="print" onload`` pattern the pages already use
+for Font Awesome, with a ``<noscript>`` fallback.
+
+Extracted CSS is cached in .cache/critical-css.json per (page hash,
+stylesheet hash). The page hash covers ``<body>`` onwards only, so head
+rewrites do not invalidate it. Rerunning refreshes the inlined block in place.
+"""
+import argparse
+import json
+import os
+import re
+
+from site_tools import css, document, writer
+from site_tools.document import Visitor
+from site_tools.fingerprint import resolve_reference
+from site_tools.manifest import CACHE_DIR, content_hash, file_hash
+
+CRITICAL_CACHE_PATH = os.path.join(CACHE_DIR, 'critical-css.json')
+FORMAT_VERSION = 1
+
+# Landing and product pages; pass files or --all for others.
+DEFAULT_PAGES = (
+    'index.html', 'chipos.html', 'agentic.html', 'adaptivision.html', 'bevybeats.html',
+    'savitri.html', 'swaastik.html', 'systemverilog.html', 'yuj.html', 'zaphy.html',
+)
+FOLD_ELEMENTS = 150
+# Warn past roughly what fits in the first round trip alongside the HTML.
+CRITICAL_BUDGET = 14 * 1024
+
+ASYNC_ONLOAD = "this.media='all'"
+_FONT_FAMILY_RE = re.compile(r'font-family\s*:\s*([^;]+)', re.I)
+
+
+class FoldElements(Visitor):
+    """Collects the above-the-fold elements, the stylesheet links and any inlined block."""
+
+    name = 'fold'
+
+    def __init__(self, fold=FOLD_ELEMENTS):
+        self.fold = fold
+
+    def begin(self, doc):
+        self.elements = []
+        self.links = []
+        self.critical = None
+        self.in_head = False
+        self.in_body = False
+        self.in_noscript = False
+
+    def start_tag(self, doc, node):
+        if node.name == 'head':
+            self.in_head = True
+        elif node.name == 'body':
+            self.in_head = False
+            self.in_body = True
+        if node.name in ('html', 'body') or (self.in_body and len(self.elements) < self.fold):
+            self.elements.append(node)
+        if not self.in_head:
+            return
+        if node.name == 'noscript':
+            self.in_noscript = True
+        elif node.name == 'link' and node.get('rel') == 'stylesheet' and not self.in_noscript:
+            self.links.append(node)
+        elif node.name == 'style' and node.attr('data-critical') is not None:
+            self.critical = node
+
+    def end_tag(self, doc, node):
+        if node.name == 'head':
+            self.in_head = False
+        elif node.name == 'noscript':
+            self.in_noscript = False
+
+    def finish(self, doc):
+        return {'elements': len(self.elements), 'links': len(self.links)}
+
+
+class ElementIndex:
+    """Above-the-fold elements indexed by class, id and tag for selector lookups."""
+
+    def __init__(self, nodes):
+        self.entries = []
+        self.by_class = {}
+        self.by_id = {}
+        self.by_tag = {}
+        for node in nodes:
+            classes = set(node.get('class', '').split())
+            entry = (node.name, node.get('id'), classes, {a.name for a in node.attrs})
+            self.entries.append(entry)
+            for cls in classes:
+                self.by_class.setdefault(cls, []).append(entry)
+            if entry[1]:
+                self.by_id.setdefault(entry[1], []).append(entry)
+            self.by_tag.setdefault(node.name, []).append(entry)
+
+    def matches(self, selector):
+        tag, ids, classes, attrs = css.subject_compound(selector)
+        if ids:
+            candidates = self.by_id.get(ids[0], ())
+        elif classes:
+            candidates = self.by_class.get(classes[0], ())
+        elif tag:
+            candidates = self.by_tag.get(tag, ())
+        else:
+            candidates = self.entries
+        for name, node_id, node_classes, node_attrs in candidates:
+            if tag and name != tag:
+                continue
+            if any(i != node_id for i in ids):
+                continue
+            if not node_classes.issuperset(classes) or not node_attrs.issuperset(attrs):
+                continue
+            return True
+        return False
+
+
+def _filter(items, index):
+    kept = []
+    for item in items:
+        if isinstance(item, css.Decl):
+            kept.append(item)
+        elif item.is_at_rule:
+            keyword = item.at_keyword
+            if keyword in ('keyframes', 'font-face', 'import', 'charset', 'property'):
+                continue
+            if item.children is None:
+                kept.append(item)
+                continue
+            children = _filter(item.children, index)
+            if children:
+                kept.append(css.Block(item.prelude, children))
+        else:
+            selectors = [s for s in css.split_selectors(item.prelude) if index.matches(s)]
+            if selectors:
+                kept.append(css.Block(','.join(selectors), item.children))
+    return kept
+
+
+def critical_css(items, index):
+    """Serialized rules from ``items`` that may apply above the fold, plus their keyframes/fonts."""
+    kept = _filter(items, index)
+    text = css.serialize(kept)
+    families = ' '.join(_FONT_FAMILY_RE.findall(text))
+    extras = []
+    for item in items:
+        if not isinstance(item, css.Block):
+            continue
+        if item.at_keyword == 'keyframes':
+            if re.search(r'(?<![\w-])%s(?![\w-])' % re.escape(item.at_params), text):
+                extras.append(item)
+        elif item.at_keyword == 'font-face' and item.children:
+            declared = ' '.join(_FONT_FAMILY_RE.findall(css.serialize(item.children)))
+            name = declared.strip().strip('"\'')
+            if name and name in families:
+                extras.append(item)
+    return text + css.serialize(extras)
+
+
+def stylesheet_path(node, page_dir=''):
+    """Public-relative path of a local stylesheet ``<link>``, or None for external ones."""
+    ref = resolve_reference(node.get('href', ''), page_dir)
+    if ref is None:
+        return None
+    path = os.path.join(document.PUBLIC_DIR, ref[1])
+    return ref[1] if os.path.isfile(path) else None
+
+
+def is_async(node):
+    return node.get('media') == 'print' and ASYNC_ONLOAD in node.get('onload', '')
+
+
+def async_link(doc, node):
+    """The ``<link>`` rewritten to load without blocking render, plus a noscript fallback."""
+    tag = doc.source(node)
+    attrs = [a for a in node.attrs if a.name in ('media', 'onload')]
+    for attr in sorted(attrs, key=lambda a: a.start, reverse=True):
+        if attr.raw is None:
+            end = attr.start + len(attr.name)
+        else:
+            end = attr.value_end + (1 if doc.text[attr.value_start - 1] in '"\'' else 0)
+        start = attr.start - node.start
+        while start > 0 and tag[start - 1].isspace():
+            start -= 1
+        tag = tag[:start] + tag[end - node.start:]
+    close = len(tag) - (2 if tag.endswith('/>') else 1)
+    loading = tag[:close].rstrip() + f' media="print" onload="{ASYNC_ONLOAD}"' + tag[close:]
+    return f'{loading}<noscript>{tag}</noscript>'
+
+
+def page_key(doc):
+    """Hash of the page from ``<body>`` on; head rewrites (including ours) do not count."""
+    body = doc.tags('body')
+    return content_hash(doc.text[body[0].start:] if body else doc.text)
+
+
+def load_cache(path=CRITICAL_CACHE_PATH):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('version') == FORMAT_VERSION:
+            return data.get('entries', {})
+    except (OSError, ValueError):
+        pass
+    return {}
+
+
+def process_page(path, cache, fold_size, used):
+    """Return ``(new_text, critical_bytes, sheets)`` for one page; new_text is None if unchanged."""
+    doc = document.load(path)
+    fold = FoldElements(fold_size)
+    document.walk(doc, [fold])
+    sheets = []
+    for node in fold.links:
+        rel = stylesheet_path(node)
+        if rel is not None and (node.get('media') in (None, 'all', 'screen') or is_async(node)):
+            sheets.append((node, rel))
+    if not sheets:
+        return None, 0, []
+
+    key = f'{doc.name}:{page_key(doc)}:{fold_size}'
+    index = None
+    parts = []
+    for node, rel in sheets:
+        sheet_key = f'{key}:{rel}:{file_hash(os.path.join(document.PUBLIC_DIR, rel))}'
+        text = cache.get(sheet_key)
+        if text is None:
+            if index is None:
+                index = ElementIndex(fold.elements)
+            with open(os.path.join(document.PUBLIC_DIR, rel), 'r', encoding='utf-8') as f:
+                text = critical_css(css.parse(f.read()), index)
+            cache[sheet_key] = text
+        used.add(sheet_key)
+        parts.append(text)
+    style = f'<style data-critical>{"".join(parts)}</style>'
+
+    edits = []
+    if fold.critical is not None:
+        span = doc.element_range(fold.critical)
+        edits.append((span[0], span[1], style))
+    first = sheets[0][0]
+    for node, rel in sheets:
+        new = async_link(doc, node) if not is_async(node) else None
+        if fold.critical is None and node is first:
+            new = style + (new or doc.source(node))
+        if new is not None:
+            edits.append((node.start, node.end, new))
+    new_text = document.apply_edits(doc.text, edits)
+    return (new_text if new_text != doc.text else None), len(style.encode('utf-8')), [r for _, r in sheets]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--fold', type=int, default=FOLD_ELEMENTS,
+                        help='number of leading <body> elements treated as above the fold')
+    parser.add_argument('--all', action='store_true', help='process every page in public/')
+    parser.add_argument('--dry-run', action='store_true', help='report without writing anything')
+    parser.add_argument('files', nargs='*', help='pages to process (default: landing and product pages)')
+    args = parser.parse_args()
+
+    if args.files:
+        paths = args.files
+    elif args.all:
+        paths = document.page_paths()
+    else:
+        paths = [os.path.join(document.PUBLIC_DIR, name) for name in DEFAULT_PAGES
+                 if os.path.exists(os.path.join(document.PUBLIC_DIR, name))]
+
+    cache = load_cache()
+    used = set()
+    transaction = writer.Transaction()
+    for path in paths:
+        try:
+            new_text, size, sheets = process_page(path, cache, args.fold, used)
+        except Exception as e:
+            print(f"Error {path}: {e}")
+            continue
+        if not sheets:
+            print(f"{path}: no local stylesheets")
+            continue
+        note = ' (over budget)' if size > CRITICAL_BUDGET else ''
+        status = 'Updated' if new_text is not None else 'Unchanged'
+        print(f"{status} {path}: {size} bytes critical CSS from {', '.join(sheets)}{note}")
+        if new_text is not None:
+            transaction.write(path, new_text)
+
+    if args.dry_run:
+        return
+    transaction.commit()
+    # Drop stale entries for the pages processed this run.
+    names = {os.path.basename(p) + ':' for p in paths}
+    entries = {k: v for k, v in cache.items() if k in used or not k.startswith(tuple(names))}
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    writer.write_text(CRITICAL_CACHE_PATH, json.dumps({'version': FORMAT_VERSION, 'entries': entries}) + '\n')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+"""Small CSS parser shared by the stylesheet build stages.
+
+Parses a stylesheet into a tree of rules, at-rules and declarations
+(including nested rules, as emitted by Tailwind v4), with helpers to pull
+class names out of selectors. It is not a validating parser: it only needs
+to respect strings, comments, parentheses and braces well enough to cut a
+stylesheet into blocks and serialize the kept ones back out.
+"""
+import re
+
+_COMMENT_RE = re.compile(r'/\*.*?\*/', re.S)
+_IDENT_CLASS_RE = re.compile(r'\.((?:\\.|[\w-]|[^\x00-\x7f])+)')
+_ESCAPE_RE = re.compile(r'\\([0-9a-fA-F]{1,6}\s?|.)')
+_VAR_RE = re.compile(r'var\(\s*(--[\w-]+)')
+_CUSTOM_PROP_RE = re.compile(r'^\s*(--[\w-]+)\s*:')
+_HEX_DIGITS = frozenset('0123456789abcdefABCDEF')
+_PSEUDO_RE = re.compile(r'(?<!\\)::?[\w-]+')
+_ID_RE = re.compile(r'#((?:\\.|[\w-]|[^\x00-\x7f])+)')
+_ATTR_NAME_RE = re.compile(r'\[\s*([\w-]+)')
+_TAG_RE = re.compile(r'^[A-Za-z][\w-]*')
+
+
+class Decl:
+    __slots__ = ('text',)
+
+    def __init__(self, text):
+        self.text = text
+
+    @property
+    def custom_property(self):
+        m = _CUSTOM_PROP_RE.match(self.text)
+        return m.group(1) if m else None
+
+
+class Block:
+    """A rule (``prelude { children }``) or at-rule; at-statements have no children."""
+
+    __slots__ = ('prelude', 'children')
+
+    def __init__(self, prelude, children=None):
+        self.prelude = prelude
+        self.children = children
+
+    @property
+    def is_at_rule(self):
+        return self.prelude.startswith('@')
+
+    @property
+    def at_keyword(self):
+        if not self.is_at_rule:
+            return None
+        return self.prelude[1:].split(None, 1)[0].split('(', 1)[0].lower()
+
+    @property
+    def at_params(self):
+        parts = self.prelude.split(None, 1)
+        return parts[1].strip() if len(parts) > 1 else ''
+
+
+def strip_comments(text):
+    return _COMMENT_RE.sub('', text)
+
+
+def _scan(text, pos, stops):
+    """Advance to the first top-level character in ``stops``, skipping strings and parens."""
+    depth = 0
+    length = len(text)
+    while pos < length:
+        ch = text[pos]
+        if ch in '"\'':
+            end = pos + 1
+            while end < length and text[end] != ch:
+                end += 2 if text[end] == '\\' else 1
+            pos = end + 1
+            continue
+        if ch == '\\':
+            pos += 2
+            continue
+        if ch in '([':
+            depth += 1
+        elif ch in ')]':
+            depth = max(0, depth - 1)
+        elif depth == 0 and ch in stops:
+            return pos
+        pos += 1
+    return length
+
+
+def _parse_block(text, pos):
+    items = []
+    length = len(text)
+    while pos < length:
+        while pos < length and text[pos] in ' \t\r\n;':
+            pos += 1
+        if pos >= length:
+            break
+        if text[pos] == '}':
+            return items, pos + 1
+        stop = _scan(text, pos, '{};')
+        prelude = text[pos:stop].strip()
+        if stop >= length or text[stop] in ';}':
+            if prelude:
+                items.append(Block(prelude) if prelude.startswith('@') else Decl(prelude))
+            pos = stop + 1 if stop < length and text[stop] == ';' else stop
+            continue
+        children, pos = _parse_block(text, stop + 1)
+        items.append(Block(prelude, children))
+    return items, pos
+
+
+def parse(text):
+    """Parse stylesheet ``text`` into a list of ``Block`` / ``Decl`` items."""
+    items, _ = _parse_block(strip_comments(text), 0)
+    return items
+
+
+def serialize(items):
+    """Serialize parsed items back to compact CSS."""
+    out = []
+    for item in items:
+        if isinstance(item, Decl):
+            out.append(item.text)
+            out.append(';')
+        elif item.children is None:
+            out.append(item.prelude)
+            out.append(';')
+        else:
+            inner = serialize(item.children)
+            out.append(item.prelude)
+            out.append('{')
+            out.append(inner[:-1] if inner.endswith(';') else inner)
+            out.append('}')
+    return ''.join(out)
+
+
+def compact(text, tight=''):
+    """Collapse whitespace outside strings; drop it entirely next to ``tight`` characters."""
+    out = []
+    pos = 0
+    length = len(text)
+    pending = False
+    while pos < length:
+        ch = text[pos]
+        if ch in ' \t\r\n\f':
+            pending = True
+            pos += 1
+            continue
+        if pending and out and ch not in tight and out[-1][-1] not in tight:
+            out.append(' ')
+        pending = False
+        if ch in '"\'':
+            end = pos + 1
+            while end < length and text[end] != ch:
+                end += 2 if text[end] == '\\' else 1
+            out.append(text[pos:end + 1])
+            pos = end + 1
+            continue
+        if ch == '\\':
+            out.append(text[pos:pos + 2])
+            pos += 2
+            continue
+        out.append(ch)
+        pos += 1
+    return ''.join(out)
+
+
+def _minify_items(items):
+    for item in items:
+        if isinstance(item, Decl):
+            if item.custom_property is None and ':' in item.text:
+                prop, value = item.text.split(':', 1)
+                item.text = prop.strip() + ':' + compact(value.strip(), ',')
+            else:
+                item.text = compact(item.text)
+        else:
+            if item.is_at_rule:
+                item.prelude = compact(item.prelude, ',')
+            else:
+                item.prelude = compact(item.prelude, ',>+~')
+            if item.children:
+                _minify_items(item.children)
+    return items
+
+
+def minify(text):
+    """Compact CSS: comments dropped, whitespace collapsed, no redundant semicolons."""
+    return serialize(_minify_items(parse(text)))
+
+
+def split_selectors(prelude):
+    """Split a selector list on top-level commas."""
+    parts = []
+    pos = 0
+    while pos <= len(prelude):
+        stop = _scan(prelude, pos, ',')
+        part = prelude[pos:stop].strip()
+        if part:
+            parts.append(part)
+        pos = stop + 1
+    return parts
+
+
+def unescape_ident(ident):
+    def repl(m):
+        esc = m.group(1)
+        if esc[0] in _HEX_DIGITS:
+            return chr(int(esc.strip(), 16))
+        return esc
+    return _ESCAPE_RE.sub(repl, ident)
+
+
+def _strip_functional_pseudos(selector):
+    """Drop the arguments of ``:is()``/``:where()``/``:not()`` etc."""
+    out = []
+    depth = 0
+    i = 0
+    while i < len(selector):
+        ch = selector[i]
+        if ch == '\\' and depth == 0:
+            out.append(selector[i:i + 2])
+            i += 2
+            continue
+        if ch == '(':
+            depth += 1
+        elif ch == ')':
+            depth = max(0, depth - 1)
+        elif depth == 0:
+            out.append(ch)
+        i += 1
+    return ''.join(out)
+
+
+def selector_classes(selector, include_pseudo_args=False):
+    """Unescaped class names in ``selector`` (``.md\\:p-4`` -> ``md:p-4``)."""
+    if not include_pseudo_args:
+        selector = _strip_functional_pseudos(selector)
+    return [unescape_ident(m.group(1)) for m in _IDENT_CLASS_RE.finditer(selector)]
+
+
+def subject_compound(selector):
+    """``(tag, ids, classes, attribute names)`` the selector's target element must have.
+
+    Only the last compound counts and pseudo-classes/elements are ignored, so
+    this over-approximates: a match means the rule may apply to the element.
+    """
+    selector = _strip_functional_pseudos(selector).strip()
+    start = 0
+    depth = 0
+    i = 0
+    while i < len(selector):
+        ch = selector[i]
+        if ch == '\\':
+            i += 2
+            continue
+        if ch == '[':
+            depth += 1
+        elif ch == ']':
+            depth = max(0, depth - 1)
+        elif depth == 0 and ch in ' >+~':
+            start = i + 1
+        i += 1
+    compound = selector[start:]
+    attrs = _ATTR_NAME_RE.findall(compound)
+    compound = _PSEUDO_RE.sub('', re.sub(r'\[[^\]]*\]', '', compound))
+    m = _TAG_RE.match(compound)
+    tag = m.group(0).lower() if m else None
+    ids = [unescape_ident(i) for i in _ID_RE.findall(compound)]
+    classes = [unescape_ident(m.group(1)) for m in _IDENT_CLASS_RE.finditer(compound)]
+    return tag, ids, classes, [a.lower() for a in attrs]
+
+
+def var_references(text):
+    return set(_VAR_RE.findall(text))
+
+
+def walk_rules(items, parents=()):
+    """Yield ``(block, parents)`` for every block in the tree, depth first."""
+    for item in items:
+        if isinstance(item, Block):
+            yield item, parents
+            if item.children:
+                yield from walk_rules(item.children, parents + (item,))
@@ -0,0 +1,456 @@
+"""Shared parsed-document model for the public/ maintenance scripts.
+
+Each page is read and tokenized once into a flat list of nodes (tags, text,
+comments) that keep their byte offsets into the original text, so audits can
+inspect attributes and rewrites can splice exact spans without re-scanning.
+"""
+import functools
+import html
+import os
+import re
+import time
+from collections import OrderedDict
+
+from site_tools import instrument
+
+PUBLIC_DIR = 'public'
+
+TEXT = 'text'
+START = 'start'
+END = 'end'
+COMMENT = 'comment'
+DECL = 'decl'
+
+# Elements whose content is not markup and must be skipped as a single text run.
+RAW_TEXT_ELEMENTS = ('script', 'style', 'textarea', 'title')
+
+VOID_ELEMENTS = frozenset((
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link',
+    'meta', 'param', 'source', 'track', 'wbr',
+))
+
+TOKEN_RE = re.compile(r'''
+    (?P<comment><!--.*?-->)
+  | (?P<decl><![^>]*>)
+  | </(?P<close>[A-Za-z][\w:-]*)[^>]*>
+  | <(?P<open>[A-Za-z][\w:-]*)(?P<attrs>(?:[^>"']|"[^"]*"|'[^']*')*)>
+''', re.S | re.X)
+
+ATTR_RE = re.compile(r'''
+    (?P<name>[^\s"'>/=]+)
+    (?:\s*=\s*(?:"(?P<dq>[^"]*)"|'(?P<sq>[^']*)'|(?P<uq>[^\s"'=<>`]+)))?
+''', re.X)
+
+_RAW_END_RE = {
+    name: re.compile(r'</%s\s*>' % name, re.I) for name in RAW_TEXT_ELEMENTS
+}
+
+
+class Attr:
+    __slots__ = ('name', 'raw', 'start', 'value_start', 'value_end')
+
+    def __init__(self, name, raw, start, value_start, value_end):
+        self.name = name
+        self.raw = raw
+        self.start = start
+        self.value_start = value_start
+        self.value_end = value_end
+
+    @property
+    def value(self):
+        return html.unescape(self.raw) if self.raw is not None else ''
+
+
+class Node:
+    __slots__ = ('kind', 'name', 'start', 'end', 'attrs', 'index')
+
+    def __init__(self, kind, start, end, name=None, attrs=None):
+        self.kind = kind
+        self.name = name
+        self.start = start
+        self.end = end
+        self.attrs = attrs or ()
+        self.index = -1
+
+    def attr(self, name):
+        for attr in self.attrs:
+            if attr.name == name:
+                return attr
+        return None
+
+    def get(self, name, default=None):
+        attr = self.attr(name)
+        return attr.value if attr is not None else default
+
+    def has_class(self, cls):
+        return cls in self.get('class', '').split()
+
+    def __repr__(self):
+        return f'<Node {self.kind} {self.name or ""} {self.start}:{self.end}>'
+
+
+def parse_attrs(text, start, end):
+    attrs = []
+    if start == end:
+        return attrs
+    for m in ATTR_RE.finditer(text, start, end):
+        group = m.lastgroup
+        if group == 'name':
+            attrs.append(Attr(m.group('name').lower(), None, m.start(), -1, -1))
+        else:
+            attrs.append(Attr(m.group('name').lower(), m.group(group),
+                              m.start(), m.start(group), m.end(group)))
+    return attrs
+
+
+def tokenize(text):
+    """Split ``text`` into a list of nodes in a single left-to-right pass."""
+    nodes = []
+    pos = 0
+    length = len(text)
+    search = TOKEN_RE.search
+    while pos < length:
+        m = search(text, pos)
+        if m is None:
+            nodes.append(Node(TEXT, pos, length))
+            break
+        if m.start() > pos:
+            nodes.append(Node(TEXT, pos, m.start()))
+        pos = m.end()
+        kind = m.lastgroup
+        if kind == 'comment':
+            nodes.append(Node(COMMENT, m.start(), pos))
+        elif kind == 'decl':
+            nodes.append(Node(DECL, m.start(), pos))
+        elif kind == 'close':
+            nodes.append(Node(END, m.start(), pos, m.group('close').lower()))
+        else:
+            name = m.group('open').lower()
+            attrs = parse_attrs(text, m.start('attrs'), m.end('attrs'))
+            nodes.append(Node(START, m.start(), pos, name, attrs))
+            if name in _RAW_END_RE:
+                close = _RAW_END_RE[name].search(text, pos)
+                raw_end = close.start() if close else length
+                if raw_end > pos:
+                    nodes.append(Node(TEXT, pos, raw_end))
+                if close:
+                    nodes.append(Node(END, close.start(), close.end(), name))
+                    pos = close.end()
+                else:
+                    pos = length
+    for i, node in enumerate(nodes):
+        node.index = i
+    return nodes
+
+
+class Document:
+    """A page's text plus its token list and lazily built lookups."""
+
+    def __init__(self, path, text, mtime_ns=0, size=0):
+        self.path = path
+        self.text = text
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.nodes = tokenize(text)
+        self._by_tag = None
+        self._closers = None
+
+    @property
+    def name(self):
+        return os.path.basename(self.path)
+
+    def source(self, node):
+        return self.text[node.start:node.end]
+
+    def tags(self, name):
+        if self._by_tag is None:
+            by_tag = {}
+            for node in self.nodes:
+                if node.kind == START:
+                    by_tag.setdefault(node.name, []).append(node)
+            self._by_tag = by_tag
+        return self._by_tag.get(name, [])
+
+    def closers(self):
+        """Map each start tag's node index to its end tag's node index.
+
+        Built once with a single stack pass. Void and self-closing elements
+        map to themselves; elements never closed are absent.
+        """
+        if self._closers is None:
+            closers = {}
+            stack = []
+            open_count = {}
+            for node in self.nodes:
+                if node.kind == START:
+                    if node.name in VOID_ELEMENTS or self.text[node.end - 2] == '/':
+                        closers[node.index] = node.index
+                    else:
+                        stack.append(node)
+                        open_count[node.name] = open_count.get(node.name, 0) + 1
+                elif node.kind == END and open_count.get(node.name):
+                    while stack:
+                        opened = stack.pop()
+                        open_count[opened.name] -= 1
+                        if opened.name == node.name:
+                            closers[opened.index] = node.index
+                            break
+            self._closers = closers
+        return self._closers
+
+    def element_range(self, node):
+        """``(start, end)`` offsets of the whole element opened by ``node``."""
+        close = self.closers().get(node.index)
+        if close is None:
+            return None
+        return node.start, self.nodes[close].end
+
+    def select(self, selector):
+        match = compile_selector(selector)
+        return [node for node in self.nodes if node.kind == START and match(node)]
+
+    def select_one(self, selector):
+        match = compile_selector(selector)
+        for node in self.nodes:
+            if node.kind == START and match(node):
+                return node
+        return None
+
+    def inner_text(self, node):
+        """Unescaped text between a start tag and the next end tag of its name."""
+        parts = []
+        for other in self.nodes[node.index + 1:]:
+            if other.kind == END and other.name == node.name:
+                break
+            if other.kind == TEXT:
+                parts.append(self.text[other.start:other.end])
+        return html.unescape(''.join(parts))
+
+
+_COMPOUND_RE = re.compile(r'''
+    (?P<tag>^[A-Za-z][\w-]*|^\*)
+  | \#(?P<id>[\w-]+)
+  | \.(?P<cls>[\w-]+)
+  | \[\s*(?P<attr>[^\s=\]~^$*|]+)\s*
+        (?:(?P<op>[~^$*]?=)\s*(?:"(?P<dq>[^"]*)"|'(?P<sq>[^']*)'|(?P<uq>[^\]\s]+))\s*)?\]
+''', re.X)
+
+_ATTR_OPS = {
+    '=': lambda value, want: value == want,
+    '~=': lambda value, want: want in value.split(),
+    '^=': lambda value, want: value.startswith(want),
+    '$=': lambda value, want: value.endswith(want),
+    '*=': lambda value, want: want in value,
+}
+
+
+@functools.lru_cache(maxsize=None)
+def compile_selector(selector):
+    """Compile a single compound selector into a predicate over start tags.
+
+    Supports ``tag``, ``#id``, ``.class`` and ``[attr]`` / ``[attr=value]``
+    (with ``~= ^= $= *=``), e.g. ``div.cursor-pointer[onclick^="window"]``.
+    """
+    selector = selector.strip()
+    tests = []
+    pos = 0
+    while pos < len(selector):
+        m = _COMPOUND_RE.match(selector, pos)
+        if m is None or m.end() == pos:
+            raise ValueError(f'unsupported selector: {selector!r}')
+        pos = m.end()
+        if m.group('tag'):
+            if m.group('tag') != '*':
+                tag = m.group('tag').lower()
+                tests.append(lambda node, tag=tag: node.name == tag)
+        elif m.group('id'):
+            tests.append(lambda node, want=m.group('id'): node.get('id') == want)
+        elif m.group('cls'):
+            tests.append(lambda node, want=m.group('cls'): node.has_class(want))
+        else:
+            name = m.group('attr').lower()
+            op = m.group('op')
+            if op is None:
+                tests.append(lambda node, name=name: node.attr(name) is not None)
+            else:
+                want = next(g for g in (m.group('dq'), m.group('sq'), m.group('uq')) if g is not None)
+                check = _ATTR_OPS[op]
+                tests.append(lambda node, name=name, want=want, check=check:
+                             node.attr(name) is not None and check(node.get(name), want))
+
+    def match(node):
+        for test in tests:
+            if not test(node):
+                return False
+        return True
+
+    return match
+
+
+# Parsed documents hold many small objects; bounding the cache keeps the
+# garbage collector from rescanning thousands of stale pages on large runs.
+CACHE_SIZE = 64
+_CACHE = OrderedDict()
+
+
+def load(path):
+    """Return the parsed document for ``path``, reusing it while mtime/size hold."""
+    key = os.path.abspath(path)
+    st = os.stat(key)
+    cached = _CACHE.get(key)
+    if cached is not None and cached.mtime_ns == st.st_mtime_ns and cached.size == st.st_size:
+        _CACHE.move_to_end(key)
+        return cached
+    with open(key, 'r', encoding='utf-8') as f:
+        text = f.read()
+    if instrument.active():
+        instrument.count('bytes_read', st.st_size)
+        instrument.count('pages_parsed')
+        with instrument.span('parse', cat='parse'):
+            doc = Document(path, text, st.st_mtime_ns, st.st_size)
+    else:
+        doc = Document(path, text, st.st_mtime_ns, st.st_size)
+    _CACHE[key] = doc
+    _CACHE.move_to_end(key)
+    while len(_CACHE) > CACHE_SIZE:
+        _CACHE.popitem(last=False)
+    return doc
+
+
+def forget(path):
+    _CACHE.pop(os.path.abspath(path), None)
+
+
+def page_paths(public_dir=PUBLIC_DIR):
+    if not os.path.isdir(public_dir):
+        return []
+    return [os.path.join(public_dir, f)
+            for f in sorted(os.listdir(public_dir)) if f.endswith('.html')]
+
+
+def pages(public_dir=PUBLIC_DIR):
+    for path in page_paths(public_dir):
+        yield load(path)
+
+
+class Visitor:
+    """Base class for single-pass checks and rewrites.
+
+    Subclasses override any of the node hooks; ``finish`` returns the
+    visitor's result for the page. Rewriting visitors call ``self.replace``
+    and the collected edits are applied once all visitors have run.
+    """
+
+    name = None
+    # Bump when a visitor's logic changes so cached results are recomputed.
+    version = 1
+
+    def cache_key(self):
+        return f'{self.name}@{self.version}'
+
+    def begin(self, doc):
+        pass
+
+    def start_tag(self, doc, node):
+        pass
+
+    def end_tag(self, doc, node):
+        pass
+
+    def text(self, doc, node):
+        pass
+
+    def comment(self, doc, node):
+        pass
+
+    def finish(self, doc):
+        return None
+
+    def replace(self, start, end, new):
+        self.edits.append((start, end, new))
+
+
+_HOOKS = {START: 'start_tag', END: 'end_tag', TEXT: 'text', COMMENT: 'comment'}
+
+
+def _overrides(visitor, hook):
+    return getattr(type(visitor), hook) is not getattr(Visitor, hook)
+
+
+def walk(doc, visitors):
+    """Run every visitor over ``doc`` in one pass over its nodes.
+
+    Returns ``(results, edits)`` where results maps visitor name to the value
+    of its ``finish`` and edits is the combined list of replacements.
+    """
+    if instrument.active():
+        with instrument.span('walk', cat='walk') as args:
+            results, edits = _timed_walk(doc, visitors)
+        # The page's span gets the visitor times too.
+        instrument.annotate(**args)
+        return results, edits
+    dispatch = {}
+    for kind, hook in _HOOKS.items():
+        dispatch[kind] = [getattr(v, hook) for v in visitors if _overrides(v, hook)]
+    for v in visitors:
+        v.edits = []
+        v.begin(doc)
+    for node in doc.nodes:
+        for fn in dispatch.get(node.kind, ()):
+            fn(doc, node)
+    results = {}
+    edits = []
+    for v in visitors:
+        results[v.name] = v.finish(doc)
+        edits.extend(v.edits)
+    return results, edits
+
+
+def _timed_walk(doc, visitors):
+    """``walk`` that also times every visitor hook, for site_tools.instrument."""
+    clock = time.perf_counter
+    spent = {v.name: 0.0 for v in visitors}
+
+    def timed(name, fn):
+        def call(*args):
+            start = clock()
+            fn(*args)
+            spent[name] += clock() - start
+        return call
+
+    dispatch = {}
+    for kind, hook in _HOOKS.items():
+        dispatch[kind] = [timed(v.name, getattr(v, hook)) for v in visitors if _overrides(v, hook)]
+    for v in visitors:
+        v.edits = []
+        timed(v.name, v.begin)(doc)
+    for node in doc.nodes:
+        for fn in dispatch.get(node.kind, ()):
+            fn(doc, node)
+    results = {}
+    edits = []
+    for v in visitors:
+        start = clock()
+        results[v.name] = v.finish(doc)
+        spent[v.name] += clock() - start
+        edits.extend(v.edits)
+    for name, seconds in spent.items():
+        instrument.add_time(f'visitor:{name}', seconds)
+    instrument.annotate(visitors={name: round(seconds * 1000, 3) for name, seconds in spent.items()})
+    return results, edits
+
+
+def apply_edits(text, edits):
+    """Splice non-overlapping ``(start, end, new)`` edits into ``text``."""
+    if not edits:
+        return text
+    out = []
+    pos = 0
+    for start, end, new in sorted(edits, key=lambda e: (e[0], e[1])):
+        if start < pos:
+            raise ValueError(f'overlapping edit at offset {start}')
+        out.append(text[pos:start])
+        out.append(new)
+        pos = end
+    out.append(text[pos:])
+    return ''.join(out)
@@ -0,0 +1,159 @@
+"""Process-pool runner for bulk page rewrites.
+
+Workers parse a page, run its visitors and compute the rewritten text; the
+parent process collects structured results and writes every changed page in
+one transaction at the end. ``make_visitors`` must be picklable (a class or a
+module-level function) because it is shipped to the worker processes.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from site_tools import document, instrument, writer
+from site_tools.manifest import content_hash
+
+UPDATED = 'updated'
+SKIPPED = 'skipped'
+FAILED = 'failed'
+
+# Below this many pages per worker the pool start-up costs more than it saves.
+MIN_PAGES_PER_WORKER = 4
+
+
+class FileResult:
+    __slots__ = ('path', 'status', 'results', 'edits', 'error', 'cached')
+
+    def __init__(self, path, status, results=None, edits=0, error=None, cached=False):
+        self.path = path
+        self.status = status
+        self.results = results or {}
+        self.edits = edits
+        self.error = error
+        self.cached = cached
+
+    def to_dict(self):
+        return {'path': self.path, 'status': self.status, 'edits': self.edits,
+                'error': self.error, 'cached': self.cached, 'results': self.results}
+
+
+class RunReport:
+    def __init__(self, results, transaction=None):
+        self.results = results
+        self.transaction = transaction
+
+    @property
+    def counts(self):
+        counts = {UPDATED: 0, SKIPPED: 0, FAILED: 0}
+        for r in self.results:
+            counts[r.status] += 1
+        return counts
+
+    def by_status(self, status):
+        return [r for r in self.results if r.status == status]
+
+    def summary(self):
+        c = self.counts
+        return f"{c[UPDATED]} updated, {c[SKIPPED]} skipped, {c[FAILED]} failed"
+
+    def to_dict(self):
+        return {'counts': self.counts, 'files': [r.to_dict() for r in self.results]}
+
+
+def _process(args):
+    make_visitors, path = args
+    with instrument.span(path, cat='file', timer='page'):
+        output = _process_page(make_visitors, path)
+    # Spans recorded in a worker process travel back with the result.
+    return output + (instrument.drain(),)
+
+
+def _process_page(make_visitors, path):
+    try:
+        doc = document.load(path)
+        visitors = make_visitors(path)
+        results, edits = document.walk(doc, visitors)
+        new_text = document.apply_edits(doc.text, edits) if edits else None
+        if new_text == doc.text:
+            new_text = None
+        status = UPDATED if new_text is not None else SKIPPED
+        cache = [(v.cache_key(), {'result': results[v.name], 'edits': len(v.edits)})
+                 for v in visitors]
+        return FileResult(path, status, results, len(edits)), new_text, content_hash(doc.text), cache
+    except Exception as e:
+        return FileResult(path, FAILED, error=str(e)), None, None, None
+
+
+def _cached(make_visitors, path, manifest, write):
+    if manifest is None or not manifest.stat_matches(path):
+        return None
+    visitors = make_visitors(path)
+    cached = manifest.results(path, [v.cache_key() for v in visitors])
+    if cached is None:
+        return None
+    # Pending edits only need the page re-run when they are going to be written.
+    edits = sum(c['edits'] for c in cached.values())
+    if edits and write:
+        return None
+    results = {v.name: cached[v.cache_key()]['result'] for v in visitors}
+    return FileResult(path, UPDATED if edits else SKIPPED, results, edits, cached=True)
+
+
+def default_workers():
+    return max(1, os.cpu_count() or 1)
+
+
+def run(make_visitors, paths, workers=None, manifest=None, write=True):
+    """Run ``make_visitors(path)`` over every page and return a ``RunReport``.
+
+    Pages with a current manifest entry are not dispatched: with ``write``
+    false (dry run, nothing is written) their cached results are returned,
+    marked updated when edits are pending; with ``write`` only pages that
+    recorded no pending edits are skipped.
+    All writes go through one ``writer.Transaction``, available on the
+    report for ``report.transaction.rollback()``; if any write fails the
+    whole batch is restored and every pending page is marked failed.
+    """
+    workers = workers or default_workers()
+    slots = [None] * len(paths)
+    todo = []
+    with instrument.span('engine:cache'):
+        for i, path in enumerate(paths):
+            hit = _cached(make_visitors, path, manifest, write)
+            if hit is not None:
+                slots[i] = hit
+            else:
+                todo.append(i)
+    instrument.count('pages_cached', len(paths) - len(todo))
+
+    jobs = [(make_visitors, paths[i]) for i in todo]
+    with instrument.span('engine:process'):
+        if workers == 1 or len(jobs) < workers * MIN_PAGES_PER_WORKER:
+            outputs = list(map(_process, jobs))
+        else:
+            chunksize = max(1, len(jobs) // (workers * 4))
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                outputs = list(pool.map(_process, jobs, chunksize=chunksize))
+
+    pending_writes = []
+    for i, (result, new_text, digest, cache, recorded) in zip(todo, outputs):
+        instrument.absorb(recorded)
+        slots[i] = result
+        if new_text is not None:
+            pending_writes.append((result, new_text))
+        if manifest is not None and digest is not None:
+            manifest.refresh(result.path, digest)
+            for key, value in cache:
+                manifest.store(result.path, key, value)
+
+    transaction = None
+    if write and pending_writes:
+        transaction = writer.Transaction()
+        for result, new_text in pending_writes:
+            transaction.write(result.path, new_text)
+        try:
+            with instrument.span('engine:commit'):
+                transaction.commit()
+        except OSError as e:
+            for result, _ in pending_writes:
+                result.status = FAILED
+                result.error = f'rolled back: {e}'
+    return RunReport(slots, transaction)
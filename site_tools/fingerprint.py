@@ -0,0 +1,189 @@
+"""Content-hash fingerprinting for public/css and public/js.
+
+Usage: python3 -m site_tools.fingerprint [--query] [--dry-run] [--jobs N]
+
+Every stylesheet and script is hashed; by default a copy named
+``name.<hash>.ext`` is written next to the original (stale copies are removed)
+and every ``<link href>`` / ``<script src>`` in public/*.html is rewritten to
+it. Fingerprinted names are served with an immutable Cache-Control header
+(see the matching ``regex`` rule in firebase.json). ``--query`` keeps the
+original filenames and rewrites references to ``name.ext?v=<hash>`` instead.
+"""
+import argparse
+import hashlib
+import json
+import os
+import posixpath
+import re
+import zlib
+
+from site_tools import document, engine, writer
+from site_tools.document import Visitor
+from site_tools.manifest import CACHE_DIR, Manifest
+
+ASSET_DIRS = ('css', 'js')
+ASSET_EXTENSIONS = ('.css', '.js')
+HASH_LENGTH = 10
+ASSET_MANIFEST_PATH = os.path.join(CACHE_DIR, 'asset-manifest.json')
+
+FINGERPRINT_RE = re.compile(r'^(?P<stem>.+)\.(?P<hash>[0-9a-f]{%d})(?P<ext>\.[a-z0-9]+)$' % HASH_LENGTH)
+_EXTERNAL_RE = re.compile(r'^(?:[a-z][a-z0-9+.-]*:|//)', re.I)
+
+# (tag, attribute) pairs that load a stylesheet or script.
+REFERENCE_ATTRS = (('link', 'href'), ('script', 'src'))
+
+
+def short_hash(data):
+    return hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+
+
+def fingerprinted_name(rel, digest):
+    stem, ext = posixpath.splitext(rel)
+    return f'{stem}.{digest}{ext}'
+
+
+def logical_name(rel):
+    """Strip a fingerprint from ``rel`` (``css/main.0123456789.css`` -> ``css/main.css``)."""
+    m = FINGERPRINT_RE.match(rel)
+    return m.group('stem') + m.group('ext') if m else rel
+
+
+def collect_assets(public_dir=document.PUBLIC_DIR):
+    """Map each un-fingerprinted asset's public-relative path to its hash."""
+    assets = {}
+    for asset_dir in ASSET_DIRS:
+        root = os.path.join(public_dir, asset_dir)
+        for dirpath, _, filenames in os.walk(root):
+            for filename in sorted(filenames):
+                rel = posixpath.join(os.path.relpath(dirpath, public_dir).replace(os.sep, '/'), filename)
+                if not filename.endswith(ASSET_EXTENSIONS) or logical_name(rel) != rel:
+                    continue
+                with open(os.path.join(dirpath, filename), 'rb') as f:
+                    digest = short_hash(f.read())
+                assets[rel] = {'hash': digest, 'file': fingerprinted_name(rel, digest)}
+    return assets
+
+
+def emit_fingerprinted(assets, public_dir=document.PUBLIC_DIR):
+    """Write ``name.<hash>.ext`` copies and delete stale fingerprints of the same asset."""
+    written = removed = 0
+    for rel, info in assets.items():
+        src = os.path.join(public_dir, rel)
+        dst = os.path.join(public_dir, info['file'])
+        with open(src, 'rb') as f:
+            if writer.write_text(dst, f.read()):
+                written += 1
+        directory = os.path.dirname(src)
+        for filename in os.listdir(directory):
+            sibling = posixpath.join(posixpath.dirname(rel), filename)
+            if sibling != info['file'] and sibling != rel and logical_name(sibling) == rel:
+                os.unlink(os.path.join(directory, filename))
+                removed += 1
+    return written, removed
+
+
+def resolve_reference(value, page_dir=''):
+    """Return ``(prefix, public-relative path, suffix)`` for a local asset URL, else None."""
+    if not value or _EXTERNAL_RE.match(value):
+        return None
+    path, sep, rest = value.partition('?')
+    if not sep:
+        path, sep, rest = value.partition('#')
+        suffix = sep + rest
+    else:
+        fragment = rest.partition('#')[2]
+        suffix = '#' + fragment if fragment else ''
+    if path.startswith('/'):
+        return '/', posixpath.normpath(path.lstrip('/')), suffix
+    rel = posixpath.normpath(posixpath.join(page_dir, path))
+    if rel.startswith('..'):
+        return None
+    return '', rel, suffix
+
+
+class AssetReferences(Visitor):
+    """Rewrites stylesheet/script references using the asset manifest."""
+
+    name = 'assets'
+
+    def __init__(self, assets, query=False):
+        self.assets = assets
+        self.query = query
+
+    def cache_key(self):
+        digest = zlib.crc32(json.dumps([self.assets, self.query], sort_keys=True).encode('utf-8'))
+        return f'{super().cache_key()}:{digest:08x}'
+
+    def begin(self, doc):
+        rel = os.path.relpath(doc.path, document.PUBLIC_DIR).replace(os.sep, '/')
+        self.page_dir = posixpath.dirname(rel)
+        self.rewritten = 0
+
+    def start_tag(self, doc, node):
+        for tag, attr_name in REFERENCE_ATTRS:
+            if node.name != tag:
+                continue
+            attr = node.attr(attr_name)
+            if attr is None or attr.raw is None:
+                continue
+            ref = resolve_reference(attr.value, self.page_dir)
+            if ref is None:
+                continue
+            prefix, rel, suffix = ref
+            info = self.assets.get(logical_name(rel))
+            if info is None:
+                continue
+            if self.query:
+                new = f'{prefix}{logical_name(rel)}?v={info["hash"]}{suffix}'
+            else:
+                new = f'{prefix}{info["file"]}{suffix}'
+            if new != attr.raw:
+                self.replace(attr.value_start, attr.value_end, new)
+                self.rewritten += 1
+
+    def finish(self, doc):
+        return {'rewritten': self.rewritten}
+
+
+class ReferenceRewrite:
+    """Picklable visitor factory for ``engine.run``."""
+
+    def __init__(self, assets, query=False):
+        self.assets = assets
+        self.query = query
+
+    def __call__(self, path):
+        return [AssetReferences(self.assets, self.query)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--query', action='store_true', help='use ?v=<hash> instead of fingerprinted filenames')
+    parser.add_argument('--dry-run', action='store_true', help='report without writing anything')
+    parser.add_argument('--jobs', type=int, default=None, help='worker processes (default: CPU count)')
+    args = parser.parse_args()
+
+    assets = collect_assets()
+    print(f"Hashed {len(assets)} assets under public/css and public/js")
+    if not args.query and not args.dry_run:
+        written, removed = emit_fingerprinted(assets)
+        print(f"Fingerprinted copies: {written} written, {removed} stale removed")
+
+    manifest = Manifest()
+    report = engine.run(ReferenceRewrite(assets, args.query), document.page_paths(),
+                        workers=args.jobs, manifest=manifest, write=not args.dry_run)
+    manifest.save()
+    for result in report.results:
+        if result.status == engine.FAILED:
+            print(f"Error {result.path}: {result.error}")
+        elif result.status == engine.UPDATED:
+            print(f"Updated {result.path} ({result.results['assets']['rewritten']} references)")
+    print(report.summary())
+
+    if not args.dry_run:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        writer.write_text(ASSET_MANIFEST_PATH, json.dumps(assets, indent=2, sort_keys=True) + '\n')
+
+
+if __name__ == "__main__":
+    main()
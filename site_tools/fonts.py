@@ -0,0 +1,775 @@
+"""Self-host Google Fonts families as WOFF2 subsets of the glyphs the site renders.
+
+Usage: python3 -m site_tools.fonts [--dry-run] [--fold N] [--jobs N]
+
+The sources are the font files in public/app/fonts named
+``<family>-<weight>.ttf`` (or ``.otf``), e.g. orbitron-700.ttf. Each page
+that requests one of those families from fonts.googleapis.com goes through
+these steps:
+
+1. Work out which text each family renders. Families and weights come from
+   inline ``style`` attributes, Tailwind ``font-*`` classes and the rules
+   in the page's ``<style>`` blocks and local stylesheets, with custom
+   properties resolved, and they inherit down the tree. As in the critical
+   CSS stage, a rule counts for an element whenever its last compound
+   selector could match, so the result over-approximates.
+2. Subset every weight to the characters that family renders anywhere on
+   the site, plus printable ASCII for text that scripts insert at runtime.
+   Each subset is written as ``fonts/<family>-<weight>.<hash>.woff2``.
+3. Replace the Google Fonts ``<link>`` with an inline ``<style data-fonts>``
+   of ``@font-face`` rules (``font-display: swap``). Preload the faces, at
+   most MAX_PRELOADS, that render the most text in the first ``--fold``
+   elements of ``<body>``.
+
+Some weights a page renders may map to a face that has no local source,
+e.g. Orbitron 400 when only orbitron-700/800/900.ttf exist. Those stay on
+Google Fonts. Instead of being removed, the link is narrowed to just those
+faces and loaded without blocking render (the ``media="print"`` pattern
+from the critical CSS stage). Add the missing file and rerun to drop the
+link. Families requested with axes other than ``wght`` (``ital``, ``opsz``)
+are left alone, and so is ``@import``-ed font CSS. Once nothing is left on
+Google Fonts, the page's preconnect/dns-prefetch hints for it are removed
+too.
+
+``data-fonts`` records the original request for the families now served
+locally, so reruns make the same decisions. Subsetting needs fontTools and
+brotli, listed in site_tools/requirements.txt (``pip install -r
+site_tools/requirements.txt``). Subsets are cached in
+.cache/font-subsets.json by source hash and character set, so a rerun with
+unchanged text works without them. Subsets no page uses any more are
+deleted.
+"""
+import argparse
+import functools
+import html
+import io
+import json
+import os
+import posixpath
+import re
+import zlib
+from urllib.parse import parse_qsl, urlsplit
+
+try:
+    from fontTools import subset
+    from fontTools.ttLib import TTFont
+except ImportError:
+    subset = None
+
+from site_tools import css, document, engine, writer
+from site_tools.critical import ASYNC_ONLOAD, FOLD_ELEMENTS, stylesheet_path
+from site_tools.document import VOID_ELEMENTS, Visitor
+from site_tools.fingerprint import fingerprinted_name, short_hash
+from site_tools.hints import FONT_ORIGINS, HINT_RELS, origin_of
+from site_tools.manifest import CACHE_DIR, Manifest, content_hash, file_hash
+
+SOURCE_DIR = 'app/fonts'
+OUTPUT_DIR = 'fonts'
+SUBSET_CACHE_PATH = os.path.join(CACHE_DIR, 'font-subsets.json')
+# Bump when the subsetting options change so cached subsets are rebuilt.
+SUBSET_VERSION = 1
+GOOGLE_FONTS_HOST = 'fonts.googleapis.com'
+GOOGLE_FONTS_CSS = 'https://fonts.googleapis.com/css2'
+MAX_PRELOADS = 2
+# Scripts set text at runtime (typed headings, counters, chat replies).
+BASELINE = ''.join(chr(c) for c in range(0x20, 0x7f))
+SKIP_ELEMENTS = ('script', 'style', 'template', 'title')
+BOLD_ELEMENTS = ('b', 'strong', 'th', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6')
+TAILWIND_WEIGHTS = {
+    'font-thin': 100, 'font-extralight': 200, 'font-light': 300, 'font-normal': 400, 'font-medium': 500,
+    'font-semibold': 600, 'font-bold': 700, 'font-extrabold': 800, 'font-black': 900,
+}
+KEYWORD_WEIGHTS = {'normal': 400, 'bold': 700, 'bolder': 700, 'lighter': 300}
+CSS_WIDE_KEYWORDS = ('inherit', 'initial', 'unset', 'revert', 'revert-layer')
+
+_SOURCE_RE = re.compile(r'^([a-z0-9-]+)-([1-9]00)\.(?:ttf|otf)$')
+_ARBITRARY_RE = re.compile(r'^font-\[(.+)\]$')
+_NAME_RE = re.compile(r'^[\w -]+$')
+
+
+def family_key(name):
+    return name.strip().strip('\'"').strip().lower()
+
+
+def local_sources(public_dir=document.PUBLIC_DIR):
+    """``{family key: {weight: public-relative source}}`` for the files in SOURCE_DIR."""
+    sources = {}
+    directory = os.path.join(public_dir, SOURCE_DIR)
+    for filename in sorted(os.listdir(directory)) if os.path.isdir(directory) else ():
+        m = _SOURCE_RE.match(filename)
+        if m:
+            family = m.group(1).replace('-', ' ')
+            sources.setdefault(family, {})[int(m.group(2))] = posixpath.join(SOURCE_DIR, filename)
+    return sources
+
+
+def styles_stamp(public_dir=document.PUBLIC_DIR):
+    """Cheap digest of the stylesheets so cached usage is redone when one changes."""
+    entries = []
+    for dirpath, dirnames, filenames in os.walk(public_dir):
+        dirnames.sort()
+        for name in sorted(filenames):
+            if name.endswith('.css'):
+                st = os.stat(os.path.join(dirpath, name))
+                entries.append((os.path.relpath(os.path.join(dirpath, name), public_dir), st.st_mtime_ns, st.st_size))
+    return format(zlib.crc32(repr(entries).encode('utf-8')), '08x')
+
+
+def match_weight(weight, available):
+    """The weight CSS font matching picks for ``weight`` from ``available``."""
+    if weight in available:
+        return weight
+    lighter = sorted((w for w in available if w < weight), reverse=True)
+    heavier = sorted(w for w in available if w > weight)
+    if 400 <= weight <= 500:
+        order = [w for w in heavier if w <= 500] + lighter + [w for w in heavier if w > 500]
+    elif weight < 400:
+        order = lighter + heavier
+    else:
+        order = heavier + lighter
+    return order[0] if order else None
+
+
+# --- Google Fonts URLs ---
+
+def parse_google_fonts(url):
+    """The ``family=`` entries of a css2 URL as dicts with name, axes, weights and spec."""
+    parts = urlsplit(url.strip())
+    if parts.hostname != GOOGLE_FONTS_HOST or parts.path.rstrip('/') != '/css2':
+        return []
+    families = []
+    for key, value in parse_qsl(parts.query):
+        if key != 'family':
+            continue
+        name, _, spec = value.partition(':')
+        axes, _, values = spec.partition('@')
+        family = {'name': name.strip(), 'axes': axes.split(',') if axes else ['wght'], 'spec': value}
+        weights = set()
+        if family['axes'] == ['wght']:
+            for item in values.split(';') if values else ['400']:
+                low, _, high = item.partition('..')
+                if low.isdigit() and (not high or high.isdigit()):
+                    weights.update(range(int(low), int(high or low) + 1, 100))
+        family['weights'] = sorted(weights)
+        families.append(family)
+    return families
+
+
+def google_fonts_url(families, display='swap'):
+    query = '&'.join('family=' + f['spec'].replace(' ', '+') for f in families)
+    return f'{GOOGLE_FONTS_CSS}?{query}&display={display}'
+
+
+def weight_spec(name, weights):
+    return f"{name}:wght@{';'.join(str(w) for w in sorted(weights))}"
+
+
+# --- Font styles ---
+
+def _split_leading_var(value):
+    """``(name, fallback)`` when ``value`` starts with a ``var()`` call, else None."""
+    if not value.startswith('var('):
+        return None
+    depth = 0
+    for i, ch in enumerate(value):
+        if ch == '(':
+            depth += 1
+        elif ch == ')':
+            depth -= 1
+            if depth == 0:
+                name, _, fallback = value[4:i].partition(',')
+                return name.strip(), fallback.strip() or None
+    return None
+
+
+def resolve_values(value, props, depth=0):
+    """Every value ``value`` can take once a leading ``var()`` is substituted."""
+    value = value.replace('!important', '').strip()
+    call = _split_leading_var(value)
+    if call is None:
+        return [value]
+    if depth > 8:
+        return []
+    name, fallback = call
+    candidates = props.get(name) or ([fallback] if fallback else [])
+    values = []
+    for candidate in candidates:
+        values.extend(resolve_values(candidate, props, depth + 1))
+    return values
+
+
+def families_of(value, props):
+    """Keys of the families a ``font-family`` value can render with (its first entry)."""
+    families = set()
+    for resolved in resolve_values(value, props):
+        first = css.split_selectors(resolved)[:1]
+        if first and first[0].lower() not in CSS_WIDE_KEYWORDS:
+            families.add(family_key(first[0]))
+    return families
+
+
+def weights_of(value, props):
+    weights = set()
+    for resolved in resolve_values(value, props):
+        resolved = resolved.lower()
+        if resolved.isdigit():
+            weights.add(min(900, max(100, round(int(resolved) / 100) * 100)))
+        elif resolved in KEYWORD_WEIGHTS:
+            weights.add(KEYWORD_WEIGHTS[resolved])
+    return weights
+
+
+def declarations(text):
+    """``(property, value)`` pairs of a ``style`` attribute."""
+    decls = []
+    for item in text.split(';'):
+        prop, sep, value = item.partition(':')
+        if sep:
+            decls.append((prop.strip().lower(), value.strip()))
+    return decls
+
+
+def _rule_selectors(block, parents):
+    """Selectors a block's declarations apply to, with nested ``&`` rules flattened."""
+    chain = [rule for rule in parents + (block,) if not rule.is_at_rule]
+    if not chain:
+        return []
+    selectors = ['']
+    for rule in chain:
+        nested = []
+        for selector in css.split_selectors(rule.prelude):
+            for outer in selectors:
+                if not outer:
+                    nested.append(selector)
+                elif '&' in selector:
+                    nested.append(selector.replace('&', outer))
+                else:
+                    nested.append(outer + ' ' + selector)
+        selectors = nested
+    return selectors
+
+
+def font_rules(text):
+    """``(rules, custom properties)`` of a stylesheet.
+
+    Rules are ``(subject compound, font-family value, font-weight value)``
+    for every rule that sets either.
+    """
+    rules = []
+    props = {}
+    for block, parents in css.walk_rules(css.parse(text)):
+        if not block.children:
+            continue
+        family = weight = None
+        for item in block.children:
+            if not isinstance(item, css.Decl):
+                continue
+            name, _, value = item.text.partition(':')
+            if item.custom_property:
+                props.setdefault(item.custom_property, []).append(value.strip())
+            elif name.strip().lower() == 'font-family':
+                family = value.strip()
+            elif name.strip().lower() == 'font-weight':
+                weight = value.strip()
+        if family is None and weight is None:
+            continue
+        for selector in _rule_selectors(block, parents):
+            rules.append((css.subject_compound(selector), family, weight))
+    return rules, props
+
+
+@functools.lru_cache(maxsize=None)
+def _stylesheet_rules(path, mtime_ns, size):
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        return font_rules(f.read())
+
+
+def stylesheet_rules(rel, public_dir=document.PUBLIC_DIR):
+    path = os.path.join(public_dir, rel)
+    st = os.stat(path)
+    return _stylesheet_rules(os.path.abspath(path), st.st_mtime_ns, st.st_size)
+
+
+class PageRules:
+    """The font rules that can reach a page's elements, indexed like critical.ElementIndex."""
+
+    def __init__(self, sheets):
+        self.props = {}
+        for _, props in sheets:
+            for name, values in props.items():
+                self.props.setdefault(name, []).extend(values)
+        self.by_class = {}
+        self.by_id = {}
+        self.by_tag = {}
+        self.universal = []
+        for rules, _ in sheets:
+            for compound, family, weight in rules:
+                tag, ids, classes, attrs = compound
+                entry = (compound,
+                         families_of(family, self.props) if family else set(),
+                         weights_of(weight, self.props) if weight else set())
+                if ids:
+                    self.by_id.setdefault(ids[0], []).append(entry)
+                elif classes:
+                    self.by_class.setdefault(classes[0], []).append(entry)
+                elif tag:
+                    self.by_tag.setdefault(tag, []).append(entry)
+                else:
+                    self.universal.append(entry)
+
+    def matching(self, node, classes):
+        """``(families, weights)`` pairs of the rules that may apply to ``node``."""
+        node_id = node.get('id')
+        candidates = list(self.universal) + self.by_tag.get(node.name, [])
+        if node_id:
+            candidates += self.by_id.get(node_id, [])
+        for cls in classes:
+            candidates += self.by_class.get(cls, [])
+        names = None
+        for (tag, ids, rule_classes, attrs), families, weights in candidates:
+            if tag and tag != node.name:
+                continue
+            if any(i != node_id for i in ids) or not classes.issuperset(rule_classes):
+                continue
+            if attrs:
+                if names is None:
+                    names = {a.name for a in node.attrs}
+                if not names.issuperset(attrs):
+                    continue
+            yield families, weights
+
+
+def tailwind_font(token):
+    """``(families, weights, conditional)`` set by a Tailwind class token."""
+    depth = 0
+    split = -1
+    for i, ch in enumerate(token):
+        if ch == '[':
+            depth += 1
+        elif ch == ']':
+            depth -= 1
+        elif ch == ':' and depth == 0:
+            split = i
+    base = token[split + 1:].lstrip('!')
+    if base in TAILWIND_WEIGHTS:
+        return set(), {TAILWIND_WEIGHTS[base]}, split >= 0
+    m = _ARBITRARY_RE.match(base)
+    if not m:
+        return set(), set(), False
+    value = m.group(1).replace('_', ' ')
+    if value.isdigit():
+        return set(), weights_of(value, {}), split >= 0
+    if value.startswith('family-name:'):
+        value = value[len('family-name:'):]
+    return {family_key(css.split_selectors(value)[0])} if value else set(), set(), split >= 0
+
+
+# --- Visitors ---
+
+class _FontVisitor(Visitor):
+    """Tracks the families and weights each element may render with, and their text."""
+
+    def __init__(self, families, fold=FOLD_ELEMENTS, stamp=''):
+        self.families = families
+        self.fold = fold
+        self.stamp = stamp
+
+    def cache_key(self):
+        return f'{super().cache_key()}:{self.fold}:{self.stamp}:{",".join(sorted(self.families))}'
+
+    def begin(self, doc):
+        rel = os.path.relpath(doc.path, document.PUBLIC_DIR).replace(os.sep, '/')
+        self.page_dir = posixpath.dirname(rel)
+        self.closers = doc.closers()
+        sheets = []
+        for node in doc.nodes:
+            if node.kind != document.START:
+                continue
+            if node.name == 'style' and node.attr('data-fonts') is None and node.index in self.closers:
+                sheets.append(font_rules(doc.text[node.end:doc.nodes[self.closers[node.index]].start]))
+            elif node.name == 'link' and 'stylesheet' in node.get('rel', '').lower().split():
+                rel_sheet = stylesheet_path(node, self.page_dir)
+                if rel_sheet:
+                    sheets.append(stylesheet_rules(rel_sheet))
+        self.rules = PageRules(sheets)
+        self.stack = []
+        self.skip = None
+        self.in_body = False
+        self.elements = 0
+        self.usage = {}
+        self.fold_text = {}
+        self.links = []
+        self.block = []
+        self.noscript_end = -1
+        self.hints = []
+
+    def current(self):
+        if self.stack:
+            return self.stack[-1][1], self.stack[-1][2]
+        return frozenset(), frozenset((400,))
+
+    def style_of(self, node):
+        families, weights = self.current()
+        if node.name in BOLD_ELEMENTS:
+            weights = frozenset((700,))
+        own_families, own_weights = set(), set()
+        may_families, may_weights = set(), set()
+        classes = set(node.get('class', '').split())
+        for token in classes:
+            fams, wts, conditional = tailwind_font(token)
+            (may_families if conditional else own_families).update(fams)
+            (may_weights if conditional else own_weights).update(wts)
+        for fams, wts in self.rules.matching(node, classes):
+            may_families.update(fams)
+            may_weights.update(wts)
+        for prop, value in declarations(node.get('style', '')):
+            if prop == 'font-family':
+                own_families = families_of(value, self.rules.props) or own_families
+            elif prop == 'font-weight':
+                own_weights = weights_of(value, self.rules.props) or own_weights
+        families = frozenset((own_families or families) | may_families)
+        weights = frozenset((own_weights or weights) | may_weights)
+        return families, weights
+
+    def start_tag(self, doc, node):
+        name = node.name
+        if name == 'body':
+            self.in_body = True
+        self.collect_head(node)
+        if self.skip is not None:
+            return
+        close = self.closers.get(node.index)
+        if name in SKIP_ELEMENTS:
+            if close is not None and close != node.index:
+                self.skip = close
+            return
+        if self.in_body:
+            self.elements += 1
+        families, weights = self.style_of(node)
+        texts = [node.get('placeholder', '')]
+        if name == 'input' and node.get('type', '').lower() in ('button', 'submit', 'reset'):
+            texts.append(node.get('value', ''))
+        for text in texts:
+            self.add_text(text, families, weights)
+        if close is not None and close != node.index and name not in VOID_ELEMENTS:
+            self.stack.append((close, families, weights))
+
+    def end_tag(self, doc, node):
+        if self.skip is not None:
+            if node.index >= self.skip:
+                self.skip = None
+            return
+        while self.stack and self.stack[-1][0] <= node.index:
+            self.stack.pop()
+
+    def text(self, doc, node):
+        if self.skip is None:
+            families, weights = self.current()
+            self.add_text(html.unescape(doc.source(node)), families, weights)
+
+    def add_text(self, text, families, weights):
+        chars = set()
+        for ch in text:
+            if not ch.isspace():
+                # text-transform can change the case of anything.
+                chars.update(ch, ch.upper(), ch.lower())
+        if not chars:
+            return
+        in_fold = self.in_body and self.elements <= self.fold
+        for family in families:
+            if family not in self.families:
+                continue
+            entry = self.usage.setdefault(family, {'chars': set(), 'weights': set()})
+            entry['chars'].update(chars)
+            entry['weights'].update(weights)
+            if in_fold:
+                for weight in weights:
+                    self.fold_text[family, weight] = self.fold_text.get((family, weight), 0) + len(text.strip())
+
+    def collect_head(self, node):
+        if node.index < self.noscript_end:
+            return
+        if node.name in ('style', 'link', 'noscript') and node.attr('data-fonts') is not None:
+            self.block.append(node)
+            if node.name == 'noscript':
+                self.noscript_end = self.closers.get(node.index, node.index)
+            return
+        if node.name != 'link':
+            return
+        rels = node.get('rel', '').lower().split()
+        if 'stylesheet' in rels and parse_google_fonts(node.get('href', '')):
+            self.links.append(node)
+        elif any(rel in HINT_RELS for rel in rels):
+            origin = origin_of(node.get('href', ''))
+            if origin in FONT_ORIGINS or origin in FONT_ORIGINS.values():
+                self.hints.append(node)
+
+    def requested(self):
+        """Google Fonts families the page asks for, including those already served locally."""
+        families = {}
+        urls = [GOOGLE_FONTS_CSS + '?' + node.get('data-fonts') for node in self.block
+                if node.name == 'style' and node.get('data-fonts')]
+        urls += [node.get('href', '') for node in self.block + self.links if node.name == 'link']
+        for url in urls:
+            for family in parse_google_fonts(url):
+                key = family_key(family['name'])
+                if key in families and families[key]['axes'] == family['axes'] == ['wght']:
+                    weights = sorted(set(families[key]['weights']) | set(family['weights']))
+                    families[key] = dict(family, weights=weights, spec=weight_spec(family['name'], weights))
+                else:
+                    families.setdefault(key, family)
+        return families
+
+    def self_hosted(self, requested):
+        return [key for key, family in requested.items() if key in self.families and family['axes'] == ['wght']]
+
+
+class FontUsage(_FontVisitor):
+    """Characters and weights of each locally available family, for families the page requests."""
+
+    name = 'font_usage'
+
+    def finish(self, doc):
+        requested = self.requested()
+        return {family: {'chars': ''.join(sorted(self.usage[family]['chars'])),
+                         'weights': sorted(self.usage[family]['weights'])}
+                for family in self.self_hosted(requested) if family in self.usage}
+
+
+class FontRewrite(_FontVisitor):
+    """Swaps Google Fonts links for inline ``@font-face`` rules pointing at the local subsets."""
+
+    name = 'fonts'
+
+    def __init__(self, faces, fold=FOLD_ELEMENTS, stamp=''):
+        super().__init__(frozenset(faces), fold, stamp)
+        self.faces = faces
+
+    def cache_key(self):
+        digest = zlib.crc32(json.dumps(self.faces, sort_keys=True).encode('utf-8'))
+        return f'{super().cache_key()}:{digest:08x}'
+
+    def finish(self, doc):
+        requested = self.requested()
+        local = self.self_hosted(requested)
+        result = {'local': [], 'remote': [], 'preloads': []}
+        if not local:
+            return result
+        remote = []
+        local_weights = {}
+        for key, family in requested.items():
+            if key not in local:
+                remote.append(family)
+                continue
+            used = self.usage.get(key, {}).get('weights', set())
+            keep = sorted({match_weight(w, family['weights']) for w in used} - set(self.faces[key]) - {None})
+            if keep:
+                remote.append(dict(family, weights=keep, spec=weight_spec(family['name'], keep)))
+                result['remote'].extend(f"{family['name']} {w}" for w in keep)
+            local_weights[key] = set(self.faces[key]) | set(keep)
+            result['local'].append(family['name'])
+
+        preload_text = {}
+        for (key, weight), count in self.fold_text.items():
+            if key in local_weights:
+                face = match_weight(weight, local_weights[key])
+                if face in self.faces[key]:
+                    preload_text[key, face] = preload_text.get((key, face), 0) + count
+        preloads = sorted(preload_text, key=lambda face: (-preload_text[face], face))[:MAX_PRELOADS]
+
+        markup = []
+        for key, weight in preloads:
+            href = posixpath.relpath(self.faces[key][weight], self.page_dir or '.')
+            markup.append(f'<link rel="preload" href="{href}" as="font" type="font/woff2" crossorigin data-fonts>')
+            result['preloads'].append(f"{requested[key]['name']} {weight}")
+        rules = []
+        for key in local:
+            name = requested[key]['name']
+            quoted = name if _NAME_RE.match(name) else name.replace("'", '')
+            for weight, rel in sorted(self.faces[key].items()):
+                href = posixpath.relpath(rel, self.page_dir or '.')
+                rules.append(f"@font-face{{font-family:'{quoted}';font-style:normal;font-weight:{weight};"
+                             f"font-display:swap;src:url({href}) format('woff2')}}")
+        record = '&'.join('family=' + requested[key]['spec'] for key in local)
+        markup.append(f'<style data-fonts="{html.escape(record)}">\n' + '\n'.join(rules) + '\n</style>')
+        if remote:
+            # Faces still fetched from Google use swap too, so they need not block rendering.
+            url = html.escape(google_fonts_url(remote))
+            markup.append(f'<link href="{url}" rel="stylesheet" media="print" onload="{ASYNC_ONLOAD}" data-fonts>')
+            markup.append(f'<noscript data-fonts><link href="{url}" rel="stylesheet"></noscript>')
+
+        nodes = sorted(self.block + self.links, key=lambda node: node.index)
+        if not remote:
+            nodes = sorted(nodes + self.hints, key=lambda node: node.index)
+        anchor = next(node for node in nodes if node in self.block or node in self.links)
+        indent = doc.text[doc.text.rfind('\n', 0, anchor.start) + 1:anchor.start]
+        new = ('\n' + indent if not indent.strip() else '\n').join(markup)
+        for node in nodes:
+            start, end = doc.element_range(node) or (node.start, node.end)
+            if node is anchor:
+                if doc.text[start:end] != new:
+                    self.replace(start, end, new)
+                continue
+            line_start = doc.text.rfind('\n', 0, start)
+            if not doc.text[line_start + 1:start].strip():
+                start = line_start
+            self.replace(start, end, '')
+        return result
+
+
+class FontVisitors:
+    """Picklable visitor factory for ``engine.run``."""
+
+    def __init__(self, families, fold=FOLD_ELEMENTS, stamp='', faces=None):
+        self.families = families
+        self.fold = fold
+        self.stamp = stamp
+        self.faces = faces
+
+    def __call__(self, path):
+        if self.faces is None:
+            return [FontUsage(self.families, self.fold, self.stamp)]
+        return [FontRewrite(self.faces, self.fold, self.stamp)]
+
+
+# --- Subsetting ---
+
+def subset_font(path, text):
+    """WOFF2 bytes of the font at ``path`` cut down to the glyphs for ``text``."""
+    options = subset.Options()
+    options.flavor = 'woff2'
+    options.layout_features = ['*']
+    options.notdef_outline = True
+    font = TTFont(path)
+    subsetter = subset.Subsetter(options)
+    subsetter.populate(text=text)
+    subsetter.subset(font)
+    buf = io.BytesIO()
+    font.save(buf)
+    return buf.getvalue()
+
+
+def load_subset_cache(path=SUBSET_CACHE_PATH):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def remove_unused(keep, public_dir=document.PUBLIC_DIR):
+    directory = os.path.join(public_dir, OUTPUT_DIR)
+    removed = 0
+    for filename in sorted(os.listdir(directory)) if os.path.isdir(directory) else ():
+        if filename.endswith('.woff2') and posixpath.join(OUTPUT_DIR, filename) not in keep:
+            os.unlink(os.path.join(directory, filename))
+            removed += 1
+    return removed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--fold', type=int, default=FOLD_ELEMENTS,
+                        help='number of leading <body> elements whose fonts are preloaded')
+    parser.add_argument('--dry-run', action='store_true', help='report without writing anything')
+    parser.add_argument('--jobs', type=int, default=None, help='worker processes (default: CPU count)')
+    args = parser.parse_args()
+
+    sources = local_sources()
+    families = frozenset(sources)
+    stamp = styles_stamp()
+    paths = document.page_paths()
+    manifest = Manifest()
+    usage = engine.run(FontVisitors(families, args.fold, stamp), paths, workers=args.jobs,
+                       manifest=manifest, write=False)
+
+    chars = {}
+    failed = False
+    for result in usage.results:
+        if result.status == engine.FAILED:
+            print(f"Error {result.path}: {result.error}")
+            failed = True
+            continue
+        for family, entry in result.results['font_usage'].items():
+            chars.setdefault(family, set()).update(entry['chars'])
+    if failed:
+        raise SystemExit(1)
+
+    cache = load_subset_cache()
+    faces = {}
+    outputs = {}
+    for family in sorted(chars):
+        text = ''.join(sorted(chars[family] | set(BASELINE)))
+        for weight, source in sorted(sources[family].items()):
+            src_path = os.path.join(document.PUBLIC_DIR, source)
+            key = f'{file_hash(src_path)}:{content_hash(text)}:{SUBSET_VERSION}'
+            entry = cache.get(source)
+            if entry and entry['key'] == key and os.path.isfile(os.path.join(document.PUBLIC_DIR, entry['file'])):
+                faces.setdefault(family, {})[weight] = entry['file']
+                continue
+            if subset is None:
+                print(f"Cannot subset {source}: fontTools is not installed (pip install -r site_tools/requirements.txt)")
+                raise SystemExit(1)
+            try:
+                data = subset_font(src_path, text)
+            except Exception as e:
+                print(f"Error {source}: {e}")
+                raise SystemExit(1)
+            stem = posixpath.splitext(posixpath.basename(source))[0]
+            rel = fingerprinted_name(posixpath.join(OUTPUT_DIR, stem + '.woff2'), short_hash(data))
+            entry = {'key': key, 'file': rel, 'glyphs': len(text), 'bytes': len(data),
+                     'source_bytes': os.path.getsize(src_path)}
+            cache[source] = entry
+            outputs[rel] = data
+            faces.setdefault(family, {})[weight] = rel
+            verb = 'Would subset' if args.dry_run else 'Subset'
+            print(f"{verb} {source}: {entry['source_bytes']} -> {entry['bytes']} bytes ({len(text)} characters)")
+
+    if not args.dry_run:
+        os.makedirs(os.path.join(document.PUBLIC_DIR, OUTPUT_DIR), exist_ok=True)
+        for rel, data in sorted(outputs.items()):
+            writer.write_text(os.path.join(document.PUBLIC_DIR, rel), data)
+
+    report = engine.run(FontVisitors(families, args.fold, stamp, faces), paths, workers=args.jobs,
+                        manifest=manifest, write=not args.dry_run)
+    manifest.save()
+    remote = {}
+    for result in report.results:
+        if result.status == engine.FAILED:
+            print(f"Error {result.path}: {result.error}")
+            failed = True
+            continue
+        r = result.results['fonts']
+        for face in r['remote']:
+            remote[face] = remote.get(face, 0) + 1
+        if result.status == engine.UPDATED:
+            notes = ['self-hosted ' + ', '.join(r['local'])]
+            if r['preloads']:
+                notes.append('preload ' + ', '.join(r['preloads']))
+            if r['remote']:
+                notes.append('kept on Google Fonts ' + ', '.join(r['remote']))
+            verb = 'Would update' if args.dry_run else 'Updated'
+            print(f"{verb} {result.path}: " + '; '.join(notes))
+
+    used = {rel for weights in faces.values() for rel in weights.values()}
+    total = sum(cache[source]['bytes'] for family in faces for source in sources[family].values())
+    source_total = sum(cache[source]['source_bytes'] for family in faces for source in sources[family].values())
+    print(f"{len(used)} font subset(s) for {', '.join(sorted(faces)) or 'no families'}: "
+          f"{source_total} -> {total} bytes")
+    for face, count in sorted(remote.items()):
+        family, weight = face.rsplit(' ', 1)
+        print(f"No local source for {face} ({count} page(s)): add "
+              f"{SOURCE_DIR}/{family.lower().replace(' ', '-')}-{weight}.ttf to self-host it")
+    if not args.dry_run and not failed:
+        removed = remove_unused(used)
+        if removed:
+            print(f"Removed {removed} unused subset(s)")
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        writer.write_text(SUBSET_CACHE_PATH, json.dumps(cache, indent=2, sort_keys=True) + '\n')
+    print(report.summary())
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,508 @@
+"""Lazy-loading, script deferral, resource hints and LCP preloads in one pass.
+
+Usage: python3 -m site_tools.hints [--fold N] [--dry-run] [--jobs N] [files ...]
+
+Four rewrites run as visitors over each page:
+
+- ``LoadingHints``: images and iframes past the first ``--fold`` body
+  elements (the same fold as site_tools.critical) get ``loading="lazy"`` and
+  ``decoding="async"``, except inside ``<header>``/``<nav>``. The page's likely LCP image gets
+  ``fetchpriority="high"`` (and loses any ``loading="lazy"``) plus a
+  ``<link rel="preload" as="image">`` in ``<head>``. That image is the widest
+  one in the fold outside header/nav/footer, by its Tailwind width classes.
+- ``DeferScripts``: local js/ scripts loaded as classic blocking scripts get
+  ``defer`` when that is safe. The file must not use ``document.write``, and
+  none of the globals it defines may be used by an inline classic script or
+  another blocking script on the page. Files that are ES modules (top-level
+  ``import``/``export``) cannot run as classic scripts at all, so their tag
+  becomes ``type="module"``. When an import map follows the tag (a module
+  load before it would get the map ignored), the tag is instead dropped if
+  a module script on the page already imports the file.
+- ``ResourceHints``: every third-party origin the page fetches from gets a
+  preconnect (render-blocking origins and font hosts first, at most
+  ``MAX_PRECONNECT`` in all) or a dns-prefetch, unless one exists already.
+
+Existing attributes and hints are never changed or duplicated, so reruns
+are no-ops. Writes go through the engine's transaction and skip unchanged
+pages; results are cached in the page manifest.
+"""
+import argparse
+import functools
+import os
+import posixpath
+import re
+import zlib
+from urllib.parse import urlsplit
+
+from site_tools import document, engine
+from site_tools.budget import PageResources
+from site_tools.critical import FOLD_ELEMENTS
+from site_tools.document import VOID_ELEMENTS, Visitor
+from site_tools.fingerprint import resolve_reference
+from site_tools.images import BREAKPOINTS, resolve_slots, width_classes
+from site_tools.links import LOCAL_HOSTS
+from site_tools.manifest import Manifest
+
+SCRIPTS_DIR = 'js'
+MAX_PRECONNECT = 4
+# Stylesheets on these hosts pull their font files from the second one.
+FONT_ORIGINS = {'https://fonts.googleapis.com': 'https://fonts.gstatic.com'}
+CORS_ORIGINS = ('https://fonts.gstatic.com',)
+# Narrower images are icons and logos, not LCP candidates.
+LCP_MIN_WIDTH = 160
+LCP_VIEWPORT = BREAKPOINTS['xl']
+CHROME_ELEMENTS = ('header', 'nav', 'footer')
+# Site chrome drawn at the top of every page; never lazy-loaded.
+TOP_CHROME = ('header', 'nav')
+HINT_RELS = ('preconnect', 'dns-prefetch')
+JS_TYPES = ('', 'text/javascript', 'application/javascript')
+
+_MODULE_RE = re.compile(r'^\s*(?:import\s*[\w{*\'"]|export\s)', re.M)
+_GLOBAL_RES = (
+    re.compile(r'\bwindow\.([A-Za-z_$][\w$]*)\s*=(?!=)'),
+    re.compile(r'^(?:async\s+)?function\s*\*?\s*([A-Za-z_$][\w$]*)', re.M),
+    re.compile(r'^class\s+([A-Za-z_$][\w$]*)', re.M),
+    re.compile(r'^(?:var|let|const)\s+([A-Za-z_$][\w$]*)', re.M),
+)
+
+
+def _insert_attr(doc, node, text):
+    """Zero-width edit adding `` text`` just before the end of a start tag."""
+    end = node.end - (2 if doc.text[node.end - 2:node.end] == '/>' else 1)
+    while end > node.start and doc.text[end - 1].isspace():
+        end -= 1
+    return end, end, ' ' + text
+
+
+def _line_indent(doc, pos):
+    line_start = doc.text.rfind('\n', 0, pos) + 1
+    prefix = doc.text[line_start:pos]
+    return prefix if not prefix.strip() else ''
+
+
+class HeadAnchor:
+    """Where new ``<head>`` tags go: after the last hint/preload, else before the first fetch."""
+
+    def __init__(self):
+        self.after = None
+        self.before = None
+        self.head_end = None
+
+    def start_tag(self, doc, node, in_head):
+        if not in_head:
+            return
+        rels = node.get('rel', '').lower().split()
+        if node.name == 'link' and any(r in HINT_RELS or r == 'preload' for r in rels):
+            self.after = node
+        elif self.before is None and (node.name in ('script', 'style')
+                                      or (node.name == 'link' and 'stylesheet' in rels)):
+            self.before = node
+
+    def insert(self, doc, markup):
+        if self.after is not None:
+            return self.after.end, self.after.end, '\n' + _line_indent(doc, self.after.start) + markup
+        node = self.before or self.head_end
+        if node is None:
+            return None
+        indent = _line_indent(doc, node.start)
+        return node.start, node.start, markup + ('\n' + indent if indent else '')
+
+
+def _desktop_width(slots):
+    width = None
+    for bp, unit, value in slots:
+        if bp <= LCP_VIEWPORT:
+            width = value if unit == 'px' else (value or LCP_VIEWPORT)
+    return width or 0
+
+
+class LoadingHints(Visitor):
+    """Lazy-loads media past the fold and prioritizes the LCP image."""
+
+    name = 'loading'
+
+    def __init__(self, fold=FOLD_ELEMENTS):
+        self.fold = fold
+
+    def cache_key(self):
+        return f'{super().cache_key()}:{self.fold}'
+
+    def begin(self, doc):
+        self.count = 0
+        self.in_head = False
+        self.in_body = False
+        self.chrome = 0
+        self.stack = []
+        self.picture = None
+        self.picture_source = None
+        self.images = []
+        self.iframes = []
+        self.preloads = set()
+        self.anchor = HeadAnchor()
+
+    def start_tag(self, doc, node):
+        name = node.name
+        if name == 'head':
+            self.in_head = True
+        elif name == 'body':
+            self.in_head, self.in_body = False, True
+        self.anchor.start_tag(doc, node, self.in_head)
+        if name == 'link' and 'preload' in node.get('rel', '').lower().split():
+            self.preloads.add(node.get('href', ''))
+            self.preloads.add(node.get('imagesrcset', ''))
+        if not self.in_body:
+            return
+        in_fold = self.count < self.fold
+        self.count += 1
+        if name == 'img':
+            slots = resolve_slots(width_classes(node.get('class', '')), [e[1] for e in self.stack])
+            top = any(e[0] in TOP_CHROME for e in self.stack)
+            self.images.append((node, in_fold or top, bool(self.chrome), _desktop_width(slots),
+                                self.picture_source if self.picture is not None else None))
+        elif name == 'iframe':
+            self.iframes.append((node, in_fold))
+        elif name == 'source' and self.picture is not None and self.picture_source is None:
+            self.picture_source = node
+        if name not in VOID_ELEMENTS:
+            self.stack.append((name, width_classes(node.get('class', ''))))
+            if name in CHROME_ELEMENTS:
+                self.chrome += 1
+            elif name == 'picture':
+                self.picture, self.picture_source = node, None
+
+    def end_tag(self, doc, node):
+        if node.name == 'head':
+            self.in_head = False
+            self.anchor.head_end = node
+        for i in range(len(self.stack) - 1, -1, -1):
+            if self.stack[i][0] == node.name:
+                for name, _ in self.stack[i:]:
+                    if name in CHROME_ELEMENTS:
+                        self.chrome -= 1
+                del self.stack[i:]
+                break
+        if node.name == 'picture':
+            self.picture = None
+
+    def lcp(self):
+        best = None
+        for entry in self.images:
+            node, in_fold, chrome, width, _ = entry
+            if in_fold and not chrome and width >= LCP_MIN_WIDTH and (best is None or width > best[3]):
+                best = entry
+        return best
+
+    def preload_markup(self, node, source):
+        attrs = ['rel="preload"', 'as="image"']
+        if source is not None and source.get('srcset'):
+            attrs.append(f'href="{node.get("src", "")}"')
+            attrs.append(f'imagesrcset="{source.get("srcset")}"')
+            if source.get('sizes'):
+                attrs.append(f'imagesizes="{source.get("sizes")}"')
+            if source.get('type'):
+                attrs.append(f'type="{source.get("type")}"')
+            key = source.get('srcset')
+        else:
+            attrs.append(f'href="{node.get("src", "")}"')
+            if node.get('srcset'):
+                attrs.append(f'imagesrcset="{node.get("srcset")}"')
+                if node.get('sizes'):
+                    attrs.append(f'imagesizes="{node.get("sizes")}"')
+            key = node.get('srcset') or node.get('src', '')
+        if key in self.preloads or node.get('src', '') in self.preloads:
+            return None
+        attrs.append('fetchpriority="high"')
+        return '<link ' + ' '.join(attrs) + '>'
+
+    def finish(self, doc):
+        lazy = 0
+        lcp = self.lcp()
+        for node, in_fold, _, _, _ in self.images:
+            if lcp is not None and node is lcp[0]:
+                continue
+            if not in_fold:
+                added = False
+                if node.attr('loading') is None:
+                    self.replace(*_insert_attr(doc, node, 'loading="lazy"'))
+                    added = True
+                if node.attr('decoding') is None:
+                    self.replace(*_insert_attr(doc, node, 'decoding="async"'))
+                    added = True
+                lazy += added
+        for node, in_fold in self.iframes:
+            if not in_fold and node.attr('loading') is None:
+                self.replace(*_insert_attr(doc, node, 'loading="lazy"'))
+                lazy += 1
+
+        result = {'lazy': lazy, 'lcp': None, 'preloaded': False}
+        if lcp is None:
+            return result
+        node, _, _, _, source = lcp
+        result['lcp'] = node.get('src')
+        loading = node.attr('loading')
+        if loading is not None and loading.value.lower() == 'lazy' and loading.raw is not None:
+            self.replace(loading.value_start, loading.value_end, 'eager')
+        if node.attr('fetchpriority') is None:
+            self.replace(*_insert_attr(doc, node, 'fetchpriority="high"'))
+        markup = self.preload_markup(node, source) if node.get('src') else None
+        if markup is not None:
+            edit = self.anchor.insert(doc, markup)
+            if edit is not None:
+                self.replace(*edit)
+                result['preloaded'] = True
+        return result
+
+
+@functools.lru_cache(maxsize=None)
+def _script_info(path, mtime_ns, size):
+    """``(is_module, uses_document_write, globals)`` for a script file."""
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    names = set()
+    for pattern in _GLOBAL_RES:
+        names.update(pattern.findall(text))
+    return bool(_MODULE_RE.search(text)), 'document.write' in text, frozenset(names)
+
+
+def script_info(path):
+    st = os.stat(path)
+    return _script_info(os.path.abspath(path), st.st_mtime_ns, st.st_size)
+
+
+def scripts_stamp(public_dir=document.PUBLIC_DIR):
+    """Cheap digest of js/ so cached decisions are redone when a script changes."""
+    directory = os.path.join(public_dir, SCRIPTS_DIR)
+    entries = []
+    if os.path.isdir(directory):
+        for name in sorted(os.listdir(directory)):
+            st = os.stat(os.path.join(directory, name))
+            entries.append((name, st.st_mtime_ns, st.st_size))
+    return format(zlib.crc32(repr(entries).encode('utf-8')), '08x')
+
+
+class DeferScripts(Visitor):
+    """Defers blocking js/ scripts whose globals nothing synchronous depends on."""
+
+    name = 'defer'
+    version = 1
+
+    def __init__(self, stamp=''):
+        self.stamp = stamp
+
+    def cache_key(self):
+        return f'{super().cache_key()}:{self.stamp}'
+
+    def begin(self, doc):
+        rel = os.path.relpath(doc.path, document.PUBLIC_DIR).replace(os.sep, '/')
+        self.page_dir = os.path.dirname(rel)
+        self.blocking = []
+        self.inline = []
+        self.modules = []
+        self.importmaps = []
+        self.in_inline = None
+
+    def text(self, doc, node):
+        if self.in_inline is not None:
+            self.in_inline.append(doc.source(node))
+
+    def end_tag(self, doc, node):
+        self.in_inline = None
+
+    def start_tag(self, doc, node):
+        self.in_inline = None
+        if node.name != 'script':
+            return
+        kind = node.get('type', '').strip().lower()
+        if kind == 'importmap':
+            self.importmaps.append(node.start)
+        elif kind == 'module' and node.get('src') is None:
+            self.in_inline = self.modules
+        if kind not in JS_TYPES:
+            return
+        if node.get('src') is None:
+            self.in_inline = self.inline
+            return
+        if node.attr('async') is not None or node.attr('defer') is not None:
+            return
+        ref = resolve_reference(node.get('src'), self.page_dir)
+        path = os.path.join(document.PUBLIC_DIR, ref[1]) if ref else None
+        if path is not None and os.path.isfile(path):
+            self.blocking.append((node, ref[1], path))
+
+    def finish(self, doc):
+        deferred = []
+        modules = []
+        removed = []
+        infos = {rel: script_info(path) for _, rel, path in self.blocking}
+        for node, rel, path in self.blocking:
+            is_module, writes, names = infos[rel]
+            if is_module:
+                if any(pos > node.start for pos in self.importmaps):
+                    # A module load before the import map would make older
+                    # browsers ignore the map; the classic tag cannot run
+                    # anyway, so it is only dropped when a module script on
+                    # the page already imports the file.
+                    name = posixpath.basename(rel)
+                    span = doc.element_range(node)
+                    if span and any(re.search(r'''['"][^'"]*\b%s['"]''' % re.escape(name), text)
+                                    for text in self.modules):
+                        start = doc.text.rfind('\n', 0, span[0])
+                        if doc.text[start + 1:span[0]].strip():
+                            start = span[0]
+                        self.replace(start, span[1], '')
+                        removed.append(rel)
+                    continue
+                type_attr = node.attr('type')
+                if type_attr is not None and type_attr.raw is not None:
+                    self.replace(type_attr.value_start, type_attr.value_end, 'module')
+                else:
+                    self.replace(*_insert_attr(doc, node, 'type="module"'))
+                modules.append(rel)
+                continue
+            if not rel.startswith(SCRIPTS_DIR + '/') or writes:
+                continue
+            others = self.inline + [open(p, encoding='utf-8').read() for _, r, p in self.blocking
+                                    if r != rel and not infos[r][0]]
+            if names and any(re.search(r'(?<![\w$.])(?:%s)(?![\w$])' % '|'.join(map(re.escape, names)), text)
+                             for text in others):
+                continue
+            self.replace(*_insert_attr(doc, node, 'defer'))
+            deferred.append(rel)
+        return {'deferred': deferred, 'modules': modules, 'removed': removed}
+
+
+class ResourceHints(PageResources):
+    """Adds preconnect/dns-prefetch for third-party origins the page fetches from."""
+
+    name = 'hints'
+
+    def __init__(self, max_preconnect=MAX_PRECONNECT):
+        self.max_preconnect = max_preconnect
+
+    def cache_key(self):
+        return f'{super().cache_key()}:{self.max_preconnect}'
+
+    def begin(self, doc):
+        super().begin(doc)
+        self.hinted = {}
+        self.anchor = HeadAnchor()
+
+    def start_tag(self, doc, node):
+        super().start_tag(doc, node)
+        self.anchor.start_tag(doc, node, self.in_head)
+        if node.name != 'link':
+            return
+        rels = node.get('rel', '').lower().split()
+        for rel in HINT_RELS:
+            if rel in rels:
+                origin = origin_of(node.get('href', ''))
+                if origin:
+                    self.hinted[origin] = max(self.hinted.get(origin, ''), rel)
+
+    def end_tag(self, doc, node):
+        super().end_tag(doc, node)
+        if node.name == 'head':
+            self.anchor.head_end = node
+
+    def finish(self, doc):
+        origins = {}
+        for res in self.resources:
+            origin = origin_of(res['url'])
+            if origin is None:
+                continue
+            important = res['blocking'] or res['type'] == 'font'
+            origins[origin] = origins.get(origin, False) or important
+            if origin in FONT_ORIGINS:
+                origins[FONT_ORIGINS[origin]] = origins.get(FONT_ORIGINS[origin], False) or res['blocking']
+        preconnects = sum(1 for rel in self.hinted.values() if rel == 'preconnect')
+        ordered = sorted(origins, key=lambda o: not origins[o])
+        markup = []
+        added = []
+        for origin in ordered:
+            if origin in self.hinted:
+                continue
+            if origins[origin] and preconnects < self.max_preconnect:
+                cors = ' crossorigin' if origin in CORS_ORIGINS else ''
+                markup.append(f'<link rel="preconnect" href="{origin}"{cors}>')
+                preconnects += 1
+            else:
+                markup.append(f'<link rel="dns-prefetch" href="{origin}">')
+            added.append(origin)
+        if markup:
+            indent = '\n' + _line_indent(doc, (self.anchor.after or self.anchor.before or
+                                               self.anchor.head_end or doc.nodes[0]).start)
+            edit = self.anchor.insert(doc, indent.join(markup))
+            if edit is not None:
+                self.replace(*edit)
+            else:
+                added = []
+        unused = sorted(o for o in self.hinted if o not in origins)
+        return {'added': added, 'unused': unused}
+
+
+def origin_of(url):
+    """``scheme://host`` of a third-party URL, or None for local/relative ones."""
+    url = url.strip()
+    if url.startswith('//'):
+        url = 'https:' + url
+    parts = urlsplit(url)
+    if parts.scheme not in ('http', 'https') or not parts.netloc or parts.hostname in LOCAL_HOSTS:
+        return None
+    return f'{parts.scheme}://{parts.netloc.lower()}'
+
+
+class HintVisitors:
+    """Picklable visitor factory for ``engine.run``."""
+
+    def __init__(self, fold=FOLD_ELEMENTS, stamp=''):
+        self.fold = fold
+        self.stamp = stamp
+
+    def __call__(self, path):
+        return [LoadingHints(self.fold), DeferScripts(self.stamp), ResourceHints()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('files', nargs='*', help='pages to process (default: public/*.html)')
+    parser.add_argument('--fold', type=int, default=FOLD_ELEMENTS,
+                        help='number of leading <body> elements treated as above the fold')
+    parser.add_argument('--dry-run', action='store_true', help='report without writing anything')
+    parser.add_argument('--jobs', type=int, default=None, help='worker processes (default: CPU count)')
+    args = parser.parse_args()
+
+    manifest = Manifest()
+    paths = args.files or document.page_paths()
+    report = engine.run(HintVisitors(args.fold, scripts_stamp()), paths, workers=args.jobs,
+                        manifest=manifest, write=not args.dry_run)
+    manifest.save()
+    for result in report.results:
+        if result.status == engine.FAILED:
+            print(f"Error {result.path}: {result.error}")
+            continue
+        if result.cached:
+            continue
+        r = result.results
+        notes = []
+        if r['loading']['lazy']:
+            notes.append(f"{r['loading']['lazy']} lazy")
+        if r['loading']['preloaded']:
+            notes.append(f"LCP preload {r['loading']['lcp']}")
+        if r['defer']['deferred']:
+            notes.append('defer ' + ', '.join(r['defer']['deferred']))
+        if r['defer']['modules']:
+            notes.append('type=module ' + ', '.join(r['defer']['modules']))
+        if r['defer']['removed']:
+            notes.append('dropped classic tag for module ' + ', '.join(r['defer']['removed']))
+        if r['hints']['added']:
+            notes.append('hints ' + ', '.join(o.split('//', 1)[1] for o in r['hints']['added']))
+        if r['hints']['unused']:
+            notes.append('unused hints ' + ', '.join(o.split('//', 1)[1] for o in r['hints']['unused']))
+        if notes:
+            verb = 'Would update' if args.dry_run and result.edits else ('Updated' if result.edits else 'Checked')
+            print(f"{verb} {result.path}: {'; '.join(notes)}")
+    print(report.summary() if not args.dry_run else f"Dry run: {len(report.by_status(engine.UPDATED))} page(s) would change")
+
+
+if __name__ == "__main__":
+    main()
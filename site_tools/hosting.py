@@ -0,0 +1,210 @@
+"""firebase.json hosting rules: clean URLs, redirects, rewrites, headers, ignores.
+
+Mirrors how Firebase Hosting answers a request closely enough for the local
+tools (link checker, preview server) to agree with production: redirects
+first, then static files (with ``cleanUrls`` and directory ``index.html``),
+then rewrites. Source patterns support Firebase's globs (``*``, ``**``,
+``{a,b}``, ``@(a|b)``), ``:param`` / ``:param*`` segments and ``regex`` keys.
+"""
+import functools
+import json
+import os
+import posixpath
+import re
+
+from site_tools.manifest import ROOT
+
+FIREBASE_JSON = os.path.join(ROOT, 'firebase.json')
+DEFAULT_TARGET = 'main'
+
+_PARAM_RE = re.compile(r':([A-Za-z][A-Za-z0-9]*)(\*?)')
+
+
+def _closing(pattern, pos, opener, closer):
+    depth = 0
+    for i in range(pos, len(pattern)):
+        if pattern[i] == opener:
+            depth += 1
+        elif pattern[i] == closer:
+            depth -= 1
+            if depth == 0:
+                return i
+    return -1
+
+
+def _split_top(text, sep):
+    parts = []
+    depth = 0
+    start = 0
+    for i, ch in enumerate(text):
+        if ch in '({':
+            depth += 1
+        elif ch in ')}':
+            depth -= 1
+        elif ch == sep and depth == 0:
+            parts.append(text[start:i])
+            start = i + 1
+    parts.append(text[start:])
+    return parts
+
+
+def _translate(pattern, params):
+    out = []
+    i = 0
+    while i < len(pattern):
+        ch = pattern[i]
+        if pattern.startswith('**/', i):
+            out.append('(?:.*/)?')
+            i += 3
+        elif pattern.startswith('**', i):
+            out.append('.*')
+            i += 2
+        elif ch == '*':
+            out.append('[^/]*')
+            i += 1
+        elif ch == '?':
+            out.append('[^/]')
+            i += 1
+        elif ch in '@+!' and pattern[i + 1:i + 2] == '(':
+            end = _closing(pattern, i + 1, '(', ')')
+            if end == -1:
+                out.append(re.escape(ch))
+                i += 1
+                continue
+            alts = '|'.join(_translate(p, params) for p in _split_top(pattern[i + 2:end], '|'))
+            out.append(f'(?:{alts})' + ('+' if ch == '+' else ''))
+            i = end + 1
+        elif ch == '{':
+            end = _closing(pattern, i, '{', '}')
+            if end == -1:
+                out.append(re.escape(ch))
+                i += 1
+                continue
+            alts = '|'.join(_translate(p, params) for p in _split_top(pattern[i + 1:end], ','))
+            out.append(f'(?:{alts})')
+            i = end + 1
+        elif ch == ':' and params and _PARAM_RE.match(pattern, i):
+            m = _PARAM_RE.match(pattern, i)
+            out.append(f'(?P<{m.group(1)}>.+)' if m.group(2) else f'(?P<{m.group(1)}>[^/]+?)')
+            i = m.end()
+        else:
+            out.append(re.escape(ch))
+            i += 1
+    return ''.join(out)
+
+
+@functools.lru_cache(maxsize=None)
+def compile_source(source, params=True):
+    """Compile a Firebase ``source`` glob into a regex matched against the URL path."""
+    return re.compile(_translate(source, params) + r'\Z')
+
+
+def _matches(rule, path):
+    if 'regex' in rule:
+        return re.match(rule['regex'], path)
+    return compile_source(rule['source']).match(path)
+
+
+class Hosting:
+    """One ``hosting`` entry of firebase.json."""
+
+    def __init__(self, config, root=ROOT):
+        self.config = config
+        self.public_dir = os.path.join(root, config.get('public', 'public'))
+        self.clean_urls = bool(config.get('cleanUrls'))
+        self.trailing_slash = config.get('trailingSlash')
+        self.redirects = config.get('redirects', [])
+        self.rewrites = config.get('rewrites', [])
+        self.header_rules = config.get('headers', [])
+        self.ignore_patterns = config.get('ignore', [])
+
+    @classmethod
+    def load(cls, path=FIREBASE_JSON, target=DEFAULT_TARGET):
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        entries = data.get('hosting', [])
+        if isinstance(entries, dict):
+            entries = [entries]
+        for entry in entries:
+            if entry.get('target', DEFAULT_TARGET) == target:
+                return cls(entry, os.path.dirname(os.path.abspath(path)))
+        if entries:
+            return cls(entries[0], os.path.dirname(os.path.abspath(path)))
+        raise ValueError(f'no hosting config in {path}')
+
+    def redirect(self, path):
+        """``(status, location)`` for the first matching redirect, or None."""
+        for rule in self.redirects:
+            m = _matches(rule, path)
+            if m is None:
+                continue
+            location = rule['destination']
+            for name, value in m.groupdict().items():
+                if value is not None:
+                    location = re.sub(r':%s\*?(?![A-Za-z0-9])' % name, lambda _: value, location)
+            return rule.get('type', 301), location
+        return None
+
+    def rewrite(self, path):
+        """The first matching rewrite rule, or None."""
+        for rule in self.rewrites:
+            if _matches(rule, path):
+                return rule
+        return None
+
+    def resolve(self, path, is_file, is_dir):
+        """One hosting step for a URL path, in Firebase's order of precedence.
+
+        ``is_file``/``is_dir`` answer for public-relative paths. Returns
+        ``('redirect', (status, location))``, ``('file', rel)``,
+        ``('function', name)`` or ``('missing', reason)``.
+        """
+        redirect = self.redirect(path)
+        if redirect is not None:
+            return 'redirect', redirect
+        rel = path.lstrip('/')
+        if rel and is_file(rel):
+            return 'file', rel
+        base = rel.rstrip('/')
+        if is_dir(base):
+            index = posixpath.join(base, 'index.html')
+            if is_file(index):
+                return 'file', index
+        if self.clean_urls and rel and is_file(rel + '.html'):
+            return 'file', rel + '.html'
+        rule = self.rewrite(path)
+        if rule is not None:
+            if 'function' in rule or 'run' in rule:
+                function = rule.get('function')
+                if isinstance(function, dict):
+                    function = function.get('functionId')
+                return 'function', function or rule['run'].get('serviceId')
+            destination = rule.get('destination', '').lstrip('/')
+            if is_file(destination):
+                return 'file', destination
+            return 'missing', f'rewrite target {rule.get("destination")} missing'
+        return 'missing', 'not found'
+
+    def headers(self, path):
+        """Headers for ``path``; later rules override earlier ones for the same key."""
+        found = {}
+        for rule in self.header_rules:
+            if _matches(rule, path):
+                for header in rule.get('headers', []):
+                    found[header['key'].lower()] = (header['key'], header['value'])
+        return list(found.values())
+
+    def ignored(self, rel):
+        """True if the public-relative path is excluded from deploys by ``ignore``."""
+        ignored = False
+        for pattern in self.ignore_patterns:
+            negate = pattern.startswith('!')
+            regex = compile_source(pattern.lstrip('!'), params=False)
+            if regex.match(rel) or any(regex.match(rel[:i]) for i in _dir_prefixes(rel)):
+                ignored = not negate
+        return ignored
+
+
+def _dir_prefixes(rel):
+    """End offsets of each parent directory of ``rel`` (ignoring a directory ignores its files)."""
+    return [i for i, ch in enumerate(rel) if ch == '/']
@@ -0,0 +1,473 @@
+"""Responsive WebP/AVIF variants for the images the pages actually render.
+
+Usage: python3 -m site_tools.images [--dry-run] [--jobs N]
+
+Every local ``<img>`` is traced back to its source image (``images/x.png``,
+or the original behind an ``images/optimized/x-64w.webp`` reference). Its
+rendered width is worked out from the Tailwind width classes on the image
+and its ancestors (``w-10``, ``md:w-32``, ``w-full`` inside a ``w-10`` box,
+``max-w-4xl`` caps ...), and the source is resized to exactly those widths
+at 1x and 2x and encoded as AVIF (when Pillow supports it), WebP and a
+PNG/JPEG fallback in public/images/optimized. The ``<img>`` is then wrapped
+in a ``<picture>`` with matching ``srcset``/``sizes``.
+
+Encoded variants are cached in .cache/image-manifest.json by source hash, so
+a rerun only hashes the sources. Pillow is only needed when something has to
+be (re-)encoded: ``pip install Pillow`` (plus ``pillow-avif-plugin`` on
+Pillow versions without built-in AVIF).
+"""
+import argparse
+import io
+import json
+import os
+import posixpath
+import re
+import zlib
+
+from site_tools import document, engine, writer
+from site_tools.document import VOID_ELEMENTS, Visitor
+from site_tools.fingerprint import resolve_reference
+from site_tools.manifest import CACHE_DIR, Manifest, file_hash
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+else:
+    try:
+        import pillow_avif  # noqa: F401  registers AVIF on older Pillow
+    except ImportError:
+        pass
+
+IMAGE_MANIFEST_PATH = os.path.join(CACHE_DIR, 'image-manifest.json')
+OPTIMIZED_DIR = 'images/optimized'
+SOURCE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+# (extension, MIME type, Pillow format, save options), best first.
+MODERN_FORMATS = (
+    ('avif', 'image/avif', 'AVIF', {'quality': 55}),
+    ('webp', 'image/webp', 'WEBP', {'quality': 80, 'method': 6}),
+)
+FALLBACK_PNG = ('png', 'PNG', {'optimize': True})
+FALLBACK_JPEG = ('jpg', 'JPEG', {'quality': 82, 'optimize': True, 'progressive': True})
+
+# Tailwind defaults: spacing unit, breakpoints and max-width scale.
+SPACING_PX = 4
+BREAKPOINTS = {'sm': 640, 'md': 768, 'lg': 1024, 'xl': 1280, '2xl': 1536}
+MAX_WIDTHS = {
+    'xs': 320, 'sm': 384, 'md': 448, 'lg': 512, 'xl': 576, '2xl': 672, '3xl': 768,
+    '4xl': 896, '5xl': 1024, '6xl': 1152, '7xl': 1280, 'screen-sm': 640,
+    'screen-md': 768, 'screen-lg': 1024, 'screen-xl': 1280, 'screen-2xl': 1536,
+}
+# Candidate widths for images that scale with the viewport.
+WIDTH_STEPS = (320, 640, 960, 1280, 1600)
+MAX_WIDTH = 1920
+
+FULL = 'full'
+_VARIANT_RE = re.compile(r'^(?P<stem>.+?)(?:-\d+w)?\.[a-z0-9]+$')
+_ARBITRARY_RE = re.compile(r'^\[(?P<num>\d+(?:\.\d+)?)(?P<unit>px|rem)\]$')
+
+
+def _length(value):
+    """Tailwind width value -> px, FULL, or None when it cannot be known."""
+    if value == 'px':
+        return 1
+    if value in ('full', 'screen') or '/' in value:
+        return FULL
+    m = _ARBITRARY_RE.match(value)
+    if m:
+        num = float(m.group('num'))
+        return round(num * 16 if m.group('unit') == 'rem' else num)
+    try:
+        return round(float(value) * SPACING_PX)
+    except ValueError:
+        return None
+
+
+def width_classes(cls):
+    """``(widths, max_widths)`` keyed by min-width breakpoint (0 = base)."""
+    widths = {}
+    max_widths = {}
+    for token in cls.split():
+        *variants, utility = token.split(':')
+        if len(variants) > 1 or (variants and variants[0] not in BREAKPOINTS):
+            continue
+        bp = BREAKPOINTS[variants[0]] if variants else 0
+        if utility.startswith('w-'):
+            value = _length(utility[2:])
+            if value is not None:
+                widths[bp] = value
+        elif utility.startswith('max-w-'):
+            value = MAX_WIDTHS.get(utility[6:]) or _length(utility[6:])
+            if isinstance(value, int):
+                max_widths[bp] = value
+    return widths, max_widths
+
+
+def _at(spec, bp):
+    best = None
+    for key in sorted(spec):
+        if key <= bp:
+            best = spec[key]
+    return best
+
+
+def resolve_slots(img_spec, ancestors):
+    """Rendered width per breakpoint: ``[min_bp, 'px', width]`` or ``[min_bp, 'vw', cap]``."""
+    breakpoints = {0}
+    for widths, max_widths in (img_spec,) + tuple(ancestors):
+        breakpoints.update(widths, max_widths)
+    slots = []
+    for bp in sorted(breakpoints):
+        cap = None
+        value = _at(img_spec[0], bp)
+        if isinstance(value, int):
+            slot = [bp, 'px', value]
+        else:
+            slot = None
+            for widths, max_widths in reversed(ancestors):
+                limit = _at(max_widths, bp)
+                if limit is not None:
+                    cap = limit if cap is None else min(cap, limit)
+                width = _at(widths, bp)
+                if isinstance(width, int):
+                    slot = [bp, 'px', width if cap is None else min(width, cap)]
+                    break
+            if slot is None:
+                slot = [bp, 'vw', cap]
+        if not slots or slots[-1][1:] != slot[1:]:
+            slots.append(slot)
+    return slots
+
+
+def variant_widths(slots, intrinsic_width):
+    widths = set()
+    for _, unit, value in slots:
+        if unit == 'px':
+            widths.update((value, value * 2))
+        else:
+            limit = min(value * 2, MAX_WIDTH) if value else MAX_WIDTH
+            widths.update(w for w in WIDTH_STEPS if w < limit)
+            widths.add(limit)
+    return sorted({min(w, intrinsic_width) for w in widths})
+
+
+def sizes_attr(slots):
+    parts = []
+    for bp, unit, value in reversed(slots):
+        if unit == 'px':
+            length = f'{value}px'
+        else:
+            length = f'min(100vw, {value}px)' if value else '100vw'
+        parts.append(f'(min-width: {bp}px) {length}' if bp else length)
+    return ', '.join(parts)
+
+
+def variant_name(source_rel, width, ext):
+    stem = posixpath.splitext(posixpath.basename(source_rel))[0]
+    return posixpath.join(OPTIMIZED_DIR, f'{stem}-{width}w.{ext}')
+
+
+def source_for(rel, variants=None, public_dir=document.PUBLIC_DIR):
+    """Public-relative source image behind an ``<img src>`` path, or None.
+
+    ``variants`` maps previously encoded files back to their source, for
+    sources that do not live in public/images.
+    """
+    if variants and rel in variants:
+        return variants[rel]
+    if rel.startswith(OPTIMIZED_DIR + '/'):
+        m = _VARIANT_RE.match(posixpath.basename(rel))
+        if not m:
+            return None
+        for ext in SOURCE_EXTENSIONS:
+            candidate = posixpath.join(posixpath.dirname(OPTIMIZED_DIR), m.group('stem') + ext)
+            if os.path.isfile(os.path.join(public_dir, candidate)):
+                return candidate
+        return None
+    if rel.lower().endswith(SOURCE_EXTENSIONS) and os.path.isfile(os.path.join(public_dir, rel)):
+        return rel
+    return None
+
+
+class _ImageVisitor(Visitor):
+    """Tracks ancestor width classes and hands every local ``<img>`` to ``image()``."""
+
+    variants = None
+
+    def begin(self, doc):
+        rel = os.path.relpath(doc.path, document.PUBLIC_DIR).replace(os.sep, '/')
+        self.page_dir = posixpath.dirname(rel)
+        self.stack = []
+        self.picture = None
+
+    def start_tag(self, doc, node):
+        if node.name == 'img':
+            ref = resolve_reference(node.get('src', ''), self.page_dir)
+            source = source_for(ref[1], self.variants) if ref else None
+            if source is not None:
+                spec = width_classes(node.get('class', ''))
+                ancestors = [entry[1] for entry in self.stack]
+                self.image(doc, node, ref[0], source, resolve_slots(spec, ancestors))
+        elif node.name not in VOID_ELEMENTS:
+            self.stack.append((node.name, width_classes(node.get('class', ''))))
+            if node.name == 'picture':
+                self.picture = node
+
+    def end_tag(self, doc, node):
+        for i in range(len(self.stack) - 1, -1, -1):
+            if self.stack[i][0] == node.name:
+                del self.stack[i:]
+                break
+        if node.name == 'picture':
+            self.picture = None
+
+    def image(self, doc, node, prefix, source, slots):
+        pass
+
+
+class ImageUsage(_ImageVisitor):
+    """Collects ``[source, slots]`` for every optimizable image on a page."""
+
+    name = 'image_usage'
+
+    def __init__(self, variants=None):
+        self.variants = variants
+
+    def cache_key(self):
+        digest = zlib.crc32(json.dumps(self.variants, sort_keys=True).encode('utf-8'))
+        return f'{super().cache_key()}:{digest:08x}'
+
+    def begin(self, doc):
+        super().begin(doc)
+        self.found = []
+
+    def image(self, doc, node, prefix, source, slots):
+        self.found.append([source, slots])
+
+    def finish(self, doc):
+        return self.found
+
+
+def _attr_end(text, attr):
+    if attr.raw is None:
+        return attr.start + len(attr.name)
+    if attr.value_start > 0 and text[attr.value_start - 1] in '"\'':
+        return attr.value_end + 1
+    return attr.value_end
+
+
+def _srcset(prefix, source, widths, ext, slots):
+    if len(slots) == 1 and slots[0][1] == 'px':
+        base = slots[0][2]
+        return ', '.join(f'{prefix}{variant_name(source, w, ext)} {w / base:g}x' for w in widths), None
+    return ', '.join(f'{prefix}{variant_name(source, w, ext)} {w}w' for w in widths), sizes_attr(slots)
+
+
+def picture_markup(doc, node, prefix, source, slots, info):
+    """``<picture>`` with one ``<source>`` per modern format around a rebuilt ``<img>``."""
+    widths = variant_widths(slots, info['size'][0])
+    parts = ['<picture>']
+    sizes = None
+    for ext in info['formats']:
+        srcset, sizes = _srcset(prefix, source, widths, ext, slots)
+        mime = next(m for e, m, _, _ in MODERN_FORMATS if e == ext)
+        sizes_html = f' sizes="{sizes}"' if sizes else ''
+        parts.append(f'<source type="{mime}" srcset="{srcset}"{sizes_html}>')
+    fallback = info['fallback']
+    srcset, sizes = _srcset(prefix, source, widths, fallback, slots)
+    img = ['<img']
+    for attr in node.attrs:
+        if attr.name in ('srcset', 'sizes'):
+            continue
+        if attr.name == 'src':
+            img.append(f'src="{prefix}{variant_name(source, widths[-1], fallback)}"')
+            img.append(f'srcset="{srcset}"')
+            if sizes:
+                img.append(f'sizes="{sizes}"')
+        else:
+            img.append(doc.text[attr.start:_attr_end(doc.text, attr)])
+    parts.append(' '.join(img) + '>')
+    parts.append('</picture>')
+    return ''.join(parts)
+
+
+class PictureRewrite(_ImageVisitor):
+    """Wraps optimizable ``<img>`` tags in ``<picture>`` (or refreshes an existing one)."""
+
+    name = 'images'
+
+    def __init__(self, images, variants=None):
+        self.images = images
+        self.variants = variants
+
+    def cache_key(self):
+        digest = zlib.crc32(json.dumps([self.images, self.variants], sort_keys=True).encode('utf-8'))
+        return f'{super().cache_key()}:{digest:08x}'
+
+    def begin(self, doc):
+        super().begin(doc)
+        self.rewritten = 0
+
+    def image(self, doc, node, prefix, source, slots):
+        info = self.images.get(source)
+        if info is None:
+            return
+        span = doc.element_range(self.picture) if self.picture is not None else None
+        if span is None:
+            span = (node.start, node.end)
+        new = picture_markup(doc, node, prefix, source, slots, info)
+        if doc.text[span[0]:span[1]] != new:
+            self.replace(span[0], span[1], new)
+            self.rewritten += 1
+
+    def finish(self, doc):
+        return {'rewritten': self.rewritten}
+
+
+class ImageVisitors:
+    """Picklable visitor factory for ``engine.run``."""
+
+    def __init__(self, variants, images=None):
+        self.variants = variants
+        self.images = images
+
+    def __call__(self, path):
+        if self.images is None:
+            return [ImageUsage(self.variants)]
+        return [PictureRewrite(self.images, self.variants)]
+
+
+def settings_key(formats):
+    return f'{zlib.crc32(repr((formats, MODERN_FORMATS, FALLBACK_PNG, FALLBACK_JPEG)).encode()):08x}'
+
+
+def available_formats():
+    if Image is None:
+        return []
+    Image.init()
+    return [ext for ext, _, fmt, _ in MODERN_FORMATS if fmt in Image.SAVE]
+
+
+def _has_alpha(im):
+    """True when the image has transparency that is actually used."""
+    if im.mode == 'P' and 'transparency' in im.info:
+        im = im.convert('RGBA')
+    if im.mode not in ('RGBA', 'LA', 'PA'):
+        return False
+    return im.getchannel('A').getextrema()[0] < 255
+
+
+def _encode(im, fmt, options):
+    buf = io.BytesIO()
+    im.save(buf, fmt, **options)
+    return buf.getvalue()
+
+
+def encode_variants(source, widths, formats, public_dir=document.PUBLIC_DIR):
+    """Resize ``source`` to each width and write every format; returns the cache entry fields."""
+    with Image.open(os.path.join(public_dir, source)) as im:
+        im.load()
+        alpha = _has_alpha(im)
+        im = im.convert('RGBA' if alpha else 'RGB')
+        size = list(im.size)
+        widths = sorted({min(w, size[0]) for w in widths})
+        fallback = FALLBACK_PNG if alpha else FALLBACK_JPEG
+        files = {}
+        for width in widths:
+            height = max(1, round(size[1] * width / size[0]))
+            resized = im if width == size[0] else im.resize((width, height), Image.LANCZOS)
+            targets = [(ext, fmt, opts) for ext, _, fmt, opts in MODERN_FORMATS if ext in formats]
+            for ext, fmt, opts in targets + [fallback]:
+                rel = variant_name(source, width, ext)
+                data = _encode(resized if alpha or fmt != 'JPEG' else resized.convert('RGB'), fmt, opts)
+                writer.write_text(os.path.join(public_dir, rel), data)
+                files[rel] = len(data)
+    return {'size': size, 'alpha': alpha, 'fallback': fallback[0], 'widths': widths, 'files': files}
+
+
+def load_image_manifest(path=IMAGE_MANIFEST_PATH):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _cache_hit(entry, digest, settings, widths, public_dir):
+    if not entry or entry.get('hash') != digest or entry.get('settings') != settings:
+        return False
+    capped = {min(w, entry['size'][0]) for w in widths}
+    if not capped <= set(entry['widths']):
+        return False
+    return all(os.path.isfile(os.path.join(public_dir, rel)) for rel in entry['files'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--dry-run', action='store_true', help='report without writing anything')
+    parser.add_argument('--jobs', type=int, default=None, help='worker processes (default: CPU count)')
+    args = parser.parse_args()
+
+    cache = load_image_manifest()
+    variants = {rel: source for source, entry in cache.items() for rel in entry['files']}
+    paths = document.page_paths()
+    manifest = Manifest()
+    usage = engine.run(ImageVisitors(variants), paths, workers=args.jobs, manifest=manifest, write=False)
+
+    requested = {}
+    for result in usage.results:
+        for source, slots in result.results.get('image_usage', ()):
+            requested.setdefault(source, []).append(slots)
+
+    formats = available_formats()
+    settings = settings_key(formats)
+    images = {}
+    for source, slot_lists in sorted(requested.items()):
+        src_path = os.path.join(document.PUBLIC_DIR, source)
+        digest = file_hash(src_path)
+        entry = cache.get(source)
+        widths = set()
+        for slots in slot_lists:
+            widths.update(variant_widths(slots, entry['size'][0] if entry else MAX_WIDTH * 2))
+        # Without Pillow, whatever was encoded last time is still usable.
+        expected = settings if Image is not None else (entry or {}).get('settings')
+        if not _cache_hit(entry, digest, expected, widths, document.PUBLIC_DIR):
+            if Image is None:
+                print(f"Skipping {source}: Pillow is not installed (pip install Pillow)")
+                continue
+            if args.dry_run:
+                print(f"Would encode {source} at {sorted(widths)}")
+                continue
+            try:
+                if entry and entry.get('hash') == digest and entry.get('settings') == settings:
+                    widths.update(entry['widths'])
+                entry = encode_variants(source, widths, formats)
+            except Exception as e:
+                print(f"Error {source}: {e}")
+                continue
+            entry.update({'hash': digest, 'settings': settings, 'formats': formats})
+            cache[source] = entry
+            total = sum(entry['files'].values())
+            print(f"Encoded {source}: {os.path.getsize(src_path)} -> {total} bytes "
+                  f"across {len(entry['files'])} variants")
+        images[source] = {'size': entry['size'], 'formats': entry['formats'],
+                          'fallback': entry['fallback']}
+
+    report = engine.run(ImageVisitors(variants, images), paths, workers=args.jobs,
+                        manifest=manifest, write=not args.dry_run)
+    manifest.save()
+    for result in report.results:
+        if result.status == engine.FAILED:
+            print(f"Error {result.path}: {result.error}")
+        elif result.status == engine.UPDATED:
+            print(f"Updated {result.path} ({result.results['images']['rewritten']} images)")
+    print(f"{len(images)} of {len(requested)} source images optimized; {report.summary()}")
+
+    if not args.dry_run:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        writer.write_text(IMAGE_MANIFEST_PATH, json.dumps(cache, indent=2, sort_keys=True) + '\n')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+"""Timers, counters and optional profiling for the site_tools stages.
+
+Usage: python3 -m site_tools.instrument [--json PATH] [--trace PATH] [--profile PATH]
+                                        [--memory] [--top N] (-m MODULE | SCRIPT) [args ...]
+
+Runs a maintenance script or stage with instrumentation switched on, e.g.::
+
+    python3 -m site_tools.instrument --trace .cache/trace.json -m site_tools.maintain --quiet
+    python3 -m site_tools.instrument --json .cache/run.json fix_css_v2.py
+
+and then prints where the time went: the slowest pages, the total per
+stage and per visitor, bytes read and written, and regex match counts per
+rule. ``--json`` writes the same data; ``--trace`` writes a Chrome trace
+(open it in chrome://tracing or https://ui.perfetto.dev) with one span per
+page, its parse/walk/write phases, and one lane per worker process.
+
+``--profile`` runs cProfile and writes pstats to PATH; ``--memory`` tracks
+allocations with tracemalloc. Both only see the main process, so pass
+``--jobs 1`` to the stage when the page work itself should be profiled.
+
+The hooks in document, engine, writer and rules cost one ``active()``
+check when nothing is recording. Worker processes started by engine.run
+send their spans and counters back with each page's result.
+"""
+import contextlib
+import cProfile
+import io
+import json
+import os
+import pstats
+import runpy
+import sys
+import time
+
+# Set to the recording process's pid so spawned workers record too.
+ENV_VAR = 'SITE_TOOLS_INSTRUMENT'
+REPORT_VERSION = 1
+TOP = 15
+VALUE_OPTIONS = ('--json', '--trace', '--profile', '--top')
+
+
+class Recorder:
+    """Spans, timers and counters for one run; ``owner`` is the main process."""
+
+    def __init__(self, owner=None):
+        self.owner = owner or os.getpid()
+        self.reset()
+
+    def reset(self):
+        self.spans = []
+        self.timers = {}
+        self.counters = {}
+        self.stack = []
+
+    def add_time(self, name, seconds, count=1):
+        timer = self.timers.get(name)
+        if timer is None:
+            self.timers[name] = [count, seconds, seconds]
+        else:
+            timer[0] += count
+            timer[1] += seconds
+            timer[2] = max(timer[2], seconds)
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def absorb(self, payload):
+        spans, timers, counters = payload
+        self.spans += spans
+        for name, (count, total, longest) in timers.items():
+            self.add_time(name, total, count)
+            self.timers[name][2] = max(self.timers[name][2], longest)
+        for name, n in counters.items():
+            self.count(name, n)
+
+    def report(self):
+        files = [dict(args, path=name, ms=round(dur / 1000, 3), pid=pid)
+                 for name, cat, _, dur, pid, args in self.spans if cat == 'file']
+        files.sort(key=lambda f: -f['ms'])
+        return {
+            'version': REPORT_VERSION,
+            'timers': {name: {'count': c, 'total_ms': round(t * 1000, 3), 'max_ms': round(m * 1000, 3)}
+                       for name, (c, t, m) in sorted(self.timers.items(), key=lambda kv: -kv[1][1])},
+            'counters': dict(sorted(self.counters.items())),
+            'files': files,
+        }
+
+    def chrome_trace(self):
+        events = []
+        for name, cat, start, dur, pid, args in self.spans:
+            events.append({'name': name, 'cat': cat, 'ph': 'X', 'ts': start, 'dur': dur,
+                           'pid': pid, 'tid': pid, 'args': args})
+        for pid in sorted({span[4] for span in self.spans}):
+            label = 'main' if pid == self.owner else f'worker {pid}'
+            events.append({'name': 'process_name', 'ph': 'M', 'pid': pid, 'tid': pid, 'args': {'name': label}})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms', 'otherData': {'counters': self.counters}}
+
+
+_recorder = Recorder(int(os.environ[ENV_VAR])) if os.environ.get(ENV_VAR, '').isdigit() else None
+
+
+def _forget_parent():
+    # A forked worker must not send back what the parent recorded before the fork.
+    if _recorder is not None:
+        _recorder.reset()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_forget_parent)
+
+
+def active():
+    return _recorder is not None
+
+
+def enable():
+    global _recorder
+    os.environ[ENV_VAR] = str(os.getpid())
+    _recorder = Recorder()
+    return _recorder
+
+
+@contextlib.contextmanager
+def span(name, cat='stage', timer=None):
+    """Time the block as a trace span and under ``timer`` (default ``name``); yields its args."""
+    rec = _recorder
+    if rec is None:
+        yield None
+        return
+    args = {}
+    rec.stack.append(args)
+    start = time.perf_counter_ns()
+    try:
+        yield args
+    finally:
+        dur = time.perf_counter_ns() - start
+        rec.stack.pop()
+        rec.spans.append((name, cat, start // 1000, dur // 1000, os.getpid(), args))
+        rec.add_time(timer or name, dur / 1e9)
+
+
+def annotate(**args):
+    """Attach ``args`` to the innermost open span."""
+    if _recorder is not None and _recorder.stack:
+        _recorder.stack[-1].update(args)
+
+
+def add_time(name, seconds):
+    if _recorder is not None:
+        _recorder.add_time(name, seconds)
+
+
+def count(name, n=1):
+    if _recorder is not None and n:
+        _recorder.count(name, n)
+
+
+def drain():
+    """What this worker recorded since the last call, for ``absorb`` in the parent; None in the parent."""
+    rec = _recorder
+    if rec is None or os.getpid() == rec.owner:
+        return None
+    payload = (rec.spans, rec.timers, rec.counters)
+    rec.spans, rec.timers, rec.counters = [], {}, {}
+    return payload
+
+
+def absorb(payload):
+    if payload is not None and _recorder is not None:
+        _recorder.absorb(payload)
+
+
+def format_bytes(n):
+    for unit in ('B', 'KB', 'MB'):
+        if abs(n) < 1024:
+            return f'{n:.0f} {unit}' if unit == 'B' else f'{n:.1f} {unit}'
+        n /= 1024
+    return f'{n:.1f} GB'
+
+
+def print_summary(report, top=TOP):
+    print(f"\n--- instrumentation: {report['wall_ms']:.0f} ms wall ---")
+    if report['files']:
+        print(f"Slowest of {len(report['files'])} page(s):")
+        for f in report['files'][:top]:
+            visitors = sorted(f.get('visitors', {}).items(), key=lambda kv: -kv[1])[:3]
+            detail = ', '.join(f'{name} {ms:.1f}' for name, ms in visitors)
+            print(f"  {f['ms']:8.1f} ms  {f['path']}" + (f"  ({detail})" if detail else ''))
+    print("Timers (total / count / max):")
+    for name, t in list(report['timers'].items())[:top * 2]:
+        print(f"  {t['total_ms']:8.1f} ms  {t['count']:6d}  {t['max_ms']:7.1f} ms  {name}")
+    if report['counters']:
+        print("Counters:")
+        for name, n in report['counters'].items():
+            print(f"  {format_bytes(n) if name.startswith('bytes') else n:>10}  {name}")
+    memory = report.get('memory')
+    if memory:
+        print(f"Memory: peak {format_bytes(memory['peak'])} traced")
+        for entry in memory['top'][:top]:
+            print(f"  {format_bytes(entry['size']):>10}  {entry['count']:6d}  {entry['where']}")
+
+
+def split_command(argv):
+    """Split ``argv`` into this runner's options and the command to run."""
+    i = 0
+    while i < len(argv) and argv[i].startswith('-') and argv[i] != '-m':
+        i += 2 if argv[i] in VALUE_OPTIONS else 1
+    return argv[:i], argv[i:]
+
+
+def run_command(command):
+    """Run ``-m MODULE args`` or ``SCRIPT args`` as __main__; returns the exit code."""
+    if command[0] == '-m':
+        target, args = command[1], command[2:]
+    else:
+        target, args = command[0], command[1:]
+    sys.argv = [target] + args
+    try:
+        if command[0] == '-m':
+            runpy.run_module(target, run_name='__main__', alter_sys=True)
+        else:
+            runpy.run_path(target, run_name='__main__')
+    except SystemExit as e:
+        if e.code is None or isinstance(e.code, int):
+            return e.code or 0
+        print(e.code, file=sys.stderr)
+        return 1
+    return 0
+
+
+def main():
+    import argparse
+
+    # Run with -m this file is __main__; the hooks record into the package module.
+    from site_tools import instrument, writer
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0],
+                                     usage='%(prog)s [options] (-m MODULE | SCRIPT) [args ...]')
+    parser.add_argument('--json', metavar='PATH', help='write timers, counters and per-page times as JSON')
+    parser.add_argument('--trace', metavar='PATH', help='write a Chrome trace (chrome://tracing, Perfetto)')
+    parser.add_argument('--profile', metavar='PATH', help='run under cProfile and write pstats to PATH')
+    parser.add_argument('--memory', action='store_true', help='track allocations with tracemalloc')
+    parser.add_argument('--top', type=int, default=TOP, help=f'rows per table (default: {TOP})')
+    options, command = split_command(sys.argv[1:])
+    args = parser.parse_args(options)
+    if not command or command == ['-m']:
+        parser.error('nothing to run: give -m MODULE or SCRIPT')
+
+    rec = instrument.enable()
+    if args.memory:
+        import tracemalloc
+        tracemalloc.start()
+    profiler = cProfile.Profile() if args.profile else None
+    started = time.perf_counter()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        with instrument.span(' '.join(command), cat='run', timer='run'):
+            code = run_command(command)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+    wall = time.perf_counter() - started
+
+    report = rec.report()
+    report['command'] = command
+    report['exit'] = code
+    report['wall_ms'] = round(wall * 1000, 3)
+    if args.memory:
+        snapshot = tracemalloc.take_snapshot()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        stats = snapshot.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)]).statistics('lineno')
+        report['memory'] = {'peak': peak, 'top': [
+            {'where': f'{s.traceback[0].filename}:{s.traceback[0].lineno}', 'size': s.size, 'count': s.count}
+            for s in stats[:args.top]]}
+
+    sys.stdout.flush()
+    print_summary(report, args.top)
+    if profiler is not None:
+        profiler.dump_stats(args.profile)
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(args.top)
+        print(out.getvalue().rstrip())
+        print(f"Wrote {args.profile}")
+    for path in (args.json, args.trace):
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    if args.json:
+        writer.write_text(args.json, json.dumps(report, indent=2) + '\n')
+        print(f"Wrote {args.json}")
+    if args.trace:
+        writer.write_text(args.trace, json.dumps(rec.chrome_trace(), separators=(',', ':')))
+        print(f"Wrote {args.trace}")
+    raise SystemExit(code)
+
+
+if __name__ == "__main__":
+    main()
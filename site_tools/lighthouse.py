@@ -0,0 +1,548 @@
+"""Per-page Lighthouse history in SQLite, compared commit to commit.
+
+Usage: python3 -m site_tools.lighthouse [--commit SHA] REPORT_OR_DIR ...
+       python3 -m site_tools.lighthouse --collect [--base-url URL] [--runs N] [files ...]
+       python3 -m site_tools.lighthouse --compare [BASE] [--head SHA] [--markdown]
+       python3 -m site_tools.lighthouse --trend PAGE
+
+Lighthouse JSON reports (``lighthouse --output=json``, or the lhr-*.json
+files Lighthouse CI leaves in .lighthouseci/) are ingested into
+.cache/lighthouse.sqlite under the commit they were taken at (default:
+HEAD). Each run keeps its LCP, TBT, CLS, FCP, Speed Index, performance
+score, total transfer and LCP element, plus every network request
+(transfer size, and how long it blocked rendering) and the failing
+opportunity audits with their per-URL savings. Re-ingesting a report is a
+no-op. ``--collect`` runs the Lighthouse CLI against ``--base-url`` for
+every page in public/ (or the given ones) and ingests the results.
+
+``--compare`` diffs two commits page by page (default: the newest commit
+against the one before it). When a page has several runs at a commit, its
+median-LCP run is used. A metric regresses when it worsens past both the
+absolute and the relative threshold in THRESHOLDS. Each regression is then
+attributed to the resources behind it: a newly render-blocking stylesheet
+or script, a new or larger resource, a changed LCP element, or an
+opportunity audit whose savings grew. Same-origin URLs are matched without
+their query string and content-hash fingerprint, so a renamed asset is
+recognised. ``--markdown`` prints the comparison as a table for a PR or CI
+job summary. The run exits 1 when anything regressed.
+"""
+import argparse
+import glob
+import json
+import os
+import posixpath
+import sqlite3
+import subprocess
+import sys
+import time
+from urllib.parse import unquote, urlsplit
+
+from site_tools import document
+from site_tools.budget import MIN_REGRESSION_BYTES, git_commit
+from site_tools.fingerprint import logical_name
+from site_tools.manifest import CACHE_DIR, content_hash
+
+DB_PATH = os.path.join(CACHE_DIR, 'lighthouse.sqlite')
+REPORTS_DIR = os.path.join(CACHE_DIR, 'lighthouse')
+SCHEMA_VERSION = 1
+BASE_URL = 'http://localhost:8000'
+LIGHTHOUSE_TIMEOUT = 180
+
+# Column -> Lighthouse audit holding its numericValue.
+METRIC_AUDITS = (
+    ('lcp', 'largest-contentful-paint'),
+    ('tbt', 'total-blocking-time'),
+    ('cls', 'cumulative-layout-shift'),
+    ('fcp', 'first-contentful-paint'),
+    ('si', 'speed-index'),
+    ('transfer', 'total-byte-weight'),
+)
+# A metric regresses when it worsens by more than both (absolute, relative).
+# The performance score is the only one where lower is worse.
+THRESHOLDS = {
+    'performance': (0.05, 0.05),
+    'lcp': (250, 0.10),
+    'tbt': (50, 0.10),
+    'cls': (0.02, 0.10),
+    'fcp': (250, 0.10),
+    'si': (250, 0.10),
+    'transfer': (MIN_REGRESSION_BYTES, 0.05),
+}
+RESOURCE_GROWTH = 0.10
+OPPORTUNITY_GROWTH_MS = 100
+BLOCKING_AUDITS = ('render-blocking-insight', 'render-blocking-resources')
+LCP_ELEMENT_AUDITS = ('lcp-breakdown-insight', 'largest-contentful-paint-element')
+MAX_CAUSES = 5
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    report_key TEXT UNIQUE NOT NULL,
+    commit_sha TEXT,
+    fetched TEXT NOT NULL,
+    ingested INTEGER NOT NULL,
+    page TEXT NOT NULL,
+    url TEXT NOT NULL,
+    form_factor TEXT,
+    lighthouse_version TEXT,
+    performance REAL,
+    lcp REAL,
+    tbt REAL,
+    cls REAL,
+    fcp REAL,
+    si REAL,
+    transfer INTEGER,
+    requests INTEGER,
+    lcp_element TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_commit ON runs (commit_sha, page);
+CREATE TABLE IF NOT EXISTS resources (
+    run_id INTEGER NOT NULL REFERENCES runs (id) ON DELETE CASCADE,
+    url TEXT NOT NULL,
+    type TEXT,
+    transfer INTEGER,
+    size INTEGER,
+    blocking_ms REAL
+);
+CREATE INDEX IF NOT EXISTS resources_run ON resources (run_id);
+CREATE TABLE IF NOT EXISTS opportunities (
+    run_id INTEGER NOT NULL REFERENCES runs (id) ON DELETE CASCADE,
+    audit TEXT NOT NULL,
+    score REAL,
+    savings_ms REAL,
+    savings_bytes INTEGER,
+    url TEXT
+);
+CREATE INDEX IF NOT EXISTS opportunities_run ON opportunities (run_id);
+"""
+
+
+def connect(path=DB_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    db = sqlite3.connect(path)
+    db.row_factory = sqlite3.Row
+    db.execute('PRAGMA foreign_keys = ON')
+    version = db.execute('PRAGMA user_version').fetchone()[0]
+    if version not in (0, SCHEMA_VERSION):
+        raise SystemExit(f"{path} has schema version {version}, expected {SCHEMA_VERSION}")
+    db.executescript(SCHEMA)
+    db.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+    return db
+
+
+def page_for(url):
+    """public/-relative page for a report URL (``/`` -> index.html, ``/chipos`` -> chipos.html)."""
+    path = unquote(urlsplit(url).path).lstrip('/')
+    if not path or path.endswith('/'):
+        return path + 'index.html'
+    if '.' not in posixpath.basename(path):
+        return path + '.html'
+    return path
+
+
+def resource_key(url, page_url):
+    """Same-origin URLs without query and fingerprint, so renamed assets still match."""
+    parts = urlsplit(url)
+    if parts.netloc != urlsplit(page_url).netloc:
+        return url.split('#', 1)[0]
+    directory, name = posixpath.split(parts.path)
+    return posixpath.join(directory, logical_name(name))
+
+
+def numeric(audits, audit_id):
+    value = audits.get(audit_id, {}).get('numericValue')
+    return None if value is None else float(value)
+
+
+def find_selector(details):
+    """The first node selector in an audit's details."""
+    if isinstance(details, dict):
+        if details.get('type') == 'node' and details.get('selector'):
+            return details['selector']
+        values = details.values()
+    elif isinstance(details, list):
+        values = details
+    else:
+        return None
+    for value in values:
+        selector = find_selector(value)
+        if selector:
+            return selector
+    return None
+
+
+def items(audit):
+    return (audit.get('details') or {}).get('items') or []
+
+
+def extract(lhr):
+    """``(run, resources, opportunities)`` rows from one Lighthouse result."""
+    audits = lhr.get('audits', {})
+    url = lhr.get('finalDisplayedUrl') or lhr.get('finalUrl') or lhr.get('requestedUrl')
+    performance = (lhr.get('categories', {}).get('performance') or {}).get('score')
+    run = {
+        'fetched': lhr.get('fetchTime', ''),
+        'page': page_for(url),
+        'url': url,
+        'form_factor': (lhr.get('configSettings') or {}).get('formFactor'),
+        'lighthouse_version': lhr.get('lighthouseVersion'),
+        'performance': performance,
+    }
+    for column, audit_id in METRIC_AUDITS:
+        run[column] = numeric(audits, audit_id)
+    requests = items(audits.get('network-requests', {}))
+    run['requests'] = len(requests)
+    run['lcp_element'] = None
+    for audit_id in LCP_ELEMENT_AUDITS:
+        run['lcp_element'] = find_selector((audits.get(audit_id) or {}).get('details'))
+        if run['lcp_element']:
+            break
+
+    blocking = {}
+    for audit_id in BLOCKING_AUDITS:
+        for item in items(audits.get(audit_id, {})):
+            if item.get('url'):
+                blocking[item['url']] = float(item.get('wastedMs') or 0)
+    resources = [(r['url'], r.get('resourceType'), r.get('transferSize'), r.get('resourceSize'),
+                  blocking.get(r['url'])) for r in requests if r.get('url')]
+
+    opportunities = []
+    for audit_id, audit in sorted(audits.items()):
+        details = audit.get('details') or {}
+        failing = audit.get('score') is not None and audit['score'] < 1
+        if not failing or not (audit.get('scoreDisplayMode') == 'metricSavings' or details.get('type') == 'opportunity'):
+            continue
+        savings_ms = details.get('overallSavingsMs', max((audit.get('metricSavings') or {}).values(), default=0))
+        savings_bytes = details.get('overallSavingsBytes')
+        opportunities.append((audit_id, audit['score'], savings_ms, savings_bytes, None))
+        for item in details.get('items') or []:
+            if isinstance(item, dict) and isinstance(item.get('url'), str) and (
+                    item.get('wastedBytes') or item.get('wastedMs')):
+                opportunities.append((audit_id, None, item.get('wastedMs'), item.get('wastedBytes'), item['url']))
+    return run, resources, opportunities
+
+
+def ingest(db, lhr, commit):
+    """Store one report; returns the run row, or None if it was already ingested."""
+    run, resources, opportunities = extract(lhr)
+    key = content_hash(json.dumps([run['url'], run['fetched'], run['form_factor']]))
+    if db.execute('SELECT 1 FROM runs WHERE report_key = ?', (key,)).fetchone():
+        return None
+    run.update(report_key=key, commit_sha=commit, ingested=int(time.time()))
+    columns = ', '.join(run)
+    cursor = db.execute(f'INSERT INTO runs ({columns}) VALUES ({", ".join("?" * len(run))})', list(run.values()))
+    run_id = cursor.lastrowid
+    db.executemany('INSERT INTO resources VALUES (?, ?, ?, ?, ?, ?)', [(run_id,) + r for r in resources])
+    db.executemany('INSERT INTO opportunities VALUES (?, ?, ?, ?, ?, ?)', [(run_id,) + o for o in opportunities])
+    return run
+
+
+def report_paths(paths):
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            found += sorted(glob.glob(os.path.join(path, '*.json')))
+        else:
+            found.append(path)
+    return found
+
+
+def load_report(path):
+    """The Lighthouse result in ``path``, or None for other JSON files (e.g. LHCI manifests)."""
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if isinstance(data, dict) and 'lighthouseVersion' in data and 'audits' in data:
+        return data
+    return None
+
+
+def collect(pages, base_url, runs, commit):
+    """Run the Lighthouse CLI over ``pages``; returns the report paths written."""
+    out_dir = os.path.join(REPORTS_DIR, commit or 'unknown')
+    os.makedirs(out_dir, exist_ok=True)
+    written = []
+    for rel in pages:
+        url = base_url.rstrip('/') + '/' + ('' if rel == 'index.html' else rel)
+        for i in range(runs):
+            out = os.path.join(out_dir, f"{rel.replace('/', '_')[:-len('.html')]}-{i + 1}.json")
+            command = ['npx', '--no-install', 'lighthouse', url, '--output=json', f'--output-path={out}',
+                       '--only-categories=performance', '--quiet', '--chrome-flags=--headless=new --no-sandbox']
+            started = time.perf_counter()
+            try:
+                result = subprocess.run(command, capture_output=True, text=True, timeout=LIGHTHOUSE_TIMEOUT)
+            except FileNotFoundError:
+                raise SystemExit("npx not found; install Node.js and run npm ci")
+            except subprocess.TimeoutExpired:
+                print(f"Error {url}: timed out after {LIGHTHOUSE_TIMEOUT}s")
+                continue
+            if result.returncode != 0:
+                output = (result.stderr or result.stdout).strip().splitlines()
+                print(f"Error {url}: {output[0] if output else f'exit {result.returncode}'}")
+                continue
+            print(f"Collected {url} ({time.perf_counter() - started:.1f}s)")
+            written.append(out)
+    return written
+
+
+def resolve_commit(db, prefix):
+    rows = db.execute('SELECT DISTINCT commit_sha FROM runs WHERE commit_sha LIKE ? OR ? LIKE commit_sha || \'%\'',
+                      (prefix + '%', prefix)).fetchall()
+    return rows[0][0] if len(rows) == 1 else None
+
+
+def commits(db):
+    """Commits with runs, oldest first by when they were ingested."""
+    rows = db.execute('SELECT commit_sha, MAX(ingested) AS last FROM runs WHERE commit_sha IS NOT NULL '
+                      'GROUP BY commit_sha ORDER BY last, commit_sha').fetchall()
+    return [row['commit_sha'] for row in rows]
+
+
+def representative_runs(db, commit):
+    """``{page: run}`` using each page's median-LCP run at ``commit``."""
+    by_page = {}
+    for row in db.execute('SELECT * FROM runs WHERE commit_sha = ? ORDER BY page, lcp, id', (commit,)):
+        by_page.setdefault(row['page'], []).append(row)
+    return {page: rows[(len(rows) - 1) // 2] for page, rows in by_page.items()}
+
+
+def run_resources(db, run):
+    """Requests of a run by ``resource_key``; repeats of a URL are summed."""
+    found = {}
+    for row in db.execute('SELECT * FROM resources WHERE run_id = ? ORDER BY transfer DESC', (run['id'],)):
+        key = resource_key(row['url'], run['url'])
+        if key not in found:
+            found[key] = dict(row)
+            continue
+        entry = found[key]
+        entry['transfer'] = (entry['transfer'] or 0) + (row['transfer'] or 0)
+        if row['blocking_ms'] is not None:
+            entry['blocking_ms'] = max(entry['blocking_ms'] or 0, row['blocking_ms'])
+    return found
+
+
+def run_opportunities(db, run):
+    totals, urls = {}, {}
+    for row in db.execute('SELECT * FROM opportunities WHERE run_id = ?', (run['id'],)):
+        if row['url'] is None:
+            totals[row['audit']] = row
+        else:
+            urls.setdefault(row['audit'], {})[resource_key(row['url'], run['url'])] = row
+    return totals, urls
+
+
+def worsened(metric, base, head):
+    """How much ``metric`` got worse (positive), if past both thresholds, else None."""
+    if base is None or head is None:
+        return None
+    absolute, relative = THRESHOLDS[metric]
+    delta = base - head if metric == 'performance' else head - base
+    if delta > absolute and delta > abs(base) * relative:
+        return delta
+    return None
+
+
+def format_metric(metric, value):
+    if value is None:
+        return '-'
+    if metric == 'performance':
+        return f'{value * 100:.0f}'
+    if metric == 'cls':
+        return f'{value:.3f}'
+    if metric == 'transfer':
+        return format_size(value)
+    return f'{value / 1000:.2f}s' if value >= 1000 else f'{value:.0f}ms'
+
+
+def format_size(n):
+    return f'{n / 1024:.1f}KB' if n is not None else '-'
+
+
+def short(url, limit=80):
+    return url if len(url) <= limit else url[:limit - 3] + '...'
+
+
+def attribute(db, base, head):
+    """Reasons a page got slower between two runs, most significant first."""
+    causes = []
+    before, after = run_resources(db, base), run_resources(db, head)
+    for key, row in after.items():
+        old = before.get(key)
+        kind = (row['type'] or 'resource').lower()
+        if row['blocking_ms'] is not None and (old is None or old['blocking_ms'] is None):
+            causes.append((row['blocking_ms'] or 0, f"newly render-blocking {kind} {short(row['url'])} "
+                                                    f"({format_size(row['transfer'])}, {row['blocking_ms']:.0f} ms)"))
+        elif old is None and (row['transfer'] or 0) >= MIN_REGRESSION_BYTES:
+            causes.append((row['transfer'] / 100, f"new {kind} {short(row['url'])} ({format_size(row['transfer'])})"))
+        elif old is not None and old['transfer'] and row['transfer']:
+            grew = row['transfer'] - old['transfer']
+            if grew >= MIN_REGRESSION_BYTES and grew > old['transfer'] * RESOURCE_GROWTH:
+                causes.append((grew / 100, f"larger {kind} {short(row['url'])} "
+                                           f"({format_size(old['transfer'])} -> {format_size(row['transfer'])})"))
+    if base['lcp_element'] and head['lcp_element'] and base['lcp_element'] != head['lcp_element']:
+        causes.append((0, f"LCP element changed: {base['lcp_element']} -> {head['lcp_element']}"))
+
+    old_totals, _ = run_opportunities(db, base)
+    new_totals, new_urls = run_opportunities(db, head)
+    for audit, row in new_totals.items():
+        old = old_totals.get(audit)
+        gained_ms = (row['savings_ms'] or 0) - ((old['savings_ms'] or 0) if old else 0)
+        gained_bytes = (row['savings_bytes'] or 0) - ((old['savings_bytes'] or 0) if old else 0)
+        if gained_ms < OPPORTUNITY_GROWTH_MS and gained_bytes < MIN_REGRESSION_BYTES:
+            continue
+        worst = max(new_urls.get(audit, {}).values(), default=None,
+                    key=lambda r: (r['savings_bytes'] or 0, r['savings_ms'] or 0))
+        gained = ' / '.join(part for part in (f"+{gained_ms:.0f} ms" if gained_ms > 0 else '',
+                                              f"+{format_size(gained_bytes)}" if gained_bytes > 0 else '') if part)
+        where = f", mostly {short(worst['url'])}" if worst is not None else ''
+        causes.append((gained_ms, f"{audit}: {gained} potential savings{where}"))
+    causes.sort(key=lambda c: -c[0])
+    return [text for _, text in causes]
+
+
+def compare(db, base_commit, head_commit):
+    """``[(page, base_run, head_run, regressions, causes)]`` for pages measured at both commits."""
+    base_runs = representative_runs(db, base_commit)
+    head_runs = representative_runs(db, head_commit)
+    rows = []
+    for page in sorted(set(base_runs) | set(head_runs)):
+        base, head = base_runs.get(page), head_runs.get(page)
+        regressions = []
+        causes = []
+        if base is not None and head is not None:
+            for metric in THRESHOLDS:
+                delta = worsened(metric, base[metric], head[metric])
+                if delta is not None:
+                    regressions.append(f"{metric} {format_metric(metric, base[metric])} -> "
+                                       f"{format_metric(metric, head[metric])}")
+            if regressions:
+                causes = attribute(db, base, head)
+        rows.append((page, base, head, regressions, causes))
+    return rows
+
+
+def print_comparison(rows, base_commit, head_commit, markdown=False):
+    columns = ('performance', 'lcp', 'tbt', 'cls', 'transfer')
+
+    def cell(metric, base, head):
+        new = format_metric(metric, head[metric] if head is not None else None)
+        if base is None or head is None or base[metric] == head[metric]:
+            return new
+        return f"{format_metric(metric, base[metric])} -> {new}"
+
+    if markdown:
+        print(f"## Lighthouse: {head_commit} vs {base_commit}\n")
+        print('| page | score | LCP | TBT | CLS | transfer | |')
+        print('|---|---|---|---|---|---|---|')
+        for page, base, head, regressions, _ in rows:
+            flag = 'regressed' if regressions else ('new' if base is None else ('removed' if head is None else ''))
+            print(f"| {page} | " + ' | '.join(cell(m, base, head) for m in columns) + f" | {flag} |")
+        regressed = [r for r in rows if r[3]]
+        if regressed:
+            print('\n### Regressions\n')
+            for page, _, _, regressions, causes in regressed:
+                print(f"- **{page}**: {', '.join(regressions)}")
+                for cause in causes[:MAX_CAUSES]:
+                    print(f"  - {cause}")
+        return
+    print(f"Comparing {head_commit} against {base_commit}")
+    print(f"{'page':<36} {'score':>9} {'LCP':>15} {'TBT':>13} {'CLS':>13} {'transfer':>19}")
+    for page, base, head, regressions, causes in rows:
+        widths = (9, 15, 13, 13, 19)
+        print(f"{page:<36} " + ' '.join(f"{cell(m, base, head):>{w}}" for m, w in zip(columns, widths)))
+        for regression in regressions:
+            print(f"  REGRESSION {regression}")
+        for cause in causes[:MAX_CAUSES]:
+            print(f"    cause: {cause}")
+
+
+def print_trend(db, page):
+    rows = db.execute('SELECT commit_sha, fetched, performance, lcp, tbt, cls, transfer, requests FROM runs '
+                      'WHERE page = ? ORDER BY fetched', (page,)).fetchall()
+    if not rows:
+        print(f"No runs for {page}")
+        return
+    print(f"{'fetched':<25} {'commit':<10} {'score':>5} {'LCP':>8} {'TBT':>7} {'CLS':>6} {'transfer':>9} {'reqs':>5}")
+    for row in rows:
+        print(f"{row['fetched'][:24]:<25} {(row['commit_sha'] or '-')[:10]:<10} "
+              f"{format_metric('performance', row['performance']):>5} {format_metric('lcp', row['lcp']):>8} "
+              f"{format_metric('tbt', row['tbt']):>7} {format_metric('cls', row['cls']):>6} "
+              f"{format_metric('transfer', row['transfer']):>9} {row['requests']:>5}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('paths', nargs='*', help='reports or directories to ingest; pages with --collect; '
+                                                 'the base commit with --compare')
+    parser.add_argument('--db', default=DB_PATH, help='SQLite history file')
+    parser.add_argument('--commit', help='commit the reports belong to (default: HEAD)')
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--collect', action='store_true', help='run Lighthouse on every page, then ingest')
+    mode.add_argument('--compare', action='store_true', help='diff two commits (default: the last two)')
+    mode.add_argument('--trend', metavar='PAGE', help='print every run of PAGE')
+    parser.add_argument('--base-url', default=BASE_URL, help=f'server to measure with --collect (default: {BASE_URL})')
+    parser.add_argument('--runs', type=int, default=1, help='Lighthouse runs per page with --collect')
+    parser.add_argument('--head', help='head commit for --compare (default: the newest)')
+    parser.add_argument('--markdown', action='store_true', help='print --compare as Markdown')
+    args = parser.parse_args()
+
+    db = connect(args.db)
+    if args.trend:
+        print_trend(db, args.trend)
+        return
+
+    if args.compare:
+        known = commits(db)
+        head = resolve_commit(db, args.head) if args.head else (known[-1] if known else None)
+        if head is None:
+            raise SystemExit(f"No runs for {args.head or 'any commit'} in {args.db}")
+        earlier = known[:known.index(head)]
+        base = resolve_commit(db, args.paths[0]) if args.paths else None
+        if base is None:
+            if args.paths:
+                print(f"No runs for {args.paths[0]}; comparing with the previous measured commit", file=sys.stderr)
+            if not earlier:
+                print(f"Nothing to compare {head} with yet")
+                return
+            base = earlier[-1]
+        rows = compare(db, base, head)
+        print_comparison(rows, base, head, args.markdown)
+        if any(regressions for _, _, _, regressions, _ in rows):
+            raise SystemExit(1)
+        return
+
+    commit = args.commit or git_commit()
+    if args.collect:
+        pages = [os.path.relpath(p, document.PUBLIC_DIR).replace(os.sep, '/')
+                 for p in (args.paths or document.page_paths())]
+        paths = collect(pages, args.base_url, args.runs, commit)
+        if not paths:
+            raise SystemExit("No Lighthouse reports collected")
+    else:
+        if not args.paths:
+            parser.error('give reports to ingest, or --collect / --compare / --trend')
+        paths = report_paths(args.paths)
+
+    added = skipped = 0
+    with db:
+        for path in paths:
+            try:
+                lhr = load_report(path)
+            except (OSError, ValueError) as e:
+                print(f"Error {path}: {e}")
+                continue
+            if lhr is None:
+                continue
+            run = ingest(db, lhr, commit)
+            if run is None:
+                skipped += 1
+                continue
+            added += 1
+            print(f"Ingested {run['page']} at {commit or 'unknown commit'}: score "
+                  f"{format_metric('performance', run['performance'])}, LCP {format_metric('lcp', run['lcp'])}, "
+                  f"TBT {format_metric('tbt', run['tbt'])}, CLS {format_metric('cls', run['cls'])}, "
+                  f"{format_metric('transfer', run['transfer'])}")
+    print(f"{added} run(s) ingested, {skipped} already in {os.path.relpath(args.db)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,372 @@
+"""Link checker for public/: local targets, #fragments and external URLs.
+
+Usage: python3 -m site_tools.links [--external] [--ttl SECONDS] [--concurrency N]
+                                   [--per-host N] [--json PATH] [--jobs N]
+
+The public/ tree is listed once into an in-memory set (minus firebase.json
+``ignore`` globs), so every local link is a set lookup resolved the way
+Firebase Hosting serves it: redirects, then files (``cleanUrls``, directory
+``index.html``), then rewrites. ``#fragment`` links are checked against the
+ids indexed per page. Links to futureatoms.com are checked locally.
+
+With ``--external``, http(s) URLs are checked by a bounded asyncio pool
+(HEAD, falling back to GET) with per-host concurrency and spacing. Results
+are kept in .cache/external-links.json for ``--ttl`` seconds (failures for an
+hour), so reruns only hit the network for new or expired URLs.
+"""
+import argparse
+import asyncio
+import json
+import os
+import posixpath
+import ssl
+import time
+from urllib.parse import unquote, urljoin, urlsplit
+
+from site_tools import document, engine, writer
+from site_tools.document import Visitor
+from site_tools.hosting import Hosting
+from site_tools.manifest import CACHE_DIR, Manifest
+
+EXTERNAL_CACHE_PATH = os.path.join(CACHE_DIR, 'external-links.json')
+LOCAL_HOSTS = ('futureatoms.com', 'www.futureatoms.com')
+SKIP_SCHEMES = ('mailto:', 'tel:', 'sms:', 'javascript:', 'data:', 'blob:')
+# <link rel> values that point at an origin rather than a resource.
+HINT_RELS = ('preconnect', 'dns-prefetch')
+REFERENCE_ATTRS = (('a', 'href'), ('link', 'href'), ('img', 'src'), ('script', 'src'),
+                   ('source', 'src'), ('iframe', 'src'))
+MAX_REDIRECTS = 5
+
+DEFAULT_TTL = 24 * 3600
+FAILURE_TTL = 3600
+CONCURRENCY = 16
+PER_HOST = 2
+HOST_INTERVAL = 0.25
+TIMEOUT = 10
+USER_AGENT = 'futureatoms-linkcheck/1.0'
+
+OK = 'ok'
+BROKEN = 'broken'
+# Hosts that refuse bots (403/429/999...) cannot be verified either way.
+BLOCKED = 'blocked'
+BLOCKED_STATUSES = (401, 403, 429, 999)
+
+
+class LinkTargets(Visitor):
+    """Collects element ids and every outgoing reference on a page."""
+
+    name = 'link_targets'
+
+    def begin(self, doc):
+        self.ids = set()
+        self.refs = []
+
+    def start_tag(self, doc, node):
+        node_id = node.get('id')
+        if node_id:
+            self.ids.add(node_id)
+        if node.name == 'a' and node.get('name'):
+            self.ids.add(node.get('name'))
+        for tag, attr in REFERENCE_ATTRS:
+            if node.name == tag:
+                value = node.get(attr)
+                if value is not None and value.strip():
+                    rel = node.get('rel', '').lower().split()
+                    if not any(r in HINT_RELS for r in rel):
+                        self.refs.append(value.strip())
+
+    def finish(self, doc):
+        return {'ids': sorted(self.ids), 'refs': self.refs}
+
+
+def link_visitors(path):
+    return [LinkTargets()]
+
+
+class SiteTree:
+    """The deployable public/ tree, listed once, resolved like Firebase Hosting."""
+
+    def __init__(self, public_dir=document.PUBLIC_DIR, hosting=None):
+        self.public_dir = public_dir
+        self.hosting = hosting
+        self.files = set()
+        self.dirs = {''}
+        for dirpath, dirnames, filenames in os.walk(public_dir):
+            rel_dir = os.path.relpath(dirpath, public_dir).replace(os.sep, '/')
+            rel_dir = '' if rel_dir == '.' else rel_dir
+            kept = []
+            for name in dirnames:
+                rel = posixpath.join(rel_dir, name)
+                if hosting is None or not hosting.ignored(rel):
+                    kept.append(name)
+                    self.dirs.add(rel)
+            dirnames[:] = kept
+            for name in filenames:
+                rel = posixpath.join(rel_dir, name)
+                if hosting is None or not hosting.ignored(rel):
+                    self.files.add(rel)
+
+    def resolve(self, path):
+        """``(status, detail)`` for a URL path: ``('file', rel)``, ``('external', url)``,
+        ``('function', name)`` or ``(BROKEN, reason)``."""
+        hosting = self.hosting if self.hosting is not None else Hosting({})
+        for _ in range(MAX_REDIRECTS + 1):
+            kind, detail = hosting.resolve(path, self.files.__contains__, self.dirs.__contains__)
+            if kind == 'redirect':
+                parts = urlsplit(detail[1])
+                if parts.scheme or parts.netloc:
+                    return 'external', detail[1]
+                path = unquote(parts.path)
+                continue
+            if kind in ('file', 'function'):
+                return kind, detail
+            return BROKEN, detail
+        return BROKEN, 'redirect loop'
+
+
+def classify(page_rel, value):
+    """``('skip'|'local'|'external', url_or_path, fragment)`` for a reference on a page."""
+    if value.lower().startswith(SKIP_SCHEMES):
+        return 'skip', None, None
+    if value.startswith('//'):
+        value = 'https:' + value
+    parts = urlsplit(value)
+    if parts.scheme in ('http', 'https'):
+        if (parts.hostname or '') in LOCAL_HOSTS:
+            return 'local', unquote(parts.path) or '/', parts.fragment
+        return 'external', value.split('#', 1)[0], None
+    if parts.scheme:
+        return 'skip', None, None
+    if not parts.path:
+        return 'local', None, parts.fragment
+    path = unquote(parts.path)
+    if not path.startswith('/'):
+        trailing = '/' if path.endswith('/') and path != '/' else ''
+        path = posixpath.normpath(posixpath.join('/', posixpath.dirname(page_rel), path))
+        path = path + trailing if path != '/' else path
+    return 'local', path, parts.fragment
+
+
+def check_local(tree, pages, page_rel, value):
+    """Return an error string for a broken local reference, else None."""
+    kind, path, fragment = classify(page_rel, value)
+    if kind != 'local':
+        return None
+    if path is None:
+        target = page_rel
+    else:
+        status, target = tree.resolve(path)
+        if status == BROKEN:
+            return target
+        if status != 'file':
+            return None
+    if fragment and fragment != 'top' and target in pages:
+        if unquote(fragment) not in pages[target]:
+            return f'missing #{fragment} in {target}'
+    return None
+
+
+def collect(paths, manifest=None, workers=None):
+    """``{page_rel: {'ids': set, 'refs': [...]}}`` for every page, reusing cached results."""
+    report = engine.run(link_visitors, paths, workers=workers, manifest=manifest, write=False)
+    pages = {}
+    for result in report.results:
+        if result.status == engine.FAILED:
+            print(f"Error {result.path}: {result.error}")
+            continue
+        rel = os.path.relpath(result.path, document.PUBLIC_DIR).replace(os.sep, '/')
+        data = result.results['link_targets']
+        pages[rel] = {'ids': set(data['ids']), 'refs': data['refs']}
+    return pages
+
+
+def check_site(tree, pages):
+    """``(broken, external)``: local problems per reference, and the external URLs found."""
+    ids = {rel: data['ids'] for rel, data in pages.items()}
+    broken = []
+    external = {}
+    for rel, data in sorted(pages.items()):
+        for value in data['refs']:
+            kind, url, _ = classify(rel, value)
+            if kind == 'external':
+                external.setdefault(url, []).append(rel)
+                continue
+            error = check_local(tree, ids, rel, value)
+            if error:
+                broken.append({'source': rel, 'link': value, 'reason': error})
+            elif kind == 'local' and url is not None:
+                status, detail = tree.resolve(url)
+                if status == 'external':
+                    external.setdefault(detail, []).append(rel)
+    return broken, external
+
+
+class ExternalChecker:
+    """Checks http(s) URLs concurrently with per-host limits and a TTL cache."""
+
+    def __init__(self, cache_path=EXTERNAL_CACHE_PATH, ttl=DEFAULT_TTL, concurrency=CONCURRENCY,
+                 per_host=PER_HOST, interval=HOST_INTERVAL, timeout=TIMEOUT):
+        self.cache_path = cache_path
+        self.ttl = ttl
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.interval = interval
+        self.timeout = timeout
+        self.cache = {}
+        if cache_path:
+            try:
+                with open(cache_path, 'r', encoding='utf-8') as f:
+                    self.cache = json.load(f)
+            except (OSError, ValueError):
+                pass
+
+    def fresh(self, url, now=None):
+        entry = self.cache.get(url)
+        if entry is None:
+            return None
+        ttl = self.ttl if entry['state'] == OK else min(self.ttl, FAILURE_TTL)
+        return entry if (now or time.time()) - entry['checked'] < ttl else None
+
+    def save(self):
+        if self.cache_path:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            writer.write_text(self.cache_path, json.dumps(self.cache, indent=1, sort_keys=True) + '\n')
+
+    async def _request(self, method, url):
+        parts = urlsplit(url)
+        secure = parts.scheme == 'https'
+        host = parts.hostname
+        port = parts.port or (443 if secure else 80)
+        context = ssl.create_default_context() if secure else None
+        reader, stream = await asyncio.wait_for(
+            asyncio.open_connection(host, port, ssl=context, server_hostname=host if secure else None),
+            self.timeout)
+        try:
+            target = (parts.path or '/') + (f'?{parts.query}' if parts.query else '')
+            stream.write((f'{method} {target} HTTP/1.1\r\nHost: {parts.netloc}\r\n'
+                          f'User-Agent: {USER_AGENT}\r\nAccept: */*\r\nConnection: close\r\n\r\n')
+                         .encode('latin-1'))
+            await stream.drain()
+            status_line = await asyncio.wait_for(reader.readline(), self.timeout)
+            fields = status_line.decode('latin-1').split(None, 2)
+            if len(fields) < 2 or not fields[1].isdigit():
+                raise ValueError(f'bad status line {status_line[:40]!r}')
+            headers = {}
+            while True:
+                line = await asyncio.wait_for(reader.readline(), self.timeout)
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                key, _, value = line.decode('latin-1').partition(':')
+                headers[key.strip().lower()] = value.strip()
+            return int(fields[1]), headers
+        finally:
+            stream.close()
+            try:
+                await stream.wait_closed()
+            except (OSError, ssl.SSLError):
+                pass
+
+    async def _throttled(self, method, url):
+        host = urlsplit(url).netloc.lower()
+        async with self._global:
+            async with self._host_slots.setdefault(host, asyncio.Semaphore(self.per_host)):
+                lock = self._host_locks.setdefault(host, asyncio.Lock())
+                async with lock:
+                    wait = self._host_next.get(host, 0) - time.monotonic()
+                    if wait > 0:
+                        await asyncio.sleep(wait)
+                    self._host_next[host] = time.monotonic() + self.interval
+                return await self._request(method, url)
+
+    async def _check(self, url):
+        current = url
+        method = 'HEAD'
+        try:
+            for _ in range(MAX_REDIRECTS + 1):
+                status, headers = await self._throttled(method, current)
+                if status in (405, 501) and method == 'HEAD':
+                    method = 'GET'
+                    continue
+                if 300 <= status < 400 and 'location' in headers:
+                    current = urljoin(current, headers['location'])
+                    continue
+                break
+            else:
+                return {'state': BROKEN, 'status': None, 'error': 'too many redirects'}
+        except (OSError, asyncio.TimeoutError, ssl.SSLError, ValueError) as e:
+            return {'state': BROKEN, 'status': None, 'error': str(e) or type(e).__name__}
+        if status < 400:
+            state = OK
+        elif status in BLOCKED_STATUSES:
+            state = BLOCKED
+        else:
+            state = BROKEN
+        return {'state': state, 'status': status, 'error': None}
+
+    async def _run(self, urls):
+        self._global = asyncio.Semaphore(self.concurrency)
+        self._host_slots = {}
+        self._host_locks = {}
+        self._host_next = {}
+        results = await asyncio.gather(*(self._check(url) for url in urls))
+        return dict(zip(urls, results))
+
+    def check(self, urls):
+        """``{url: entry}`` for every URL; only stale or unseen URLs touch the network."""
+        now = time.time()
+        todo = sorted(url for url in set(urls) if self.fresh(url, now) is None)
+        if todo:
+            for url, entry in asyncio.run(self._run(todo)).items():
+                entry['checked'] = time.time()
+                self.cache[url] = entry
+        return {url: self.cache[url] for url in set(urls)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--external', action='store_true', help='also check http(s) links')
+    parser.add_argument('--ttl', type=int, default=DEFAULT_TTL, help='seconds to trust a cached external result')
+    parser.add_argument('--concurrency', type=int, default=CONCURRENCY, help='external requests in flight')
+    parser.add_argument('--per-host', type=int, default=PER_HOST, help='external requests in flight per host')
+    parser.add_argument('--json', metavar='PATH', help='write the full report as JSON')
+    parser.add_argument('--jobs', type=int, default=None, help='worker processes (default: CPU count)')
+    args = parser.parse_args()
+
+    tree = SiteTree(hosting=Hosting.load())
+    manifest = Manifest()
+    pages = collect(document.page_paths(), manifest, args.jobs)
+    manifest.save()
+    broken, external = check_site(tree, pages)
+
+    print(f"Checked {sum(len(p['refs']) for p in pages.values())} references on {len(pages)} pages "
+          f"({len(tree.files)} files in public/)")
+    for item in broken:
+        print(f"Broken: {item['source']} -> {item['link']} ({item['reason']})")
+
+    external_results = {}
+    if args.external:
+        checker = ExternalChecker(ttl=args.ttl, concurrency=args.concurrency, per_host=args.per_host)
+        external_results = checker.check(list(external))
+        checker.save()
+        for url, entry in sorted(external_results.items()):
+            if entry['state'] != OK:
+                detail = entry['status'] or entry['error']
+                print(f"{entry['state'].capitalize()}: {url} ({detail}) on {', '.join(sorted(set(external[url]))[:3])}")
+        bad = sum(1 for e in external_results.values() if e['state'] == BROKEN)
+        print(f"External: {len(external_results)} checked, {bad} broken")
+    else:
+        print(f"{len(external)} external URLs not checked (use --external)")
+
+    if args.json:
+        report = {'broken': broken,
+                  'external': {url: dict(entry, pages=sorted(set(external[url])))
+                               for url, entry in external_results.items()}}
+        writer.write_text(args.json, json.dumps(report, indent=2, sort_keys=True) + '\n')
+
+    if broken or any(e['state'] == BROKEN for e in external_results.values()):
+        raise SystemExit(1)
+    print("No broken links found!")
+
+
+if __name__ == "__main__":
+    main()
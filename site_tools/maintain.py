@@ -0,0 +1,88 @@
+"""Run every page audit and rewrite over public/ in a single pass.
+
+Usage: python3 -m site_tools.maintain [--fix] [--quiet] [--no-cache] [--jobs N] [page.html ...]
+
+Results are cached in .cache/site-manifest.json by content hash, so pages that
+have not changed since the last run are neither read nor re-checked.
+"""
+import argparse
+import os
+
+from site_tools import document, engine
+from site_tools.checks import (
+    WORDMARK_SKIP,
+    LogoAudit,
+    MainCssVersion,
+    OrbitronWordmark,
+    PageMeta,
+    format_logo_audit,
+)
+from site_tools.manifest import Manifest
+
+
+def visitors_for(path):
+    visitors = [LogoAudit(), MainCssVersion(), PageMeta()]
+    if os.path.basename(path) not in WORDMARK_SKIP:
+        visitors.append(OrbitronWordmark())
+    return visitors
+
+
+def pending_edits(results):
+    return results['main_css']['updated'] + results.get('orbitron', {}).get('updated', 0)
+
+
+def page_findings(results, fix=False):
+    """Problems in one page's results, one line each; the logo audit is reported separately."""
+    findings = []
+    meta = results['meta']
+    if not meta['title']:
+        findings.append("missing <title>")
+    if not meta['description']:
+        findings.append("missing meta description")
+    edits = pending_edits(results)
+    if edits:
+        action = 'updated' if fix else 'needs update'
+        findings.append(f"{action}: {edits} edit(s) "
+                        f"(main.css {results['main_css']['updated']}, "
+                        f"wordmark {results.get('orbitron', {}).get('updated', 0)})")
+    return findings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('files', nargs='*', help='pages to process (default: public/*.html)')
+    parser.add_argument('--fix', action='store_true', help='apply rewrites instead of only reporting')
+    parser.add_argument('--quiet', action='store_true', help='only print pages with findings')
+    parser.add_argument('--no-cache', action='store_true', help='ignore and do not update the manifest')
+    parser.add_argument('--jobs', type=int, default=None, help='worker processes (default: CPU count)')
+    args = parser.parse_args()
+
+    manifest = None if args.no_cache else Manifest()
+    paths = args.files or document.page_paths()
+    report = engine.run(visitors_for, paths, workers=args.jobs, manifest=manifest, write=args.fix)
+    pending = 0
+    for result in report.results:
+        path = result.path
+        if result.status == engine.FAILED:
+            print(f"{path}: ERROR {result.error}")
+            continue
+        results = result.results
+        findings = page_findings(results, args.fix)
+        if pending_edits(results):
+            pending += 1
+        if args.quiet and not findings:
+            continue
+        print(format_logo_audit(path, results['logo']))
+        for finding in findings:
+            print(f"  {finding}")
+
+    if manifest is not None:
+        manifest.prune(paths)
+        manifest.save()
+
+    verb = 'Updated' if args.fix else 'Pages needing updates'
+    print(f"{verb}: {pending} of {len(paths)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""Persistent per-page manifest so reruns only re-process edited pages.
+
+Each entry records a page's mtime, size and content hash together with the
+results of every check that has run against that exact content. A page whose
+stat is unchanged is not even read; a page that was touched but not changed
+is read and hashed once, then its cached results are reused.
+"""
+import hashlib
+import json
+import os
+
+from site_tools import document, instrument, writer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_DIR = os.path.join(ROOT, '.cache')
+MANIFEST_PATH = os.path.join(CACHE_DIR, 'site-manifest.json')
+
+FORMAT_VERSION = 1
+
+
+def content_hash(text):
+    if isinstance(text, str):
+        text = text.encode('utf-8')
+    return hashlib.sha256(text).hexdigest()
+
+
+def file_hash(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class Manifest:
+    def __init__(self, path=MANIFEST_PATH):
+        self.path = path
+        self.entries = {}
+        self.dirty = False
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == FORMAT_VERSION:
+                self.entries = data.get('files', {})
+        except (OSError, ValueError):
+            pass
+
+    def key(self, path):
+        return os.path.relpath(os.path.abspath(path), ROOT).replace(os.sep, '/')
+
+    def entry(self, path):
+        return self.entries.get(self.key(path))
+
+    def stat_matches(self, path, st=None):
+        entry = self.entry(path)
+        if entry is None:
+            return False
+        st = st or os.stat(path)
+        return entry['mtime_ns'] == st.st_mtime_ns and entry['size'] == st.st_size
+
+    def refresh(self, path, digest, st=None):
+        """Record the current stat/hash; drops cached results if the content changed."""
+        st = st or os.stat(path)
+        key = self.key(path)
+        entry = self.entries.get(key)
+        if entry is None or entry['hash'] != digest:
+            entry = {'hash': digest, 'results': {}}
+            self.entries[key] = entry
+        entry['mtime_ns'] = st.st_mtime_ns
+        entry['size'] = st.st_size
+        self.dirty = True
+        return entry
+
+    def results(self, path, keys):
+        entry = self.entry(path)
+        if entry is None:
+            return None
+        cached = entry['results']
+        if not all(k in cached for k in keys):
+            return None
+        return {k: cached[k] for k in keys}
+
+    def store(self, path, key, value):
+        self.entries[self.key(path)]['results'][key] = value
+        self.dirty = True
+
+    def prune(self, keep_paths):
+        keep = {self.key(p) for p in keep_paths}
+        for key in list(self.entries):
+            if key not in keep and not os.path.exists(os.path.join(ROOT, key)):
+                del self.entries[key]
+                self.dirty = True
+
+    def save(self):
+        if not self.dirty:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        writer.write_text(self.path, json.dumps({'version': FORMAT_VERSION, 'files': self.entries},
+                                                separators=(',', ':'), sort_keys=True))
+        self.dirty = False
+
+
+def cached_walk(path, visitors, manifest=None, fix=False):
+    """Like ``document.walk`` but reuses manifest results for unchanged pages.
+
+    Returns ``(results, edits, doc)``. On a cache hit ``edits`` is empty and
+    ``doc`` is None. When ``fix`` is set, cached results are only reused if
+    the previous run recorded no pending edits for that page.
+    """
+    with instrument.span(path, cat='file', timer='page'):
+        return _cached_walk(path, visitors, manifest, fix)
+
+
+def _cached_walk(path, visitors, manifest, fix):
+    if manifest is None:
+        doc = document.load(path)
+        results, edits = document.walk(doc, visitors)
+        return results, edits, doc
+
+    keys = [v.cache_key() for v in visitors]
+
+    def reuse():
+        cached = manifest.results(path, keys)
+        if cached is None:
+            return None
+        if fix and any(c['edits'] for c in cached.values()):
+            return None
+        return {v.name: cached[k]['result'] for v, k in zip(visitors, keys)}
+
+    st = os.stat(path)
+    if manifest.stat_matches(path, st):
+        results = reuse()
+        if results is not None:
+            return results, [], None
+
+    doc = document.load(path)
+    manifest.refresh(path, content_hash(doc.text), st)
+    results = reuse()
+    if results is not None:
+        return results, [], None
+
+    results, edits = document.walk(doc, visitors)
+    for v, k in zip(visitors, keys):
+        manifest.store(path, k, {'result': results[v.name], 'edits': len(v.edits)})
+    return results, edits, doc
@@ -0,0 +1,579 @@
+"""Minify public/ into dist/ with gzip and Brotli siblings for every text asset.
+
+Usage: python3 -m site_tools.minify [--out DIR] [--jobs N] [--report PATH] [--no-compress]
+
+HTML is minified on the shared token list: comments (except conditional
+ones) are dropped, whitespace runs in text collapse to one character and
+tag whitespace outside quoted values is tightened. Text is never joined
+across a tag boundary, so inline spacing (``FUTURE<span>ATOMS``, the split
+"Evolving Intelligence" tagline) survives. ``<pre>``, ``<textarea>`` and
+elements with a Tailwind ``whitespace-pre*`` class are copied verbatim.
+Inline ``<style>``/``<script>`` and the files in css/ and js/ go through
+``css.minify`` and ``minify_js``; JSON-LD is re-serialized compactly.
+
+``minify_js`` is deliberately conservative: it strips comments and
+indentation and joins lines only where no semicolon can be inserted, so it
+never changes how a script parses. Anything that fails to minify is copied
+unchanged.
+
+Outputs are cached in .cache/minify/ by source hash (and settings), so
+unchanged files are neither re-minified nor recompressed. Files excluded
+by firebase.json's ``ignore`` are not copied. Brotli output needs the optional
+``brotli`` package (pip install brotli); without it only .gz is written.
+"""
+import argparse
+import gzip
+import json
+import os
+import re
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+
+from site_tools import css, document, writer
+from site_tools.hosting import Hosting
+from site_tools.manifest import CACHE_DIR, ROOT, content_hash, file_hash
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+DIST_DIR = os.path.join(ROOT, 'dist')
+BLOB_DIR = os.path.join(CACHE_DIR, 'minify')
+MINIFY_MANIFEST_PATH = os.path.join(CACHE_DIR, 'minify-manifest.json')
+FORMAT_VERSION = 1
+# Bump when a minifier changes so cached outputs are rebuilt.
+MINIFIER_VERSION = 1
+
+MINIFY_KINDS = {'.html': 'html', '.htm': 'html', '.css': 'css', '.js': 'js', '.mjs': 'js'}
+COMPRESS_EXTENSIONS = frozenset((
+    '.html', '.htm', '.css', '.js', '.mjs', '.json', '.map', '.svg', '.txt', '.xml',
+    '.webmanifest', '.ico', '.md', '.sh',
+))
+# Smaller files fit in one packet anyway; the headers cost more than they save.
+MIN_COMPRESS_SIZE = 1024
+# Average line length past which a file is taken to be minified already.
+MINIFIED_LINE_LENGTH = 1000
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 11
+
+# Whitespace-only text next to these never renders, so it is dropped outright.
+_INVISIBLE = frozenset(('html', 'head', 'body', 'meta', 'link', 'title', 'base'))
+_PRESERVE = ('pre', 'textarea')
+_PRESERVE_CLASS_RE = re.compile(r'(?:^|\s)(?:[\w-]+:)*whitespace-(?:pre|break-spaces)')
+_JS_TYPES = ('', 'text/javascript', 'application/javascript', 'module')
+_JSON_TYPES = ('application/ld+json', 'application/json', 'importmap')
+_TAG_WS_RE = re.compile(r'''("[^"]*"|'[^']*')|\s+''')
+_WS_RE = re.compile(r'\s+')
+
+
+def _collapse(m):
+    return '\n' if '\n' in m.group(0) else ' '
+
+
+def _tighten_tag(source):
+    def repl(m):
+        return m.group(1) or ' '
+    tag = _TAG_WS_RE.sub(repl, source)
+    return re.sub(r'\s*(/?>)$', r'\1', tag)
+
+
+def _script_type(node):
+    return node.get('type', '').strip().lower()
+
+
+def _raw_text(parent, text):
+    """Minified content of a ``<script>``/``<style>``/``<title>`` element."""
+    if not text.strip():
+        return ''
+    if parent.name not in ('script', 'style', 'title'):
+        return text
+    if parent.name == 'title':
+        return _WS_RE.sub(' ', text).strip()
+    if parent.name == 'style':
+        if _script_type(parent) not in ('', 'text/css'):
+            return text
+        out = css.minify(text)
+        close = '</style'
+    else:
+        kind = _script_type(parent)
+        if parent.get('src') is not None:
+            return text
+        if kind in _JSON_TYPES:
+            try:
+                out = json.dumps(json.loads(text), ensure_ascii=False, separators=(',', ':'))
+            except ValueError:
+                return text
+            out = out.replace('</', '<\\/')
+        elif kind in _JS_TYPES:
+            out = minify_js(text)
+        else:
+            return text
+        close = '</script'
+    if close in out.lower() and close not in text.lower():
+        return text
+    return out
+
+
+def minify_html(text):
+    """Minify a page; the document structure and every attribute value are unchanged."""
+    doc = document.Document('', text)
+    nodes = doc.nodes
+    closers = doc.closers()
+    out = []
+    preserve_until = -1
+    for i, node in enumerate(nodes):
+        source = text[node.start:node.end]
+        if node.kind == document.COMMENT:
+            if source.startswith(('<!--[if', '<!--<![endif', '<!--<!')):
+                out.append(source)
+        elif node.kind == document.DECL:
+            out.append(source)
+        elif node.kind in (document.START, document.END):
+            out.append(_tighten_tag(source))
+            if node.kind == document.START and i > preserve_until:
+                if node.name in _PRESERVE or _PRESERVE_CLASS_RE.search(node.get('class', '')):
+                    preserve_until = closers.get(i, len(nodes))
+        elif i <= preserve_until:
+            out.append(source)
+        else:
+            prev = nodes[i - 1] if i else None
+            if prev is not None and prev.kind == document.START and prev.name in document.RAW_TEXT_ELEMENTS:
+                out.append(_raw_text(prev, source))
+                continue
+            if source.strip():
+                out.append(_WS_RE.sub(_collapse, source))
+                continue
+            following = nodes[i + 1] if i + 1 < len(nodes) else None
+            if out and out[-1][-1:].isspace():
+                continue
+            if ((prev is None or prev.kind == document.DECL or prev.name in _INVISIBLE)
+                    or following is None or following.name in _INVISIBLE):
+                continue
+            out.append(_collapse(_WS_RE.match(source)))
+    return ''.join(out)
+
+
+_JS_KEYWORDS_BEFORE_EXPR = frozenset((
+    'return', 'typeof', 'instanceof', 'in', 'of', 'new', 'delete', 'void', 'throw',
+    'case', 'do', 'else', 'yield', 'await',
+))
+_IDENT_RE = re.compile(r'[\w$\\\u0080-\uffff]')
+
+
+def _ident_char(ch):
+    return bool(ch) and _IDENT_RE.match(ch) is not None
+
+
+def _regex_allowed(out):
+    """True if a ``/`` after the emitted output starts a regex literal rather than a division."""
+    text = ''.join(out[-3:]).rstrip()
+    if not text:
+        return True
+    last = text[-1]
+    if last in ')]':
+        return False
+    if _ident_char(last):
+        m = re.search(r'[\w$]+$', text)
+        return m is not None and m.group(0) in _JS_KEYWORDS_BEFORE_EXPR
+    return True
+
+
+def _skip_string(src, pos, quote):
+    end = pos + 1
+    length = len(src)
+    while end < length and src[end] != quote:
+        if src[end] == '\\':
+            end += 1
+        elif src[end] == '\n' and quote != '`':
+            break
+        end += 1
+    return end + 1
+
+
+def _skip_regex(src, pos):
+    end = pos + 1
+    length = len(src)
+    in_class = False
+    while end < length:
+        ch = src[end]
+        if ch == '\\':
+            end += 2
+            continue
+        if ch == '\n':
+            return None
+        if ch == '[':
+            in_class = True
+        elif ch == ']':
+            in_class = False
+        elif ch == '/' and not in_class:
+            end += 1
+            while end < length and _ident_char(src[end]):
+                end += 1
+            return end
+        end += 1
+    return None
+
+
+def minify_js(src):
+    """Strip comments and redundant whitespace without relying on semicolon insertion.
+
+    Newlines are kept unless the previous character makes a line break
+    meaningless (``{ ( [ , ;``), so automatic semicolon insertion behaves
+    exactly as in the original. ``/*!`` license comments are kept.
+    """
+    out = []
+    pos = 0
+    length = len(src)
+    pending = None
+    # ``{`` pushes 'brace' and ``${`` pushes 'template'; a matching ``}`` pops.
+    braces = []
+
+    def emit(token):
+        nonlocal pending
+        if pending is not None and out:
+            prev = out[-1][-1]
+            first = token[0]
+            if pending == '\n' and prev not in '{([,;' and first not in ')]},;':
+                out.append('\n')
+            elif ((_ident_char(prev) and (_ident_char(first) or first == '.'))
+                  or (prev in '+-' and first in '+-') or (prev == '/' and first in '/*')):
+                out.append(' ')
+        pending = None
+        out.append(token)
+
+    def template(start):
+        """Copy a template literal from ``start`` up to its end or the next ``${``."""
+        end = start
+        while end < length:
+            ch = src[end]
+            if ch == '\\':
+                end += 2
+                continue
+            if ch == '`':
+                return end + 1, False
+            if ch == '$' and src[end + 1:end + 2] == '{':
+                return end + 2, True
+            end += 1
+        return length, False
+
+    while pos < length:
+        ch = src[pos]
+        if ch in ' \t\r\n\f\v\u00a0\ufeff':
+            if ch == '\n':
+                pending = '\n'
+            elif pending is None:
+                pending = ' '
+            pos += 1
+        elif src.startswith('//', pos):
+            end = src.find('\n', pos)
+            pos = length if end == -1 else end
+        elif src.startswith('/*', pos):
+            end = src.find('*/', pos + 2)
+            end = length if end == -1 else end + 2
+            comment = src[pos:end]
+            if comment.startswith('/*!'):
+                emit(comment)
+                pending = '\n'
+            elif '\n' in comment:
+                pending = '\n'
+            elif pending is None:
+                pending = ' '
+            pos = end
+        elif ch in '"\'':
+            end = _skip_string(src, pos, ch)
+            emit(src[pos:end])
+            pos = end
+        elif ch == '`':
+            end, opened = template(pos + 1)
+            emit(src[pos:end])
+            if opened:
+                braces.append('template')
+            pos = end
+        elif ch == '}' and braces and braces[-1] == 'template':
+            braces.pop()
+            end, opened = template(pos + 1)
+            emit(src[pos:end])
+            if opened:
+                braces.append('template')
+            pos = end
+        elif ch == '/' and _regex_allowed(out):
+            end = _skip_regex(src, pos)
+            if end is None:
+                emit(ch)
+                pos += 1
+            else:
+                emit(src[pos:end])
+                pos = end
+        elif _ident_char(ch):
+            end = pos + 1
+            while end < length and (_ident_char(src[end]) or
+                                    (src[end] == '.' and src[pos].isdigit()) or
+                                    (src[end] in '+-' and src[end - 1] in 'eE' and src[pos].isdigit())):
+                end += 1
+            emit(src[pos:end])
+            pos = end
+        else:
+            if ch == '{':
+                braces.append('brace')
+            elif ch == '}' and braces:
+                braces.pop()
+            emit(ch)
+            pos += 1
+    return ''.join(out).strip() + ('\n' if out else '')
+
+
+def minify_text(kind, text):
+    if kind == 'html':
+        return minify_html(text)
+    if kind == 'css':
+        return css.minify(text)
+    if kind == 'js':
+        return minify_js(text)
+    return text
+
+
+def compress(data, use_brotli):
+    """``{'.gz': bytes, '.br': bytes}`` for the encodings that actually save bytes."""
+    out = {}
+    if len(data) < MIN_COMPRESS_SIZE:
+        return out
+    gz = gzip.compress(data, GZIP_LEVEL, mtime=0)
+    if len(gz) < len(data):
+        out['.gz'] = gz
+    if use_brotli:
+        br = brotli.compress(data, quality=BROTLI_QUALITY)
+        if len(br) < len(data):
+            out['.br'] = br
+    return out
+
+
+def already_minified(rel, data):
+    """``.min.*`` files and bundler output (long lines) are only compressed."""
+    return rel.endswith(('.min.js', '.min.css')) or data.count(b'\n') * MINIFIED_LINE_LENGTH < len(data)
+
+
+def _process(args):
+    """Worker: ``(rel, minified bytes or None, compressed, error)`` for one source file."""
+    path, rel, kind, compressible, use_brotli = args
+    error = None
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+        minified = None
+        if kind is not None and not already_minified(rel, data):
+            try:
+                text = minify_text(kind, data.decode('utf-8'))
+                encoded = text.encode('utf-8')
+                if len(encoded) < len(data):
+                    minified = encoded
+            except Exception as e:
+                error = f'not minified: {e}'
+        compressed = {}
+        if compressible:
+            compressed = compress(minified if minified is not None else data, use_brotli)
+        return rel, minified, compressed, error
+    except Exception as e:
+        return rel, None, {}, str(e)
+
+
+def settings_key(use_brotli):
+    return content_hash(repr((MINIFIER_VERSION, GZIP_LEVEL, use_brotli and BROTLI_QUALITY,
+                              MIN_COMPRESS_SIZE)))[:12]
+
+
+def blob_path(digest, suffix):
+    return os.path.join(BLOB_DIR, digest[:2], digest + suffix)
+
+
+def load_manifest(path=MINIFY_MANIFEST_PATH):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('version') == FORMAT_VERSION:
+            return data.get('files', {})
+    except (OSError, ValueError):
+        pass
+    return {}
+
+
+def source_files(public_dir, hosting):
+    """``(path, rel)`` for every deployable file under ``public_dir``."""
+    found = []
+    for dirpath, dirnames, filenames in os.walk(public_dir):
+        dirnames.sort()
+        for name in sorted(filenames):
+            path = os.path.join(dirpath, name)
+            rel = os.path.relpath(path, public_dir).replace(os.sep, '/')
+            if hosting is None or not hosting.ignored(rel):
+                found.append((path, rel))
+    return found
+
+
+def _copy(src, dst):
+    """Copy ``src`` unless ``dst`` already has the same size and mtime."""
+    try:
+        s, d = os.stat(src), os.stat(dst)
+        if s.st_size == d.st_size and s.st_mtime_ns == d.st_mtime_ns:
+            return False
+    except FileNotFoundError:
+        pass
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    shutil.copy2(src, dst)
+    return True
+
+
+def build(public_dir, out_dir, use_brotli=True, compress_output=True, jobs=None):
+    """Mirror ``public_dir`` into ``out_dir``; returns the per-file size report."""
+    use_brotli = use_brotli and brotli is not None
+    hosting = None
+    try:
+        hosting = Hosting.load()
+    except (OSError, ValueError) as e:
+        print(f"Warning: firebase.json not used ({e})")
+    manifest = load_manifest()
+    settings = settings_key(use_brotli)
+    files = source_files(public_dir, hosting)
+    report = []
+    expected = set()
+    work = []
+    entries = {}
+
+    for path, rel in files:
+        ext = os.path.splitext(rel)[1].lower()
+        kind = MINIFY_KINDS.get(ext)
+        compressible = compress_output and ext in COMPRESS_EXTENSIONS
+        dst = os.path.join(out_dir, rel)
+        expected.add(dst)
+        if kind is None and not compressible:
+            _copy(path, dst)
+            continue
+        st = os.stat(path)
+        entry = manifest.get(rel)
+        if entry is not None and (entry['mtime_ns'], entry['size']) == (st.st_mtime_ns, st.st_size):
+            digest = entry['hash']
+        else:
+            digest = file_hash(path)
+        key = content_hash(f'{digest}:{settings}:{compressible}')
+        if (entry is not None and entry.get('key') == key
+                and all(os.path.exists(blob_path(key, s)) for s in entry['outputs'])):
+            entries[rel] = dict(entry, mtime_ns=st.st_mtime_ns, size=st.st_size)
+            continue
+        entries[rel] = {'mtime_ns': st.st_mtime_ns, 'size': st.st_size, 'hash': digest, 'key': key}
+        work.append((path, rel, kind, compressible, use_brotli))
+
+    def finish(rel, minified, compressed, error):
+        entry = entries[rel]
+        outputs = {}
+        if minified is not None:
+            outputs['.min'] = minified
+        outputs.update(compressed)
+        for suffix, data in outputs.items():
+            target = blob_path(entry['key'], suffix)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            writer.write_text(target, data)
+        entry['outputs'] = {s: len(d) for s, d in outputs.items()}
+        if error:
+            print(f"Warning {rel}: {error}")
+
+    jobs = jobs or os.cpu_count() or 1
+    if jobs > 1 and len(work) > jobs:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            results = list(pool.map(_process, work, chunksize=4))
+    else:
+        results = [_process(task) for task in work]
+    for result in results:
+        finish(*result)
+
+    for path, rel in files:
+        entry = entries.get(rel)
+        if entry is None:
+            continue
+        dst = os.path.join(out_dir, rel)
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        outputs = entry['outputs']
+        if '.min' in outputs:
+            with open(blob_path(entry['key'], '.min'), 'rb') as f:
+                writer.write_text(dst, f.read())
+        else:
+            _copy(path, dst)
+        for suffix in ('.gz', '.br'):
+            if suffix in outputs:
+                with open(blob_path(entry['key'], suffix), 'rb') as f:
+                    writer.write_text(dst + suffix, f.read())
+                expected.add(dst + suffix)
+        report.append({'path': rel, 'original': entry['size'], 'minified': outputs.get('.min', entry['size']),
+                       'gzip': outputs.get('.gz'), 'brotli': outputs.get('.br')})
+
+    removed = _remove_stale(out_dir, expected)
+    used_keys = {e['key'] for e in entries.values()}
+    _prune_blobs(used_keys)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    writer.write_text(MINIFY_MANIFEST_PATH, json.dumps({'version': FORMAT_VERSION, 'files': entries},
+                                                       separators=(',', ':'), sort_keys=True))
+    return report, len(work), removed
+
+
+def _remove_stale(out_dir, expected):
+    removed = 0
+    for dirpath, _, filenames in os.walk(out_dir, topdown=False):
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            if path not in expected:
+                os.unlink(path)
+                removed += 1
+        if dirpath != out_dir and not os.listdir(dirpath):
+            os.rmdir(dirpath)
+    return removed
+
+
+def _prune_blobs(used_keys):
+    if not os.path.isdir(BLOB_DIR):
+        return
+    for dirpath, _, filenames in os.walk(BLOB_DIR):
+        for name in filenames:
+            if name.split('.', 1)[0] not in used_keys:
+                os.unlink(os.path.join(dirpath, name))
+
+
+def format_size(n):
+    if n is None:
+        return '-'
+    return f'{n / 1024:.1f}K' if n >= 1024 else f'{n}B'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--out', default=DIST_DIR, help='output directory (default: dist/)')
+    parser.add_argument('--jobs', type=int, default=None, help='worker processes (default: CPU count)')
+    parser.add_argument('--report', metavar='PATH', help='also write the size report as JSON')
+    parser.add_argument('--no-compress', action='store_true', help='skip the .gz/.br siblings')
+    parser.add_argument('--all', action='store_true', help='list every file, not just minified ones')
+    args = parser.parse_args()
+
+    if brotli is None and not args.no_compress:
+        print("brotli not installed: writing .gz only (pip install brotli for .br)")
+    public_dir = os.path.join(ROOT, document.PUBLIC_DIR)
+    report, rebuilt, removed = build(public_dir, os.path.abspath(args.out), compress_output=not args.no_compress,
+                                     jobs=args.jobs)
+
+    print(f"{'file':<48} {'before':>9} {'after':>9} {'saved':>6} {'gzip':>9} {'brotli':>9}")
+    totals = {'original': 0, 'minified': 0, 'gzip': 0, 'brotli': 0}
+    for row in sorted(report, key=lambda r: r['original'], reverse=True):
+        for k in totals:
+            totals[k] += row[k] if row[k] is not None else row['minified']
+        if row['minified'] == row['original'] and not args.all:
+            continue
+        saved = 100 - 100 * row['minified'] // row['original'] if row['original'] else 0
+        print(f"{row['path']:<48} {format_size(row['original']):>9} {format_size(row['minified']):>9} "
+              f"{saved:>5}% {format_size(row['gzip']):>9} {format_size(row['brotli']):>9}")
+    print(f"{'total (' + str(len(report)) + ' text files)':<48} {format_size(totals['original']):>9} "
+          f"{format_size(totals['minified']):>9} {'':>6} {format_size(totals['gzip']):>9} "
+          f"{format_size(totals['brotli']) if brotli is not None else '-':>9}")
+    print(f"{rebuilt} file(s) rebuilt, {len(report) - rebuilt} from cache, {removed} stale output(s) removed")
+    if args.report:
+        writer.write_text(args.report, json.dumps({'files': report, 'totals': totals}, indent=2) + '\n')
+
+
+if __name__ == "__main__":
+    main()
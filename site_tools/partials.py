@@ -0,0 +1,367 @@
+"""Render shared partials (header, footer, logo, head tags) into the pages.
+
+Usage: python3 -m site_tools.partials [--check] [--force] [--graph] [files ...]
+       python3 -m site_tools.partials --adopt NAME [--selector SEL] [--force] [files ...]
+
+A page includes a partial with a pair of marker comments; everything between
+them is owned by the build and replaced with ``partials/<name>.html``::
+
+    <!-- include:logo tagline="Evolving Intelligence" -->
+    ...rendered output...
+    <!-- /include:logo -->
+
+Marker attributes fill ``{{ name }}`` / ``{{ name | default }}`` placeholders,
+and partials may include other partials the same way. The rendered block is
+re-indented to the marker's column, so pages stay readable and deployable
+as-is: public/ remains both the source and the output.
+
+Which partials each page uses (transitively) is recorded in
+.cache/partials-graph.json with the page's stat and the hash of each of those
+partials as the page was last rendered. A run re-renders only pages that
+changed since then or that depend on a partial whose content differs from the
+hash they recorded; everything else is skipped without being read. Pages that
+failed to render are dropped from the graph and retried on the next run.
+
+``--adopt`` migrates existing pages: the first element matching the partial's
+selector is wrapped in markers. If the partial does not exist yet it is
+seeded from the first page. Pages whose element differs from the partial are
+reported and left alone unless ``--force`` is given.
+"""
+import argparse
+import json
+import os
+import re
+import textwrap
+
+from site_tools import document, writer
+from site_tools.document import Visitor
+from site_tools.manifest import CACHE_DIR, ROOT, content_hash
+
+PARTIALS_DIR = os.path.join(ROOT, 'partials')
+GRAPH_PATH = os.path.join(CACHE_DIR, 'partials-graph.json')
+FORMAT_VERSION = 2
+
+# Elements --adopt looks for when no --selector is given.
+ADOPT_SELECTORS = {
+    'logo': 'a.flex.items-center.gap-3[href="/"]',
+    'header': 'header',
+    'footer': 'footer',
+}
+
+_OPEN_RE = re.compile(r'<!--\s*include:([\w.-]+)((?:\s+[\w-]+="[^"]*")*)\s*-->\Z')
+_CLOSE_RE = re.compile(r'<!--\s*/include:([\w.-]+)\s*-->\Z')
+_PARAM_RE = re.compile(r'([\w-]+)="([^"]*)"')
+_PLACEHOLDER_RE = re.compile(r'\{\{\s*([\w-]+)\s*(?:\|\s*(.*?))?\s*\}\}', re.S)
+
+
+class Region:
+    __slots__ = ('name', 'params', 'open', 'close')
+
+    def __init__(self, name, params, open_node, close_node):
+        self.name = name
+        self.params = params
+        self.open = open_node
+        self.close = close_node
+
+
+class IncludeRegions(Visitor):
+    """Collects the outermost include marker pairs; nested ones belong to the partial."""
+
+    name = 'includes'
+
+    def begin(self, doc):
+        self.regions = []
+        self.errors = []
+        self.stack = []
+
+    def comment(self, doc, node):
+        source = doc.source(node)
+        m = _OPEN_RE.match(source)
+        if m:
+            self.stack.append((m.group(1), dict(_PARAM_RE.findall(m.group(2))), node))
+            return
+        m = _CLOSE_RE.match(source)
+        if m is None:
+            return
+        if not self.stack or self.stack[-1][0] != m.group(1):
+            self.errors.append(f'unexpected /include:{m.group(1)} at offset {node.start}')
+            return
+        name, params, open_node = self.stack.pop()
+        if not self.stack:
+            self.regions.append(Region(name, params, open_node, node))
+
+    def finish(self, doc):
+        for name, _, node in self.stack:
+            self.errors.append(f'include:{name} at offset {node.start} is never closed')
+        return {'regions': len(self.regions), 'errors': self.errors}
+
+
+def find_regions(doc):
+    visitor = IncludeRegions()
+    results, _ = document.walk(doc, [visitor])
+    return visitor.regions, results['includes']['errors']
+
+
+def marker_indent(text, pos):
+    """Whitespace before ``pos`` on its line, or None if the line has other content."""
+    line_start = text.rfind('\n', 0, pos) + 1
+    prefix = text[line_start:pos]
+    return prefix if not prefix.strip() else None
+
+
+def fill(text, open_node, body):
+    """Text to put between an open marker and its close marker."""
+    body = body.strip('\n')
+    indent = marker_indent(text, open_node.start)
+    if indent is None:
+        return body
+    lines = [indent + line if line.strip() else '' for line in body.split('\n')]
+    return '\n' + '\n'.join(lines) + '\n' + indent
+
+
+def substitute(source, params, name):
+    def placeholder(m):
+        key, default = m.group(1), m.group(2)
+        if key in params:
+            return params[key]
+        if default is not None:
+            return default
+        raise ValueError(f'partial {name}: no value for {{{{ {key} }}}}')
+    return _PLACEHOLDER_RE.sub(placeholder, source)
+
+
+class Partials:
+    """The partials directory, with rendered output memoized per (name, params)."""
+
+    def __init__(self, directory=PARTIALS_DIR):
+        self.directory = directory
+        self._sources = {}
+        self._rendered = {}
+
+    def path(self, name):
+        return os.path.join(self.directory, name + '.html')
+
+    def exists(self, name):
+        return os.path.isfile(self.path(name))
+
+    def source(self, name):
+        if name not in self._sources:
+            try:
+                with open(self.path(name), 'r', encoding='utf-8') as f:
+                    self._sources[name] = f.read()
+            except FileNotFoundError:
+                raise ValueError(f'unknown partial {name!r} (expected {self.path(name)})')
+        return self._sources[name]
+
+    def hashes(self):
+        if not os.path.isdir(self.directory):
+            return {}
+        return {f[:-len('.html')]: content_hash(self.source(f[:-len('.html')]))
+                for f in sorted(os.listdir(self.directory)) if f.endswith('.html')}
+
+    def render(self, name, params=None, stack=()):
+        """``(text, deps)``: the expanded partial and every partial it pulled in."""
+        params = params or {}
+        key = (name, tuple(sorted(params.items())))
+        if key in self._rendered:
+            return self._rendered[key]
+        if name in stack:
+            raise ValueError('include cycle: ' + ' -> '.join(stack + (name,)))
+        text = substitute(self.source(name), params, name)
+        doc = document.Document(self.path(name), text)
+        regions, errors = find_regions(doc)
+        if errors:
+            raise ValueError(f'partial {name}: {errors[0]}')
+        deps = {name}
+        edits = []
+        for region in regions:
+            inner, inner_deps = self.render(region.name, region.params, stack + (name,))
+            deps |= inner_deps
+            edits.append((region.open.end, region.close.start, fill(text, region.open, inner)))
+        result = (document.apply_edits(text, edits), frozenset(deps))
+        self._rendered[key] = result
+        return result
+
+
+def render_page(doc, partials):
+    """``(new_text, deps)`` for a page; new_text equals doc.text when it is current."""
+    regions, errors = find_regions(doc)
+    if errors:
+        raise ValueError(errors[0])
+    deps = set()
+    edits = []
+    for region in regions:
+        body, region_deps = partials.render(region.name, region.params)
+        deps |= region_deps
+        edits.append((region.open.end, region.close.start, fill(doc.text, region.open, body)))
+    return document.apply_edits(doc.text, edits), deps
+
+
+def page_key(path):
+    return os.path.relpath(os.path.abspath(path), ROOT).replace(os.sep, '/')
+
+
+def load_graph(path=GRAPH_PATH):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('version') == FORMAT_VERSION:
+            return data
+    except (OSError, ValueError):
+        pass
+    return {'version': FORMAT_VERSION, 'pages': {}}
+
+
+def save_graph(graph, path=GRAPH_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    writer.write_text(path, json.dumps(graph, indent=1, sort_keys=True) + '\n')
+
+
+def is_stale(entry, hashes):
+    """True when a partial ``entry`` was rendered against differs from (or is missing in) ``hashes``."""
+    return any(hashes.get(name) != digest for name, digest in entry['deps'].items())
+
+
+def dependents(graph):
+    """Reverse edges of the graph: ``{partial: [page, ...]}``."""
+    users = {}
+    for page, entry in sorted(graph['pages'].items()):
+        for name in entry['deps']:
+            users.setdefault(name, []).append(page)
+    return users
+
+
+def build(paths, partials, graph, force=False):
+    """Re-render stale pages; returns ``(transaction, statuses, entries)`` without committing."""
+    hashes = partials.hashes()
+    transaction = writer.Transaction()
+    statuses = []
+    entries = {}
+    for path in paths:
+        key = page_key(path)
+        entry = graph['pages'].get(key)
+        try:
+            st = os.stat(path)
+            if (not force and entry is not None and entry['mtime_ns'] == st.st_mtime_ns
+                    and entry['size'] == st.st_size and not is_stale(entry, hashes)):
+                statuses.append((path, 'current', sorted(entry['deps'])))
+                continue
+            doc = document.load(path)
+            new_text, deps = render_page(doc, partials)
+        except Exception as e:
+            statuses.append((path, f'error: {e}', []))
+            entries[key] = None
+            continue
+        deps = sorted(deps)
+        entries[key] = {name: hashes[name] for name in deps}
+        if new_text != doc.text:
+            transaction.write(path, new_text)
+            statuses.append((path, 'rendered', deps))
+        else:
+            statuses.append((path, 'unchanged', deps))
+    return transaction, statuses, entries
+
+
+def record(graph, entries):
+    """Store each page's partial hashes with its post-write stat; failed pages (None) are dropped."""
+    for key, deps in entries.items():
+        if deps is None:
+            graph['pages'].pop(key, None)
+            continue
+        st = os.stat(os.path.join(ROOT, key))
+        graph['pages'][key] = {'mtime_ns': st.st_mtime_ns, 'size': st.st_size, 'deps': deps}
+    for key in list(graph['pages']):
+        if not os.path.exists(os.path.join(ROOT, key)):
+            del graph['pages'][key]
+
+
+def adopt(paths, partials, name, selector, force=False):
+    """Wrap the element matching ``selector`` on each page in ``name`` include markers."""
+    match = document.compile_selector(selector)
+    transaction = writer.Transaction()
+    for path in paths:
+        try:
+            doc = document.load(path)
+            if any(r.name == name for r in find_regions(doc)[0]):
+                print(f"{path}: already includes {name}")
+                continue
+            node = next((n for n in doc.nodes if n.kind == document.START and match(n)), None)
+            span = doc.element_range(node) if node is not None else None
+            if span is None:
+                print(f"{path}: [SKIP] no closed element matching {selector}")
+                continue
+            indent = marker_indent(doc.text, span[0])
+            element = textwrap.dedent((indent or '') + doc.text[span[0]:span[1]]).strip('\n')
+            if not partials.exists(name):
+                os.makedirs(partials.directory, exist_ok=True)
+                writer.write_text(partials.path(name), element + '\n')
+                print(f"Created {partials.path(name)} from {path}")
+            body, _ = partials.render(name)
+            if ' '.join(body.split()) != ' '.join(element.split()) and not force:
+                print(f"{path}: [DIFFERS] {name} element does not match the partial (use --force)")
+                continue
+            open_marker = f'<!-- include:{name} -->'
+            text = doc.text[:span[0]] + open_marker + doc.text[span[1]:]
+            start = span[0] + len(open_marker)
+            opened = document.Node(document.COMMENT, span[0], start)
+            new_text = text[:start] + fill(text, opened, body) + f'<!-- /include:{name} -->' + text[start:]
+            transaction.write(path, new_text)
+            print(f"Adopted {name} in {path}")
+        except Exception as e:
+            print(f"Error {path}: {e}")
+    transaction.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('files', nargs='*', help='pages to process (default: public/*.html)')
+    parser.add_argument('--check', action='store_true', help='report stale pages and exit 1 without writing')
+    parser.add_argument('--force', action='store_true', help='ignore the dependency graph (or, with --adopt, '
+                                                             'replace elements that differ from the partial)')
+    parser.add_argument('--graph', action='store_true', help='print which pages use each partial')
+    parser.add_argument('--adopt', metavar='NAME', help='wrap existing elements in NAME include markers')
+    parser.add_argument('--selector', help='element to adopt (default: built-in selector for NAME)')
+    parser.add_argument('--partials', default=PARTIALS_DIR, help='partials directory')
+    args = parser.parse_args()
+
+    paths = args.files or document.page_paths()
+    partials = Partials(args.partials)
+
+    if args.adopt:
+        selector = args.selector or ADOPT_SELECTORS.get(args.adopt)
+        if selector is None:
+            parser.error(f'--selector is required for {args.adopt!r}')
+        adopt(paths, partials, args.adopt, selector, args.force)
+        return
+
+    graph = load_graph()
+    if args.graph:
+        for name, pages in sorted(dependents(graph).items()):
+            print(f"{name}: {len(pages)} page(s)")
+            for page in pages:
+                print(f"  {page}")
+        return
+
+    transaction, statuses, entries = build(paths, partials, graph, force=args.force or args.check)
+    counts = {}
+    for path, status, deps in statuses:
+        kind = status.split(':', 1)[0]
+        counts[kind] = counts.get(kind, 0) + 1
+        if kind == 'rendered':
+            verb = 'Stale' if args.check else 'Rendered'
+            print(f"{verb} {path} ({', '.join(deps)})")
+        elif kind == 'error':
+            print(f"Error {path}: {status.split(': ', 1)[1]}")
+    print(', '.join(f"{n} {k}" for k, n in sorted(counts.items())) or 'No pages')
+
+    if args.check:
+        if counts.get('rendered') or counts.get('error'):
+            raise SystemExit(1)
+        return
+    transaction.commit()
+    record(graph, entries)
+    save_graph(graph)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+"""Local preview server that answers requests the way Firebase Hosting does.
+
+Usage: python3 -m site_tools.preview [--port N] [--host H] [--dist | --dir DIR] [--log PATH]
+
+Requests go through firebase.json's hosting config via ``Hosting``:
+redirects (with ``:param`` substitution), static files, ``cleanUrls`` (and
+the 301 from ``/page.html`` to ``/page``), directory indexes, rewrites and
+the custom 404.html. The configured headers are applied, and files excluded
+by ``ignore`` are not served. Without a Cache-Control rule, Firebase's
+default ``max-age=3600`` is sent.
+
+When a ``.br`` or ``.gz`` sibling exists (see site_tools.minify, ``--dist``)
+and the client accepts that encoding, it is served with
+``Content-Encoding``. Every response carries a content-hash ETag, and
+``If-None-Match`` gets a 304. Each request is logged with its status, bytes
+sent, encoding and latency; ``--log`` also appends JSON lines for later
+analysis. Cloud Function rewrites are not emulated and answer 501.
+"""
+import argparse
+import asyncio
+import json
+import mimetypes
+import os
+import posixpath
+import time
+from email.utils import formatdate
+from urllib.parse import unquote, urlsplit
+
+from site_tools.hosting import Hosting
+from site_tools.manifest import file_hash
+from site_tools.minify import DIST_DIR
+
+DEFAULT_PORT = 5000
+DEFAULT_CACHE_CONTROL = 'max-age=3600'
+# Preferred first when the client accepts several.
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+MAX_HEADER_BYTES = 64 * 1024
+KEEP_ALIVE_TIMEOUT = 5
+
+REASONS = {
+    200: 'OK', 301: 'Moved Permanently', 302: 'Found', 304: 'Not Modified', 307: 'Temporary Redirect',
+    308: 'Permanent Redirect', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+    431: 'Request Header Fields Too Large', 501: 'Not Implemented',
+}
+
+mimetypes.add_type('application/manifest+json', '.webmanifest')
+mimetypes.add_type('text/javascript', '.js')
+mimetypes.add_type('text/javascript', '.mjs')
+mimetypes.add_type('image/webp', '.webp')
+mimetypes.add_type('image/avif', '.avif')
+mimetypes.add_type('font/woff2', '.woff2')
+
+
+def accepted_encodings(header):
+    """Content codings the client accepts (``q=0`` excluded)."""
+    accepted = set()
+    for part in (header or '').split(','):
+        name, _, params = part.strip().partition(';')
+        name = name.strip().lower()
+        q = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if name and q > 0:
+            accepted.add(name)
+    return accepted
+
+
+def content_type(rel):
+    kind, _ = mimetypes.guess_type(rel)
+    kind = kind or 'application/octet-stream'
+    if kind.startswith('text/') or kind in ('application/json', 'application/manifest+json', 'image/svg+xml'):
+        kind += '; charset=utf-8'
+    return kind
+
+
+class Response:
+    __slots__ = ('status', 'headers', 'body', 'encoding')
+
+    def __init__(self, status, headers=None, body=b'', encoding=None):
+        self.status = status
+        self.headers = headers or []
+        self.body = body
+        self.encoding = encoding
+
+
+class PreviewServer:
+    def __init__(self, hosting, root=None, log_path=None):
+        self.hosting = hosting
+        self.root = os.path.abspath(root or hosting.public_dir)
+        self.log_path = log_path
+        self._etags = {}
+        self.requests = 0
+        self.bytes_sent = 0
+
+    def _path(self, rel):
+        return os.path.join(self.root, *rel.split('/'))
+
+    def is_file(self, rel):
+        return not self.hosting.ignored(rel) and os.path.isfile(self._path(rel))
+
+    def is_dir(self, rel):
+        return (not rel or not self.hosting.ignored(rel)) and os.path.isdir(self._path(rel))
+
+    def etag(self, path, suffix=''):
+        st = os.stat(path)
+        key = (path, st.st_mtime_ns, st.st_size)
+        etag = self._etags.get(key)
+        if etag is None:
+            etag = self._etags[key] = file_hash(path)[:20]
+        return f'"{etag}{suffix}"'
+
+    def respond(self, method, target, headers):
+        """Build the ``Response`` for one request (without touching the socket)."""
+        if method not in ('GET', 'HEAD'):
+            return Response(405, [('Allow', 'GET, HEAD')], b'Method Not Allowed\n')
+        parts = urlsplit(target)
+        path = unquote(parts.path) or '/'
+        if not path.startswith('/'):
+            return Response(400, body=b'Bad Request\n')
+        trailing = path.endswith('/') and path != '/'
+        path = posixpath.normpath(path) + ('/' if trailing else '')
+        path = '/' + path.lstrip('/')
+
+        kind, detail = self.hosting.resolve(path, self.is_file, self.is_dir)
+        if kind == 'redirect':
+            status, location = detail
+            if parts.query:
+                location += ('&' if '?' in location else '?') + parts.query
+            return Response(status, [('Location', location)] + self.hosting.headers(path))
+        if kind == 'function':
+            return Response(501, self.hosting.headers(path),
+                            f'Cloud Function rewrite to {detail!r} is not emulated by the preview server\n'
+                            .encode('utf-8'))
+        if kind == 'missing':
+            return self._not_found(path, headers)
+
+        rel = detail
+        if self.hosting.clean_urls and path.endswith('.html') and path.lstrip('/') == rel:
+            clean = path[:-len('index.html')] if path.endswith('/index.html') else path[:-len('.html')]
+            location = clean + ('?' + parts.query if parts.query else '')
+            return Response(301, [('Location', location)] + self.hosting.headers(path))
+        return self._file(200, rel, path, headers)
+
+    def _not_found(self, path, headers):
+        if self.is_file('404.html'):
+            return self._file(404, '404.html', path, headers)
+        return Response(404, self.hosting.headers(path), b'Not Found\n')
+
+    def _file(self, status, rel, path, headers):
+        full = self._path(rel)
+        accepted = accepted_encodings(headers.get('accept-encoding'))
+        served, encoding = full, None
+        has_variants = False
+        for name, suffix in ENCODINGS:
+            if os.path.isfile(full + suffix):
+                has_variants = True
+                if encoding is None and name in accepted:
+                    served, encoding = full + suffix, name
+        out = [('Content-Type', content_type(rel))]
+        if encoding:
+            out.append(('Content-Encoding', encoding))
+        if has_variants:
+            out.append(('Vary', 'Accept-Encoding'))
+        etag = self.etag(served, '-' + encoding if encoding else '')
+        out.append(('ETag', etag))
+        configured = self.hosting.headers(path)
+        if not any(key.lower() == 'cache-control' for key, _ in configured):
+            out.append(('Cache-Control', DEFAULT_CACHE_CONTROL))
+        names = {key.lower() for key, _ in configured}
+        out = [h for h in out if h[0].lower() not in names] + configured
+
+        if status == 200 and etag in [t.strip() for t in headers.get('if-none-match', '').split(',')]:
+            return Response(304, [h for h in out if h[0] not in ('Content-Type', 'Content-Encoding')],
+                            encoding=encoding)
+        with open(served, 'rb') as f:
+            body = f.read()
+        return Response(status, out, body, encoding)
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), KEEP_ALIVE_TIMEOUT)
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+                    break
+                except asyncio.LimitOverrunError:
+                    await self._send(writer, 'GET', '-', '-', Response(431, body=b'Headers too large\n'),
+                                     time.perf_counter(), False)
+                    break
+                started = time.perf_counter()
+                lines = head.decode('latin-1').split('\r\n')
+                try:
+                    method, target, version = lines[0].split(' ', 2)
+                except ValueError:
+                    await self._send(writer, '-', '-', '-', Response(400, body=b'Bad Request\n'), started, False)
+                    break
+                headers = {}
+                for line in lines[1:]:
+                    if ':' in line:
+                        key, value = line.split(':', 1)
+                        headers[key.strip().lower()] = value.strip()
+                connection = headers.get('connection', '').lower()
+                keep_alive = (version == 'HTTP/1.1' and connection != 'close') or connection == 'keep-alive'
+                try:
+                    response = self.respond(method, target, headers)
+                except Exception as e:
+                    print(f"Error {method} {target}: {e}")
+                    response = Response(500, body=b'Internal Server Error\n')
+                await self._send(writer, method, target, version, response, started, keep_alive)
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _send(self, writer, method, target, version, response, started, keep_alive):
+        body = b'' if method == 'HEAD' or response.status == 304 else response.body
+        length = len(response.body)
+        lines = [f'HTTP/1.1 {response.status} {REASONS.get(response.status, "Error")}',
+                 f'Date: {formatdate(usegmt=True)}', 'Server: site_tools.preview']
+        lines += [f'{key}: {value}' for key, value in response.headers]
+        if response.status != 304:
+            lines.append(f'Content-Length: {length}')
+        lines.append('Connection: ' + ('keep-alive' if keep_alive else 'close'))
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body)
+        await writer.drain()
+        elapsed = (time.perf_counter() - started) * 1000
+        self.requests += 1
+        self.bytes_sent += len(body)
+        self.log(method, target, response, len(body), elapsed)
+
+    def log(self, method, target, response, sent, elapsed):
+        encoding = response.encoding or '-'
+        print(f"{method} {target} {response.status} {sent}B {encoding} {elapsed:.1f}ms", flush=True)
+        if self.log_path:
+            entry = {'time': time.time(), 'method': method, 'path': target, 'status': response.status,
+                     'bytes': sent, 'encoding': response.encoding, 'ms': round(elapsed, 3)}
+            with open(self.log_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry) + '\n')
+
+
+async def serve(server, host, port):
+    listener = await asyncio.start_server(server.handle, host, port, limit=MAX_HEADER_BYTES)
+    shown = 'localhost' if host in ('127.0.0.1', '::1', 'localhost') else host
+    print(f"Serving HTTP on {host} port {port} (http://{shown}:{port}/) from {server.root}", flush=True)
+    async with listener:
+        await listener.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1', help='interface to bind (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f'port (default: {DEFAULT_PORT})')
+    parser.add_argument('--target', default='main', help='firebase.json hosting target (default: main)')
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument('--dist', action='store_true', help='serve the minified dist/ build')
+    source.add_argument('--dir', help='serve this directory instead of the hosting public dir')
+    parser.add_argument('--log', metavar='PATH', help='append one JSON line per request to PATH')
+    args = parser.parse_args()
+
+    hosting = Hosting.load(target=args.target)
+    root = DIST_DIR if args.dist else args.dir
+    if root is not None and not os.path.isdir(root):
+        parser.error(f'{root} does not exist (run python3 -m site_tools.minify first?)')
+    server = PreviewServer(hosting, root, args.log)
+    try:
+        asyncio.run(serve(server, args.host, args.port))
+    except KeyboardInterrupt:
+        print(f"\n{server.requests} request(s), {server.bytes_sent} bytes sent")
+
+
+if __name__ == "__main__":
+    main()
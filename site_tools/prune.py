@@ -0,0 +1,379 @@
+"""Reachability report for the deployed public/ tree, with an optional prune.
+
+Usage: python3 -m site_tools.prune [--prune] [--check] [--keep GLOB ...] [--json PATH] [--jobs N]
+
+The walk starts from every HTML file, the site's well-known files
+(robots.txt, sitemap.xml, favicon.ico, ...), every URL in sitemap.xml and
+robots.txt, and the local paths named in firebase.json (rewrite and
+redirect destinations, literal header sources). It follows references the
+way each file type makes them:
+
+- HTML: href/src/srcset/poster/data-* URLs, ``<meta content>`` URLs, inline
+  ``style`` and ``<style>`` ``url()``, inline scripts and import maps;
+- CSS: ``url()`` and ``@import``;
+- JS, JSON and text: ES ``import``/``export ... from``/``import()`` specifiers
+  and any string literal or site URL that names a deployed file. This
+  covers bundler chunk maps (``"./vendor-react-<hash>.js"``) and asset
+  paths built in code.
+
+URLs resolve the way Firebase Hosting serves them (see site_tools.links).
+Files under firebase.json ``ignore`` globs are never uploaded, so they are
+listed separately and are not pruned.
+
+The report lists unreachable files by size, groups of byte-identical
+deployed files, and bundler chunks superseded by a newer build of the same
+chunk. ``--prune`` deletes the unreachable files (minus ``--keep`` globs
+and the build inputs in KEEP) and any directories left empty; ``--check``
+exits 1 when something is unreachable.
+"""
+import argparse
+import fnmatch
+import json
+import os
+import posixpath
+import re
+from collections import defaultdict
+from urllib.parse import unquote, urlsplit
+
+from site_tools import engine, writer
+from site_tools.document import Visitor
+from site_tools.hosting import Hosting
+from site_tools.links import LOCAL_HOSTS, SiteTree, classify
+from site_tools.manifest import Manifest, file_hash
+
+WELL_KNOWN = ('robots.txt', 'sitemap.xml', 'favicon.ico', 'manifest.json', 'site.webmanifest',
+              'llm.txt', 'llms.txt', 'llms-full.txt', '404.html', 'index.html')
+WELL_KNOWN_DIRS = ('.well-known',)
+# Files other stages read or fetch at run time, never reported or pruned: the
+# full Tailwind build (site_tools.tailwind --build) and the search client and
+# its index shards (site_tools.search), whose shard names only exist in code.
+KEEP = ('css/tailwind.min.css', 'js/search.js', 'js/search.*.js', 'search/*')
+URL_ATTRS = ('href', 'src', 'poster', 'data', 'action', 'background', 'data-src', 'data-href',
+             'data-background', 'data-poster')
+SRCSET_ATTRS = ('srcset', 'imagesrcset', 'data-srcset')
+SCRIPT_EXTENSIONS = ('.js', '.mjs', '.cjs')
+STYLE_EXTENSIONS = ('.css',)
+TEXT_EXTENSIONS = ('.json', '.webmanifest', '.txt', '.xml', '.svg', '.map', '.sh')
+# ``name-<hash>.ext`` as emitted by Vite/Rollup/webpack.
+CHUNK_RE = re.compile(r'^(?P<stem>.+)-(?P<hash>[A-Za-z0-9_-]{8})(?P<ext>\.[a-z0-9]+)$')
+
+_CSS_URL_RE = re.compile(r'''url\(\s*(?:"([^"]*)"|'([^']*)'|([^)'"\s]+))\s*\)|@import\s+(?:"([^"]*)"|'([^']*)')''', re.I)
+_JS_IMPORT_RE = re.compile(r'''(?:\bfrom\s*|\bimport\s*\(?\s*)(["'])([^"'\n]+)\1''')
+_STRING_RE = re.compile(r'''(["'`])((?:\.{0,2}/)?[\w@~.+%/-]+\.[A-Za-z0-9]{1,8}(?:[?#][^"'`\s]*)?)\1''')
+_SITE_URL_RE = re.compile(r'https?://(?:%s)(/[^\s"\'<>)]*)' % '|'.join(re.escape(h) for h in LOCAL_HOSTS))
+_LOC_RE = re.compile(r'<loc>\s*([^<\s]+)\s*</loc>')
+_ROBOTS_SITEMAP_RE = re.compile(r'^\s*sitemap:\s*(\S+)', re.I | re.M)
+
+
+def srcset_urls(value):
+    return [c.strip().split()[0] for c in value.split(',') if c.strip()]
+
+
+def css_urls(text):
+    return [next(g for g in m.groups() if g is not None) for m in _CSS_URL_RE.finditer(text)]
+
+
+def script_urls(text):
+    """Import specifiers and path-like string literals in script or JSON text."""
+    urls = [m.group(2) for m in _JS_IMPORT_RE.finditer(text)]
+    urls += [m.group(2) for m in _STRING_RE.finditer(text)]
+    urls += _SITE_URL_RE.findall(text)
+    return urls
+
+
+class PageReferences(Visitor):
+    """Every URL a page could make the browser fetch or navigate to."""
+
+    name = 'references'
+
+    def begin(self, doc):
+        self.refs = []
+        self.raw = None
+
+    def start_tag(self, doc, node):
+        self.raw = None
+        for attr in node.attrs:
+            name = attr.name.lower()
+            value = attr.value
+            if not value or attr.raw is None:
+                continue
+            if name in URL_ATTRS:
+                self.refs.append(value.strip())
+            elif name in SRCSET_ATTRS:
+                self.refs.extend(srcset_urls(value))
+            elif name == 'style':
+                self.refs.extend(css_urls(value))
+            elif name == 'content' and node.name == 'meta' and value.strip().startswith(('/', 'http')):
+                self.refs.append(value.strip())
+        if node.name in ('style', 'script'):
+            self.raw = node.name
+
+    def text(self, doc, node):
+        if self.raw == 'style':
+            self.refs.extend(css_urls(doc.source(node)))
+        elif self.raw == 'script':
+            self.refs.extend(script_urls(doc.source(node)))
+
+    def end_tag(self, doc, node):
+        self.raw = None
+
+    def finish(self, doc):
+        return {'refs': self.refs}
+
+
+def reference_visitors(path):
+    return [PageReferences()]
+
+
+def file_references(tree, rel):
+    """URLs referenced by a non-HTML file (empty for binary types)."""
+    ext = posixpath.splitext(rel)[1].lower()
+    if ext not in SCRIPT_EXTENSIONS + STYLE_EXTENSIONS + TEXT_EXTENSIONS:
+        return []
+    try:
+        with open(os.path.join(tree.public_dir, rel), 'r', encoding='utf-8') as f:
+            text = f.read()
+    except (OSError, UnicodeDecodeError):
+        return []
+    if ext in STYLE_EXTENSIONS:
+        return css_urls(text)
+    refs = script_urls(text)
+    if ext == '.xml':
+        refs += _LOC_RE.findall(text)
+    elif rel == 'robots.txt':
+        refs += _ROBOTS_SITEMAP_RE.findall(text)
+    return refs
+
+
+def resolve(tree, from_rel, value):
+    """Public-relative files ``value`` can mean when referenced from ``from_rel``."""
+    value = value.strip()
+    kind, path, _ = classify(from_rel, value)
+    if kind != 'local' or path is None:
+        return []
+    candidates = [path]
+    if not value.startswith(('/', 'http', '//', '.')):
+        # Bare paths built in scripts are usually document- or root-relative.
+        candidates.append('/' + unquote(urlsplit(value).path))
+    found = []
+    for candidate in candidates:
+        status, detail = tree.resolve(candidate)
+        if status == 'file' and detail not in found:
+            found.append(detail)
+    return found
+
+
+def config_roots(hosting):
+    """Local paths firebase.json serves on purpose."""
+    paths = []
+    for rule in hosting.rewrites:
+        if rule.get('destination', '').startswith('/'):
+            paths.append(rule['destination'])
+    for rule in hosting.redirects:
+        parts = urlsplit(rule.get('destination', ''))
+        if not parts.scheme and not parts.netloc and parts.path.startswith('/'):
+            paths.append(parts.path)
+    for rule in hosting.header_rules:
+        source = rule.get('source', '')
+        if source.startswith('/') and not any(ch in source for ch in '*?{}[]!@:'):
+            paths.append(source)
+    return paths
+
+
+class Reachability:
+    """The reference graph of the deployable tree, walked from its entry points."""
+
+    def __init__(self, tree, hosting, manifest=None, workers=None):
+        self.tree = tree
+        self.hosting = hosting
+        self.manifest = manifest
+        self.workers = workers
+        self.reachable = {}
+
+    def roots(self):
+        roots = {}
+        for rel in sorted(self.tree.files):
+            if rel.endswith('.html'):
+                roots[rel] = 'html'
+            elif rel in WELL_KNOWN or rel.split('/', 1)[0] in WELL_KNOWN_DIRS:
+                roots[rel] = 'well-known'
+        for path in config_roots(self.hosting):
+            for rel in resolve(self.tree, '', path):
+                roots.setdefault(rel, 'firebase.json')
+        return roots
+
+    def walk(self):
+        roots = self.roots()
+        pages = sorted(rel for rel in self.tree.files if rel.endswith('.html'))
+        report = engine.run(reference_visitors, [os.path.join(self.tree.public_dir, rel) for rel in pages],
+                            workers=self.workers, manifest=self.manifest, write=False)
+        page_refs = {}
+        for result in report.results:
+            rel = os.path.relpath(result.path, self.tree.public_dir).replace(os.sep, '/')
+            if result.status == engine.FAILED:
+                print(f"Error {result.path}: {result.error}")
+                page_refs[rel] = []
+            else:
+                page_refs[rel] = result.results['references']['refs']
+
+        queue = list(roots)
+        self.reachable = dict(roots)
+        while queue:
+            rel = queue.pop()
+            refs = page_refs[rel] if rel in page_refs else file_references(self.tree, rel)
+            for value in refs:
+                for target in resolve(self.tree, rel, value):
+                    if target not in self.reachable:
+                        self.reachable[target] = rel
+                        queue.append(target)
+        return self.reachable
+
+    def unreachable(self):
+        return sorted(rel for rel in self.tree.files if rel not in self.reachable)
+
+
+def file_size(tree, rel):
+    try:
+        return os.path.getsize(os.path.join(tree.public_dir, rel))
+    except OSError:
+        return 0
+
+
+def duplicates(tree):
+    """Groups of byte-identical deployed files, largest first."""
+    by_size = defaultdict(list)
+    for rel in tree.files:
+        path = os.path.join(tree.public_dir, rel)
+        if os.path.isfile(path) and not os.path.islink(path):
+            by_size[os.path.getsize(path)].append(rel)
+    groups = []
+    for size, rels in by_size.items():
+        if len(rels) < 2 or size == 0:
+            continue
+        by_hash = defaultdict(list)
+        for rel in rels:
+            by_hash[file_hash(os.path.join(tree.public_dir, rel))].append(rel)
+        groups.extend((size, sorted(g)) for g in by_hash.values() if len(g) > 1)
+    return sorted(groups, key=lambda g: (-g[0] * (len(g[1]) - 1), g[1]))
+
+
+def superseded_chunks(tree, reachable):
+    """``(unreachable chunk, reachable chunk)`` pairs: two builds of the same bundler chunk."""
+    builds = defaultdict(list)
+    for rel in tree.files:
+        m = CHUNK_RE.match(posixpath.basename(rel))
+        if m and m.group('ext') in SCRIPT_EXTENSIONS + STYLE_EXTENSIONS:
+            builds[(posixpath.dirname(rel), m.group('stem'), m.group('ext'))].append(rel)
+    pairs = []
+    for rels in builds.values():
+        live = [r for r in rels if r in reachable]
+        if live:
+            pairs.extend((r, live[0]) for r in sorted(rels) if r not in reachable)
+    return sorted(pairs)
+
+
+def ignored_files(hosting, public_dir):
+    found = []
+    for dirpath, dirnames, filenames in os.walk(public_dir):
+        rel_dir = os.path.relpath(dirpath, public_dir).replace(os.sep, '/')
+        rel_dir = '' if rel_dir == '.' else rel_dir
+        for name in filenames:
+            rel = posixpath.join(rel_dir, name)
+            if hosting.ignored(rel):
+                found.append(rel)
+    return sorted(found)
+
+
+def prune(tree, rels):
+    """Delete ``rels`` and directories left empty; returns bytes removed."""
+    removed = 0
+    for rel in rels:
+        path = os.path.join(tree.public_dir, rel)
+        removed += file_size(tree, rel)
+        os.unlink(path)
+        directory = os.path.dirname(path)
+        while os.path.abspath(directory) != os.path.abspath(tree.public_dir) and not os.listdir(directory):
+            os.rmdir(directory)
+            directory = os.path.dirname(directory)
+    return removed
+
+
+def format_size(n):
+    for unit in ('B', 'KB', 'MB'):
+        if n < 1024 or unit == 'MB':
+            return f'{n:.0f} {unit}' if unit == 'B' else f'{n:.1f} {unit}'
+        n /= 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--prune', action='store_true', help='delete unreachable files')
+    parser.add_argument('--check', action='store_true', help='exit 1 if any deployed file is unreachable')
+    parser.add_argument('--keep', action='append', default=[], metavar='GLOB',
+                        help='never report or prune files matching this public-relative glob '
+                             '(in addition to KEEP)')
+    parser.add_argument('--target', default='main', help='firebase.json hosting target (default: main)')
+    parser.add_argument('--json', metavar='PATH', help='write the full report as JSON')
+    parser.add_argument('--jobs', type=int, default=None, help='worker processes (default: CPU count)')
+    args = parser.parse_args()
+
+    hosting = Hosting.load(target=args.target)
+    tree = SiteTree(hosting.public_dir, hosting)
+    graph = Reachability(tree, hosting, manifest=Manifest(), workers=args.jobs)
+    reachable = graph.walk()
+    graph.manifest.save()
+    keep = KEEP + tuple(args.keep)
+    kept = lambda rel: any(fnmatch.fnmatch(rel, pattern) for pattern in keep)
+    unreachable = [rel for rel in graph.unreachable() if not kept(rel)]
+    sizes = {rel: file_size(tree, rel) for rel in tree.files}
+    total = sum(sizes.values())
+    dead = sum(sizes[rel] for rel in unreachable)
+
+    print(f"{len(tree.files)} deployed files ({format_size(total)}), "
+          f"{len(reachable)} reachable, {len(unreachable)} unreachable ({format_size(dead)})")
+    if unreachable:
+        print("\nUnreachable:")
+        for rel in sorted(unreachable, key=lambda r: (-sizes[r], r)):
+            print(f"  {format_size(sizes[rel]):>10}  {rel}")
+
+    superseded = superseded_chunks(tree, reachable)
+    if superseded:
+        print("\nSuperseded bundler chunks:")
+        for old, live in superseded:
+            print(f"  {old} (live build: {posixpath.basename(live)})")
+
+    groups = duplicates(tree)
+    if groups:
+        wasted = sum(size * (len(rels) - 1) for size, rels in groups)
+        print(f"\nByte-identical duplicates ({format_size(wasted)} redundant):")
+        for size, rels in groups:
+            marks = [rel + ('' if rel in reachable else ' (unreachable)') for rel in rels]
+            print(f"  {format_size(size):>10}  " + ', '.join(marks))
+
+    ignored = ignored_files(hosting, hosting.public_dir)
+    if ignored:
+        print(f"\nNot deployed (firebase.json ignore): {', '.join(ignored)}")
+
+    if args.json:
+        data = {
+            'deployed': {'files': len(tree.files), 'bytes': total},
+            'unreachable': [{'path': rel, 'bytes': sizes[rel]} for rel in unreachable],
+            'superseded': [{'path': old, 'live': live} for old, live in superseded],
+            'duplicates': [{'bytes': size, 'paths': rels} for size, rels in groups],
+            'ignored': ignored,
+            'reached_from': {rel: reachable[rel] for rel in sorted(reachable)},
+        }
+        os.makedirs(os.path.dirname(os.path.abspath(args.json)), exist_ok=True)
+        writer.write_text(args.json, json.dumps(data, indent=2) + '\n')
+
+    if args.prune and unreachable:
+        removed = prune(tree, unreachable)
+        print(f"\nPruned {len(unreachable)} files ({format_size(removed)})")
+    elif unreachable and not args.check:
+        print("\nRun with --prune to delete unreachable files")
+    if args.check and unreachable and not args.prune:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""BM25 passage index of the site for the chat function in functions/.
+
+Usage: python3 -m site_tools.retrieval [--check] [--jobs N]
+       python3 -m site_tools.retrieval --query TEXT [-k N]
+
+The chat endpoint sends Gemini only the few passages relevant to a
+question, not the whole site. Pages go through the same extraction as
+site_tools.content (search.VisibleText, cached in
+.cache/search-manifest.json) and are cut into passages at their
+h1-h3 headings. Sections longer than MAX_WORDS are split into overlapping
+windows that end on a sentence where possible. Sections shorter than
+MIN_WORDS are folded into the next one.
+
+functions/site-index.json holds each passage (URL with heading anchor,
+page title, section title, text) and, for every term, its postings with the
+BM25 weight already computed. A query's score is therefore just the sum
+of its terms' weights. Terms go through ``tokenize`` and ``stem`` here and
+the same rules in functions/site-retrieval.js. ``--query`` ranks passages
+from the written index without calling anything, and so does
+``node functions/site-retrieval.js "question"``.
+"""
+import argparse
+import json
+import math
+import os
+import re
+
+from site_tools import document, engine, writer
+from site_tools.content import CONTENT_EXCLUDE, canonical_url
+from site_tools.manifest import ROOT, Manifest
+from site_tools.search import (MAX_TERM_LENGTH, SEARCH_MANIFEST_PATH, STOP_WORDS, page_url, robots_disallowed,
+                               text_visitors, tokenize)
+
+INDEX_PATH = os.path.join(ROOT, 'functions', 'site-index.json')
+FORMAT_VERSION = 1
+MAX_WORDS = 160
+OVERLAP_WORDS = 30
+MIN_WORDS = 12
+# Okapi BM25 parameters.
+K1 = 1.2
+B = 0.75
+WEIGHT_DIGITS = 3
+TOP_K = 5
+MAX_PER_PAGE = 2
+
+_SENTENCE_END_RE = re.compile(r'[.!?]["\')\]]*$')
+
+
+def stem(term):
+    """Fold plain plurals together (``designs`` -> ``design``); site-retrieval.js does the same."""
+    if len(term) > 5 and term.endswith('ies'):
+        return term[:-3] + 'y'
+    if len(term) > 4 and term.endswith('s') and not term.endswith(('ss', 'us', 'is')):
+        return term[:-1]
+    return term
+
+
+def terms(text):
+    return [stem(t) for t in tokenize(text) if t not in STOP_WORDS]
+
+
+def windows(words, max_words=MAX_WORDS, overlap=OVERLAP_WORDS):
+    """Split ``words`` into runs of at most ``max_words``, ending on a sentence where possible."""
+    if len(words) <= max_words:
+        return [words]
+    runs = []
+    start = 0
+    while start < len(words):
+        end = min(start + max_words, len(words))
+        if end < len(words):
+            for i in range(end, start + max_words * 2 // 3, -1):
+                if _SENTENCE_END_RE.search(words[i - 1]):
+                    end = i
+                    break
+        runs.append(words[start:end])
+        if end == len(words):
+            break
+        start = max(end - overlap, start + 1)
+    return runs
+
+
+def page_passages(url, info):
+    """``[url#anchor, page title, section title, text]`` passages of one page."""
+    text = info['text']
+    bounds = [(0, None, info['title'])]
+    for (_, anchor, heading), offset in zip(info['sections'], info.get('offsets', ())):
+        if offset > bounds[-1][0]:
+            bounds.append((offset, anchor, heading))
+        else:
+            bounds[-1] = (bounds[-1][0], anchor, heading)
+    segments = []
+    pending = []
+    for i, (start, anchor, heading) in enumerate(bounds):
+        end = bounds[i + 1][0] if i + 1 < len(bounds) else len(text)
+        words = pending + text[start:end].split()
+        if len(words) < MIN_WORDS and i + 1 < len(bounds):
+            pending = words
+            continue
+        pending = []
+        if words:
+            segments.append((anchor, heading, words))
+    passages = []
+    for anchor, heading, words in segments:
+        for run in windows(words):
+            passages.append([f'{url}#{anchor}' if anchor else url, info['title'], heading, ' '.join(run)])
+    return passages
+
+
+def build_index(passages, k1=K1, b=B):
+    docs = [terms(' '.join(passage[1:])) for passage in passages]
+    count = len(docs)
+    avg_length = sum(len(d) for d in docs) / count if count else 0.0
+    postings = {}
+    for pid, doc in enumerate(docs):
+        freqs = {}
+        for term in doc:
+            freqs[term] = freqs.get(term, 0) + 1
+        norm = k1 * (1 - b + b * len(doc) / avg_length) if avg_length else k1
+        for term, tf in freqs.items():
+            postings.setdefault(term, []).append((pid, tf * (k1 + 1) / (tf + norm)))
+    index = {}
+    for term in sorted(postings):
+        df = len(postings[term])
+        idf = math.log(1 + (count - df + 0.5) / (df + 0.5))
+        flat = []
+        for pid, weight in postings[term]:
+            flat += [pid, round(idf * weight, WEIGHT_DIGITS)]
+        index[term] = flat
+    return {
+        'version': FORMAT_VERSION,
+        'maxTermLength': MAX_TERM_LENGTH,
+        'stopWords': sorted(STOP_WORDS),
+        'passages': passages,
+        'terms': index,
+    }
+
+
+def rank(index, query, k=TOP_K, max_per_page=MAX_PER_PAGE):
+    """``[(score, passage)]`` for ``query``, best first, as site-retrieval.js ranks them."""
+    scores = {}
+    for term in set(terms(query)):
+        postings = index['terms'].get(term, ())
+        for i in range(0, len(postings), 2):
+            scores[postings[i]] = scores.get(postings[i], 0) + postings[i + 1]
+    results = []
+    per_page = {}
+    for pid in sorted(scores, key=lambda pid: (-scores[pid], pid)):
+        page = index['passages'][pid][0].split('#')[0]
+        if per_page.get(page, 0) >= max_per_page:
+            continue
+        per_page[page] = per_page.get(page, 0) + 1
+        results.append((scores[pid], index['passages'][pid]))
+        if len(results) >= k:
+            break
+    return results
+
+
+def read(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return f.read()
+    except OSError:
+        return ''
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--check', action='store_true', help='write nothing; exit 1 if the index is stale')
+    parser.add_argument('--query', help='rank passages from the written index for TEXT and exit')
+    parser.add_argument('-k', type=int, default=TOP_K, help='passages to show with --query')
+    parser.add_argument('--jobs', type=int, default=None, help='worker processes (default: CPU count)')
+    args = parser.parse_args()
+
+    if args.query:
+        try:
+            index = json.loads(read(INDEX_PATH))
+        except ValueError:
+            print(f"No index at {os.path.relpath(INDEX_PATH, ROOT)}; run python3 -m site_tools.retrieval first")
+            raise SystemExit(1)
+        for score, (url, title, heading, text) in rank(index, args.query, args.k):
+            print(f"{score:7.3f}  {title} / {heading}\n         {url}\n         {text[:200]}...")
+        return
+
+    manifest = Manifest(SEARCH_MANIFEST_PATH)
+    paths = document.page_paths()
+    report = engine.run(text_visitors, paths, workers=args.jobs, manifest=manifest, write=False)
+    manifest.prune(paths)
+    manifest.save()
+
+    disallowed = robots_disallowed()
+    failed = False
+    passages = []
+    for result in sorted(report.results, key=lambda r: r.path):
+        if result.status == engine.FAILED:
+            print(f"Error {result.path}: {result.error}")
+            failed = True
+            continue
+        rel = os.path.relpath(result.path, document.PUBLIC_DIR).replace(os.sep, '/')
+        if rel in CONTENT_EXCLUDE or any(page_url(rel).startswith(p) for p in disallowed):
+            continue
+        info = result.results['search_text']
+        passages.extend(page_passages(canonical_url(rel, info), info))
+
+    index = build_index(passages)
+    text = json.dumps(index, ensure_ascii=False, separators=(',', ':')) + '\n'
+    print(f"{len(passages)} passages, {len(index['terms'])} terms, {len(text.encode('utf-8'))} bytes")
+    rel = os.path.relpath(INDEX_PATH, ROOT)
+    if read(INDEX_PATH) == text:
+        print(f"{rel} is up to date")
+    elif args.check:
+        print(f"Out of date: {rel}")
+        failed = True
+    else:
+        writer.write_text(INDEX_PATH, text)
+        print(f"Updated {rel}")
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
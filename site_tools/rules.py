@@ -0,0 +1,241 @@
+"""Declarative page invariants checked in one combined regex pass per page.
+
+Usage: python3 -m site_tools.rules [--json PATH] [--jobs N] [page.html ...]
+
+Each ``Rule`` is a pattern plus what it means: ``FORBID`` (every match is a
+violation), ``REQUIRE`` (the page must match at least once, optionally with a
+``value`` group whose length is bounded) or ``ANCHOR`` (a position other
+rules can be scoped to with ``after=``/``window=``). All rules are compiled
+into a single alternation, so a page is scanned once no matter how many
+rules there are. Alternatives must not overlap one another: the scan
+reports non-overlapping matches.
+
+Results are cached in the page manifest; the JSON report (``--json -`` for
+stdout) is meant for CI, and the exit status is 1 when any error-level rule
+fails.
+"""
+import argparse
+import bisect
+import functools
+import html
+import json
+import re
+import sys
+import zlib
+
+from site_tools import document, engine, instrument, writer
+from site_tools.checks import LOGO_ONCLICK, MAIN_CSS, MAIN_CSS_VERSION, WORDMARK_SKIP
+from site_tools.document import Visitor
+from site_tools.fingerprint import HASH_LENGTH
+from site_tools.manifest import Manifest
+
+FORBID = 'forbid'
+REQUIRE = 'require'
+ANCHOR = 'anchor'
+
+ERROR = 'error'
+WARNING = 'warning'
+
+REPORT_VERSION = 1
+_VALUE_GROUP = '(?P<value>'
+
+
+class Rule:
+    def __init__(self, id, pattern, message, kind=FORBID, severity=ERROR, after=None, window=None,
+                 min_length=None, max_length=None, exclude=(), ignore_case=False):
+        self.id = id
+        self.pattern = pattern
+        self.message = message
+        self.kind = kind
+        self.severity = severity
+        self.after = after
+        self.window = window
+        self.min_length = min_length
+        self.max_length = max_length
+        self.exclude = tuple(exclude)
+        self.ignore_case = ignore_case
+
+    def definition(self):
+        return (self.id, self.pattern, self.message, self.kind, self.severity, self.after,
+                self.window, self.min_length, self.max_length, self.exclude, self.ignore_case)
+
+
+RULES = (
+    Rule('logo-header', re.escape(f'onclick="{LOGO_ONCLICK}"'), 'clickable header logo', kind=ANCHOR),
+    Rule('logo-size', r'w-10 h-10', 'header logo is not sized w-10 h-10',
+         kind=REQUIRE, after='logo-header', window=800),
+    Rule('logo-size-legacy', r'w-12 h-12', 'header logo still uses the old w-12 h-12 size',
+         after='logo-header', window=800),
+    Rule('logo-tagline', r'Evolving\s+Intelligence', 'header logo is missing the "Evolving Intelligence" tagline',
+         kind=REQUIRE, after='logo-header', window=800),
+    Rule('wordmark-font', r'FUTURE\s*<span class="text-cyan-400">\s*ATOMS\s*</span>',
+         'FUTURE/ATOMS wordmark span has no Orbitron font', exclude=WORDMARK_SKIP),
+    # A fingerprinted href (css/main.<hash>.css) never matches; fingerprint --query and the pin do not either.
+    Rule('main-css-version',
+         r'href="%s(?!\?v=(?:%s|[0-9a-f]{%d})")[^"]*"' % (re.escape(MAIN_CSS), MAIN_CSS_VERSION, HASH_LENGTH),
+         f'{MAIN_CSS} link is neither fingerprinted nor pinned to ?v={MAIN_CSS_VERSION}'),
+    Rule('title', r'<title[^>]*>(?P<value>[^<]*)</title>', 'page <title>',
+         kind=REQUIRE, min_length=10, max_length=70, ignore_case=True),
+    Rule('meta-description',
+         r'''<meta\s(?=[^>]*\bname=["']description["'])[^>]*?\bcontent=(?P<value>"[^"]*"|'[^']*')[^>]*>''',
+         'meta description', kind=REQUIRE, max_length=160, ignore_case=True),
+)
+
+
+def rules_key(rules):
+    return format(zlib.crc32(repr([r.definition() for r in rules]).encode('utf-8')), '08x')
+
+
+@functools.lru_cache(maxsize=None)
+def compile_rules(rules):
+    """One regex with a named alternative ``r<i>`` (and ``r<i>_value``) per rule."""
+    parts = []
+    for i, rule in enumerate(rules):
+        if rule.pattern.count(_VALUE_GROUP) > 1:
+            raise ValueError(f'rule {rule.id}: at most one value group')
+        pattern = rule.pattern.replace(_VALUE_GROUP, f'(?P<r{i}_value>')
+        if rule.ignore_case:
+            pattern = f'(?i:{pattern})'
+        parts.append(f'(?P<r{i}>{pattern})')
+    return re.compile('|'.join(parts), re.S)
+
+
+def scan(text, rules):
+    """``{rule id: [(offset, value), ...]}`` from a single pass over ``text``."""
+    compiled = compile_rules(rules)
+    hits = {rule.id: [] for rule in rules}
+    for m in compiled.finditer(text):
+        index = int(m.lastgroup[1:].split('_', 1)[0])
+        rule = rules[index]
+        value = m.group(f'r{index}_value') if _VALUE_GROUP in rule.pattern else None
+        hits[rule.id].append((m.start(), value))
+    if instrument.active():
+        for rule_id, found in hits.items():
+            if found:
+                instrument.count(f'matches:{rule_id}', len(found))
+    return hits
+
+
+def evaluate(name, text, rules=RULES):
+    """List of violation dicts for one page."""
+    hits = scan(text, rules)
+    newlines = None
+    violations = []
+
+    def add(rule, message, offset=None, value=None):
+        nonlocal newlines
+        line = None
+        if offset is not None:
+            if newlines is None:
+                newlines = [m.start() for m in re.finditer('\n', text)]
+            line = bisect.bisect_right(newlines, offset) + 1
+        violation = {'rule': rule.id, 'severity': rule.severity, 'message': message, 'line': line}
+        if value is not None:
+            violation['value'] = value
+        violations.append(violation)
+
+    for rule in rules:
+        if rule.kind == ANCHOR or name in rule.exclude:
+            continue
+        found = hits[rule.id]
+        if rule.after is not None:
+            anchors = hits.get(rule.after)
+            if not anchors:
+                continue
+            start = anchors[0][0]
+            found = [h for h in found if start <= h[0] < start + (rule.window or len(text))]
+        if rule.kind == FORBID:
+            for offset, _ in found:
+                add(rule, rule.message, offset)
+        elif not found:
+            add(rule, rule.message if rule.after else f'missing {rule.message}')
+        elif _VALUE_GROUP in rule.pattern:
+            offset, value = found[0]
+            value = value or ''
+            if value[:1] in ('"', "'") and value[-1:] == value[:1]:
+                value = value[1:-1]
+            value = ' '.join(html.unescape(value).split())
+            if not value:
+                add(rule, f'empty {rule.message}', offset)
+            elif rule.max_length is not None and len(value) > rule.max_length:
+                add(rule, f'{rule.message} too long ({len(value)} chars, max {rule.max_length})',
+                    offset, value)
+                violations[-1]['severity'] = WARNING
+            elif rule.min_length is not None and len(value) < rule.min_length:
+                add(rule, f'{rule.message} too short ({len(value)} chars, min {rule.min_length})',
+                    offset, value)
+                violations[-1]['severity'] = WARNING
+    return violations
+
+
+class RuleAudit(Visitor):
+    """Runs the rule registry over the page text in one scan."""
+
+    name = 'rules'
+
+    def __init__(self, rules=RULES):
+        self.rules = rules
+
+    def cache_key(self):
+        return f'{super().cache_key()}:{rules_key(self.rules)}'
+
+    def finish(self, doc):
+        return evaluate(doc.name, doc.text, self.rules)
+
+
+def rule_visitors(path):
+    return [RuleAudit()]
+
+
+def build_report(results, rules=RULES):
+    pages = {}
+    errors = warnings = 0
+    for result in results:
+        if result.status == engine.FAILED:
+            violations = [{'rule': 'read', 'severity': ERROR, 'message': result.error, 'line': None}]
+        else:
+            violations = result.results['rules']
+        pages[result.path] = violations
+        errors += sum(1 for v in violations if v['severity'] == ERROR)
+        warnings += sum(1 for v in violations if v['severity'] == WARNING)
+    return {
+        'version': REPORT_VERSION,
+        'rules': [{'id': r.id, 'kind': r.kind, 'severity': r.severity, 'message': r.message}
+                  for r in rules if r.kind != ANCHOR],
+        'pages': pages,
+        'summary': {'pages': len(pages), 'failing_pages': sum(1 for v in pages.values() if v),
+                    'errors': errors, 'warnings': warnings},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('files', nargs='*', help='pages to check (default: public/*.html)')
+    parser.add_argument('--json', metavar='PATH', help="write the JSON report to PATH ('-' for stdout)")
+    parser.add_argument('--jobs', type=int, default=None, help='worker processes (default: CPU count)')
+    args = parser.parse_args()
+
+    manifest = Manifest()
+    paths = args.files or document.page_paths()
+    run = engine.run(rule_visitors, paths, workers=args.jobs, manifest=manifest, write=False)
+    manifest.save()
+    report = build_report(run.results)
+
+    if args.json == '-':
+        sys.stdout.write(json.dumps(report, indent=2) + '\n')
+    else:
+        if args.json:
+            writer.write_text(args.json, json.dumps(report, indent=2) + '\n')
+        for path, violations in report['pages'].items():
+            for v in violations:
+                where = f":{v['line']}" if v['line'] else ''
+                print(f"{path}{where}: {v['severity']}: {v['message']} [{v['rule']}]")
+        s = report['summary']
+        print(f"{s['errors']} error(s), {s['warnings']} warning(s) on {s['failing_pages']} of {s['pages']} pages")
+
+    if report['summary']['errors']:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
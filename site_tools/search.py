@@ -0,0 +1,352 @@
+"""Prebuilt, sharded full-text search index for public/*.html.
+
+Usage: python3 -m site_tools.search [--max-shard BYTES] [--dry-run] [--jobs N]
+
+Each page's visible text (title, description, headings and body, minus
+scripts, styles, site chrome and hidden elements) is extracted once. The
+extraction is cached in .cache/search-manifest.json, so a rebuild only
+re-reads pages that changed. Pages with ``<meta name="robots"
+content="noindex">`` or under a robots.txt ``Disallow`` are skipped.
+
+Text is tokenized by NFKD-folding, lowercasing and splitting on
+``[a-z0-9]+``; public/js/search.js applies the same rules to queries. The
+inverted index maps each term to postings ``[doc, pos, +delta, ...]``
+(token positions, delta-encoded). It is split into shards by term prefix:
+one shard per first letter, split into two-letter prefixes while a shard is
+over ``--max-shard`` bytes. A query then fetches only the shards for its
+own terms. Shards are written as ``search/<prefix>.<hash>.json``, so
+unchanged shards keep their names (and browser caches) across builds.
+``search/index.json`` lists the documents (url, title, description,
+heading anchors) and the shard files. Document ids are kept from the
+previous build so that one edited page only rewrites the shards its terms
+touch.
+"""
+import argparse
+import html
+import json
+import os
+import posixpath
+import re
+import unicodedata
+from collections import defaultdict
+
+from site_tools import document, engine, writer
+from site_tools.document import VOID_ELEMENTS, Visitor
+from site_tools.fingerprint import short_hash
+from site_tools.manifest import CACHE_DIR, Manifest
+
+SEARCH_DIR = 'search'
+INDEX_PATH = os.path.join(document.PUBLIC_DIR, SEARCH_DIR, 'index.json')
+SEARCH_MANIFEST_PATH = os.path.join(CACHE_DIR, 'search-manifest.json')
+ROBOTS_PATH = os.path.join(document.PUBLIC_DIR, 'robots.txt')
+FORMAT_VERSION = 1
+MAX_SHARD_BYTES = 48 * 1024
+MAX_PREFIX = 3
+MAX_TERM_LENGTH = 32
+SKIP_ELEMENTS = frozenset(('script', 'style', 'noscript', 'template', 'svg', 'canvas', 'iframe',
+                           'header', 'nav', 'footer', 'head', 'select', 'button'))
+HEADINGS = ('h1', 'h2', 'h3')
+# Too common to be worth a posting list; queries drop them too.
+STOP_WORDS = frozenset('''
+    a an and are as at be but by for from has have in is it its of on or that the this to was were
+    will with you your we our
+'''.split())
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+_SPACE_RE = re.compile(r'\s+')
+
+
+def fold(text):
+    text = unicodedata.normalize('NFKD', text)
+    return ''.join(ch for ch in text if not unicodedata.combining(ch)).lower()
+
+
+def tokenize(text):
+    return [t for t in _TOKEN_RE.findall(fold(text)) if len(t) <= MAX_TERM_LENGTH]
+
+
+class VisibleText(Visitor):
+    """The text a reader sees on a page, plus the anchors of its headings."""
+
+    name = 'search_text'
+    version = 3
+
+    def begin(self, doc):
+        self.title = ''
+        self.description = ''
+        self.noindex = False
+        self.canonical = None
+        self.skip = []
+        self.parts = []
+        self.sections = []
+        self.heading = None
+        self.last_id = None
+
+    def start_tag(self, doc, node):
+        name = node.name
+        if name == 'title':
+            self.title = _SPACE_RE.sub(' ', doc.inner_text(node)).strip()
+        elif name == 'meta':
+            meta = (node.get('name') or '').lower()
+            if meta == 'description':
+                self.description = (node.get('content') or '').strip()
+            elif meta == 'robots' and 'noindex' in (node.get('content') or '').lower():
+                self.noindex = True
+        elif name == 'link' and 'canonical' in (node.get('rel') or '').lower().split():
+            self.canonical = (node.get('href') or '').strip() or None
+        if name in VOID_ELEMENTS:
+            if name in ('br', 'hr') and not self.skip:
+                self.text_part(' ')
+            return
+        hidden = node.attr('hidden') is not None or (node.get('aria-hidden') or '').lower() == 'true'
+        if self.skip or name in SKIP_ELEMENTS or hidden:
+            self.skip.append(name)
+            return
+        if node.get('id'):
+            self.last_id = node.get('id')
+        if name in HEADINGS:
+            self.heading = {'id': node.get('id') or self.last_id, 'parts': [], 'start': len(self.parts)}
+        self.parts.append(' ')
+
+    def end_tag(self, doc, node):
+        if self.skip:
+            if node.name == self.skip[-1]:
+                self.skip.pop()
+            return
+        if self.heading is not None and node.name in HEADINGS:
+            text = _SPACE_RE.sub(' ', ''.join(self.heading['parts'])).strip()
+            if text:
+                self.sections.append({'id': self.heading['id'], 'title': text, 'part': self.heading['start']})
+            self.heading = None
+        self.parts.append(' ')
+
+    def text(self, doc, node):
+        if not self.skip:
+            self.text_part(html.unescape(doc.source(node)))
+
+    def text_part(self, text):
+        self.parts.append(text)
+        if self.heading is not None:
+            self.heading['parts'].append(text)
+
+    def finish(self, doc):
+        # Positions count the title's tokens first, as in ``postings``.
+        offset = len(tokenize(self.title))
+        sections = []
+        offsets = []
+        for section in self.sections:
+            before = ''.join(self.parts[:section['part']])
+            sections.append([offset + len(tokenize(before)), section['id'], section['title']])
+            offsets.append(len(_SPACE_RE.sub(' ', before).lstrip()))
+        return {
+            'title': self.title,
+            'description': self.description,
+            'noindex': self.noindex,
+            'canonical': self.canonical,
+            'text': _SPACE_RE.sub(' ', ''.join(self.parts)).strip(),
+            'sections': sections,
+            # Where each section starts in ``text``, for passage splitting.
+            'offsets': offsets,
+        }
+
+
+def text_visitors(path):
+    return [VisibleText()]
+
+
+def robots_disallowed(path=ROBOTS_PATH):
+    """``Disallow`` prefixes of the ``User-agent: *`` group."""
+    prefixes = []
+    active = False
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return prefixes
+    for line in lines:
+        key, _, value = line.split('#', 1)[0].partition(':')
+        key, value = key.strip().lower(), value.strip()
+        if key == 'user-agent':
+            active = value == '*'
+        elif key == 'disallow' and active and value:
+            prefixes.append(value)
+    return prefixes
+
+
+def page_url(rel):
+    if rel == 'index.html':
+        return '/'
+    if rel.endswith('/index.html'):
+        return '/' + rel[:-len('index.html')]
+    return '/' + (rel[:-len('.html')] if rel.endswith('.html') else rel)
+
+
+def postings(docs):
+    """``{term: {doc_id: [positions]}}`` for ``{doc_id: text}``."""
+    index = defaultdict(dict)
+    for doc_id, (title, text) in sorted(docs.items()):
+        # The title counts as the first words of the page.
+        for pos, term in enumerate(tokenize(title) + tokenize(text)):
+            if term in STOP_WORDS:
+                continue
+            index[term].setdefault(doc_id, []).append(pos)
+    return index
+
+
+def encode_postings(by_doc):
+    encoded = []
+    for doc_id in sorted(by_doc):
+        row = [doc_id]
+        last = 0
+        for pos in by_doc[doc_id]:
+            row.append(pos - last)
+            last = pos
+        encoded.append(row)
+    return encoded
+
+
+def _dump(data):
+    return json.dumps(data, separators=(',', ':'), sort_keys=True, ensure_ascii=False)
+
+
+def shard(index, max_bytes=MAX_SHARD_BYTES):
+    """``{prefix: {term: postings}}``, splitting prefixes until shards fit ``max_bytes``."""
+    encoded = {term: encode_postings(by_doc) for term, by_doc in index.items()}
+    pending = [('', sorted(encoded))]
+    shards = {}
+    while pending:
+        prefix, terms = pending.pop()
+        groups = defaultdict(list)
+        for term in terms:
+            groups[term[:len(prefix) + 1]].append(term)
+        for key, group in groups.items():
+            data = {term: encoded[term] for term in group}
+            exact = [t for t in group if len(t) <= len(key)]
+            if len(_dump(data).encode('utf-8')) > max_bytes and len(key) < MAX_PREFIX and len(group) > len(exact):
+                # Terms no longer than the prefix stay in the prefix's own shard.
+                if exact:
+                    shards[key] = {term: encoded[term] for term in exact}
+                pending.append((key, [t for t in group if len(t) > len(key)]))
+            else:
+                shards[key] = data
+    return shards
+
+
+def load_index(path=INDEX_PATH):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return data if data.get('version') == FORMAT_VERSION else None
+
+
+def assign_ids(urls, previous):
+    """Doc id per url, keeping the previous build's ids so unchanged shards stay identical."""
+    old = {}
+    if previous:
+        for doc_id, doc in enumerate(previous['docs']):
+            if doc is not None:
+                old[doc[0]] = doc_id
+    ids = {url: old[url] for url in urls if url in old}
+    free = sorted(set(range(len(previous['docs']) if previous else 0)) - set(ids.values()))
+    next_id = len(previous['docs']) if previous else 0
+    for url in sorted(urls):
+        if url in ids:
+            continue
+        if free:
+            ids[url] = free.pop(0)
+        else:
+            ids[url] = next_id
+            next_id += 1
+    return ids
+
+
+def build(pages, previous=None, max_bytes=MAX_SHARD_BYTES):
+    """``(index_json, {filename: shard_text})`` for ``{rel: extracted}``."""
+    urls = {page_url(rel): info for rel, info in pages.items()}
+    ids = assign_ids(urls, previous)
+    # Holes left by removed pages are reused; trailing ones are dropped here.
+    size = max(ids.values()) + 1 if ids else 0
+    docs = [None] * size
+    texts = {}
+    for url, info in urls.items():
+        doc_id = ids[url]
+        docs[doc_id] = [url, info['title'], info['description'], info['sections']]
+        texts[doc_id] = (info['title'], info['text'])
+    files = {}
+    shard_map = {}
+    for prefix, data in sorted(shard(postings(texts), max_bytes).items()):
+        text = _dump(data)
+        filename = f'{prefix}.{short_hash(text.encode("utf-8"))}.json'
+        files[filename] = text
+        shard_map[prefix] = filename
+    index = {
+        'version': FORMAT_VERSION,
+        'docs': docs,
+        'shards': shard_map,
+        'stopWords': sorted(STOP_WORDS),
+        'maxTermLength': MAX_TERM_LENGTH,
+    }
+    return index, files
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--max-shard', type=int, default=MAX_SHARD_BYTES,
+                        help=f'split a shard by a longer prefix above this size (default: {MAX_SHARD_BYTES})')
+    parser.add_argument('--dry-run', action='store_true', help='report without writing anything')
+    parser.add_argument('--jobs', type=int, default=None, help='worker processes (default: CPU count)')
+    args = parser.parse_args()
+
+    manifest = Manifest(SEARCH_MANIFEST_PATH)
+    paths = document.page_paths()
+    report = engine.run(text_visitors, paths, workers=args.jobs, manifest=manifest, write=False)
+    manifest.prune(paths)
+    manifest.save()
+
+    disallowed = robots_disallowed()
+    pages = {}
+    skipped = []
+    for result in report.results:
+        if result.status == engine.FAILED:
+            print(f"Error {result.path}: {result.error}")
+            continue
+        rel = os.path.relpath(result.path, document.PUBLIC_DIR).replace(os.sep, '/')
+        info = result.results['search_text']
+        url = page_url(rel)
+        if info['noindex'] or any(url.startswith(prefix) for prefix in disallowed):
+            skipped.append(rel)
+            continue
+        pages[rel] = info
+    fresh = sum(1 for r in report.results if r.status != engine.FAILED and not r.cached)
+    print(f"Extracted text from {fresh} changed page(s), {len(report.results) - fresh} from cache")
+    if skipped:
+        print(f"Not indexed (noindex/robots.txt): {', '.join(sorted(skipped))}")
+
+    previous = load_index()
+    index, files = build(pages, previous, args.max_shard)
+    terms = sum(1 for text in files.values() for _ in json.loads(text))
+    total = sum(len(text.encode('utf-8')) for text in files.values())
+    old_files = set(previous['shards'].values()) if previous else set()
+    changed = sorted(set(files) - old_files)
+    print(f"{len(pages)} pages, {terms} terms in {len(files)} shards ({total} bytes); "
+          f"{len(changed)} shard(s) changed")
+    if args.dry_run:
+        return
+
+    directory = os.path.join(document.PUBLIC_DIR, SEARCH_DIR)
+    os.makedirs(directory, exist_ok=True)
+    for filename in changed:
+        writer.write_text(os.path.join(directory, filename), files[filename])
+    writer.write_text(INDEX_PATH, _dump(index) + '\n')
+    removed = 0
+    for filename in os.listdir(directory):
+        if filename.endswith('.json') and filename != 'index.json' and filename not in files:
+            os.unlink(os.path.join(directory, filename))
+            removed += 1
+    print(f"Wrote {posixpath.join(SEARCH_DIR, 'index.json')}, {len(changed)} shard(s), removed {removed} stale")
+
+
+if __name__ == "__main__":
+    main()
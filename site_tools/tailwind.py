@@ -0,0 +1,398 @@
+"""Replace the runtime Tailwind CDN with a purged, prebuilt stylesheet.
+
+Usage: python3 -m site_tools.tailwind [--per-page] [--dry-run] [--build CSS] [--jobs N]
+
+First generates the full Tailwind build from src/input.css with the
+Tailwind CLI (``npx @tailwindcss/cli``, installed by ``npm ci``) into
+.cache/tailwind/tailwind.full.css; its ``@source`` globs scan public/, so
+every variant and arbitrary value the pages use (``focus:not-sr-only``,
+``text-[10px]``, ``drop-shadow-[...]``) gets a rule. ``--build CSS`` purges
+an existing full build instead, without running the CLI.
+
+Then collects every class token the site can use (class attributes, inline
+scripts and public/js/*.js), keeps only the matching rules from the full
+build, drops theme variables, @property rules and keyframes that nothing
+references any more, and writes public/css/tailwind.site.css (or one
+public/css/tw/<page>.css per page with ``--per-page``). Pages loading
+cdn.tailwindcss.com are rewritten to link the purged stylesheet instead.
+
+Classes used in markup but missing from the full build would lose their
+styles once the CDN is gone, so when there are any they are listed, nothing
+is written, pages keep the CDN link and the run exits 1.
+"""
+import argparse
+import os
+import posixpath
+import re
+import subprocess
+
+from site_tools import css, document, engine, writer
+from site_tools.document import Visitor
+from site_tools.fingerprint import logical_name
+from site_tools.manifest import CACHE_DIR, ROOT, Manifest
+
+TAILWIND_INPUT = os.path.join(ROOT, 'src', 'input.css')
+TAILWIND_BUILD = os.path.join(CACHE_DIR, 'tailwind', 'tailwind.full.css')
+TAILWIND_TIMEOUT = 300
+SITE_STYLESHEET = 'css/tailwind.site.css'
+PER_PAGE_DIR = 'css/tw'
+CDN_HOST = 'cdn.tailwindcss.com'
+JS_DIR = os.path.join(document.PUBLIC_DIR, 'js')
+
+# Layers whose rules are kept only when a used class selects them.
+PURGED_LAYERS = ('utilities', 'components')
+# Layers holding variable defaults that are kept only when referenced.
+VARIABLE_LAYERS = ('theme', 'properties')
+
+_CANDIDATE_SPLIT_RE = re.compile(r'[\s"`<>;{}=]+')
+_CANDIDATE_TRIM = '\'",;()`'
+
+
+def candidates(text):
+    """Every substring of ``text`` that could be a class name (over-inclusive by design)."""
+    found = set()
+    for token in _CANDIDATE_SPLIT_RE.split(text):
+        if not token:
+            continue
+        found.add(token)
+        trimmed = token.strip(_CANDIDATE_TRIM)
+        if trimmed:
+            found.add(trimmed)
+    return found
+
+
+class ClassCollector(Visitor):
+    """Collects class attribute tokens, inline-script candidates and local script srcs."""
+
+    name = 'classes'
+
+    def begin(self, doc):
+        self.classes = set()
+        self.script_tokens = set()
+        self.scripts = []
+        self.in_script = False
+
+    def start_tag(self, doc, node):
+        cls = node.get('class')
+        if cls:
+            self.classes.update(cls.split())
+        if node.name == 'script':
+            self.in_script = True
+            src = node.get('src')
+            if src and not src.startswith(('http:', 'https:', '//')):
+                self.scripts.append(logical_name(src.split('?')[0].lstrip('/')))
+
+    def end_tag(self, doc, node):
+        if node.name == 'script':
+            self.in_script = False
+
+    def text(self, doc, node):
+        if self.in_script:
+            self.script_tokens.update(candidates(doc.text[node.start:node.end]))
+
+    def finish(self, doc):
+        return {'classes': self.classes, 'script_tokens': self.script_tokens, 'scripts': self.scripts}
+
+
+def _filter_rules(items, used):
+    kept = []
+    for item in items:
+        if isinstance(item, css.Decl):
+            kept.append(item)
+        elif item.is_at_rule:
+            if item.children is None:
+                kept.append(item)
+                continue
+            children = _filter_rules(item.children, used)
+            if children:
+                kept.append(css.Block(item.prelude, children))
+        else:
+            selectors = [s for s in css.split_selectors(item.prelude)
+                         if all(c in used for c in css.selector_classes(s))]
+            if selectors:
+                kept.append(css.Block(','.join(selectors), item.children))
+    return kept
+
+
+def _is_layer(item, names):
+    return isinstance(item, css.Block) and item.at_keyword == 'layer' and item.at_params in names
+
+
+def _prune_variables(items, referenced):
+    kept = []
+    for item in items:
+        if isinstance(item, css.Decl):
+            prop = item.custom_property
+            if prop is None or prop in referenced:
+                kept.append(item)
+        elif item.children is not None:
+            children = _prune_variables(item.children, referenced)
+            if children:
+                kept.append(css.Block(item.prelude, children))
+        else:
+            kept.append(item)
+    return kept
+
+
+def _custom_properties(items):
+    values = {}
+    for item in items:
+        if isinstance(item, css.Decl):
+            prop = item.custom_property
+            if prop:
+                values.setdefault(prop, set()).update(css.var_references(item.text))
+        elif item.children:
+            for prop, refs in _custom_properties(item.children).items():
+                values.setdefault(prop, set()).update(refs)
+    return values
+
+
+def purge(items, used):
+    """Keep only rules selected by ``used`` classes plus the variables/keyframes they need."""
+    kept = []
+    variable_layers = []
+    property_rules = []
+    keyframes = []
+    for item in items:
+        if _is_layer(item, PURGED_LAYERS):
+            kept.append(css.Block(item.prelude, _filter_rules(item.children or [], used)))
+        elif _is_layer(item, VARIABLE_LAYERS):
+            variable_layers.append(len(kept))
+            kept.append(item)
+        elif isinstance(item, css.Block) and item.at_keyword == 'property':
+            property_rules.append(item)
+        elif isinstance(item, css.Block) and item.at_keyword == 'keyframes':
+            keyframes.append(item)
+        else:
+            kept.append(item)
+
+    variables = [kept[i] for i in variable_layers]
+    body_text = css.serialize([item for i, item in enumerate(kept) if i not in variable_layers])
+    referenced = css.var_references(body_text)
+    definitions = _custom_properties(variables)
+    pending = list(referenced)
+    while pending:
+        for ref in definitions.get(pending.pop(), ()):
+            if ref not in referenced:
+                referenced.add(ref)
+                pending.append(ref)
+
+    for i in variable_layers:
+        kept[i] = css.Block(kept[i].prelude, _prune_variables(kept[i].children or [], referenced))
+    animated = css.serialize(kept)
+    kept += [p for p in property_rules if p.at_params in referenced]
+    kept += [k for k in keyframes
+             if re.search(r'(?<![\w-])%s(?![\w-])' % re.escape(k.at_params), animated)]
+    return [item for item in kept if not (isinstance(item, css.Block) and item.children == [])]
+
+
+def tailwind_classes(items):
+    classes = set()
+    for item in items:
+        if _is_layer(item, PURGED_LAYERS):
+            for block, _ in css.walk_rules(item.children or []):
+                if not block.is_at_rule:
+                    for selector in css.split_selectors(block.prelude):
+                        classes.update(css.selector_classes(selector))
+    return classes
+
+
+def utility_root(cls):
+    """``md:hover:-translate-x-2`` -> ``translate``; used to tell Tailwind classes from others."""
+    base = cls.rsplit(':', 1)[-1].lstrip('!-')
+    return base.split('-', 1)[0].split('[', 1)[0]
+
+
+def generate(output=TAILWIND_BUILD, source=TAILWIND_INPUT):
+    """Write the full (unpurged) Tailwind build for the current pages to ``output``."""
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    command = ['npx', '--no-install', '@tailwindcss/cli', '-i', source, '-o', output, '--minify']
+    try:
+        result = subprocess.run(command, cwd=ROOT, capture_output=True, text=True, timeout=TAILWIND_TIMEOUT)
+    except FileNotFoundError:
+        raise SystemExit("npx not found; install Node.js and run npm ci")
+    except subprocess.TimeoutExpired:
+        raise SystemExit(f"Tailwind CLI timed out after {TAILWIND_TIMEOUT}s")
+    if result.returncode != 0:
+        output_lines = (result.stderr or result.stdout).strip().splitlines()
+        raise SystemExit(f"Tailwind CLI failed: {output_lines[0] if output_lines else f'exit {result.returncode}'}"
+                         " (run npm ci, or pass --build with an existing full build)")
+
+
+def _is_tailwind_output(rel):
+    """Tailwind builds in public/css (the old full build, purged sheets) are not the site's own CSS."""
+    rel = logical_name(rel)
+    return rel in ('css/tailwind.min.css', SITE_STYLESHEET) or rel.startswith(PER_PAGE_DIR + '/')
+
+
+def own_stylesheet_classes():
+    classes = set()
+    css_dir = os.path.join(document.PUBLIC_DIR, 'css')
+    for dirpath, _, filenames in os.walk(css_dir):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            rel = os.path.relpath(path, document.PUBLIC_DIR).replace(os.sep, '/')
+            if not filename.endswith('.css') or _is_tailwind_output(rel):
+                continue
+            with open(path, 'r', encoding='utf-8') as f:
+                for block, _ in css.walk_rules(css.parse(f.read())):
+                    if not block.is_at_rule:
+                        classes.update(css.selector_classes(block.prelude, include_pseudo_args=True))
+    return classes
+
+
+def inline_style_classes(doc):
+    classes = set()
+    for node in doc.tags('style'):
+        for block, _ in css.walk_rules(css.parse(doc.inner_text(node))):
+            if not block.is_at_rule:
+                classes.update(css.selector_classes(block.prelude, include_pseudo_args=True))
+    return classes
+
+
+def js_candidates():
+    tokens = {}
+    if not os.path.isdir(JS_DIR):
+        return tokens
+    for filename in sorted(os.listdir(JS_DIR)):
+        if filename.endswith('.js') and logical_name('js/' + filename) == 'js/' + filename:
+            with open(os.path.join(JS_DIR, filename), 'r', encoding='utf-8') as f:
+                tokens['js/' + filename] = candidates(f.read())
+    return tokens
+
+
+def _line_span(text, start, end):
+    """Widen ``start:end`` to its whole line when nothing else shares the line."""
+    line_start = text.rfind('\n', 0, start) + 1
+    line_end = text.find('\n', end)
+    line_end = len(text) if line_end == -1 else line_end + 1
+    if text[line_start:start].strip() or text[end:line_end].strip():
+        return start, end
+    return line_start, line_end
+
+
+class CdnToStylesheet(Visitor):
+    """Swaps the Tailwind CDN script (or a previous purged link) for ``href``.
+
+    ``dns-prefetch``/``preconnect`` hints for the CDN host are dropped too.
+    """
+
+    name = 'tailwind'
+
+    def __init__(self, href):
+        self.href = href
+
+    def cache_key(self):
+        return f'{super().cache_key()}:{self.href}'
+
+    def begin(self, doc):
+        self.replaced = 0
+
+    def start_tag(self, doc, node):
+        if node.name == 'script' and CDN_HOST in node.get('src', ''):
+            span = doc.element_range(node)
+            if span is not None:
+                self.replace(span[0], span[1], f'<link rel="stylesheet" href="{self.href}">')
+                self.replaced += 1
+        elif node.name == 'link' and CDN_HOST in node.get('href', ''):
+            self.replace(*_line_span(doc.text, node.start, node.end), '')
+            self.replaced += 1
+        elif node.name == 'link' and node.get('rel') == 'stylesheet':
+            attr = node.attr('href')
+            href = logical_name(attr.value) if attr is not None and attr.raw is not None else ''
+            if (href == SITE_STYLESHEET or href.startswith(PER_PAGE_DIR + '/')) and href != self.href:
+                self.replace(attr.value_start, attr.value_end, self.href)
+                self.replaced += 1
+
+    def finish(self, doc):
+        return {'replaced': self.replaced}
+
+
+class LinkStylesheet:
+    """Picklable visitor factory: per-site or per-page stylesheet href."""
+
+    def __init__(self, per_page=False):
+        self.per_page = per_page
+
+    def __call__(self, path):
+        if self.per_page:
+            stem = os.path.splitext(os.path.basename(path))[0]
+            return [CdnToStylesheet(posixpath.join(PER_PAGE_DIR, stem + '.css'))]
+        return [CdnToStylesheet(SITE_STYLESHEET)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--per-page', action='store_true', help='emit one stylesheet per page')
+    parser.add_argument('--dry-run', action='store_true', help='report without writing anything')
+    parser.add_argument('--build', metavar='CSS', help='purge this full Tailwind build instead of generating one')
+    parser.add_argument('--jobs', type=int, default=None, help='worker processes (default: CPU count)')
+    args = parser.parse_args()
+
+    build = args.build or TAILWIND_BUILD
+    if not args.build:
+        generate(build)
+    with open(build, 'r', encoding='utf-8') as f:
+        full = css.parse(f.read())
+    available = tailwind_classes(full)
+    roots = {utility_root(c) for c in available}
+    js_tokens = js_candidates()
+    all_js = set().union(*js_tokens.values()) if js_tokens else set()
+
+    own = own_stylesheet_classes()
+    paths = document.page_paths()
+    site_used = set(all_js)
+    uncovered = {}
+    outputs = {}
+    for path in paths:
+        doc = document.load(path)
+        results, _ = document.walk(doc, [ClassCollector()])
+        info = results['classes']
+        page_used = info['classes'] | info['script_tokens']
+        site_used |= page_used
+        missing = info['classes'] - available - own - inline_style_classes(doc)
+        for cls in missing:
+            if utility_root(cls) not in roots:
+                continue
+            uncovered.setdefault(cls, []).append(doc.name)
+        if args.per_page:
+            for script in info['scripts']:
+                page_used |= js_tokens.get(script, set())
+            stem = os.path.splitext(doc.name)[0]
+            outputs[posixpath.join(PER_PAGE_DIR, stem + '.css')] = page_used
+
+    if not args.per_page:
+        outputs[SITE_STYLESHEET] = site_used
+
+    if uncovered:
+        print(f"{len(uncovered)} class(es) used in markup have no rule in {os.path.relpath(build)} "
+              f"or the site stylesheets:")
+        for cls in sorted(uncovered)[:40]:
+            print(f"  {cls}  ({', '.join(sorted(uncovered[cls])[:3])})")
+        if len(uncovered) > 40:
+            print(f"  ... and {len(uncovered) - 40} more")
+        print("Pages keep the Tailwind CDN.")
+        raise SystemExit(1)
+
+    full_size = os.path.getsize(build)
+    for rel, used in sorted(outputs.items()):
+        text = css.serialize(purge(full, used))
+        target = os.path.join(document.PUBLIC_DIR, rel)
+        print(f"{rel}: {len(text.encode('utf-8'))} bytes (full build {full_size})")
+        if not args.dry_run:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            writer.write_text(target, text + '\n')
+
+    manifest = Manifest()
+    report = engine.run(LinkStylesheet(args.per_page), paths, workers=args.jobs,
+                        manifest=manifest, write=not args.dry_run)
+    manifest.save()
+    for result in report.results:
+        if result.status == engine.FAILED:
+            print(f"Error {result.path}: {result.error}")
+        elif result.status == engine.UPDATED:
+            print(f"Updated {result.path}")
+    print(report.summary())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Tokenizer, element matching and edit splicing in site_tools.document."""
+import unittest
+
+from site_tools.document import COMMENT, END, START, TEXT, Document, apply_edits, tokenize
+
+
+def kinds(text):
+    return [(n.kind, n.name, text[n.start:n.end]) for n in tokenize(text)]
+
+
+class TokenizeTest(unittest.TestCase):
+
+    def test_offsets_cover_the_text(self):
+        text = '<!DOCTYPE html><p class="a">Hi <b>there</b></p>\n'
+        nodes = tokenize(text)
+        self.assertEqual(''.join(text[n.start:n.end] for n in nodes), text)
+        self.assertEqual([n.index for n in nodes], list(range(len(nodes))))
+
+    def test_attributes(self):
+        text = '<a href="/x" data-id=\'7\' hidden title=plain>'
+        node = tokenize(text)[0]
+        self.assertEqual(node.get('href'), '/x')
+        self.assertEqual(node.get('data-id'), '7')
+        self.assertEqual(node.get('title'), 'plain')
+        self.assertIsNotNone(node.attr('hidden'))
+        attr = node.attr('href')
+        self.assertEqual(text[attr.value_start:attr.value_end], '/x')
+
+    def test_comment_hides_markup(self):
+        self.assertEqual(kinds('<!-- <div> --><p>'), [
+            (COMMENT, None, '<!-- <div> -->'),
+            (START, 'p', '<p>'),
+        ])
+
+    def test_script_and_style_are_raw_text(self):
+        text = '<script>if (a < b) { x = "</div>"; }</script><style>p > a {}</style>'
+        self.assertEqual(kinds(text), [
+            (START, 'script', '<script>'),
+            (TEXT, None, 'if (a < b) { x = "</div>"; }'),
+            (END, 'script', '</script>'),
+            (START, 'style', '<style>'),
+            (TEXT, None, 'p > a {}'),
+            (END, 'style', '</style>'),
+        ])
+
+    def test_unclosed_script_runs_to_the_end(self):
+        self.assertEqual(kinds('<script>let s = "<p>";'), [
+            (START, 'script', '<script>'),
+            (TEXT, None, 'let s = "<p>";'),
+        ])
+
+    def test_attribute_values_may_contain_angle_brackets(self):
+        nodes = tokenize('<div data-x="a > b">t</div>')
+        self.assertEqual([n.kind for n in nodes], [START, TEXT, END])
+        self.assertEqual(nodes[0].get('data-x'), 'a > b')
+
+
+class ClosersTest(unittest.TestCase):
+
+    def element(self, doc, node):
+        start, end = doc.element_range(node)
+        return doc.text[start:end]
+
+    def test_nested_divs(self):
+        doc = Document('t.html', '<div id="a"><div id="b"><p>x</p></div><div id="c"></div></div>')
+        outer, inner, last = doc.tags('div')
+        self.assertEqual(self.element(doc, outer), doc.text)
+        self.assertEqual(self.element(doc, inner), '<div id="b"><p>x</p></div>')
+        self.assertEqual(self.element(doc, last), '<div id="c"></div>')
+
+    def test_void_and_self_closing_map_to_themselves(self):
+        doc = Document('t.html', '<p><img src="a.png"><br/><svg><path d="M0"/></svg></p>')
+        for name in ('img', 'br', 'path'):
+            node = doc.tags(name)[0]
+            self.assertEqual(doc.closers()[node.index], node.index)
+        self.assertEqual(self.element(doc, doc.tags('p')[0]), doc.text)
+
+    def test_unclosed_inner_element_is_skipped(self):
+        doc = Document('t.html', '<div><p>one<p>two</div>')
+        div = doc.tags('div')[0]
+        self.assertEqual(self.element(doc, div), doc.text)
+        self.assertIsNone(doc.element_range(doc.tags('p')[0]))
+
+    def test_stray_end_tag_is_ignored(self):
+        doc = Document('t.html', '<div></span><span>x</span></div>')
+        self.assertEqual(self.element(doc, doc.tags('div')[0]), doc.text)
+        self.assertEqual(self.element(doc, doc.tags('span')[0]), '<span>x</span>')
+
+    def test_tags_inside_comments_and_scripts_do_not_count(self):
+        doc = Document('t.html', '<div><!-- </div> --><script>"</div>"</script></div>')
+        self.assertEqual(self.element(doc, doc.tags('div')[0]), doc.text)
+
+
+class ApplyEditsTest(unittest.TestCase):
+
+    def test_no_edits_returns_the_text(self):
+        self.assertEqual(apply_edits('abc', []), 'abc')
+
+    def test_edits_apply_in_offset_order(self):
+        self.assertEqual(apply_edits('0123456789', [(7, 8, 'X'), (1, 3, ''), (4, 4, '+')]), '03+456X89')
+
+    def test_adjacent_edits(self):
+        self.assertEqual(apply_edits('abcdef', [(2, 4, 'X'), (0, 2, 'Y'), (4, 6, 'Z')]), 'YXZ')
+
+    def test_insert_at_the_end_of_a_replaced_span(self):
+        self.assertEqual(apply_edits('abcd', [(1, 3, 'X'), (3, 3, '+')]), 'aX+d')
+
+    def test_overlapping_edits_raise(self):
+        with self.assertRaises(ValueError):
+            apply_edits('abcdef', [(0, 3, 'X'), (2, 4, 'Y')])
+
+    def test_nested_edits_raise(self):
+        with self.assertRaises(ValueError):
+            apply_edits('abcdef', [(0, 6, 'X'), (2, 3, 'Y')])
+
+
+if __name__ == '__main__':
+    unittest.main()
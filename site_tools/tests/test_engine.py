@@ -0,0 +1,62 @@
+"""Manifest reuse in site_tools.engine.run."""
+import os
+import tempfile
+import unittest
+
+from site_tools import engine
+from site_tools.document import Visitor
+from site_tools.manifest import Manifest
+
+
+class DropBold(Visitor):
+    name = 'bold'
+    walks = 0
+
+    def begin(self, doc):
+        DropBold.walks += 1
+
+    def start_tag(self, doc, node):
+        if node.name == 'b':
+            self.replace(node.start, node.end, '')
+
+
+class EngineCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.clean = os.path.join(self.tmp.name, 'clean.html')
+        self.pending = os.path.join(self.tmp.name, 'pending.html')
+        for path, text in ((self.clean, '<p>x</p>'), (self.pending, '<b>x')):
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(text)
+        self.manifest = Manifest(os.path.join(self.tmp.name, 'manifest.json'))
+        DropBold.walks = 0
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def run_engine(self, write):
+        report = engine.run(lambda path: [DropBold()], [self.clean, self.pending],
+                            workers=1, manifest=self.manifest, write=write)
+        return {os.path.basename(r.path): (r.status, r.edits, r.cached) for r in report.results}
+
+    def test_dry_run_reuses_pages_with_pending_edits(self):
+        first = self.run_engine(write=False)
+        self.assertEqual(first['pending.html'], (engine.UPDATED, 1, False))
+        self.assertEqual(self.run_engine(write=False), {
+            'clean.html': (engine.SKIPPED, 0, True),
+            'pending.html': (engine.UPDATED, 1, True),
+        })
+        self.assertEqual(DropBold.walks, 2)
+
+    def test_write_reruns_pages_with_pending_edits(self):
+        self.run_engine(write=False)
+        results = self.run_engine(write=True)
+        self.assertEqual(results['clean.html'], (engine.SKIPPED, 0, True))
+        self.assertEqual(results['pending.html'], (engine.UPDATED, 1, False))
+        with open(self.pending, encoding='utf-8') as f:
+            self.assertEqual(f.read(), 'x')
+
+
+if __name__ == '__main__':
+    unittest.main()
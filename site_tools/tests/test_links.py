@@ -0,0 +1,127 @@
+"""ExternalChecker against a stub HTTP server on an ephemeral port."""
+import os
+import socket
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from site_tools.links import BLOCKED, BROKEN, OK, ExternalChecker
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    # path -> {method: (status, headers)}; '*' answers any method.
+    routes = {
+        '/ok': {'*': (200, {})},
+        '/no-head': {'HEAD': (405, {}), 'GET': (200, {})},
+        '/moved': {'*': (301, {'Location': '/ok'})},
+        '/forbidden': {'*': (403, {})},
+        '/missing': {'*': (404, {})},
+    }
+
+    def respond(self):
+        self.server.hits.append((self.command, self.path))
+        route = self.routes.get(self.path, {'*': (404, {})})
+        status, headers = route.get(self.command) or route['*']
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    do_HEAD = do_GET = respond
+
+    def log_message(self, *args):
+        pass
+
+
+def closed_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+class ExternalCheckerTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+        cls.server.hits = []
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+        cls.base = f'http://127.0.0.1:{cls.server.server_address[1]}'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.server.hits.clear()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache_path = os.path.join(self.tmp.name, 'external-links.json')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def checker(self, **kwargs):
+        kwargs.setdefault('cache_path', self.cache_path)
+        return ExternalChecker(interval=0, timeout=5, **kwargs)
+
+    def check_one(self, path):
+        url = self.base + path
+        return self.checker(cache_path=None).check([url])[url]
+
+    def test_ok(self):
+        entry = self.check_one('/ok')
+        self.assertEqual((entry['state'], entry['status']), (OK, 200))
+        self.assertEqual(self.server.hits, [('HEAD', '/ok')])
+
+    def test_head_not_allowed_falls_back_to_get(self):
+        entry = self.check_one('/no-head')
+        self.assertEqual((entry['state'], entry['status']), (OK, 200))
+        self.assertEqual(self.server.hits, [('HEAD', '/no-head'), ('GET', '/no-head')])
+
+    def test_redirect_is_followed(self):
+        entry = self.check_one('/moved')
+        self.assertEqual((entry['state'], entry['status']), (OK, 200))
+        self.assertEqual(self.server.hits, [('HEAD', '/moved'), ('HEAD', '/ok')])
+
+    def test_forbidden_is_blocked(self):
+        entry = self.check_one('/forbidden')
+        self.assertEqual((entry['state'], entry['status']), (BLOCKED, 403))
+
+    def test_not_found_is_broken(self):
+        entry = self.check_one('/missing')
+        self.assertEqual((entry['state'], entry['status']), (BROKEN, 404))
+
+    def test_connection_refused_is_broken(self):
+        url = f'http://127.0.0.1:{closed_port()}/'
+        entry = self.checker(cache_path=None).check([url])[url]
+        self.assertEqual(entry['state'], BROKEN)
+        self.assertIsNone(entry['status'])
+        self.assertTrue(entry['error'])
+
+    def test_cache_is_reused_within_ttl(self):
+        urls = [self.base + '/ok', self.base + '/missing']
+        first = self.checker()
+        first.check(urls)
+        first.save()
+        self.assertEqual(len(self.server.hits), 2)
+
+        again = self.checker().check(urls)
+        self.assertEqual(len(self.server.hits), 2)
+        self.assertEqual(again[urls[0]]['state'], OK)
+        self.assertEqual(again[urls[1]]['state'], BROKEN)
+
+    def test_expired_entries_are_rechecked(self):
+        url = self.base + '/ok'
+        first = self.checker()
+        first.check([url])
+        first.save()
+        self.checker(ttl=0).check([url])
+        self.assertEqual(self.server.hits, [('HEAD', '/ok'), ('HEAD', '/ok')])
+
+
+if __name__ == '__main__':
+    unittest.main()
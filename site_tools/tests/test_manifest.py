@@ -0,0 +1,119 @@
+"""Manifest reuse and invalidation in site_tools.manifest.cached_walk."""
+import os
+import tempfile
+import unittest
+
+from site_tools.document import Visitor
+from site_tools.manifest import Manifest, cached_walk
+
+
+class CountLinks(Visitor):
+    name = 'links'
+    walks = 0
+
+    def begin(self, doc):
+        CountLinks.walks += 1
+        self.count = 0
+
+    def start_tag(self, doc, node):
+        if node.name == 'a':
+            self.count += 1
+
+    def finish(self, doc):
+        return self.count
+
+
+class CountLinksV2(CountLinks):
+    version = 2
+
+
+class DropBold(Visitor):
+    name = 'bold'
+
+    def start_tag(self, doc, node):
+        if node.name == 'b':
+            self.replace(node.start, node.end, '')
+
+
+class ManifestTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.page = os.path.join(self.tmp.name, 'page.html')
+        self.manifest_path = os.path.join(self.tmp.name, 'manifest.json')
+        self.mtime = 10 ** 18
+        self.write('<a href="/"></a>')
+        CountLinks.walks = 0
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, text):
+        with open(self.page, 'w', encoding='utf-8') as f:
+            f.write(text)
+        # Explicit, always-advancing mtimes so coarse filesystem clocks cannot hide an edit.
+        self.mtime += 10 ** 9
+        os.utime(self.page, ns=(self.mtime, self.mtime))
+
+    def walk(self, visitors, manifest, fix=False):
+        results, edits, doc = cached_walk(self.page, visitors, manifest, fix)
+        return results, doc is not None
+
+    def test_unchanged_page_is_reused(self):
+        manifest = Manifest(self.manifest_path)
+        self.assertEqual(self.walk([CountLinks()], manifest), ({'links': 1}, True))
+        self.assertEqual(self.walk([CountLinks()], manifest), ({'links': 1}, False))
+        self.assertEqual(CountLinks.walks, 1)
+
+    def test_results_survive_save_and_load(self):
+        manifest = Manifest(self.manifest_path)
+        self.walk([CountLinks()], manifest)
+        manifest.save()
+        self.assertEqual(self.walk([CountLinks()], Manifest(self.manifest_path)), ({'links': 1}, False))
+        self.assertEqual(CountLinks.walks, 1)
+
+    def test_touched_but_identical_page_is_reused(self):
+        manifest = Manifest(self.manifest_path)
+        self.walk([CountLinks()], manifest)
+        self.write('<a href="/"></a>')
+        self.assertEqual(self.walk([CountLinks()], manifest), ({'links': 1}, False))
+        self.assertEqual(CountLinks.walks, 1)
+
+    def test_content_change_invalidates(self):
+        manifest = Manifest(self.manifest_path)
+        self.walk([CountLinks()], manifest)
+        self.write('<a href="/"></a><a href="/x"></a>')
+        self.assertEqual(self.walk([CountLinks()], manifest), ({'links': 2}, True))
+        self.assertEqual(CountLinks.walks, 2)
+
+    def test_visitor_version_change_invalidates(self):
+        manifest = Manifest(self.manifest_path)
+        self.walk([CountLinks()], manifest)
+        self.assertEqual(self.walk([CountLinksV2()], manifest), ({'links': 1}, True))
+        self.assertEqual(self.walk([CountLinksV2()], manifest), ({'links': 1}, False))
+        self.assertEqual(CountLinks.walks, 2)
+
+    def test_added_visitor_invalidates(self):
+        manifest = Manifest(self.manifest_path)
+        self.walk([CountLinks()], manifest)
+        results, walked = self.walk([CountLinks(), DropBold()], manifest)
+        self.assertTrue(walked)
+        self.assertEqual(results, {'links': 1, 'bold': None})
+
+    def test_pending_edits_are_redone_when_fixing(self):
+        manifest = Manifest(self.manifest_path)
+        self.write('<b>x')
+        self.walk([DropBold()], manifest)
+        self.assertFalse(self.walk([DropBold()], manifest)[1])
+        results, edits, doc = cached_walk(self.page, [DropBold()], manifest, fix=True)
+        self.assertIsNotNone(doc)
+        self.assertEqual(len(edits), 1)
+
+    def test_other_format_version_is_ignored(self):
+        with open(self.manifest_path, 'w', encoding='utf-8') as f:
+            f.write('{"version": 0, "files": {"x": {}}}')
+        self.assertEqual(Manifest(self.manifest_path).entries, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+"""Incremental rebuilds in site_tools.partials.build."""
+import os
+import tempfile
+import unittest
+
+from site_tools.partials import Partials, build, load_graph, record
+
+
+class PartialsBuildTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.partials_dir = os.path.join(self.tmp.name, 'partials')
+        os.mkdir(self.partials_dir)
+        self.pages = [self.write(os.path.join(self.tmp.name, name), '<!-- include:x --><!-- /include:x -->\n')
+                      for name in ('about.html', 'careers.html')]
+        self.graph = load_graph(os.path.join(self.tmp.name, 'missing.json'))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, path, text):
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        return path
+
+    def read(self, path):
+        with open(path, encoding='utf-8') as f:
+            return f.read()
+
+    def partial(self, name, text):
+        self.write(os.path.join(self.partials_dir, name + '.html'), text)
+
+    def build(self, paths):
+        transaction, statuses, entries = build(paths, Partials(self.partials_dir), self.graph)
+        transaction.commit()
+        record(self.graph, entries)
+        return {os.path.basename(path): status.split(':', 1)[0] for path, status, _ in statuses}
+
+    def test_partial_change_reaches_pages_left_out_of_a_partial_build(self):
+        self.partial('x', '<p>v1</p>')
+        self.assertEqual(self.build(self.pages), {'about.html': 'rendered', 'careers.html': 'rendered'})
+        self.assertEqual(self.build(self.pages), {'about.html': 'current', 'careers.html': 'current'})
+
+        self.partial('x', '<p>v2</p>')
+        self.assertEqual(self.build(self.pages[:1]), {'about.html': 'rendered'})
+        self.assertEqual(self.build(self.pages), {'about.html': 'current', 'careers.html': 'rendered'})
+        self.assertIn('<p>v2</p>', self.read(self.pages[1]))
+
+    def test_failed_page_is_retried(self):
+        self.partial('x', '<p>v1</p>')
+        self.build(self.pages)
+        self.partial('x', '<!-- include:y --><!-- /include:y -->')
+        self.assertEqual(self.build(self.pages), {'about.html': 'error', 'careers.html': 'error'})
+
+        self.partial('y', '<p>y</p>')
+        self.assertEqual(self.build(self.pages), {'about.html': 'rendered', 'careers.html': 'rendered'})
+        self.assertIn('<p>y</p>', self.read(self.pages[0]))
+
+
+if __name__ == '__main__':
+    unittest.main()
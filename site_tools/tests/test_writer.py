@@ -0,0 +1,87 @@
+"""Atomic writes and Transaction rollback in site_tools.writer."""
+import os
+import tempfile
+import unittest
+
+from site_tools import writer
+
+
+class WriterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def path(self, name, text=None):
+        path = os.path.join(self.dir, name)
+        if text is not None:
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(text)
+        return path
+
+    def read(self, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return f.read()
+
+    def test_write_text_skips_identical_content(self):
+        path = self.path('a.html', 'same')
+        os.utime(path, ns=(1, 1))
+        self.assertFalse(writer.write_text(path, 'same'))
+        self.assertEqual(os.stat(path).st_mtime_ns, 1)
+        self.assertTrue(writer.write_text(path, 'new'))
+        self.assertEqual(self.read(path), 'new')
+        self.assertEqual(sorted(os.listdir(self.dir)), ['a.html'])
+
+    def test_commit_writes_changed_files_only(self):
+        a = self.path('a.html', 'a')
+        b = self.path('b.html', 'b')
+        with writer.Transaction() as tx:
+            tx.write(a, 'a2')
+            tx.write(b, 'b')
+        self.assertEqual(tx.written, [a])
+        self.assertEqual(tx.unchanged, [b])
+        self.assertEqual(self.read(a), 'a2')
+
+    def test_failing_write_restores_files_already_replaced(self):
+        a = self.path('a.html', 'a')
+        b = self.path('b.html', 'b')
+        created = self.path('new.html')
+        tx = writer.Transaction()
+        tx.write(a, 'a2')
+        tx.write(created, 'new')
+        tx.write(b, 'b2')
+        tx.write(os.path.join(self.dir, 'missing', 'c.html'), 'c')
+        with self.assertRaises(OSError):
+            tx.commit()
+        self.assertEqual(self.read(a), 'a')
+        self.assertEqual(self.read(b), 'b')
+        self.assertFalse(os.path.exists(created))
+        self.assertFalse(tx.committed)
+        self.assertEqual(sorted(os.listdir(self.dir)), ['a.html', 'b.html'])
+
+    def test_exception_in_block_discards_staged_writes(self):
+        a = self.path('a.html', 'a')
+        with self.assertRaises(RuntimeError):
+            with writer.Transaction() as tx:
+                tx.write(a, 'a2')
+                raise RuntimeError('stop')
+        self.assertEqual(self.read(a), 'a')
+
+    def test_rollback_after_commit(self):
+        a = self.path('a.html', 'a')
+        created = self.path('new.html')
+        tx = writer.Transaction()
+        tx.write(a, 'a2')
+        tx.write(created, 'new')
+        tx.commit()
+        self.assertEqual(self.read(a), 'a2')
+        tx.rollback()
+        self.assertEqual(self.read(a), 'a')
+        self.assertFalse(os.path.exists(created))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,444 @@
+"""Watch public/ and re-run only the audits and rewrites an edit affects.
+
+Usage: python3 -m site_tools.watch [--fix] [--debounce MS] [--poll]
+
+Changes are picked up with inotify (through libc, so Linux only; ``--poll``
+or any other platform falls back to polling stats every POLL_INTERVAL). A
+burst of saves is merged until nothing has arrived for ``--debounce``
+milliseconds, then dispatched:
+
+- an edited page gets the maintain audits and rewrites (logo, main.css
+  version, title/description, wordmark), the rule registry and its link
+  check, in one parse;
+- a created, renamed or deleted file re-checks the links of the pages that
+  point at it (or, for a new file, the pages with broken links), resolved
+  like Firebase Hosting by ``links.SiteTree``;
+- an edited partial re-renders the pages that include it.
+
+Rewrites are only applied with ``--fix``; otherwise they are reported like
+``maintain`` does. Results reuse the .cache/site-manifest.json cache, so
+touching a page without changing it costs one hash. Link problems are
+printed when they appear or go away; the full list is printed at start-up.
+"""
+import argparse
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import time
+
+from site_tools import document, engine
+from site_tools.hosting import Hosting
+from site_tools.links import LinkTargets, SiteTree, check_local, classify, collect
+from site_tools.maintain import page_findings, visitors_for
+from site_tools.manifest import Manifest
+from site_tools.partials import PARTIALS_DIR, Partials, build, load_graph, record, save_graph
+from site_tools.rules import RuleAudit
+
+DEBOUNCE = 0.05
+# Upper bound on how long a steady stream of events can delay a run.
+MAX_WAIT = 0.5
+POLL_INTERVAL = 0.5
+# Pages named per broken or fixed link; the rest are counted.
+MAX_SOURCES = 5
+
+CHANGED = 'changed'
+REMOVED = 'removed'
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+_EVENT = struct.Struct('iIII')
+
+
+def ignored_name(name):
+    """Dotfiles (including writer's temp files) and editor swap/backup files."""
+    return name.startswith('.') or name.endswith(('~', '.swp', '.swx')) or name == '4913'
+
+
+class Inotify:
+    """Recursive inotify watch over directory trees."""
+
+    def __init__(self, roots):
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        if not hasattr(self.libc, 'inotify_init1'):
+            raise OSError('inotify is not available')
+        self.fd = self.libc.inotify_init1(os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self.dirs = {}
+        self.overflowed = False
+        for root in roots:
+            self.add_tree(root)
+
+    def add_tree(self, top):
+        """Watch ``top`` and its subdirectories; returns the files already in them."""
+        files = []
+        for dirpath, dirnames, filenames in os.walk(top):
+            dirnames[:] = [d for d in dirnames if not ignored_name(d)]
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(dirpath), WATCH_MASK)
+            if wd < 0:
+                err = ctypes.get_errno()
+                raise OSError(err, f'{os.strerror(err)}: {dirpath}')
+            self.dirs[wd] = dirpath
+            files += [os.path.join(dirpath, f) for f in filenames if not ignored_name(f)]
+        return files
+
+    def drop_tree(self, top):
+        for wd, path in list(self.dirs.items()):
+            if path == top or path.startswith(top + os.sep):
+                self.libc.inotify_rm_watch(self.fd, wd)
+                del self.dirs[wd]
+
+    def read(self, timeout):
+        """``{path: CHANGED|REMOVED}`` for events within ``timeout`` seconds (None waits)."""
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return {}
+        data = os.read(self.fd, 1 << 16)
+        changes = {}
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = _EVENT.unpack_from(data, offset)
+            name = data[offset + _EVENT.size:offset + _EVENT.size + length].split(b'\0', 1)[0]
+            offset += _EVENT.size + length
+            if mask & IN_Q_OVERFLOW:
+                self.overflowed = True
+                continue
+            if mask & IN_IGNORED:
+                self.dirs.pop(wd, None)
+                continue
+            directory = self.dirs.get(wd)
+            if directory is None or not name or ignored_name(os.fsdecode(name)):
+                continue
+            path = os.path.join(directory, os.fsdecode(name))
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    # Files can land in a new directory before its watch exists.
+                    try:
+                        changes.update((f, CHANGED) for f in self.add_tree(path))
+                    except OSError as e:
+                        print(f"Cannot watch {path}: {e}")
+                elif mask & (IN_DELETE | IN_MOVED_FROM):
+                    self.drop_tree(path)
+                    changes[path] = REMOVED
+            elif mask & (IN_DELETE | IN_MOVED_FROM):
+                changes[path] = REMOVED
+            elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+                changes[path] = CHANGED
+        return changes
+
+    def close(self):
+        os.close(self.fd)
+
+
+class Poller:
+    """Stat-polling stand-in for ``Inotify``."""
+
+    def __init__(self, roots, interval=POLL_INTERVAL):
+        self.roots = roots
+        self.interval = interval
+        self.overflowed = False
+        self.snapshot = self.scan()
+
+    def scan(self):
+        stats = {}
+        for root in self.roots:
+            for dirpath, dirnames, filenames in os.walk(root):
+                dirnames[:] = [d for d in dirnames if not ignored_name(d)]
+                for name in filenames:
+                    if ignored_name(name):
+                        continue
+                    path = os.path.join(dirpath, name)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    stats[path] = (st.st_mtime_ns, st.st_size)
+        return stats
+
+    def read(self, timeout):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            current = self.scan()
+            changes = {path: CHANGED for path, st in current.items() if self.snapshot.get(path) != st}
+            changes.update((path, REMOVED) for path in self.snapshot if path not in current)
+            self.snapshot = current
+            if changes:
+                return changes
+            if deadline is None:
+                time.sleep(self.interval)
+            else:
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    return {}
+                time.sleep(min(self.interval, left))
+
+    def close(self):
+        pass
+
+
+def batches(watcher, debounce=DEBOUNCE, max_wait=MAX_WAIT):
+    """Yield merged changes once ``debounce`` seconds pass without another event."""
+    while True:
+        changes = watcher.read(None)
+        if not changes and not watcher.overflowed:
+            continue
+        deadline = time.monotonic() + max_wait
+        while True:
+            left = deadline - time.monotonic()
+            if left <= 0:
+                break
+            more = watcher.read(min(debounce, left))
+            if not more:
+                break
+            changes.update(more)
+        yield changes
+
+
+def watch_visitors(path):
+    return visitors_for(path) + [RuleAudit(), LinkTargets()]
+
+
+def page_rel(path):
+    return os.path.relpath(path, document.PUBLIC_DIR).replace(os.sep, '/')
+
+
+class Session:
+    """The link graph and caches kept between batches."""
+
+    def __init__(self, fix=False, partials_dir=PARTIALS_DIR):
+        self.fix = fix
+        self.partials = Partials(partials_dir)
+        self.partials_dir = os.path.abspath(partials_dir)
+        self.public_dir = os.path.abspath(document.PUBLIC_DIR)
+        self.manifest = Manifest()
+        self.hosting = Hosting.load()
+        # Stat of pages written with --fix, so their own events are not re-run.
+        self.written = {}
+        self.load()
+
+    def load(self):
+        """Full pass: list public/, collect every page's ids and links, check them."""
+        self.tree = SiteTree(hosting=self.hosting)
+        pages = collect(document.page_paths(), self.manifest)
+        self.manifest.save()
+        self.ids = {rel: data['ids'] for rel, data in pages.items()}
+        self.refs = {rel: data['refs'] for rel, data in pages.items()}
+        self.targets = {}
+        self.linked_from = {}
+        self.broken = {}
+        for rel in self.refs:
+            self.index(rel)
+            self.broken[rel] = self.check_links(rel)
+
+    def forget(self, rel):
+        for target in self.targets.pop(rel, ()):
+            self.linked_from[target].discard(rel)
+
+    def index(self, rel):
+        """Record which files the links on ``rel`` resolve to."""
+        self.forget(rel)
+        targets = set()
+        for value in self.refs.get(rel, ()):
+            kind, path, _ = classify(rel, value)
+            if kind == 'local' and path is not None:
+                status, target = self.tree.resolve(path)
+                if status == 'file':
+                    targets.add(target)
+        self.targets[rel] = targets
+        for target in targets:
+            self.linked_from.setdefault(target, set()).add(rel)
+
+    def check_links(self, rel):
+        problems = []
+        for value in self.refs.get(rel, ()):
+            error = check_local(self.tree, self.ids, rel, value)
+            if error:
+                problems.append((value, error))
+        return problems
+
+    def is_echo(self, path):
+        stamp = self.written.pop(path, None)
+        if stamp is None:
+            return False
+        try:
+            st = os.stat(path)
+        except OSError:
+            return False
+        return stamp == (st.st_mtime_ns, st.st_size)
+
+    def update_tree(self, changes):
+        """Apply file changes to the tree; returns ``(pages, created, removed)`` as public/ paths."""
+        pages, created, removed = set(), set(), set()
+        for path, kind in changes.items():
+            rel = os.path.relpath(os.path.abspath(path), self.public_dir).replace(os.sep, '/')
+            if rel.startswith('../') or self.hosting.ignored(rel):
+                continue
+            if kind == REMOVED:
+                gone = {f for f in self.tree.files if f == rel or f.startswith(rel + '/')}
+                self.tree.files -= gone
+                self.tree.dirs -= {d for d in self.tree.dirs if d == rel or d.startswith(rel + '/')}
+                removed |= gone
+                continue
+            if not os.path.isfile(path) or self.is_echo(path):
+                continue
+            if rel not in self.tree.files:
+                self.tree.files.add(rel)
+                parent = os.path.dirname(rel)
+                while parent:
+                    self.tree.dirs.add(parent)
+                    parent = os.path.dirname(parent)
+                created.add(rel)
+            if '/' not in rel and rel.endswith('.html'):
+                pages.add(rel)
+        return pages, created, removed
+
+    def render_partials(self, out):
+        graph = load_graph()
+        transaction, statuses, entries = build(document.page_paths(), self.partials, graph)
+        for path, status, deps in statuses:
+            if status == 'rendered':
+                out.append(f"  {'Rendered' if self.fix else 'Stale'} {path} ({', '.join(deps)})")
+            elif status.startswith('error'):
+                out.append(f"  Error {path}: {status.split(': ', 1)[1]}")
+        if self.fix:
+            transaction.commit()
+            record(graph, entries)
+            save_graph(graph)
+
+    def audit_pages(self, rels, out):
+        """Run the page visitors over ``rels``; returns the pages whose ids changed."""
+        paths = [os.path.join(document.PUBLIC_DIR, rel) for rel in sorted(rels)]
+        report = engine.run(watch_visitors, paths, workers=1, manifest=self.manifest, write=self.fix)
+        # Rewritten pages are audited again so the findings describe what is on disk now.
+        updated = [r.path for r in report.results if r.status == engine.UPDATED] if self.fix else []
+        current = {}
+        if updated:
+            rerun = engine.run(watch_visitors, updated, workers=1, manifest=self.manifest, write=False)
+            current = {r.path: r.results for r in rerun.results if r.status != engine.FAILED}
+        moved_ids = set()
+        for result in report.results:
+            rel = page_rel(result.path)
+            if result.status == engine.FAILED:
+                out.append(f"  {result.path}: ERROR {result.error}")
+                continue
+            results = current.get(result.path, result.results)
+            # Post-write results: anything still listed as needing an update was not fixed.
+            findings = page_findings(results)
+            if result.path in updated:
+                findings.insert(0, f"updated: {result.edits} edit(s)")
+            logo = results['logo']
+            if logo['found'] and not (logo['size'].startswith('OK') and logo['text'].startswith('OK')):
+                findings.insert(0, f"logo: {logo['size']}, {logo['text']}")
+            for v in results['rules']:
+                where = f":{v['line']}" if v['line'] else ''
+                findings.append(f"{v['severity']}{where}: {v['message']} [{v['rule']}]")
+            out.append(f"  {result.path}: {'no findings' if not findings else ''}".rstrip())
+            out += [f"    {finding}" for finding in findings]
+            if result.path in updated:
+                st = os.stat(result.path)
+                self.written[result.path] = (st.st_mtime_ns, st.st_size)
+            data = results['link_targets']
+            if set(data['ids']) != self.ids.get(rel):
+                moved_ids.add(rel)
+            self.ids[rel] = set(data['ids'])
+            self.refs[rel] = data['refs']
+        return moved_ids
+
+    def handle(self, changes, overflowed=False):
+        started = time.perf_counter()
+        out = []
+        if overflowed:
+            out.append("  event queue overflowed; rescanning public/")
+            self.load()
+            relink = set(self.refs)
+            pages = set()
+        else:
+            if any(os.path.abspath(p).startswith(self.partials_dir + os.sep) for p in changes):
+                self.render_partials(out)
+            pages, created, removed = self.update_tree(changes)
+            for rel in removed:
+                if rel in self.refs:
+                    del self.refs[rel], self.ids[rel], self.broken[rel]
+                    self.forget(rel)
+            moved_ids = self.audit_pages(pages, out) if pages else set()
+            relink = set(pages)
+            for rel in removed | moved_ids:
+                relink |= self.linked_from.get(rel, set())
+            if created:
+                relink |= {rel for rel, problems in self.broken.items() if problems}
+            if removed:
+                self.manifest.prune(document.page_paths())
+        news = {}
+        for rel in sorted(relink & set(self.refs)):
+            self.index(rel)
+            before = self.broken.get(rel, [])
+            after = self.broken[rel] = self.check_links(rel)
+            for problem in after:
+                if problem not in before:
+                    news.setdefault(('Broken', problem), []).append(rel)
+            for problem in before:
+                if problem not in after:
+                    news.setdefault(('Fixed', problem), []).append(rel)
+        for (verb, (link, reason)), sources in sorted(news.items()):
+            sources = sorted(set(sources))
+            shown = ', '.join(sources[:MAX_SOURCES]) + (f" (+{len(sources) - MAX_SOURCES} more)"
+                                                        if len(sources) > MAX_SOURCES else '')
+            detail = f" ({reason})" if verb == 'Broken' else ''
+            out.append(f"  {verb}: {link}{detail} on {shown}")
+        elapsed = (time.perf_counter() - started) * 1000
+        if out:
+            print(f"{time.strftime('%H:%M:%S')} {len(changes)} change(s), {len(relink)} page(s) "
+                  f"checked in {elapsed:.0f} ms")
+            print('\n'.join(out), flush=True)
+        self.manifest.save()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--fix', action='store_true', help='apply rewrites instead of only reporting')
+    parser.add_argument('--debounce', type=int, default=int(DEBOUNCE * 1000),
+                        help=f'quiet period in ms before a run (default: {int(DEBOUNCE * 1000)})')
+    parser.add_argument('--poll', action='store_true', help='poll file stats instead of using inotify')
+    args = parser.parse_args()
+
+    session = Session(fix=args.fix)
+    roots = [d for d in (document.PUBLIC_DIR, PARTIALS_DIR) if os.path.isdir(d)]
+    watcher = None
+    if not args.poll:
+        try:
+            watcher = Inotify(roots)
+        except (OSError, AttributeError, TypeError) as e:
+            print(f"inotify unavailable ({e}); polling every {POLL_INTERVAL}s")
+    if watcher is None:
+        watcher = Poller(roots)
+
+    broken = [(rel, link, reason) for rel, problems in sorted(session.broken.items()) for link, reason in problems]
+    for rel, link, reason in broken:
+        print(f"Broken: {rel} -> {link} ({reason})")
+    print(f"Watching {', '.join(os.path.relpath(d) + '/' for d in roots)}: {len(session.refs)} pages, {len(broken)} broken link(s)"
+          f"{'' if args.fix else ', rewrites reported only (use --fix)'}. Ctrl-C to stop.", flush=True)
+    try:
+        for changes in batches(watcher, debounce=args.debounce / 1000):
+            overflowed, watcher.overflowed = watcher.overflowed, False
+            try:
+                session.handle(changes, overflowed)
+            except Exception as e:
+                print(f"Error: {e}", flush=True)
+    except KeyboardInterrupt:
+        print()
+    finally:
+        watcher.close()
+        session.manifest.save()
+
+
+if __name__ == "__main__":
+    main()
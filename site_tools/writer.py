@@ -0,0 +1,126 @@
+"""Atomic, skip-if-unchanged file writes for the page patchers.
+
+Every write goes to a temp file in the target's directory and is renamed over
+the original, so an interrupted run never leaves a truncated page behind.
+Writes whose content matches what is already on disk are skipped, keeping
+mtimes (and deploy hashes) stable. ``Transaction`` batches a whole run and
+can restore every original if any write fails or the caller rolls back.
+"""
+import os
+import tempfile
+
+from site_tools import instrument
+
+
+def _encode(text):
+    return text.encode('utf-8') if isinstance(text, str) else text
+
+
+def read_bytes(path):
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except FileNotFoundError:
+        return None
+    instrument.count('bytes_read', len(data))
+    return data
+
+
+def _atomic_replace(path, data):
+    if instrument.active():
+        instrument.count('bytes_written', len(data))
+        instrument.count('files_written')
+        with instrument.span('write', cat='write'):
+            return _replace(path, data)
+    return _replace(path, data)
+
+
+def _replace(path, data):
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(prefix='.' + os.path.basename(path) + '.', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        try:
+            os.chmod(tmp, os.stat(path).st_mode & 0o7777)
+        except FileNotFoundError:
+            os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def write_text(path, text):
+    """Atomically write ``text`` to ``path``; returns False if it was already identical."""
+    data = _encode(text)
+    if read_bytes(path) == data:
+        return False
+    _atomic_replace(path, data)
+    return True
+
+
+class Transaction:
+    """Stage writes for a whole run and apply them together.
+
+    Use as a context manager: staged writes are committed when the block
+    exits cleanly and discarded if it raises. If a write fails part-way
+    through the commit, files already replaced are restored. ``rollback()``
+    restores the originals of a committed transaction.
+    """
+
+    def __init__(self):
+        self.staged = {}
+        self.originals = {}
+        self.written = []
+        self.unchanged = []
+        self.committed = False
+
+    def write(self, path, text):
+        self.staged[os.path.abspath(path)] = (path, _encode(text))
+
+    def commit(self):
+        try:
+            for key, (path, data) in self.staged.items():
+                original = read_bytes(key)
+                if original == data:
+                    self.unchanged.append(path)
+                    continue
+                self.originals[key] = original
+                _atomic_replace(key, data)
+                self.written.append(path)
+        except BaseException:
+            self.rollback()
+            raise
+        self.staged = {}
+        self.committed = True
+        return self.written
+
+    def rollback(self):
+        for key, original in reversed(list(self.originals.items())):
+            if original is None:
+                try:
+                    os.unlink(key)
+                except FileNotFoundError:
+                    pass
+            else:
+                _atomic_replace(key, original)
+        self.originals = {}
+        self.written = []
+        self.staged = {}
+        self.committed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.staged = {}
+        return False